@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Aplica los pagos con saldo sin aplicar a las facturas abiertas de cada
+cliente, en orden de vencimiento (conciliación de fin de mes)
+
+Uso:
+    python aplicar_pagos.py                 # todos los pagos pendientes de aplicar
+    python aplicar_pagos.py --pagos 10,11   # solo los pagos indicados
+"""
+import argparse
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from mysql.connector import Error
+
+from modules.cobranzas.asignacion import aplicar_pagos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aplicación de pagos a facturas (FIFO)')
+    parser.add_argument('--pagos', help='IDs de pagos separados por coma')
+    args = parser.parse_args()
+
+    pago_ids = [int(p) for p in args.pagos.split(',')] if args.pagos else None
+
+    print("=" * 60)
+    print("APLICACIÓN DE PAGOS")
+    print("=" * 60)
+
+    try:
+        reporte = aplicar_pagos(pago_ids)
+    except (ValueError, Error) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"Pagos procesados:       {reporte['pagos']}")
+    print(f"Aplicaciones creadas:   {reporte['aplicaciones']}")
+    print(f"Facturas actualizadas:  {reporte['facturas_actualizadas']}")
+    print(f"Monto aplicado:         ${reporte['monto_aplicado']:,.2f}")
+    print(f"Monto sin aplicar:      ${reporte['monto_sin_aplicar']:,.2f}")
+    print(f"Tiempo:                 {reporte['segundos']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de analítica de cartera
+
+Compara el cálculo vectorizado (modules/cobranzas/analytics.py) contra la ruta
+SQL por cliente (Cliente.get_atraso_promedio_ponderado + Factura.get_antiguedad_saldos).
+
+Uso:
+    python bench_portfolio_analytics.py                  # contra la BD configurada en .env
+    python bench_portfolio_analytics.py --sintetico 50000 # sin BD, N clientes sintéticos
+"""
+import argparse
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+
+from modules.cobranzas.analytics import PortfolioSnapshot
+
+
+def snapshot_sintetico(num_clientes, facturas_por_cliente=20, pagos_por_cliente=5, seed=42):
+    """Genera un snapshot con datos aleatorios sin tocar la BD"""
+    rng = np.random.default_rng(seed)
+    hoy = np.datetime64('today', 'D').astype(np.int64)
+    n_f = num_clientes * facturas_por_cliente
+    n_p = num_clientes * pagos_por_cliente
+
+    emision = hoy - rng.integers(0, 365, n_f)
+    total = rng.uniform(5000, 100000, n_f)
+    abierta = rng.random(n_f) < 0.4
+
+    snapshot = PortfolioSnapshot()
+    snapshot.facturas = {
+        'id': np.arange(n_f, dtype=np.int64),
+        'cliente_id': rng.integers(1, num_clientes + 1, n_f),
+        'total': total,
+        'saldo': np.where(abierta, total * rng.uniform(0.2, 1.0, n_f), 0.0),
+        'emision': emision,
+        'vencimiento': emision + 30,
+        'abierta': abierta,
+    }
+    snapshot.pagos = {
+        'id': np.arange(n_p, dtype=np.int64),
+        'cliente_id': rng.integers(1, num_clientes + 1, n_p),
+        'monto': rng.uniform(1000, 80000, n_p),
+        'fecha': hoy - rng.integers(0, 120, n_p),
+    }
+    return snapshot
+
+
+def medir(nombre, funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} mejor: {min(tiempos) * 1000:10.2f} ms   promedio: {np.mean(tiempos) * 1000:10.2f} ms")
+    return min(tiempos)
+
+
+def bench_sintetico(num_clientes):
+    print(f"Datos sintéticos: {num_clientes} clientes")
+    snapshot = snapshot_sintetico(num_clientes)
+    print(f"  facturas: {len(snapshot.facturas['id'])}, pagos: {len(snapshot.pagos['id'])}\n")
+    medir("Vectorizado: métricas por cliente", lambda: snapshot.calcular('cliente'))
+    medir("Vectorizado: total de cartera", lambda: snapshot.calcular(None))
+
+
+def bench_bd():
+    from models import Cliente, Factura
+
+    clientes = Cliente.get_all() or []
+    print(f"Clientes activos en BD: {len(clientes)}\n")
+
+    snapshot = PortfolioSnapshot()
+    medir("Vectorizado: carga del snapshot", snapshot.cargar, repeticiones=1)
+    medir("Vectorizado: métricas por cliente", lambda: snapshot.calcular('cliente'))
+
+    def ruta_sql():
+        for c in clientes:
+            Cliente.get_atraso_promedio_ponderado(c['id'])
+            Factura.get_antiguedad_saldos(c['id'])
+
+    medir("SQL por cliente (atraso + antigüedad)", ruta_sql, repeticiones=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sintetico', type=int, metavar='N', help='Número de clientes sintéticos (sin BD)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE ANALÍTICA DE CARTERA")
+    print("=" * 60)
+    print()
+
+    if args.sintetico:
+        bench_sintetico(args.sintetico)
+    else:
+        bench_bd()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pronóstico de cobranza Monte Carlo (modules/cobranzas/pronostico.py)
+
+Uso:
+    python bench_pronostico_cobranza.py                          # 100k facturas × 10k escenarios sintéticos
+    python bench_pronostico_cobranza.py --facturas 200000 --clientes 20000
+    python bench_pronostico_cobranza.py --bd                     # contra la BD configurada en .env
+"""
+import argparse
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+
+from modules.cobranzas.pronostico import simular, resumir, pronosticar, SEMANAS
+
+
+def cartera_sintetica(num_facturas, num_clientes, seed=42):
+    """Facturas abiertas aleatorias: ~60% vencidas, el resto vence en las próximas 8 semanas"""
+    rng = np.random.default_rng(seed)
+    vencida = rng.random(num_facturas) < 0.6
+    return {
+        'clientes': rng.integers(0, num_clientes, num_facturas),
+        'saldos': rng.uniform(1000, 100000, num_facturas),
+        'semanas_vencimiento': np.where(vencida, 0, rng.integers(1, 9, num_facturas)),
+        'probabilidad': rng.uniform(0.2, 0.95, num_clientes),
+        'dias_pago': rng.uniform(5, 90, num_clientes),
+    }
+
+
+def bench_sintetico(num_facturas, num_clientes, escenarios, repeticiones):
+    print(f"Datos sintéticos: {num_facturas} facturas, {num_clientes} clientes, "
+          f"{escenarios} escenarios, {SEMANAS} semanas\n")
+    cartera = cartera_sintetica(num_facturas, num_clientes)
+
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        cobros = simular(**cartera, escenarios=escenarios, seed=i)
+        resumen = resumir(cobros)
+        tiempos.append(time.perf_counter() - inicio)
+
+    print(f"  Simulación + resumen   mejor: {min(tiempos):8.2f} s   promedio: {np.mean(tiempos):8.2f} s")
+    print(f"  Celdas por segundo (clientes × escenarios): {num_clientes * escenarios / min(tiempos):,.0f}")
+    print(f"  Saldo abierto:      ${cartera['saldos'].sum():,.2f}")
+    print(f"  Cobranza esperada:  ${resumen['total']['esperado']:,.2f} "
+          f"(p05 ${resumen['total']['p05']:,.2f} - p95 ${resumen['total']['p95']:,.2f})")
+
+
+def bench_bd(escenarios):
+    inicio = time.perf_counter()
+    pronostico = pronosticar(escenarios=escenarios)
+    print(f"  Ejecución ML: {pronostico['ejecucion_id']}")
+    print(f"  Facturas: {pronostico['facturas']}, clientes: {pronostico['clientes']} "
+          f"({pronostico['clientes_sin_modelo']} sin resultado ML)")
+    print(f"  Carga + simulación: {time.perf_counter() - inicio:.2f} s")
+
+    inicio = time.perf_counter()
+    pronosticar(escenarios=escenarios)
+    print(f"  Desde caché:        {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    print(f"  Cobranza esperada:  ${pronostico['total']['esperado']:,.2f} "
+          f"de ${pronostico['saldo_abierto']:,.2f} abiertos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--facturas', type=int, default=100000, help='Facturas sintéticas')
+    parser.add_argument('--clientes', type=int, default=10000, help='Clientes sintéticos')
+    parser.add_argument('--escenarios', type=int, default=10000, help='Escenarios a simular')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--bd', action='store_true', help='Usar las facturas y resultados ML de la BD')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE PRONÓSTICO DE COBRANZA (MONTE CARLO)")
+    print("=" * 60)
+    print()
+
+    if args.bd:
+        bench_bd(args.escenarios)
+    else:
+        bench_sintetico(args.facturas, args.clientes, args.escenarios, args.repeticiones)
+
+
+if __name__ == '__main__':
+    main()
@@ -37,6 +37,36 @@ class Config:
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB máximo
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'txt', 'png', 'jpg', 'jpeg'}
+    # Almacén de documentos por SHA-256 (fuera de static: se sirve solo con login)
+    DOCUMENTS_FOLDER = os.environ.get('DOCUMENTS_FOLDER', 'storage/documentos')
+    # Backend del almacén: 'local' (DOCUMENTS_FOLDER) o 's3' (bucket compartido por
+    # varios nodos web; con 's3', DOCUMENTS_FOLDER solo guarda temporales de subida)
+    DOCUMENTS_STORAGE = os.environ.get('DOCUMENTS_STORAGE', 'local').lower()
+    S3_BUCKET = os.environ.get('S3_BUCKET', '')
+    S3_PREFIX = os.environ.get('S3_PREFIX', 'documentos/')
+    # Vacío para AWS; la URL del servicio para MinIO u otro compatible
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')
+    S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+    S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID', '')
+    S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY', '')
+    # Validez de las URLs firmadas de descarga; 0 hace pasar las descargas por la app
+    S3_PRESIGNED_SEGUNDOS = int(os.environ.get('S3_PRESIGNED_SEGUNDOS', '300'))
+    # Entrega de descargas por el proxy (backend local): '' (Flask), 'nginx'
+    # (X-Accel-Redirect) o 'apache' (X-Sendfile). Con nginx, DOCUMENTS_ACCEL_PREFIX debe ser una
+    # location `internal` con alias a DOCUMENTS_FOLDER (y `etag off`: el ETag es el SHA-256)
+    DOCUMENTS_ACCEL = os.environ.get('DOCUMENTS_ACCEL', '').lower()
+    DOCUMENTS_ACCEL_PREFIX = os.environ.get('DOCUMENTS_ACCEL_PREFIX', '/_documentos/')
+    # Procesos para renderizar miniaturas de documentos (modules/documents/miniaturas.py)
+    MINIATURAS_PROCESOS = int(os.environ.get('MINIATURAS_PROCESOS', '2'))
+
+    # Índice vectorial del chatbot (modules/chatbot/conocimiento.py):
+    # RAG_EMBEDDINGS = 'local' (hashing, solo CPU) o 'remoto' (/embeddings de LLM_API_BASE)
+    RAG_EMBEDDINGS = os.environ.get('RAG_EMBEDDINGS', 'local').lower()
+    RAG_EMBEDDINGS_MODEL = os.environ.get('RAG_EMBEDDINGS_MODEL', 'text-embedding-3-small')
+    RAG_INDEX_FOLDER = os.environ.get('RAG_INDEX_FOLDER', 'rag_index')
+
+    # Artefactos de modelos ML entrenados (scoring de cobranza)
+    ML_MODELS_FOLDER = os.environ.get('ML_MODELS_FOLDER', 'ml_models')
 
     # Configuración OAuth - Microsoft
     MICROSOFT_CLIENT_ID = os.environ.get('MICROSOFT_CLIENT_ID', '')
@@ -0,0 +1,120 @@
+"""
+Contadores con escritura diferida (write-behind) para columnas muy calientes.
+
+Cada vista de un anuncio o descarga de un documento hacía su propio
+UPDATE ... SET x = x + 1 sobre la misma fila, de modo que un anuncio popular
+serializaba las peticiones en el lock de esa fila. Aquí los incrementos se
+acumulan en memoria por id y un hilo los escribe juntos en un único
+UPDATE ... CASE cada INTERVALO_SEGUNDOS, o antes si se juntan MAX_PENDIENTES
+ids distintos. Al terminar el proceso se vacía lo pendiente.
+
+Los contadores quedan eventualmente consistentes: una lectura puede no ver
+los últimos segundos de incrementos de este proceso. Si la escritura falla,
+los incrementos vuelven al buffer y se reintentan en la siguiente pasada.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from database import execute_transaction
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SEGUNDOS = 5.0
+MAX_PENDIENTES = 500
+# Ids por sentencia UPDATE ... CASE
+IDS_POR_SENTENCIA = 500
+
+
+class ContadorDiferido:
+    """Acumula incrementos de tabla.columna por id y los escribe por lotes"""
+
+    def __init__(self, tabla, columna, intervalo=INTERVALO_SEGUNDOS, max_pendientes=MAX_PENDIENTES):
+        self.tabla = tabla
+        self.columna = columna
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        self._pendientes = Counter()
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._pid = None
+
+    def incrementar(self, registro_id, cantidad=1):
+        """Suma al contador del registro sin tocar la base de datos"""
+        with self._lock:
+            self._pendientes[registro_id] += cantidad
+            lleno = len(self._pendientes) >= self.max_pendientes
+            self._asegurar_hilo()
+        if lleno:
+            self._despertar.set()
+
+    def pendientes(self):
+        """Copia de los incrementos aún no escritos"""
+        with self._lock:
+            return dict(self._pendientes)
+
+    def sentencias(self, incrementos):
+        """UPDATE ... CASE (query, params) para un dict {id: incremento}"""
+        ids = list(incrementos)
+        sentencias = []
+        for inicio in range(0, len(ids), IDS_POR_SENTENCIA):
+            lote = ids[inicio:inicio + IDS_POR_SENTENCIA]
+            casos = ' '.join(['WHEN %s THEN %s'] * len(lote))
+            query = (f"UPDATE {self.tabla} SET {self.columna} = {self.columna} + CASE id {casos} END "
+                     f"WHERE id IN ({', '.join(['%s'] * len(lote))})")
+            params = [v for i in lote for v in (i, incrementos[i])] + lote
+            sentencias.append((query, tuple(params)))
+        return sentencias
+
+    def vaciar(self):
+        """
+        Escribe los incrementos pendientes en una transacción
+
+        Returns:
+            int: Registros actualizados (0 si no había pendientes o falló)
+        """
+        with self._lock:
+            incrementos, self._pendientes = self._pendientes, Counter()
+        if not incrementos:
+            return 0
+
+        if execute_transaction(self.sentencias(incrementos)):
+            return len(incrementos)
+
+        logger.warning(f"No se pudieron escribir {len(incrementos)} contadores de "
+                       f"{self.tabla}.{self.columna}; se reintentará")
+        with self._lock:
+            self._pendientes.update(incrementos)
+        return 0
+
+    def _asegurar_hilo(self):
+        # Tras un fork (workers de gunicorn) el hilo del padre no existe en el hijo
+        if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        self._pid = os.getpid()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True,
+                                      name=f'contador-{self.tabla}-{self.columna}')
+        self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                self.vaciar()
+            except Exception as e:
+                logger.error(f"Error al escribir contadores de {self.tabla}.{self.columna}: {e}")
+
+
+descargas_documentos = ContadorDiferido('documentos', 'descargas')
+vistas_anuncios = ContadorDiferido('anuncios', 'vistas')
+
+
+@atexit.register
+def vaciar_todos():
+    """Escribe lo pendiente de todos los contadores (al apagar el proceso)"""
+    for contador in (descargas_documentos, vistas_anuncios):
+        contador.vaciar()
@@ -1,4 +1,6 @@
 import logging
+from contextlib import contextmanager
+import mysql.connector
 from mysql.connector import Error
 from mysql.connector import pooling
 from config import Config
@@ -112,3 +114,178 @@ def execute_many(query, data):
         if connection.is_connected():
             cursor.close()
             connection.close()
+
+
+def execute_batch(statements):
+    """
+    Ejecuta varias consultas SELECT en un solo viaje al servidor
+
+    Las consultas se envían como un único batch multi-statement y se leen
+    los result sets en el mismo orden en que fueron enviadas.
+
+    Args:
+        statements: Lista de tuplas (query, params)
+
+    Returns:
+        - Lista con los resultados de cada consulta (lista de dict)
+        - None si ocurre un error
+    """
+    connection = get_db_connection()
+    if connection is None:
+        return None
+
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+
+        query = ';\n'.join(q.strip().rstrip(';') for q, _ in statements)
+        params = tuple(p for _, stmt_params in statements for p in (stmt_params or ()))
+
+        results = []
+        for result in cursor.execute(query, params, multi=True):
+            if result.with_rows:
+                results.append(result.fetchall())
+        return results
+    except Error as e:
+        logger.error(f"Error al ejecutar batch de queries: {e}")
+        connection.rollback()
+        return None
+    finally:
+        if connection.is_connected():
+            if cursor is not None:
+                cursor.close()
+            connection.close()
+
+
+def execute_transaction(statements):
+    """
+    Ejecuta varias sentencias de escritura en una sola transacción
+
+    Args:
+        statements: Lista de tuplas (query, params). Si params es una lista,
+            la sentencia se ejecuta con executemany (una fila por elemento)
+
+    Returns:
+        bool: True si la transacción se confirmó, False si se revirtió
+    """
+    connection = get_db_connection()
+    if connection is None:
+        return False
+
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        connection.start_transaction()
+        for query, params in statements:
+            if isinstance(params, list):
+                if params:
+                    cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params)
+        connection.commit()
+        return True
+    except Error as e:
+        logger.error(f"Error en transacción, se revierte: {e}")
+        connection.rollback()
+        return False
+    finally:
+        if connection.is_connected():
+            if cursor is not None:
+                cursor.close()
+            connection.close()
+
+
+def stream_query(query, params=None, batch_size=1000):
+    """
+    Ejecuta un SELECT y entrega las filas a medida que llegan del servidor
+
+    Usa un cursor sin buffer sobre una conexión dedicada (fuera del pool),
+    de modo que una exportación larga no retiene memoria ni conexiones del
+    pool. La conexión se abre, la query se ejecuta y se lee el primer bloque
+    antes de devolver el generador: los errores de conexión o de SQL se
+    lanzan aquí, antes de que la ruta envíe los encabezados de la respuesta.
+    La conexión se cierra al agotar o cerrar el generador.
+
+    Args:
+        query: SQL SELECT a ejecutar
+        params: Parámetros para la query
+        batch_size: Filas leídas por cada fetchmany
+
+    Returns:
+        generator: Una fila (dict) por iteración
+
+    Raises:
+        Error: Si no se pudo abrir la conexión o ejecutar la query
+    """
+    try:
+        connection = mysql.connector.connect(
+            host=Config.DB_CONFIG['host'],
+            user=Config.DB_CONFIG['user'],
+            password=Config.DB_CONFIG['password'],
+            database=Config.DB_CONFIG['database']
+        )
+    except Error as e:
+        logger.error(f"Error al abrir conexión de streaming: {e}")
+        raise
+
+    cursor = connection.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, params or ())
+        primeras = cursor.fetchmany(batch_size)
+    except Error as e:
+        logger.error(f"Error al ejecutar query de streaming: {e}")
+        _cerrar_streaming(cursor, connection)
+        raise
+
+    return _filas_streaming(cursor, connection, primeras, batch_size)
+
+
+def _filas_streaming(cursor, connection, rows, batch_size):
+    try:
+        while rows:
+            yield from rows
+            rows = cursor.fetchmany(batch_size)
+    finally:
+        _cerrar_streaming(cursor, connection)
+
+
+def _cerrar_streaming(cursor, connection):
+    # Si la descarga se canceló quedan filas sin leer y el cierre puede
+    # fallar; la conexión es dedicada y se descarta de todos modos
+    for cerrar in (cursor.close, connection.close):
+        try:
+            cerrar()
+        except Error:
+            pass
+
+
+@contextmanager
+def transaction():
+    """
+    Abre una transacción y entrega un cursor (dictionary) para usarla
+
+    Hace commit al salir del bloque y rollback si se produce una excepción,
+    de modo que lecturas con FOR UPDATE y escrituras quedan en la misma
+    transacción.
+
+    Uso:
+        with transaction() as cursor:
+            cursor.execute("SELECT ... FOR UPDATE", params)
+            cursor.executemany("INSERT ...", filas)
+    """
+    connection = get_db_connection()
+    if connection is None:
+        raise Error("No hay conexión disponible con la base de datos")
+
+    cursor = connection.cursor(dictionary=True, buffered=True)
+    try:
+        connection.start_transaction()
+        yield cursor
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Genera las miniaturas y vistas previas que faltan de los documentos
+
+Las subidas nuevas se procesan solas en segundo plano; este script completa
+los documentos existentes (después de migrar_documentos_blobs.py) o los que
+quedaron fuera porque el pool estaba saturado. Solo genera lo que no existe.
+Las miniaturas de PDF requieren pdftoppm (paquete poppler-utils); sin él se
+guarda una vista previa de texto.
+
+Uso:
+    python generar_miniaturas.py
+    python generar_miniaturas.py --procesos 4
+"""
+import argparse
+import sys
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from models import Document
+from modules.documents.miniaturas import generar_pendientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Miniaturas y vistas previas de documentos')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Procesos de renderizado (default: MINIATURAS_PROCESOS)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("MINIATURAS DE DOCUMENTOS")
+    print("=" * 60)
+
+    documentos = Document.get_all()
+    if documentos is None:
+        print("✗ Error al consultar los documentos")
+        return 1
+
+    inicio = time.perf_counter()
+    reporte = generar_pendientes(documentos, procesos=args.procesos)
+
+    print(f"✓ {reporte['documentos']} documentos revisados en {time.perf_counter() - inicio:.2f}s")
+    print(f"  Miniaturas:      {reporte['miniatura']}")
+    print(f"  Vistas de texto: {reporte['texto']}")
+    print(f"  Sin cambios:     {reporte['omitidos']}")
+    if reporte['errores']:
+        print(f"✗ {reporte['errores']} documentos con error (ver log)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Importa facturas o pagos desde un CSV (extracto nocturno del ERP)
+
+Columnas de facturas: numero_factura, cliente_codigo, fecha_emision,
+    fecha_vencimiento, total [, subtotal, iva, saldo_pendiente, moneda, estado, notas]
+Columnas de pagos: numero_pago, cliente_codigo, fecha_pago, monto
+    [, metodo_pago, referencia, banco, notas]
+
+Uso:
+    python importar_cobranzas.py facturas extracto_facturas.csv
+    python importar_cobranzas.py pagos extracto_pagos.csv --lote 10000
+    python importar_cobranzas.py pagos extracto_pagos.csv --aplicar   # y aplica FIFO
+"""
+import argparse
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from mysql.connector import Error
+
+from modules.cobranzas.asignacion import aplicar_pagos
+from modules.cobranzas.importacion import importar, IMPORTACIONES, TAMANO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importación masiva de cobranzas')
+    parser.add_argument('tipo', choices=sorted(IMPORTACIONES))
+    parser.add_argument('archivo', help='Ruta del CSV (UTF-8, con encabezados)')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                        help=f'Filas por transacción (default: {TAMANO_LOTE})')
+    parser.add_argument('--aplicar', action='store_true',
+                        help='Tras importar pagos, aplicarlos a facturas por vencimiento (FIFO)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"IMPORTACIÓN DE {args.tipo.upper()}")
+    print("=" * 60)
+
+    try:
+        with open(args.archivo, newline='', encoding='utf-8-sig') as archivo:
+            reporte = importar(args.tipo, archivo, tamano_lote=args.lote)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"Filas procesadas:  {reporte['procesadas']}")
+    print(f"Insertadas:        {reporte['insertadas']}")
+    print(f"Duplicadas:        {reporte['duplicadas']}")
+    print(f"Rechazadas:        {reporte['rechazadas']}")
+    print(f"Tiempo:            {reporte['segundos']}s ({reporte['filas_por_segundo']} filas/s)")
+
+    for rechazo in reporte['rechazos']:
+        print(f"  línea {rechazo['linea']}: {rechazo['motivo']}")
+    if reporte['rechazadas'] > len(reporte['rechazos']):
+        print(f"  ... y {reporte['rechazadas'] - len(reporte['rechazos'])} más")
+
+    if reporte.get('error'):
+        # Los lotes anteriores quedaron confirmados; no se aplican pagos de una carga incompleta
+        print(f"✗ {reporte['error']}")
+        print(f"  Última línea confirmada: {reporte['ultima_linea_confirmada'] or '-'}")
+        return 1
+
+    if args.aplicar and args.tipo == 'pagos' and reporte['insertadas']:
+        try:
+            aplicacion = aplicar_pagos()
+        except (ValueError, Error) as e:
+            print(f"✗ Error al aplicar los pagos: {e}")
+            return 1
+        print(f"Pagos aplicados:   {aplicacion['pagos']} "
+              f"(${aplicacion['monto_aplicado']:,.2f} en {aplicacion['facturas_actualizadas']} facturas)")
+
+    return 0 if reporte['rechazadas'] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Sincroniza el índice vectorial de conocimiento del chatbot
+
+Requiere las migraciones sql/migrations/add_documentos_fulltext.sql y
+add_conocimiento_fragmentos.sql. Los documentos y anuncios nuevos se agregan
+solos en segundo plano; este script procesa lo pendiente (por ejemplo los
+documentos existentes tras correr indexar_documentos.py) o reconstruye todo.
+Cada nodo tiene su propio índice en RAG_INDEX_FOLDER: se corre en cada uno.
+
+Uso:
+    python indexar_conocimiento.py                 # solo fragmentos nuevos
+    python indexar_conocimiento.py --reconstruir   # vacía el índice de este nodo y vuelve a indexar
+    python indexar_conocimiento.py --buscar "política de viáticos"
+"""
+import argparse
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from modules.chatbot.conocimiento import buscar, sincronizar
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice vectorial de documentos y anuncios')
+    parser.add_argument('--reconstruir', action='store_true', help='Vacía el índice de este nodo y lo reconstruye')
+    parser.add_argument('--buscar', metavar='PREGUNTA', help='Prueba una búsqueda después de sincronizar')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ÍNDICE DE CONOCIMIENTO DEL CHATBOT")
+    print("=" * 60)
+
+    try:
+        reporte = sincronizar(reconstruir=args.reconstruir)
+    except (RuntimeError, OSError) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"✓ {reporte['nuevos']} fragmentos nuevos en {reporte['segundos']}s")
+    print(f"  Proveedor:  {reporte['proveedor']}")
+    print(f"  Total:      {reporte['filas']} vectores")
+    if reporte['centroides']:
+        print(f"  IVF:        {reporte['centroides']} centroides reentrenados")
+
+    if args.buscar:
+        for fragmento in buscar(args.buscar):
+            print(f"\n[{fragmento['similitud']:.3f}] {fragmento['titulo']} ({fragmento['fuente']})")
+            print(f"  {fragmento['texto'][:200]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
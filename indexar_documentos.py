@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Indexa el contenido de los documentos para la búsqueda de texto completo
+
+Requiere la migración sql/migrations/add_documentos_fulltext.sql. Las subidas
+nuevas se indexan solas en segundo plano; este script procesa los documentos
+existentes o los que quedaron pendientes, y con --todos reconstruye el índice.
+
+Uso:
+    python indexar_documentos.py           # solo documentos sin indexar
+    python indexar_documentos.py --todos   # reindexa todos los documentos
+"""
+import argparse
+import sys
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from modules.documents.indice import indexar_pendientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice de texto completo de documentos')
+    parser.add_argument('--todos', action='store_true', help='Reindexa todos los documentos activos')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("INDEXACIÓN DE DOCUMENTOS")
+    print("=" * 60)
+
+    inicio = time.perf_counter()
+    try:
+        reporte = indexar_pendientes(reindexar=args.todos)
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"✓ {reporte['documentos']} documentos en {time.perf_counter() - inicio:.2f}s")
+    print(f"  Con texto:  {reporte['indexado']}")
+    print(f"  Sin texto:  {reporte['sin_texto']}")
+    print(f"  Pasajes:    {reporte['pasajes']}")
+    if reporte['error']:
+        print(f"✗ {reporte['error']} documentos no se pudieron leer (ver documento_indice.error)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
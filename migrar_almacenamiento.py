@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Copia los documentos del almacén de un backend a otro (p. ej. disco local → S3)
+
+Copia cada blob registrado en documento_blobs, con su miniatura y vista
+previa, y actualiza su ubicación en la base de datos. Solo copia lo que falta
+en el destino, así que se puede interrumpir y volver a ejecutar. El origen no
+se borra: una vez terminada la copia, cambiar DOCUMENTS_STORAGE y reiniciar
+los nodos. Ejecutar antes migrar_documentos_blobs.py si quedan documentos
+subidos antes del almacén por contenido.
+
+Uso:
+    python migrar_almacenamiento.py --destino s3
+    python migrar_almacenamiento.py --origen s3 --destino local
+"""
+import argparse
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from modules.documents.backends import crear_backend
+from modules.documents.storage import migrar_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migración del almacén de documentos entre backends')
+    parser.add_argument('--origen', choices=['local', 's3'], default='local')
+    parser.add_argument('--destino', choices=['local', 's3'], required=True)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"MIGRACIÓN DEL ALMACÉN DE DOCUMENTOS: {args.origen.upper()} → {args.destino.upper()}")
+    print("=" * 60)
+
+    if args.origen == args.destino:
+        print("✗ El origen y el destino deben ser distintos")
+        return 1
+
+    try:
+        origen = crear_backend(args.origen)
+        destino = crear_backend(args.destino)
+        reporte = migrar_backend(origen, destino)
+    except Exception as e:
+        # Incluye los errores de boto3 (credenciales, bucket inexistente, red)
+        print(f"✗ {e}")
+        return 1
+
+    print(f"✓ {reporte['copiados']} de {reporte['blobs']} blobs copiados "
+          f"({reporte['bytes'] / (1024 * 1024):.2f} MB)")
+    print(f"  Ya existentes en el destino: {reporte['existentes']}")
+    print(f"  Miniaturas y vistas previas: {reporte['derivados']}")
+    if reporte['faltantes']:
+        print(f"✗ {len(reporte['faltantes'])} blobs no están en el origen:")
+        for sha256 in reporte['faltantes']:
+            print(f"    {sha256}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Migra los documentos existentes al almacén direccionado por contenido
+
+Requiere la migración sql/migrations/add_documento_blobs.sql. Calcula el
+SHA-256 de cada archivo subido antes del cambio, lo mueve al backend del
+almacén (DOCUMENTS_STORAGE) y deja una sola copia de los archivos repetidos. Se puede ejecutar varias
+veces: solo procesa documentos sin sha256.
+
+Uso:
+    python migrar_documentos_blobs.py
+"""
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from modules.documents.storage import migrar_existentes
+
+
+def main():
+    print("=" * 60)
+    print("MIGRACIÓN DE DOCUMENTOS AL ALMACÉN POR CONTENIDO")
+    print("=" * 60)
+
+    try:
+        reporte = migrar_existentes()
+    except (RuntimeError, OSError) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"✓ {reporte['migrados']} de {reporte['documentos']} documentos migrados")
+    print(f"  Duplicados:       {reporte['duplicados']}")
+    print(f"  Espacio liberado: {reporte['bytes_liberados'] / (1024 * 1024):.2f} MB")
+    if reporte['faltantes']:
+        print(f"✗ Archivos no encontrados (documentos {', '.join(map(str, reporte['faltantes']))})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,10 @@
 """
 Modelos para interactuar con la base de datos
 """
-from database import execute_query
+import re
+import unicodedata
+from database import execute_query, execute_batch, execute_transaction, transaction
+from contadores import descargas_documentos, vistas_anuncios
 from werkzeug.security import check_password_hash, generate_password_hash
 
 class User:
@@ -177,6 +180,41 @@ class Employee:
         search_pattern = f"%{search_term}%"
         return execute_query(query, (search_pattern, search_pattern, search_pattern, search_pattern), fetch=True)
 
+    @staticmethod
+    def consultar(termino=None, departamento=None, limit=10, offset=0):
+        """
+        Empleados activos filtrados y ordenados por relevancia (para el chatbot)
+
+        Con término, primero el nombre completo exacto, luego nombre o apellido
+        que empiezan por él y al final coincidencias en email o cargo.
+        """
+        where, params, orden, orden_params = ["e.activo = TRUE"], [], "", []
+        if termino:
+            patron = f"%{termino}%"
+            where.append("(CONCAT(e.nombre, ' ', e.apellido) LIKE %s OR e.email LIKE %s OR e.cargo LIKE %s)")
+            params += [patron, patron, patron]
+            orden = """
+                CASE WHEN CONCAT(e.nombre, ' ', e.apellido) = %s THEN 0
+                     WHEN e.nombre LIKE %s OR e.apellido LIKE %s THEN 1
+                     WHEN CONCAT(e.nombre, ' ', e.apellido) LIKE %s THEN 2
+                     ELSE 3 END,
+            """
+            orden_params = [termino, f"{termino}%", f"{termino}%", patron]
+        if departamento:
+            where.append("d.nombre LIKE %s")
+            params.append(f"%{departamento}%")
+
+        query = f"""
+            SELECT e.id, e.nombre, e.apellido, e.email, e.telefono, e.extension, e.cargo,
+                   e.fecha_ingreso, d.nombre as departamento_nombre
+            FROM empleados e
+            LEFT JOIN departamentos d ON e.departamento_id = d.id
+            WHERE {' AND '.join(where)}
+            ORDER BY {orden} e.apellido, e.nombre, e.id
+            LIMIT %s OFFSET %s
+        """
+        return execute_query(query, tuple(params + orden_params + [limit, offset]), fetch=True)
+
     @staticmethod
     def create_from_user(user_id, username, email, nombre_completo, rol, departamento_id=None, cargo=None):
         """Crea un empleado automáticamente desde un usuario"""
@@ -260,6 +298,30 @@ class Vacation:
         """
         return execute_query(query, fetch=True)
 
+    @staticmethod
+    def consultar(estado=None, empleado=None, limit=10, offset=0):
+        """Solicitudes filtradas por estado o nombre del empleado; primero las pendientes"""
+        where, params = ["TRUE"], []
+        if estado:
+            where.append("v.estado = %s")
+            params.append(estado)
+        if empleado:
+            where.append("CONCAT(e.nombre, ' ', e.apellido) LIKE %s")
+            params.append(f"%{empleado}%")
+
+        query = f"""
+            SELECT v.id, v.empleado_id, e.nombre, e.apellido, v.fecha_inicio, v.fecha_fin,
+                   v.dias_solicitados, v.tipo, v.estado, v.motivo, v.fecha_solicitud,
+                   u.nombre_completo as aprobador_nombre, v.comentarios_aprobador
+            FROM vacaciones v
+            JOIN empleados e ON v.empleado_id = e.id
+            LEFT JOIN usuarios u ON v.aprobador_id = u.id
+            WHERE {' AND '.join(where)}
+            ORDER BY v.estado = 'pendiente' DESC, v.fecha_solicitud DESC, v.id DESC
+            LIMIT %s OFFSET %s
+        """
+        return execute_query(query, tuple(params + [limit, offset]), fetch=True)
+
     @staticmethod
     def get_by_employee(employee_id):
         """Obtiene las solicitudes de vacaciones de un empleado"""
@@ -318,21 +380,137 @@ class Document:
         return execute_query(query, (categoria,), fetch=True)
 
     @staticmethod
-    def create(titulo, descripcion, categoria, nombre_archivo, ruta_archivo, tamanio, tipo_archivo, subido_por):
-        """Crea un nuevo documento"""
+    def consultar(categoria=None, termino=None, limit=10, offset=0):
+        """Documentos activos por categoría o título/descripción; primero los que lo tienen en el título"""
+        where, params, orden, orden_params = ["d.activo = TRUE"], [], "", []
+        if categoria:
+            where.append("d.categoria = %s")
+            params.append(categoria)
+        if termino:
+            patron = f"%{termino}%"
+            where.append("(d.titulo LIKE %s OR d.descripcion LIKE %s)")
+            params += [patron, patron]
+            orden, orden_params = "d.titulo LIKE %s DESC,", [patron]
+
+        query = f"""
+            SELECT d.id, d.titulo, d.descripcion, d.categoria, d.tipo_archivo, d.fecha_subida, d.descargas
+            FROM documentos d
+            WHERE {' AND '.join(where)}
+            ORDER BY {orden} d.fecha_subida DESC, d.id DESC
+            LIMIT %s OFFSET %s
+        """
+        return execute_query(query, tuple(params + orden_params + [limit, offset]), fetch=True)
+
+    @staticmethod
+    def get_by_id(doc_id):
+        """Obtiene un documento activo por ID"""
+        query = "SELECT * FROM documentos WHERE id = %s AND activo = TRUE"
+        result = execute_query(query, (doc_id,), fetch=True)
+        return result[0] if result else None
+
+    @staticmethod
+    def create(titulo, descripcion, categoria, nombre_archivo, ruta_archivo, tamanio, tipo_archivo,
+               subido_por, sha256=None):
+        """
+        Crea un nuevo documento
+
+        Con sha256 el archivo es un blob del almacén direccionado por contenido;
+        la referencia en documento_blobs ya la tomó storage.guardar().
+        """
         query = """
             INSERT INTO documentos (titulo, descripcion, categoria, nombre_archivo, ruta_archivo,
-                                  tamanio, tipo_archivo, subido_por)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                                  tamanio, tipo_archivo, subido_por, sha256)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        return execute_query(query, (titulo, descripcion, categoria, nombre_archivo, ruta_archivo,
-                                    tamanio, tipo_archivo, subido_por))
+        params = (titulo, descripcion, categoria, nombre_archivo, ruta_archivo,
+                  tamanio, tipo_archivo, subido_por, sha256)
+        return execute_query(query, params)
+
+    @staticmethod
+    def get_sin_blob():
+        """Documentos cuyo archivo aún no está en el almacén por contenido"""
+        query = "SELECT id, ruta_archivo FROM documentos WHERE sha256 IS NULL ORDER BY id"
+        return execute_query(query, fetch=True)
+
+    @staticmethod
+    def asignar_blob(doc_id, sha256, ruta_archivo, tamanio):
+        """Apunta un documento existente a su blob (referencia tomada por storage.guardar())"""
+        return execute_transaction([
+            ("UPDATE documentos SET sha256 = %s, ruta_archivo = %s, tamanio = %s WHERE id = %s",
+             (sha256, ruta_archivo, tamanio, doc_id)),
+        ])
 
     @staticmethod
     def increment_downloads(doc_id):
-        """Incrementa el contador de descargas"""
-        query = "UPDATE documentos SET descargas = descargas + 1 WHERE id = %s"
-        execute_query(query, (doc_id,))
+        """Incrementa el contador de descargas (se escribe por lotes, ver contadores.py)"""
+        descargas_documentos.incrementar(doc_id)
+
+
+class DocumentBlob:
+    """Blobs del almacén de documentos por SHA-256 con conteo de referencias"""
+
+    @staticmethod
+    def get_by_hash(sha256):
+        """Obtiene un blob por su hash"""
+        result = execute_query("SELECT * FROM documento_blobs WHERE sha256 = %s", (sha256,), fetch=True)
+        return result[0] if result else None
+
+    @staticmethod
+    def get_all():
+        """Todos los blobs (para copiarlos a otro backend)"""
+        return execute_query("SELECT sha256, tamanio, ruta FROM documento_blobs ORDER BY sha256", fetch=True)
+
+    @staticmethod
+    def actualizar_ruta(sha256, ruta):
+        """Registra la nueva ubicación de un blob en el blob y en sus documentos"""
+        return execute_transaction([
+            ("UPDATE documento_blobs SET ruta = %s WHERE sha256 = %s", (ruta, sha256)),
+            ("UPDATE documentos SET ruta_archivo = %s WHERE sha256 = %s", (ruta, sha256)),
+        ])
+
+    @staticmethod
+    def sql_referenciar(sha256, tamanio, ruta, referencias=1):
+        """Sentencia que registra el blob o suma referencias si ya existía"""
+        query = """
+            INSERT INTO documento_blobs (sha256, tamanio, ruta, referencias)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE referencias = documento_blobs.referencias + VALUES(referencias)
+        """
+        return query, (sha256, tamanio, ruta, referencias)
+
+    @staticmethod
+    def referenciar(sha256, tamanio, ruta):
+        """Suma una referencia al blob (registrándolo si no existe); espera a un liberar() en curso"""
+        return execute_transaction([DocumentBlob.sql_referenciar(sha256, tamanio, ruta)])
+
+    @staticmethod
+    def liberar(sha256, borrar=None):
+        """
+        Resta una referencia al blob
+
+        Args:
+            sha256: Hash del blob
+            borrar: Función que borra sus archivos si queda sin referencias. Se
+                    llama con la fila bloqueada, así que un referenciar()
+                    simultáneo espera a que termine y luego ve el blob ausente
+
+        Returns:
+            bool: True si el blob quedó sin referencias (su fila se borra)
+        """
+        with transaction() as cursor:
+            cursor.execute("SELECT referencias FROM documento_blobs WHERE sha256 = %s FOR UPDATE",
+                           (sha256,))
+            fila = cursor.fetchone()
+            if not fila:
+                return False
+            if fila['referencias'] <= 1:
+                if borrar:
+                    borrar()
+                cursor.execute("DELETE FROM documento_blobs WHERE sha256 = %s", (sha256,))
+                return True
+            cursor.execute("UPDATE documento_blobs SET referencias = referencias - 1 WHERE sha256 = %s",
+                           (sha256,))
+            return False
 
 
 class Announcement:
@@ -371,9 +549,8 @@ class Announcement:
 
     @staticmethod
     def increment_views(announcement_id):
-        """Incrementa el contador de vistas"""
-        query = "UPDATE anuncios SET vistas = vistas + 1 WHERE id = %s"
-        execute_query(query, (announcement_id,))
+        """Incrementa el contador de vistas (se escribe por lotes, ver contadores.py)"""
+        vistas_anuncios.incrementar(announcement_id)
 
 
 class Ticket:
@@ -390,6 +567,40 @@ class Ticket:
         """
         return execute_query(query, fetch=True)
 
+    @staticmethod
+    def consultar(estado=None, prioridad=None, categoria=None, termino=None, limit=10, offset=0):
+        """
+        Tickets filtrados, primero los abiertos y más urgentes (para el chatbot)
+
+        Con término, los que lo tienen en el título van antes que los que solo
+        lo tienen en la descripción.
+        """
+        where, params, orden, orden_params = ["TRUE"], [], "", []
+        for columna, valor in (('t.estado', estado), ('t.prioridad', prioridad), ('t.categoria', categoria)):
+            if valor:
+                where.append(f"{columna} = %s")
+                params.append(valor)
+        if termino:
+            patron = f"%{termino}%"
+            where.append("(t.titulo LIKE %s OR t.descripcion LIKE %s)")
+            params += [patron, patron]
+            orden, orden_params = "t.titulo LIKE %s DESC,", [patron]
+
+        query = f"""
+            SELECT t.id, t.titulo, t.descripcion, t.categoria, t.prioridad, t.estado, t.fecha_creacion,
+                   u1.nombre_completo as solicitante_nombre, u2.nombre_completo as asignado_nombre
+            FROM tickets t
+            JOIN usuarios u1 ON t.solicitante_id = u1.id
+            LEFT JOIN usuarios u2 ON t.asignado_a = u2.id
+            WHERE {' AND '.join(where)}
+            ORDER BY {orden}
+                FIELD(t.estado, 'abierto', 'en_proceso', 'resuelto', 'cerrado'),
+                FIELD(t.prioridad, 'urgente', 'alta', 'media', 'baja'),
+                t.fecha_creacion DESC, t.id DESC
+            LIMIT %s OFFSET %s
+        """
+        return execute_query(query, tuple(params + orden_params + [limit, offset]), fetch=True)
+
     @staticmethod
     def get_by_user(user_id):
         """Obtiene tickets creados por un usuario"""
@@ -553,6 +764,401 @@ class Cliente:
         return result[0] if result else None
 
 
+def normalizar_texto(texto):
+    """
+    Normaliza un texto para búsqueda: sin acentos, en minúsculas y con
+    cualquier carácter no alfanumérico convertido en espacio
+
+    Args:
+        texto: Texto a normalizar
+
+    Returns:
+        str: Texto normalizado
+    """
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch))
+    return re.sub(r'[^0-9a-z]+', ' ', texto.lower()).strip()
+
+
+class ClienteBusqueda:
+    """Índice de búsqueda por prefijo sobre código, razón social y RFC"""
+
+    MAX_TERMINOS = 4
+    MAX_LONGITUD_TOKEN = 100
+    COLUMNAS_ORDEN = {
+        'codigo': 'c.codigo',
+        'razon_social': 'c.razon_social',
+        'rfc': 'c.rfc',
+        'limite_credito': 'c.limite_credito',
+        'saldo_total': 'saldo_total',
+        'saldo_vencido': 'saldo_vencido',
+    }
+
+    @staticmethod
+    def tokens_cliente(cliente):
+        """
+        Genera los tokens indexables de un cliente
+
+        Además de cada palabra, se indexa el código y el RFC completos (sin
+        separadores) para que "CLI-001" se encuentre escribiendo "cli001".
+        """
+        tokens = set()
+        for campo in ('codigo', 'razon_social', 'rfc'):
+            normalizado = normalizar_texto(cliente.get(campo))
+            if not normalizado:
+                continue
+            tokens.update(normalizado.split())
+            if campo != 'razon_social':
+                tokens.add(normalizado.replace(' ', ''))
+        return sorted(t[:ClienteBusqueda.MAX_LONGITUD_TOKEN] for t in tokens)
+
+    @staticmethod
+    def terminos_consulta(texto):
+        """Convierte el texto escrito por el usuario en términos de búsqueda"""
+        terminos = normalizar_texto(texto).split()
+        return [t[:ClienteBusqueda.MAX_LONGITUD_TOKEN]
+                for t in terminos[:ClienteBusqueda.MAX_TERMINOS]]
+
+    @staticmethod
+    def indexar(cliente_ids=None):
+        """
+        Reconstruye el índice de búsqueda
+
+        Args:
+            cliente_ids: Lista de IDs a reindexar (None = todos)
+
+        Returns:
+            int: Número de tokens escritos, o None si falló
+        """
+        query = "SELECT id, codigo, razon_social, rfc FROM clientes"
+        params = None
+        if cliente_ids is not None:
+            if not cliente_ids:
+                return 0
+            placeholders = ', '.join(['%s'] * len(cliente_ids))
+            query += f" WHERE id IN ({placeholders})"
+            params = tuple(cliente_ids)
+
+        clientes = execute_query(query, params, fetch=True)
+        if clientes is None:
+            return None
+
+        filas = [(token, c['id']) for c in clientes
+                 for token in ClienteBusqueda.tokens_cliente(c)]
+
+        if cliente_ids is None:
+            borrar = ("DELETE FROM cliente_busqueda_tokens", None)
+        else:
+            borrar = (f"DELETE FROM cliente_busqueda_tokens WHERE cliente_id IN ({placeholders})",
+                      tuple(cliente_ids))
+
+        ok = execute_transaction([
+            borrar,
+            ("INSERT INTO cliente_busqueda_tokens (token, cliente_id) VALUES (%s, %s)", filas),
+        ])
+        return len(filas) if ok else None
+
+    @staticmethod
+    def _filtro(texto):
+        """Construye el WHERE de búsqueda: cada término debe ser prefijo de algún token"""
+        condiciones = ["c.activo = TRUE"]
+        params = []
+        for termino in ClienteBusqueda.terminos_consulta(texto):
+            condiciones.append(
+                "c.id IN (SELECT cliente_id FROM cliente_busqueda_tokens WHERE token LIKE %s)"
+            )
+            params.append(termino + '%')
+        return " AND ".join(condiciones), params
+
+    @staticmethod
+    def buscar(texto, limit=10):
+        """
+        Sugerencias de clientes para autocompletado
+
+        Args:
+            texto: Texto escrito por el usuario
+            limit: Máximo de resultados
+
+        Returns:
+            list: Clientes (id, codigo, razon_social, rfc)
+        """
+        if not ClienteBusqueda.terminos_consulta(texto):
+            return []
+
+        where, params = ClienteBusqueda._filtro(texto)
+        query = f"""
+            SELECT c.id, c.codigo, c.razon_social, c.rfc
+            FROM clientes c
+            WHERE {where}
+            ORDER BY c.razon_social
+            LIMIT %s
+        """
+        return execute_query(query, tuple(params) + (limit,), fetch=True) or []
+
+    @staticmethod
+    def grid(texto='', ordenar_por='razon_social', direccion='asc', page=1, per_page=25):
+        """
+        Página de la grilla de clientes con su saldo precalculado
+
+        Args:
+            texto: Filtro de búsqueda (vacío = todos los clientes activos)
+            ordenar_por: Columna de COLUMNAS_ORDEN
+            direccion: 'asc' o 'desc'
+            page: Página (desde 1)
+            per_page: Filas por página
+
+        Returns:
+            dict: total, page, per_page y clientes
+        """
+        columna = ClienteBusqueda.COLUMNAS_ORDEN.get(ordenar_por, 'c.razon_social')
+        direccion = 'DESC' if str(direccion).lower() == 'desc' else 'ASC'
+        where, params = ClienteBusqueda._filtro(texto)
+        offset = (page - 1) * per_page
+
+        resultados = execute_batch([
+            (f"SELECT COUNT(*) AS total FROM clientes c WHERE {where}", params),
+            (f"""
+                SELECT c.id, c.codigo, c.razon_social, c.rfc, c.limite_credito,
+                       COALESCE(s.saldo_total, 0) AS saldo_total,
+                       COALESCE(s.saldo_vencido, 0) AS saldo_vencido,
+                       COALESCE(s.facturas_pendientes, 0) AS facturas_pendientes,
+                       COALESCE(s.facturas_vencidas, 0) AS facturas_vencidas
+                FROM clientes c
+                LEFT JOIN cliente_saldos s ON s.cliente_id = c.id
+                WHERE {where}
+                ORDER BY {columna} {direccion}, c.id
+                LIMIT %s OFFSET %s
+            """, params + [per_page, offset]),
+        ])
+        if resultados is None:
+            return None
+
+        conteo, clientes = resultados
+        return {
+            'total': conteo[0]['total'] if conteo else 0,
+            'page': page,
+            'per_page': per_page,
+            'clientes': clientes
+        }
+
+
+class ClienteSaldo:
+    """Saldos precalculados por cliente (tabla cliente_saldos)"""
+
+    MAX_REFRESCO_PARCIAL = 1000
+
+    @staticmethod
+    def refrescar(cliente_ids=None):
+        """
+        Recalcula el saldo de los clientes indicados en una sola sentencia
+
+        Los saldos vencidos dependen de la fecha, por lo que conviene un
+        refresco completo diario además de los refrescos puntuales.
+
+        Args:
+            cliente_ids: Lista de IDs a recalcular (None = todos)
+
+        Returns:
+            Resultado de execute_query (None si falló)
+        """
+        filtro = ""
+        params = None
+        # Con muchos clientes es más barato recalcular la tabla completa
+        if cliente_ids is not None and len(cliente_ids) > ClienteSaldo.MAX_REFRESCO_PARCIAL:
+            cliente_ids = None
+        if cliente_ids is not None:
+            if not cliente_ids:
+                return 0
+            filtro = f"WHERE c.id IN ({', '.join(['%s'] * len(cliente_ids))})"
+            params = tuple(cliente_ids)
+
+        query = f"""
+            INSERT INTO cliente_saldos
+                (cliente_id, saldo_total, saldo_vencido, facturas_pendientes, facturas_vencidas)
+            SELECT
+                c.id,
+                COALESCE(SUM(f.saldo_pendiente), 0),
+                COALESCE(SUM(CASE WHEN f.estado = 'vencida' OR f.fecha_vencimiento < CURDATE()
+                                  THEN f.saldo_pendiente ELSE 0 END), 0),
+                COUNT(f.id),
+                COALESCE(SUM(CASE WHEN f.estado = 'vencida' OR f.fecha_vencimiento < CURDATE()
+                                  THEN 1 ELSE 0 END), 0)
+            FROM clientes c
+            LEFT JOIN facturas f ON f.cliente_id = c.id
+                AND f.estado IN ('pendiente', 'parcial', 'vencida')
+            {filtro}
+            GROUP BY c.id
+            ON DUPLICATE KEY UPDATE
+                saldo_total = VALUES(saldo_total),
+                saldo_vencido = VALUES(saldo_vencido),
+                facturas_pendientes = VALUES(facturas_pendientes),
+                facturas_vencidas = VALUES(facturas_vencidas)
+        """
+        resultado = execute_query(query, params)
+        if resultado is not None:
+            CobranzaWorklist.refrescar(cliente_ids)
+        return resultado
+
+
+class CobranzaWorklist:
+    """Lista de llamadas priorizada por recuperación esperada (tabla cobranza_worklist)"""
+
+    # Sin resultado ML se usa una probabilidad neutra para no ocultar al cliente
+    PROBABILIDAD_SIN_MODELO = 0.5
+    # Duración de un intento de contacto y ventana para estimar la tasa de contacto
+    HORAS_POR_INTENTO = 0.25
+    DIAS_HISTORIAL_CONTACTO = 90
+    PRIORIDADES = ('alta', 'media', 'baja')
+
+    @staticmethod
+    def refrescar(cliente_ids=None):
+        """
+        Recalcula la posición en la lista de los clientes indicados
+
+        monto_esperado = probabilidad_pago × min(saldo, monto_recuperable_predicho)
+        horas_contacto = HORAS_POR_INTENTO / tasa de contacto (suavizada, últimos
+        DIAS_HISTORIAL_CONTACTO días); valor_hora = monto_esperado / horas_contacto.
+        Lee los saldos de cliente_saldos, así que debe ejecutarse después de
+        ClienteSaldo.refrescar (que ya lo llama).
+
+        Args:
+            cliente_ids: Lista de IDs a recalcular (None = todos)
+
+        Returns:
+            bool: True si se actualizó la lista
+        """
+        filtro = filtro_ml = filtro_seg = ""
+        params = ()
+        if cliente_ids is not None and len(cliente_ids) > ClienteSaldo.MAX_REFRESCO_PARCIAL:
+            cliente_ids = None
+        if cliente_ids is not None:
+            if not cliente_ids:
+                return True
+            placeholders = ', '.join(['%s'] * len(cliente_ids))
+            filtro = f"AND s.cliente_id IN ({placeholders})"
+            filtro_ml = f"AND rc.cliente_codigo IN (SELECT codigo FROM clientes WHERE id IN ({placeholders}))"
+            filtro_seg = f"AND cliente_id IN ({placeholders})"
+            params = tuple(cliente_ids)
+
+        borrar = "DELETE FROM cobranza_worklist"
+        if cliente_ids is not None:
+            borrar += f" WHERE cliente_id IN ({', '.join(['%s'] * len(cliente_ids))})"
+
+        insertar = f"""
+            INSERT INTO cobranza_worklist
+                (cliente_id, saldo_total, saldo_vencido, probabilidad_pago, monto_recuperable,
+                 monto_esperado, horas_contacto, valor_hora, prioridad_cobranza,
+                 accion_recomendada, ml_resultado_id)
+            SELECT
+                w.cliente_id, w.saldo_total, w.saldo_vencido, w.probabilidad, w.recuperable,
+                ROUND(w.probabilidad * w.recuperable, 2),
+                w.horas,
+                ROUND(w.probabilidad * w.recuperable / w.horas, 2),
+                w.prioridad_cobranza, w.accion_recomendada, w.ml_resultado_id
+            FROM (
+                SELECT
+                    s.cliente_id, s.saldo_total, s.saldo_vencido,
+                    COALESCE(rc.probabilidad_pago, %s) AS probabilidad,
+                    LEAST(s.saldo_total, COALESCE(rc.monto_recuperable_predicho, s.saldo_total)) AS recuperable,
+                    %s * (COALESCE(h.intentos, 0) + 2) / (COALESCE(h.contactos, 0) + 1) AS horas,
+                    rc.prioridad_cobranza, rc.accion_recomendada, rc.id AS ml_resultado_id
+                FROM cliente_saldos s
+                JOIN clientes c ON c.id = s.cliente_id
+                LEFT JOIN (
+                    SELECT rc.cliente_codigo, MAX(rc.id) AS id
+                    FROM ml_resultados_cliente rc
+                    JOIN ml_ejecuciones e ON e.id = rc.ejecucion_id
+                    JOIN ml_modelos m ON m.id = e.modelo_id
+                    WHERE e.estado = 'completado' AND m.activo = 1
+                    AND rc.probabilidad_pago IS NOT NULL
+                    {filtro_ml}
+                    GROUP BY rc.cliente_codigo
+                ) ultimo ON ultimo.cliente_codigo = c.codigo
+                LEFT JOIN ml_resultados_cliente rc ON rc.id = ultimo.id
+                LEFT JOIN (
+                    SELECT cliente_id, COUNT(*) AS intentos,
+                           SUM(resultado <> 'no_contesta') AS contactos
+                    FROM cobranza_seguimientos
+                    WHERE fecha_contacto >= CURDATE() - INTERVAL {CobranzaWorklist.DIAS_HISTORIAL_CONTACTO} DAY
+                    {filtro_seg}
+                    GROUP BY cliente_id
+                ) h ON h.cliente_id = s.cliente_id
+                WHERE s.saldo_total > 0
+                {filtro}
+            ) w
+        """
+        return execute_transaction([
+            (borrar, params),
+            (insertar, (CobranzaWorklist.PROBABILIDAD_SIN_MODELO, CobranzaWorklist.HORAS_POR_INTENTO)
+                       + params + params + params),
+        ])
+
+    @staticmethod
+    def refrescar_ejecucion(ejecucion_id):
+        """
+        Recalcula la lista para los clientes evaluados en una ejecución ML
+
+        Args:
+            ejecucion_id: ID de la ejecución con resultados nuevos
+
+        Returns:
+            bool: True si se actualizó la lista
+        """
+        filas = execute_query("""
+            SELECT DISTINCT c.id
+            FROM ml_resultados_cliente rc
+            JOIN clientes c ON c.codigo = rc.cliente_codigo
+            WHERE rc.ejecucion_id = %s
+        """, (ejecucion_id,), fetch=True)
+        if filas is None:
+            return False
+        return CobranzaWorklist.refrescar([f['id'] for f in filas])
+
+    @staticmethod
+    def get_pagina(page=1, per_page=25, prioridad=None):
+        """
+        Página de la lista de llamadas ordenada por valor por hora de contacto
+
+        Args:
+            page: Página (desde 1)
+            per_page: Filas por página
+            prioridad: Filtra por prioridad_cobranza del modelo ('alta', 'media', 'baja')
+
+        Returns:
+            dict: total, page, per_page y clientes (None si falló)
+        """
+        where, params = "TRUE", []
+        if prioridad in CobranzaWorklist.PRIORIDADES:
+            where, params = "w.prioridad_cobranza = %s", [prioridad]
+        offset = (page - 1) * per_page
+
+        resultados = execute_batch([
+            (f"SELECT COUNT(*) AS total FROM cobranza_worklist w WHERE {where}", params),
+            (f"""
+                SELECT w.*, c.codigo, c.razon_social, c.telefono, c.email, c.contacto_nombre
+                FROM cobranza_worklist w
+                JOIN clientes c ON c.id = w.cliente_id
+                WHERE {where}
+                ORDER BY w.valor_hora DESC, w.cliente_id DESC
+                LIMIT %s OFFSET %s
+            """, params + [per_page, offset]),
+        ])
+        if resultados is None:
+            return None
+
+        conteo, clientes = resultados
+        for posicion, cliente in enumerate(clientes, start=offset + 1):
+            cliente['posicion'] = posicion
+        return {
+            'total': conteo[0]['total'] if conteo else 0,
+            'page': page,
+            'per_page': per_page,
+            'clientes': clientes
+        }
+
+
 class Factura:
     @staticmethod
     def get_all():
@@ -691,33 +1297,217 @@ class CobranzaSeguimiento:
             return execute_query(query, fetch=True)
 
 
+class CobranzaAlerta:
+    """Alertas de cobranza generadas por modules/cobranzas/alertas.py"""
+
+    @staticmethod
+    def get_activas(cliente_id=None, tipo_alerta=None, solo_no_leidas=False, limit=50):
+        """
+        Obtiene alertas activas, de la más reciente a la más antigua
+
+        Args:
+            cliente_id: Filtra por cliente (opcional)
+            tipo_alerta: Filtra por tipo (opcional)
+            solo_no_leidas: Solo alertas no leídas
+            limit: Máximo de alertas
+
+        Returns:
+            list: Alertas con código y razón social del cliente
+        """
+        condiciones = ["a.activa = TRUE"]
+        params = []
+        if cliente_id:
+            condiciones.append("a.cliente_id = %s")
+            params.append(cliente_id)
+        if tipo_alerta:
+            condiciones.append("a.tipo_alerta = %s")
+            params.append(tipo_alerta)
+        if solo_no_leidas:
+            condiciones.append("a.leida = FALSE")
+
+        query = f"""
+            SELECT a.id, a.cliente_id, a.factura_id, a.seguimiento_id, a.tipo_alerta,
+                   a.mensaje, a.leida, a.fecha_creacion,
+                   c.codigo as cliente_codigo, c.razon_social as cliente_nombre
+            FROM cobranza_alertas a
+            JOIN clientes c ON a.cliente_id = c.id
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY a.fecha_creacion DESC
+            LIMIT %s
+        """
+        params.append(limit)
+        return execute_query(query, tuple(params), fetch=True) or []
+
+    @staticmethod
+    def get_resumen():
+        """Conteo de alertas activas (y no leídas) por tipo"""
+        query = """
+            SELECT tipo_alerta, COUNT(*) as total, SUM(leida = FALSE) as no_leidas
+            FROM cobranza_alertas
+            WHERE activa = TRUE
+            GROUP BY tipo_alerta
+        """
+        return execute_query(query, fetch=True) or []
+
+    @staticmethod
+    def marcar_leida(alerta_id):
+        """Marca una alerta como leída"""
+        query = """
+            UPDATE cobranza_alertas
+            SET leida = TRUE, fecha_lectura = NOW()
+            WHERE id = %s AND leida = FALSE
+        """
+        return execute_query(query, (alerta_id,))
+
+
 class Cobranza:
     """Clase con métodos de análisis avanzado para cobranzas"""
 
     @staticmethod
-    def get_resumen_cliente_completo(cliente_id):
-        """Genera un resumen completo de la situación de un cliente"""
-        cliente = Cliente.get_by_id(cliente_id)
-        if not cliente:
+    def get_resumen_cliente_completo(cliente_id, limite_seguimientos=5):
+        """
+        Genera un resumen completo de la situación de un cliente
+
+        Todas las consultas se envían en un solo batch (un viaje a la BD).
+        Las facturas se leen una sola vez y de ellas se derivan la cartera,
+        el atraso ponderado, la antigüedad de saldos y las pendientes.
+
+        Args:
+            cliente_id: ID del cliente
+            limite_seguimientos: Número de seguimientos recientes a incluir
+
+        Returns:
+            dict con el resumen, o None si el cliente no existe
+        """
+        resultados = execute_batch([
+            ("SELECT * FROM clientes WHERE id = %s", (cliente_id,)),
+            ("""
+                SELECT f.*,
+                    DATEDIFF(CURDATE(), f.fecha_vencimiento) as dias_vencido
+                FROM facturas f
+                WHERE f.cliente_id = %s AND f.estado != 'cancelada'
+                ORDER BY f.fecha_vencimiento ASC
+            """, (cliente_id,)),
+            ("""
+                SELECT p.*, u.nombre_completo as registrado_por_nombre
+                FROM pagos p
+                LEFT JOIN usuarios u ON p.registrado_por = u.id
+                WHERE p.cliente_id = %s
+                ORDER BY p.fecha_pago DESC
+                LIMIT 5
+            """, (cliente_id,)),
+            ("""
+                SELECT s.*, u.nombre_completo as realizado_por_nombre,
+                    f.numero_factura
+                FROM cobranza_seguimientos s
+                LEFT JOIN usuarios u ON s.realizado_por = u.id
+                LEFT JOIN facturas f ON s.factura_id = f.id
+                WHERE s.cliente_id = %s
+                ORDER BY s.fecha_contacto DESC
+                LIMIT %s
+            """, (cliente_id, limite_seguimientos)),
+            ("""
+                SELECT s.*, c.razon_social as cliente_nombre, c.codigo as cliente_codigo,
+                    u.nombre_completo as realizado_por_nombre
+                FROM cobranza_seguimientos s
+                JOIN clientes c ON s.cliente_id = c.id
+                LEFT JOIN usuarios u ON s.realizado_por = u.id
+                WHERE s.cliente_id = %s
+                AND s.resultado = 'promesa_pago'
+                AND s.fecha_promesa_pago IS NOT NULL
+                AND s.fecha_promesa_pago <= CURDATE()
+                ORDER BY s.fecha_promesa_pago
+            """, (cliente_id,)),
+        ])
+        if not resultados or not resultados[0]:
             return None
 
-        resumen_cartera = Cliente.get_resumen_cartera(cliente_id)
-        atraso_ponderado = Cliente.get_atraso_promedio_ponderado(cliente_id)
-        antiguedad = Factura.get_antiguedad_saldos(cliente_id)
-        facturas_pendientes = Factura.get_pendientes_by_cliente(cliente_id)
-        ultimos_pagos = Pago.get_historial_pagos(cliente_id, 5)
-        ultimos_seguimientos = CobranzaSeguimiento.get_by_cliente(cliente_id, 5)
-        promesas_pendientes = CobranzaSeguimiento.get_promesas_pendientes(cliente_id)
+        cliente, facturas, ultimos_pagos, seguimientos, promesas = resultados
+        cliente = cliente[0]
 
         return {
             'cliente': cliente,
-            'cartera': resumen_cartera,
-            'atraso_promedio_ponderado': atraso_ponderado,
-            'antiguedad_saldos': antiguedad[0] if antiguedad else None,
-            'facturas_pendientes': facturas_pendientes or [],
-            'ultimos_pagos': ultimos_pagos or [],
-            'ultimos_seguimientos': ultimos_seguimientos or [],
-            'promesas_incumplidas': promesas_pendientes or []
+            **Cobranza._resumir_facturas(cliente, facturas),
+            'facturas': facturas,
+            'ultimos_pagos': ultimos_pagos,
+            'ultimos_seguimientos': seguimientos,
+            'promesas_incumplidas': promesas
+        }
+
+    @staticmethod
+    def _resumir_facturas(cliente, facturas):
+        """
+        Calcula cartera, atraso ponderado y antigüedad de saldos a partir de
+        las facturas no canceladas de un cliente (mismas reglas que
+        Cliente.get_resumen_cartera, Cliente.get_atraso_promedio_ponderado y
+        Factura.get_antiguedad_saldos)
+        """
+        cartera = {
+            'id': cliente['id'], 'codigo': cliente['codigo'],
+            'razon_social': cliente['razon_social'], 'rfc': cliente['rfc'],
+            'email': cliente['email'], 'telefono': cliente['telefono'],
+            'limite_credito': cliente['limite_credito'],
+            'dias_credito': cliente['dias_credito'],
+            'total_facturas': len(facturas),
+            'facturas_pendientes': 0, 'facturas_vencidas': 0, 'facturas_pagadas': 0,
+            'total_facturado': 0, 'saldo_total_pendiente': 0, 'saldo_vencido': 0
+        }
+        antiguedad = {
+            'cliente_id': cliente['id'], 'codigo': cliente['codigo'],
+            'razon_social': cliente['razon_social'],
+            'vigente': 0, 'dias_1_30': 0, 'dias_31_60': 0, 'dias_61_90': 0,
+            'dias_mas_90': 0, 'total_pendiente': 0
+        }
+        saldo_ponderado = 0
+        saldo_atraso = 0
+        num_facturas_atraso = 0
+        facturas_pendientes = []
+
+        for f in facturas:
+            estado = f['estado']
+            saldo = f['saldo_pendiente'] or 0
+            dias = f['dias_vencido'] or 0
+
+            cartera['total_facturado'] += f['total'] or 0
+            cartera['saldo_total_pendiente'] += saldo
+            if estado in ('pendiente', 'parcial'):
+                cartera['facturas_pendientes'] += 1
+            elif estado == 'vencida':
+                cartera['facturas_vencidas'] += 1
+                cartera['saldo_vencido'] += saldo
+            elif estado == 'pagada':
+                cartera['facturas_pagadas'] += 1
+
+            if estado not in ('pendiente', 'parcial', 'vencida'):
+                continue
+            facturas_pendientes.append(f)
+
+            if dias <= 0:
+                antiguedad['vigente'] += saldo
+            elif dias <= 30:
+                antiguedad['dias_1_30'] += saldo
+            elif dias <= 60:
+                antiguedad['dias_31_60'] += saldo
+            elif dias <= 90:
+                antiguedad['dias_61_90'] += saldo
+            else:
+                antiguedad['dias_mas_90'] += saldo
+            antiguedad['total_pendiente'] += saldo
+
+            if saldo > 0:
+                saldo_ponderado += max(dias, 0) * saldo
+                saldo_atraso += saldo
+                num_facturas_atraso += 1
+
+        return {
+            'cartera': cartera,
+            'atraso_promedio_ponderado': {
+                'atraso_promedio_ponderado': saldo_ponderado / saldo_atraso if saldo_atraso else 0,
+                'saldo_total': saldo_atraso if num_facturas_atraso else None,
+                'num_facturas': num_facturas_atraso
+            },
+            'antiguedad_saldos': antiguedad if facturas_pendientes else None,
+            'facturas_pendientes': facturas_pendientes
         }
 
     @staticmethod
@@ -749,6 +1539,106 @@ class Cobranza:
         return result[0]
 
 
+class CarteraSnapshot:
+    """Serie de tiempo diaria de la cartera (total y por cliente)"""
+
+    COLUMNAS = ('cartera_total', 'cartera_vencida', 'vigente', 'dias_1_30', 'dias_31_60',
+                'dias_61_90', 'dias_mas_90', 'facturas_pendientes', 'facturas_vencidas')
+    PERIODOS = {
+        'dia': None,
+        'semana': 'YEARWEEK(fecha, 3)',
+        'mes': 'YEAR(fecha) * 100 + MONTH(fecha)',
+    }
+
+    @staticmethod
+    def generar():
+        """
+        Registra el snapshot del día actual (idempotente: re-ejecutarlo el mismo
+        día reemplaza las filas de hoy)
+
+        Returns:
+            bool: True si el snapshot se guardó
+        """
+        columnas = ', '.join(CarteraSnapshot.COLUMNAS)
+        sumas = ', '.join(f"COALESCE(SUM({c}), 0)" for c in CarteraSnapshot.COLUMNAS)
+        actualizar = ', '.join(f"{c} = VALUES({c})"
+                               for c in CarteraSnapshot.COLUMNAS + ('clientes_con_saldo',))
+
+        return execute_transaction([
+            ("DELETE FROM cartera_snapshots_cliente WHERE fecha = CURDATE()", None),
+            (f"""
+                INSERT INTO cartera_snapshots_cliente (fecha, cliente_id, {columnas})
+                SELECT
+                    CURDATE(), f.cliente_id,
+                    SUM(f.saldo_pendiente),
+                    SUM(CASE WHEN f.fecha_vencimiento < CURDATE() THEN f.saldo_pendiente ELSE 0 END),
+                    SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) <= 0 THEN f.saldo_pendiente ELSE 0 END),
+                    SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) BETWEEN 1 AND 30 THEN f.saldo_pendiente ELSE 0 END),
+                    SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) BETWEEN 31 AND 60 THEN f.saldo_pendiente ELSE 0 END),
+                    SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) BETWEEN 61 AND 90 THEN f.saldo_pendiente ELSE 0 END),
+                    SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) > 90 THEN f.saldo_pendiente ELSE 0 END),
+                    COUNT(*),
+                    SUM(CASE WHEN f.estado = 'vencida' OR f.fecha_vencimiento < CURDATE() THEN 1 ELSE 0 END)
+                FROM facturas f
+                WHERE f.estado IN ('pendiente', 'parcial', 'vencida')
+                GROUP BY f.cliente_id
+            """, None),
+            (f"""
+                INSERT INTO cartera_snapshots_diarios (fecha, {columnas}, clientes_con_saldo)
+                SELECT CURDATE(), {sumas}, COUNT(*)
+                FROM cartera_snapshots_cliente
+                WHERE fecha = CURDATE()
+                ON DUPLICATE KEY UPDATE {actualizar}
+            """, None),
+        ])
+
+    @staticmethod
+    def get_serie(fecha_inicio, fecha_fin, cliente_id=None, granularidad='dia'):
+        """
+        Obtiene la serie de snapshots en un rango de fechas
+
+        Para 'semana' y 'mes' se devuelve el último snapshot de cada periodo
+        (los saldos son un stock, no se suman entre días).
+
+        Args:
+            fecha_inicio: Fecha inicial (date o 'YYYY-MM-DD')
+            fecha_fin: Fecha final (inclusive)
+            cliente_id: ID del cliente (None = cartera total)
+            granularidad: 'dia', 'semana' o 'mes'
+
+        Returns:
+            list: Filas ordenadas por fecha
+        """
+        if granularidad not in CarteraSnapshot.PERIODOS:
+            raise ValueError(f"Granularidad no soportada: {granularidad}")
+
+        if cliente_id is None:
+            tabla, filtro, params = 'cartera_snapshots_diarios', '', []
+        else:
+            tabla, filtro, params = 'cartera_snapshots_cliente', 'AND cliente_id = %s', [cliente_id]
+
+        rango = f"fecha BETWEEN %s AND %s {filtro}"
+        params = [fecha_inicio, fecha_fin] + params
+        periodo = CarteraSnapshot.PERIODOS[granularidad]
+
+        if periodo is None:
+            query = f"SELECT * FROM {tabla} WHERE {rango} ORDER BY fecha"
+        else:
+            query = f"""
+                SELECT s.* FROM {tabla} s
+                JOIN (
+                    SELECT MAX(fecha) AS fecha FROM {tabla}
+                    WHERE {rango}
+                    GROUP BY {periodo}
+                ) p ON p.fecha = s.fecha
+                WHERE 1 = 1 {filtro.replace('cliente_id', 's.cliente_id')}
+                ORDER BY s.fecha
+            """
+            params = params + params[2:]
+
+        return execute_query(query, tuple(params), fetch=True) or []
+
+
 # ==================== MÓDULO DE KPIs (POWER BI) ====================
 
 class PowerBIReport:
@@ -960,8 +1850,8 @@ class MLEjecucion:
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
         return execute_query(query, (modelo_id, fecha_datos_desde, fecha_datos_hasta,
-                                    num_registros, duracion, parametros,
-                                    usuario_ejecutor, estado))
+                                    num_registros, duracion, estado,
+                                    parametros, usuario_ejecutor))
 
     @staticmethod
     def get_ultimas_ejecuciones(limit=20):
@@ -1042,19 +1932,98 @@ class MLKDDProceso:
 class MLResultadoCliente:
     """Gestión de resultados ML por cliente"""
 
+    # Columnas copiadas a ml_latest_result (último resultado por cliente y modelo)
+    COLUMNAS_ULTIMO = ('score_prediccion', 'clasificacion', 'probabilidad_pago',
+                       'dias_pago_predicho', 'monto_recuperable_predicho',
+                       'factores_principales', 'confianza_prediccion', 'segmento_cliente',
+                       'cluster_id', 'accion_recomendada', 'prioridad_cobranza',
+                       'datos_entrada', 'explicacion')
+
+    @staticmethod
+    def sql_actualizar_ultimos(ejecucion_id=None):
+        """
+        Sentencia que lleva los resultados de una ejecución a ml_latest_result
+
+        Debe ejecutarse en la misma transacción que cierra la ejecución. Solo
+        reemplaza la fila de un cliente/modelo si la ejecución es más reciente
+        (fecha_ejecucion, id), así que reprocesar una ejecución vieja no pisa
+        la vigente.
+
+        Args:
+            ejecucion_id: ID de la ejecución (None = todas las completadas)
+
+        Returns:
+            tuple: (query, params) para cursor.execute o execute_transaction
+        """
+        columnas = MLResultadoCliente.COLUMNAS_ULTIMO
+        mas_reciente = ("(VALUES(fecha_ejecucion), VALUES(ejecucion_id)) >= "
+                        "(ml_latest_result.fecha_ejecucion, ml_latest_result.ejecucion_id)")
+        # Las asignaciones se aplican en orden: ejecucion_id y fecha_ejecucion
+        # van al final para que la condición use los valores anteriores
+        asignaciones = ',\n                '.join(
+            f"{c} = IF({mas_reciente}, VALUES({c}), ml_latest_result.{c})"
+            for c in columnas + ('resultado_id', 'ejecucion_id', 'fecha_ejecucion')
+        )
+        if ejecucion_id is None:
+            filtro, params = "e.estado = 'completado'", ()
+        else:
+            filtro, params = "rc.ejecucion_id = %s", (ejecucion_id,)
+
+        query = f"""
+            INSERT INTO ml_latest_result
+                (cliente_codigo, modelo_id, ejecucion_id, resultado_id, fecha_ejecucion,
+                 {', '.join(columnas)})
+            SELECT rc.cliente_codigo, e.modelo_id, e.id, rc.id, e.fecha_ejecucion,
+                   {', '.join('rc.' + c for c in columnas)}
+            FROM ml_resultados_cliente rc
+            JOIN ml_ejecuciones e ON rc.ejecucion_id = e.id
+            WHERE {filtro}
+            ORDER BY e.fecha_ejecucion, e.id, rc.id
+            ON DUPLICATE KEY UPDATE
+                {asignaciones}
+        """
+        return query, params
+
+    @staticmethod
+    def reconstruir_ultimos():
+        """Recalcula ml_latest_result desde todo el historial de ejecuciones"""
+        return execute_transaction([
+            ("DELETE FROM ml_latest_result", ()),
+            MLResultadoCliente.sql_actualizar_ultimos(),
+        ])
+
     @staticmethod
     def get_by_cliente(cliente_codigo):
-        """Obtiene todos los resultados ML de un cliente"""
+        """Obtiene el último resultado ML de un cliente por cada modelo activo"""
         query = """
             SELECT
-                rc.*,
+                lr.*,
+                lr.resultado_id as id,
                 m.nombre as modelo_nombre,
                 m.tipo_modelo,
                 m.algoritmo,
                 m.descripcion as modelo_descripcion,
-                e.fecha_ejecucion,
                 e.fecha_datos_desde,
                 e.fecha_datos_hasta
+            FROM ml_latest_result lr
+            JOIN ml_modelos m ON lr.modelo_id = m.id
+            JOIN ml_ejecuciones e ON lr.ejecucion_id = e.id
+            WHERE lr.cliente_codigo = %s
+            AND m.activo = 1
+            ORDER BY lr.fecha_ejecucion DESC
+        """
+        return execute_query(query, (cliente_codigo,), fetch=True)
+
+    @staticmethod
+    def get_historial_cliente(cliente_codigo, limit=50):
+        """Obtiene los resultados ML de un cliente en las ejecuciones más recientes"""
+        query = """
+            SELECT
+                rc.*,
+                m.nombre as modelo_nombre,
+                m.tipo_modelo,
+                m.algoritmo,
+                e.fecha_ejecucion
             FROM ml_resultados_cliente rc
             JOIN ml_ejecuciones e ON rc.ejecucion_id = e.id
             JOIN ml_modelos m ON e.modelo_id = m.id
@@ -1062,20 +2031,94 @@ class MLResultadoCliente:
             AND e.estado = 'completado'
             AND m.activo = 1
             ORDER BY e.fecha_ejecucion DESC
+            LIMIT %s
         """
-        return execute_query(query, (cliente_codigo,), fetch=True)
+        return execute_query(query, (cliente_codigo, limit), fetch=True)
 
     @staticmethod
     def get_ultimos_por_cliente(cliente_codigo, limit=5):
-        """Obtiene los últimos N resultados de un cliente"""
+        """Obtiene el último resultado de un cliente en cada modelo (hasta N modelos)"""
         query = """
-            SELECT * FROM v_ml_ultimos_resultados_cliente
-            WHERE cliente_codigo = %s
-            ORDER BY fecha_ejecucion DESC
+            SELECT
+                lr.cliente_codigo,
+                c.razon_social,
+                m.nombre as modelo_nombre,
+                m.tipo_modelo,
+                m.algoritmo,
+                lr.fecha_ejecucion,
+                lr.score_prediccion,
+                lr.clasificacion,
+                lr.probabilidad_pago,
+                lr.dias_pago_predicho,
+                lr.monto_recuperable_predicho,
+                lr.accion_recomendada,
+                lr.prioridad_cobranza,
+                lr.confianza_prediccion,
+                lr.segmento_cliente,
+                met.accuracy,
+                met.f1_score,
+                met.auc_roc
+            FROM ml_latest_result lr
+            JOIN ml_modelos m ON lr.modelo_id = m.id
+            JOIN clientes c ON lr.cliente_codigo = c.codigo
+            LEFT JOIN ml_metricas_modelo met ON met.ejecucion_id = lr.ejecucion_id
+            WHERE lr.cliente_codigo = %s
+            AND m.activo = 1
+            ORDER BY lr.fecha_ejecucion DESC
             LIMIT %s
         """
         return execute_query(query, (cliente_codigo, limit), fetch=True)
 
+    @staticmethod
+    def get_ultimos_clientes(cliente_codigos):
+        """
+        Último resultado de varios clientes en cada modelo activo, sin columnas JSON
+
+        Cada fila trae resultado_id: las columnas pesadas (factores_principales,
+        datos_entrada, explicacion) se leen aparte con get_detalle_resultados.
+        """
+        if not cliente_codigos:
+            return []
+        placeholders = ', '.join(['%s'] * len(cliente_codigos))
+        query = f"""
+            SELECT
+                lr.cliente_codigo,
+                lr.modelo_id,
+                lr.resultado_id,
+                lr.ejecucion_id,
+                lr.fecha_ejecucion,
+                lr.score_prediccion,
+                lr.clasificacion,
+                lr.probabilidad_pago,
+                lr.dias_pago_predicho,
+                lr.monto_recuperable_predicho,
+                lr.confianza_prediccion,
+                lr.segmento_cliente,
+                lr.accion_recomendada,
+                lr.prioridad_cobranza,
+                m.nombre as modelo_nombre,
+                m.algoritmo
+            FROM ml_latest_result lr
+            JOIN ml_modelos m ON lr.modelo_id = m.id
+            WHERE lr.cliente_codigo IN ({placeholders})
+            AND m.activo = 1
+            ORDER BY lr.cliente_codigo, lr.fecha_ejecucion DESC, lr.modelo_id
+        """
+        return execute_query(query, tuple(cliente_codigos), fetch=True)
+
+    @staticmethod
+    def get_detalle_resultados(resultado_ids):
+        """Columnas JSON y explicación de varios resultados por ID"""
+        if not resultado_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(resultado_ids))
+        query = f"""
+            SELECT id, factores_principales, datos_entrada, explicacion
+            FROM ml_resultados_cliente
+            WHERE id IN ({placeholders})
+        """
+        return execute_query(query, tuple(resultado_ids), fetch=True)
+
     @staticmethod
     def get_by_ejecucion(ejecucion_id):
         """Obtiene todos los resultados de una ejecución"""
@@ -1116,11 +2159,11 @@ class MLResultadoCliente:
     def get_clientes_con_resultados():
         """Obtiene lista de clientes que tienen resultados ML"""
         query = """
-            SELECT DISTINCT c.codigo, c.razon_social
+            SELECT c.codigo, c.razon_social
             FROM clientes c
-            JOIN ml_resultados_cliente rc ON c.codigo = rc.cliente_codigo
-            JOIN ml_ejecuciones e ON rc.ejecucion_id = e.id
-            WHERE e.estado = 'completado'
+            WHERE EXISTS (
+                SELECT 1 FROM ml_latest_result lr WHERE lr.cliente_codigo = c.codigo
+            )
             ORDER BY c.razon_social
         """
         return execute_query(query, fetch=True)
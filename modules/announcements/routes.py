@@ -1,6 +1,7 @@
 from flask import render_template, request, redirect, url_for, flash, session
 from modules.announcements import announcements_bp
 from modules.auth.routes import login_required
+from modules.chatbot import conocimiento
 from models import Announcement
 
 @announcements_bp.route('/')
@@ -33,6 +34,7 @@ def create():
         fecha_expiracion = request.form.get('fecha_expiracion') or None
 
         Announcement.create(titulo, contenido, tipo, prioridad, session['user_id'], fecha_expiracion)
+        conocimiento.programar_sincronizacion()
         flash('Anuncio creado exitosamente', 'success')
         return redirect(url_for('announcements.index'))
 
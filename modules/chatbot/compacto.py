@@ -0,0 +1,178 @@
+"""
+Codificación compacta de los resultados de herramientas para el contexto del LLM
+
+Un resultado serializado tal cual repite cada clave en cada fila, lleva
+fechas ISO con segundos y microsegundos, decimales completos y campos
+vacíos. Aquí:
+
+- Las listas de registros se convierten en tabla: {"columnas": [...],
+  "filas": [[...], ...]}, y las columnas con el mismo valor en todas las
+  filas pasan a "comun".
+- Se quitan los nulos, los textos vacíos y los campos que la herramienta no
+  necesita mostrar (ESQUEMAS). Los valores por defecto se conservan: un
+  campo ausente siempre significa vacío, y si todas las filas tienen el
+  mismo valor ya van una sola vez en "comun".
+- Las fechas quedan como 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM' y los números se
+  redondean (2 decimales salvo que el esquema diga otra cosa).
+- El JSON se emite sin espacios; un resultado exitoso es directamente su
+  contenido y uno fallido es {"error": ...}.
+
+Para guardar, resumen_accion() deja en chatbot_actions solo una referencia
+al mensaje de la herramienta y un resumen cuando el resultado es grande,
+en lugar de repetir el mismo payload en dos tablas.
+"""
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+
+DECIMALES_DEFAULT = 2
+# Por encima de este tamaño, chatbot_actions guarda solo referencia y resumen
+MAX_BYTES_ACCION = 2048
+MIN_FILAS_TABLA = 2
+
+_ISO = re.compile(r'^(\d{4}-\d{2}-\d{2})T(\d{2}:\d{2})(:\d{2}(\.\d+)?)?([+-]\d{2}:\d{2}|Z)?$')
+
+# Por herramienta: campos a omitir (IDs internos) y decimales por campo
+ESQUEMAS = {
+    'get_my_vacations': {'omitir': {'empleado_id', 'aprobador_id'}},
+    'get_my_tickets': {'omitir': {'solicitante_id', 'asignado_a'}},
+    'get_announcements': {'omitir': {'autor_id', 'activo', 'imagen_url'}},
+    'buscar_documentos': {'decimales': {'relevancia': 3}},
+    'buscar_conocimiento': {'decimales': {'similitud': 3}},
+}
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        if (valor.hour, valor.minute, valor.second) == (0, 0, 0):
+            return valor.strftime('%Y-%m-%d')
+        return valor.strftime('%Y-%m-%d %H:%M')
+    return valor.isoformat()
+
+
+def _escalar(valor, decimales):
+    if isinstance(valor, (datetime, date)):
+        return _fecha(valor)
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (float, Decimal)):
+        redondeado = round(float(valor), decimales)
+        return int(redondeado) if redondeado.is_integer() else redondeado
+    if isinstance(valor, str):
+        # Las herramientas ya entregan las fechas como ISO (convert_datetime_to_str)
+        iso = _ISO.match(valor)
+        if iso:
+            fecha, hora, segundos = iso.group(1), iso.group(2), iso.group(3) or ''
+            if hora == '00:00' and not segundos.strip(':0.'):
+                return fecha
+            return f'{fecha} {hora}'
+    return valor
+
+
+def _vacio(valor):
+    return valor is None or valor == '' or valor == [] or valor == {}
+
+
+def _es_tabla(lista):
+    return len(lista) >= MIN_FILAS_TABLA and all(isinstance(x, dict) for x in lista)
+
+
+def _tabla(registros):
+    columnas = []
+    for registro in registros:
+        columnas.extend(c for c in registro if c not in columnas)
+    filas = [[registro.get(c) for c in columnas] for registro in registros]
+
+    comun, variables = {}, []
+    for i, columna in enumerate(columnas):
+        valores = [fila[i] for fila in filas]
+        if all(v == valores[0] for v in valores) and not isinstance(valores[0], (list, dict)):
+            if not _vacio(valores[0]):
+                comun[columna] = valores[0]
+        else:
+            variables.append(i)
+
+    tabla = {'columnas': [columnas[i] for i in variables],
+             'filas': [[fila[i] for i in variables] for fila in filas]}
+    if comun:
+        tabla['comun'] = comun
+    return tabla
+
+
+def compactar(valor, herramienta=None):
+    """
+    Estructura compacta de un resultado (sigue siendo JSON serializable)
+
+    Args:
+        valor: Resultado de la herramienta
+        herramienta: Nombre de la herramienta, para aplicar su esquema
+    """
+    esquema = ESQUEMAS.get(herramienta, {})
+    omitir = esquema.get('omitir', set())
+    decimales = esquema.get('decimales', {})
+
+    def visitar(v, campo=None):
+        if isinstance(v, dict):
+            resultado = {}
+            for k, x in v.items():
+                if k in omitir:
+                    continue
+                x = visitar(x, k)
+                if not _vacio(x):
+                    resultado[k] = x
+            return resultado
+        if isinstance(v, (list, tuple)):
+            elementos = [visitar(x, campo) for x in v]
+            return _tabla(elementos) if _es_tabla(elementos) else elementos
+        return _escalar(v, decimales.get(campo, DECIMALES_DEFAULT))
+
+    return visitar(valor)
+
+
+def codificar(resultado, herramienta=None):
+    """
+    Texto compacto del resultado de execute_tool para el mensaje 'tool'
+
+    Args:
+        resultado: {'success': bool, 'data': ...} o {'success': False, 'error': ...}
+        herramienta: Nombre de la herramienta
+    """
+    if resultado.get('success'):
+        contenido = compactar(resultado.get('data'), herramienta)
+    else:
+        contenido = {'error': resultado.get('error') or 'Error desconocido'}
+    return json.dumps(contenido, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def resumen(valor):
+    """Escalares de primer nivel y largo de las listas y tablas de un resultado"""
+    if not isinstance(valor, dict):
+        return {'tipo': type(valor).__name__}
+    salida = {}
+    for clave, x in valor.items():
+        if isinstance(x, dict) and 'filas' in x and 'columnas' in x:
+            salida[clave] = len(x['filas'])
+        elif isinstance(x, (list, dict)):
+            salida[clave] = len(x)
+        else:
+            salida[clave] = x[:200] if isinstance(x, str) else x
+    return salida
+
+
+def resumen_accion(contenido, mensaje_id):
+    """
+    Lo que se guarda en chatbot_actions.action_result
+
+    Los resultados chicos se guardan compactos; los grandes ya están en el
+    mensaje 'tool' (mensaje_id), así que solo se guarda la referencia y un resumen.
+
+    Args:
+        contenido: Texto devuelto por codificar()
+        mensaje_id: ID del mensaje 'tool' con el resultado completo
+    """
+    tamano = len(contenido.encode('utf-8'))
+    datos = json.loads(contenido)
+    if tamano <= MAX_BYTES_ACCION:
+        return datos
+    return {'mensaje_id': mensaje_id, 'bytes': tamano, 'resumen': resumen(datos)}
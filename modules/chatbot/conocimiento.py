@@ -0,0 +1,525 @@
+"""
+Índice vectorial local para que el chatbot responda citando documentos y anuncios
+
+Fragmentos indexados:
+- Los pasajes de documentos que ya extrae modules/documents/indice.py
+  (documento_pasajes), con el título del documento como contexto.
+- Los anuncios, partidos en pasajes con el mismo criterio.
+
+Cada fragmento se convierte en un vector float32 normalizado y se agrega al
+final de RAG_INDEX_FOLDER/vectores.f32, que se lee con np.memmap; la fila de
+cada vector y su texto se guardan en conocimiento_fragmentos. La
+sincronización es incremental: solo procesa los pasajes y anuncios que aún no
+tienen fragmentos en el índice. Los fragmentos de documentos reindexados, inactivos o de
+anuncios expirados se descartan al buscar (el JOIN con su origen no los trae).
+
+La matriz vive en el disco de cada nodo y la tabla es compartida, así que
+cada índice tiene un ID de instancia (meta.json) y sus filas en
+conocimiento_fragmentos van con ese ID: la sincronización y las búsquedas
+solo miran las filas de la propia instancia. Un nodo nuevo, o uno
+que perdió RAG_INDEX_FOLDER, crea una instancia nueva y se reconstruye sin
+tocar las filas de los demás; al reconstruir solo borra las de su instancia
+anterior.
+
+Búsqueda aproximada (IVF): a partir de MIN_FILAS_IVF vectores se entrenan
+centroides con k-means esférico, cada fila guarda su centroide más cercano y
+una consulta solo compara contra las filas de los SONDAS_IVF centroides más
+parecidos. Con menos filas se compara contra todas (exacto y igual de rápido).
+
+Embeddings (RAG_EMBEDDINGS):
+- 'local' (default): hashing de palabras y bigramas normalizados, sin
+  acentos ni plurales simples, en DIMENSION_LOCAL dimensiones. Solo CPU y
+  NumPy, sin modelos que descargar; captura coincidencias léxicas.
+- 'remoto': endpoint /embeddings compatible con OpenAI en LLM_API_BASE.
+Cambiar de proveedor reconstruye el índice en la siguiente sincronización.
+"""
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import requests
+
+from config import Config
+from database import execute_query, execute_transaction
+from models import normalizar_texto
+from modules.documents import indice
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_LOCAL = 512
+PESO_BIGRAMA = 0.5
+LOTE_EMBEDDINGS = 64
+LOTE_FUENTES = 500
+
+MIN_FILAS_IVF = 5000
+SONDAS_IVF = 8
+ITERACIONES_KMEANS = 8
+MUESTRA_KMEANS = 20000
+BLOQUE_ASIGNACION = 8192
+
+LIMITE_DEFAULT = 3
+# ~600 tokens de contexto para el LLM
+MAX_CARACTERES_CONTEXTO = 2400
+
+STOPWORDS = frozenset("""
+a al ante con contra de del desde durante e el en entre es esta este la las lo los
+o para pero por que se sin sobre su sus un una uno unos unas y ya como mas muy no si
+""".split())
+
+
+# ==================== EMBEDDINGS ====================
+
+def _raiz(palabra):
+    """Quita plurales simples: viaticos -> viatico, politicas -> politica"""
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] not in 'aeiou':
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s'):
+        return palabra[:-1]
+    return palabra
+
+
+class EmbeddingsLocales:
+    """Embeddings por hashing de términos (solo CPU, sin estado)"""
+
+    def __init__(self, dimension=DIMENSION_LOCAL):
+        self.dimension = dimension
+        self.nombre = f'local-hashing-{dimension}'
+
+    def embeber(self, textos):
+        matriz = np.zeros((len(textos), self.dimension), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            palabras = [_raiz(p) for p in normalizar_texto(texto).split()
+                        if p not in STOPWORDS and len(p) > 1]
+            unigramas = Counter(palabras)
+            bigramas = Counter(f'{a}_{b}' for a, b in zip(palabras, palabras[1:]))
+            for terminos, peso in ((unigramas, 1.0), (bigramas, PESO_BIGRAMA)):
+                for termino, n in terminos.items():
+                    h = zlib.crc32(termino.encode())
+                    # El bit alto decide el signo para que las colisiones tiendan a cancelarse
+                    signo = peso if h & 0x80000000 else -peso
+                    matriz[i, h % self.dimension] += signo * (1.0 + math.log(n))
+        return _normalizar(matriz)
+
+
+class EmbeddingsRemotos:
+    """Embeddings de un endpoint /embeddings compatible con OpenAI"""
+
+    def __init__(self):
+        self.api_base = os.environ.get('LLM_API_BASE', 'https://api.openai.com/v1')
+        self.api_key = os.environ.get('LLM_API_KEY', '')
+        self.modelo = Config.RAG_EMBEDDINGS_MODEL
+        self.nombre = f'remoto-{self.modelo}'
+
+    def embeber(self, textos):
+        try:
+            response = requests.post(
+                f'{self.api_base}/embeddings',
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                json={'model': self.modelo, 'input': list(textos)},
+                timeout=60
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Error al obtener embeddings: {e}")
+        datos = sorted(response.json()['data'], key=lambda d: d['index'])
+        return _normalizar(np.array([d['embedding'] for d in datos], dtype=np.float32))
+
+
+def _normalizar(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.where(normas > 0, normas, 1)
+
+
+def proveedor_embeddings():
+    """Proveedor configurado en RAG_EMBEDDINGS"""
+    if Config.RAG_EMBEDDINGS == 'remoto':
+        return EmbeddingsRemotos()
+    return EmbeddingsLocales()
+
+
+# ==================== ÍNDICE EN DISCO ====================
+
+def kmeans_esferico(X, k, iteraciones=ITERACIONES_KMEANS, seed=0):
+    """Centroides unitarios que maximizan la similitud coseno con sus filas"""
+    rng = np.random.default_rng(seed)
+    centroides = X[rng.choice(len(X), size=k, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignacion = np.argmax(X @ centroides.T, axis=1)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignacion, X)
+        con_filas = np.bincount(asignacion, minlength=k) > 0
+        centroides[con_filas] = _normalizar(sumas[con_filas])
+    return centroides
+
+
+class IndiceVectorial:
+    """Matriz float32 en disco (solo se agregan filas) con índice IVF opcional"""
+
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        self.ruta_meta = os.path.join(carpeta, 'meta.json')
+        self.ruta_vectores = os.path.join(carpeta, 'vectores.f32')
+        self.ruta_asignaciones = os.path.join(carpeta, 'asignaciones.i32')
+        self.ruta_centroides = os.path.join(carpeta, 'centroides.npy')
+        self.meta = {}
+        if os.path.exists(self.ruta_meta):
+            with open(self.ruta_meta) as f:
+                self.meta = json.load(f)
+
+    @property
+    def dimension(self):
+        return self.meta.get('dimension')
+
+    @property
+    def instancia(self):
+        """ID de este índice en conocimiento_fragmentos (None si nunca se creó)"""
+        return self.meta.get('instancia')
+
+    def filas(self):
+        if not self.dimension or not os.path.exists(self.ruta_vectores):
+            return 0
+        return os.path.getsize(self.ruta_vectores) // (self.dimension * 4)
+
+    def _guardar_meta(self):
+        tmp = self.ruta_meta + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.ruta_meta)
+
+    def reiniciar(self, proveedor, dimension):
+        """Vacía el índice para un proveedor/dimensión nuevos, con una instancia nueva"""
+        os.makedirs(self.carpeta, exist_ok=True)
+        for ruta in (self.ruta_vectores, self.ruta_asignaciones, self.ruta_centroides):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        self.meta = {'instancia': uuid.uuid4().hex, 'proveedor': proveedor,
+                     'dimension': dimension, 'filas_entrenamiento': 0}
+        self._guardar_meta()
+
+    def fijar_dimension(self, dimension):
+        """Dimensión de los vectores, conocida con el primer lote de embeddings"""
+        self.meta['dimension'] = dimension
+        self._guardar_meta()
+
+    def matriz(self):
+        n = self.filas()
+        if n == 0:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.memmap(self.ruta_vectores, dtype=np.float32, mode='r', shape=(n, self.dimension))
+
+    def centroides(self):
+        if not os.path.exists(self.ruta_centroides):
+            return None
+        return np.load(self.ruta_centroides)
+
+    def asignaciones(self):
+        """Centroide de cada fila, o None si el archivo no cubre todas las filas"""
+        n = self.filas()
+        if not os.path.exists(self.ruta_asignaciones) or os.path.getsize(self.ruta_asignaciones) != n * 4:
+            return None
+        return np.memmap(self.ruta_asignaciones, dtype=np.int32, mode='r', shape=(n,))
+
+    def _asignar(self, X, centroides):
+        return np.concatenate([
+            np.argmax(X[i:i + BLOQUE_ASIGNACION] @ centroides.T, axis=1)
+            for i in range(0, len(X), BLOQUE_ASIGNACION)
+        ]).astype(np.int32) if len(X) else np.zeros(0, dtype=np.int32)
+
+    def agregar(self, vectores):
+        """Agrega vectores al final; devuelve la fila del primero"""
+        inicio = self.filas()
+        with open(self.ruta_vectores, 'ab') as f:
+            f.write(np.ascontiguousarray(vectores, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        centroides = self.centroides()
+        if (centroides is not None and os.path.exists(self.ruta_asignaciones)
+                and os.path.getsize(self.ruta_asignaciones) == inicio * 4):
+            with open(self.ruta_asignaciones, 'ab') as f:
+                f.write(self._asignar(vectores, centroides).tobytes())
+        return inicio
+
+    def requiere_entrenamiento(self):
+        n = self.filas()
+        if n < MIN_FILAS_IVF:
+            return False
+        return (self.centroides() is None or self.asignaciones() is None
+                or n >= 2 * self.meta.get('filas_entrenamiento', 0))
+
+    def entrenar(self):
+        """Entrena los centroides IVF (k ≈ √n) y reasigna todas las filas"""
+        X = self.matriz()
+        n = len(X)
+        k = max(16, int(math.sqrt(n)))
+        muestra = np.random.default_rng(n).choice(n, size=min(n, MUESTRA_KMEANS), replace=False)
+        centroides = kmeans_esferico(np.asarray(X[np.sort(muestra)]), k)
+
+        for ruta, datos in ((self.ruta_asignaciones, self._asignar(X, centroides)),
+                            (self.ruta_centroides, centroides)):
+            tmp = ruta + '.tmp'
+            with open(tmp, 'wb') as f:
+                if ruta.endswith('.npy'):
+                    np.save(f, datos)
+                else:
+                    f.write(datos.tobytes())
+            os.replace(tmp, ruta)
+        self.meta['filas_entrenamiento'] = n
+        self._guardar_meta()
+        return k
+
+    def buscar(self, consulta, k):
+        """
+        Filas más similares a un vector de consulta normalizado
+
+        Returns:
+            tuple: (filas, similitudes) ordenadas de mayor a menor similitud
+        """
+        X = self.matriz()
+        if len(X) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        candidatos = None
+        centroides, asignaciones = self.centroides(), self.asignaciones()
+        if len(X) >= MIN_FILAS_IVF and centroides is not None and asignaciones is not None:
+            sondas = np.argsort(-(centroides @ consulta))[:SONDAS_IVF]
+            candidatos = np.flatnonzero(np.isin(asignaciones, sondas))
+            similitudes = X[candidatos] @ consulta
+        else:
+            similitudes = X @ consulta
+
+        k = min(k, len(similitudes))
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores], kind='stable')]
+        filas = candidatos[mejores] if candidatos is not None else mejores
+        return filas, similitudes[mejores]
+
+
+# ==================== SINCRONIZACIÓN ====================
+
+_lock_escritura = threading.Lock()
+
+
+@contextmanager
+def _bloqueo_escritura(carpeta):
+    """Un solo escritor por índice, también entre workers de gunicorn"""
+    os.makedirs(carpeta, exist_ok=True)
+    with _lock_escritura, open(os.path.join(carpeta, '.lock'), 'w') as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(candado, fcntl.LOCK_UN)
+
+
+def _ultima_fila(instancia):
+    """Última fila de una instancia en conocimiento_fragmentos (None si no tiene)"""
+    resultado = execute_query("""
+        SELECT MAX(fila) AS ultima_fila FROM conocimiento_fragmentos WHERE indice = %s
+    """, (instancia,), fetch=True)
+    if resultado is None:
+        raise RuntimeError('Error al consultar el índice de conocimiento')
+    return resultado[0]['ultima_fila'] if resultado else None
+
+
+def _fragmentos_nuevos(instancia):
+    """
+    Pasajes y anuncios que aún no tienen fragmentos en la instancia, por lotes
+
+    No se usa el último ID indexado como marca: los AUTO_INCREMENT no se
+    confirman en orden entre procesos, y un pasaje con ID menor que llega
+    después de una sincronización quedaría sin indexar.
+    """
+    desde = 0
+    while True:
+        pasajes = execute_query("""
+            SELECT p.id, p.orden, p.texto, d.titulo
+            FROM documento_pasajes p
+            JOIN documentos d ON d.id = p.documento_id
+            LEFT JOIN conocimiento_fragmentos f
+                ON f.indice = %s AND f.fuente = 'documento' AND f.fuente_id = p.id
+            WHERE p.id > %s AND d.activo = TRUE AND f.fila IS NULL
+            ORDER BY p.id
+            LIMIT %s
+        """, (instancia, desde, LOTE_FUENTES), fetch=True)
+        if pasajes is None:
+            raise RuntimeError('Error al consultar los pasajes de documentos')
+        if not pasajes:
+            break
+        yield [('documento', p['id'], p['orden'], p['texto'], f"{p['titulo']}: {p['texto']}")
+               for p in pasajes]
+        desde = pasajes[-1]['id']
+
+    desde = 0
+    while True:
+        anuncios = execute_query("""
+            SELECT a.id, a.titulo, a.contenido FROM anuncios a
+            WHERE a.id > %s AND a.activo = TRUE
+            AND NOT EXISTS (
+                SELECT 1 FROM conocimiento_fragmentos f
+                WHERE f.indice = %s AND f.fuente = 'anuncio' AND f.fuente_id = a.id
+            )
+            ORDER BY a.id
+            LIMIT %s
+        """, (desde, instancia, LOTE_FUENTES), fetch=True)
+        if anuncios is None:
+            raise RuntimeError('Error al consultar los anuncios')
+        if not anuncios:
+            break
+        yield [('anuncio', a['id'], orden, texto, f"{a['titulo']}: {texto}")
+               for a in anuncios
+               for orden, texto in enumerate(indice.pasajes(a['contenido'] or '') or [a['titulo']])]
+        desde = anuncios[-1]['id']
+
+
+def sincronizar(reconstruir=False):
+    """
+    Agrega al índice vectorial los pasajes y anuncios nuevos
+
+    Args:
+        reconstruir: Vacía el índice de este nodo y vuelve a procesar todo
+
+    Returns:
+        dict: proveedor, fragmentos nuevos, filas totales, centroides (si se
+              reentrenó el IVF) y segundos
+    """
+    inicio = time.perf_counter()
+    carpeta = Config.RAG_INDEX_FOLDER
+    proveedor = proveedor_embeddings()
+
+    with _bloqueo_escritura(carpeta):
+        indice_vectorial = IndiceVectorial(carpeta)
+        instancia = indice_vectorial.instancia
+        ultima_fila = _ultima_fila(instancia) if instancia else None
+        # La BD tiene filas que el archivo local ya no (carpeta restaurada o truncada)
+        incompleto = ultima_fila is not None and ultima_fila >= indice_vectorial.filas()
+        if (reconstruir or incompleto or instancia is None
+                or indice_vectorial.meta.get('proveedor') != proveedor.nombre):
+            # Solo se borran las filas de la instancia de este nodo
+            if instancia and not execute_transaction([
+                    ("DELETE FROM conocimiento_fragmentos WHERE indice = %s", (instancia,))]):
+                raise RuntimeError('Error al vaciar el índice de conocimiento')
+            indice_vectorial.reiniciar(proveedor.nombre, None)
+
+        nuevos = 0
+        for fragmentos in _fragmentos_nuevos(indice_vectorial.instancia):
+            for i in range(0, len(fragmentos), LOTE_EMBEDDINGS):
+                lote = fragmentos[i:i + LOTE_EMBEDDINGS]
+                vectores = proveedor.embeber([f[4] for f in lote])
+                if indice_vectorial.dimension is None:
+                    indice_vectorial.fijar_dimension(int(vectores.shape[1]))
+
+                primera = indice_vectorial.agregar(vectores)
+                filas = [(indice_vectorial.instancia, primera + j, fuente, fuente_id, orden, texto)
+                         for j, (fuente, fuente_id, orden, texto, _) in enumerate(lote)]
+                # Si falla, los vectores ya escritos quedan huérfanos y nunca se devuelven
+                if not execute_transaction([("""
+                    INSERT INTO conocimiento_fragmentos (indice, fila, fuente, fuente_id, orden, texto)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, filas)]):
+                    raise RuntimeError('Error al guardar los fragmentos de conocimiento')
+                nuevos += len(lote)
+
+        centroides = indice_vectorial.entrenar() if indice_vectorial.requiere_entrenamiento() else None
+        return {
+            'proveedor': proveedor.nombre,
+            'nuevos': nuevos,
+            'filas': indice_vectorial.filas(),
+            'centroides': centroides,
+            'segundos': round(time.perf_counter() - inicio, 2),
+        }
+
+
+def _sincronizar_en_segundo_plano():
+    try:
+        reporte = sincronizar()
+        if reporte['nuevos']:
+            logger.info(f"Índice de conocimiento: {reporte}")
+    except Exception as e:
+        logger.error(f"Error al sincronizar el índice de conocimiento: {e}")
+
+
+def programar_sincronizacion():
+    """Encola la sincronización detrás de la extracción de texto de documentos"""
+    indice.en_segundo_plano(_sincronizar_en_segundo_plano)
+
+
+# ==================== BÚSQUEDA ====================
+
+def _detalles(instancia, filas):
+    """Texto y origen de las filas que siguen vigentes (documento activo, anuncio no expirado)"""
+    marcas = ', '.join(['%s'] * len(filas))
+    resultado = execute_query(f"""
+        SELECT f.fila, f.fuente, f.texto, d.id AS origen_id, d.titulo, d.categoria
+        FROM conocimiento_fragmentos f
+        JOIN documento_pasajes p ON f.fuente = 'documento' AND p.id = f.fuente_id
+        JOIN documentos d ON d.id = p.documento_id AND d.activo = TRUE
+        WHERE f.indice = %s AND f.fila IN ({marcas})
+        UNION ALL
+        SELECT f.fila, f.fuente, f.texto, a.id AS origen_id, a.titulo, a.tipo AS categoria
+        FROM conocimiento_fragmentos f
+        JOIN anuncios a ON f.fuente = 'anuncio' AND a.id = f.fuente_id
+        WHERE f.indice = %s AND f.fila IN ({marcas}) AND a.activo = TRUE
+        AND (a.fecha_expiracion IS NULL OR a.fecha_expiracion >= CURDATE())
+    """, (instancia, *filas) * 2, fetch=True)
+    if resultado is None:
+        raise RuntimeError('Error al consultar el índice de conocimiento')
+    return {r['fila']: r for r in resultado}
+
+
+def buscar(consulta, limit=LIMITE_DEFAULT, max_caracteres=MAX_CARACTERES_CONTEXTO):
+    """
+    Fragmentos de documentos y anuncios más parecidos a la consulta
+
+    Args:
+        consulta: Pregunta o palabras clave
+        limit: Máximo de fragmentos
+        max_caracteres: Presupuesto total de texto (el último fragmento se recorta)
+
+    Returns:
+        list: [{fuente, origen_id, titulo, categoria, texto, similitud}]
+    """
+    consulta = (consulta or '').strip()
+    if not consulta:
+        raise ValueError('La consulta está vacía')
+
+    indice_vectorial = IndiceVectorial(Config.RAG_INDEX_FOLDER)
+    proveedor = proveedor_embeddings()
+    if (indice_vectorial.meta.get('proveedor') != proveedor.nombre or not indice_vectorial.instancia
+            or not indice_vectorial.filas()):
+        return []
+
+    vector = proveedor.embeber([consulta])[0]
+    # Se piden de más porque algunos fragmentos pueden ya no estar vigentes
+    filas, similitudes = indice_vectorial.buscar(vector, limit * 4)
+    candidatos = [(int(f), float(s)) for f, s in zip(filas, similitudes) if s > 0]
+    if not candidatos:
+        return []
+    detalles = _detalles(indice_vectorial.instancia, [f for f, _ in candidatos])
+
+    resultados, restante = [], max_caracteres
+    for fila, similitud in candidatos:
+        detalle = detalles.get(fila)
+        if detalle is None:
+            continue
+        texto = detalle['texto'][:restante]
+        resultados.append({
+            'fuente': detalle['fuente'],
+            'origen_id': detalle['origen_id'],
+            'titulo': detalle['titulo'],
+            'categoria': detalle['categoria'],
+            'texto': texto,
+            'similitud': round(similitud, 4),
+        })
+        restante -= len(texto)
+        if len(resultados) == limit or restante <= 0:
+            break
+    return resultados
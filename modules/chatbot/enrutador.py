@@ -0,0 +1,197 @@
+"""
+Selección de herramientas por mensaje para el chatbot
+
+Enviar los esquemas de todas las herramientas del rol (hasta ~27) en cada
+iteración cuesta miles de tokens de prompt aunque el usuario solo salude.
+El enrutador elige los grupos de herramientas relevantes con palabras clave
+sobre el mensaje normalizado (sin acentos, por prefijo de palabra) más los
+grupos usados en los últimos turnos, para que las preguntas de seguimiento
+("¿y la siguiente?") conserven sus herramientas.
+
+Siempre se envía además solicitar_herramientas, un esquema mínimo con el que
+el modelo pide el resto cuando el enrutador no acertó. También se pasa al
+conjunto completo si el modelo llama a una herramienta que no se le envió.
+Al final de cada petición se registra la precisión (grupos enviados que se
+usaron) y la cobertura (grupos usados que se habían enviado).
+"""
+import json
+import logging
+import threading
+
+from models import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+AMPLIAR = 'solicitar_herramientas'
+# Turnos con herramientas del historial que mantienen sus grupos
+TURNOS_MEMORIA = 3
+CARACTERES_POR_TOKEN = 4
+
+GRUPOS = {
+    'consultas': ('get_employees_info', 'get_departments_info', 'get_documents_info',
+                  'buscar_documentos', 'buscar_conocimiento', 'get_announcements'),
+    'personal': ('get_my_vacations', 'get_my_tickets', 'request_vacation', 'create_ticket'),
+    'rrhh': ('get_all_vacations', 'approve_vacation', 'reject_vacation'),
+    'soporte': ('get_all_tickets', 'update_ticket_status', 'assign_ticket'),
+    'admin': ('create_user', 'create_announcement', 'get_system_stats'),
+    'cobranzas': ('buscar_cliente', 'get_deuda_cliente', 'get_atraso_promedio_ponderado',
+                  'get_facturas_cliente', 'get_resumen_cliente', 'get_antiguedad_saldos',
+                  'get_dashboard_cobranzas', 'get_lista_llamadas', 'get_pronostico_cobranza',
+                  'get_caracteristicas_cliente'),
+    'powerbi': ('list_powerbi_reports', 'analyze_powerbi_report', 'get_powerbi_report_filters'),
+}
+
+# Prefijos de palabras normalizadas que activan cada grupo
+PALABRAS_CLAVE = {
+    'consultas': ('empleado', 'colaborador', 'companer', 'departament', 'area', 'documento', 'politica',
+                  'procedimiento', 'manual', 'formulario', 'reglamento', 'norma', 'anuncio',
+                  'comunicado', 'noticia', 'telefono', 'extension', 'correo', 'email', 'contacto',
+                  'quien', 'directorio', 'viatico', 'beneficio', 'cargo', 'jefe', 'gerente'),
+    'personal': ('vacacion', 'permiso', 'licencia', 'ausencia', 'ticket', 'incidencia',
+                 'soporte', 'falla', 'problema', 'reportar', 'mis', 'mio', 'mia'),
+    'rrhh': ('vacacion', 'solicitud', 'aprob', 'rechaz', 'pendiente', 'permiso', 'licencia'),
+    'soporte': ('ticket', 'incidencia', 'asign', 'resuel', 'resolver', 'cerrar', 'falla'),
+    'admin': ('usuario', 'anuncio', 'publicar', 'comunicado', 'estadistica', 'sistema', 'metrica'),
+    'cobranzas': ('cliente', 'deuda', 'debe', 'factura', 'saldo', 'cobr', 'cartera', 'atraso', 'mora',
+                  'vencid', 'pago', 'pagar', 'llamar', 'llamada', 'pronostic', 'rfc', 'antiguedad',
+                  'recuper', 'morosidad', 'caracteristica'),
+    'powerbi': ('power', 'powerbi', 'bi', 'reporte', 'dashboard', 'tablero', 'grafic', 'kpi',
+                'indicador', 'visualizacion', 'filtro'),
+}
+
+_GRUPO_DE = {nombre: grupo for grupo, nombres in GRUPOS.items() for nombre in nombres}
+
+_metricas = {'peticiones': 0, 'enviados': 0, 'usados': 0, 'aciertos': 0, 'ampliaciones': 0}
+_metricas_lock = threading.Lock()
+
+
+def herramienta_ampliar(grupos_disponibles):
+    """Esquema mínimo con el que el modelo pide herramientas que no se le enviaron"""
+    return {
+        "type": "function",
+        "function": {
+            "name": AMPLIAR,
+            "description": "Habilita las herramientas que no están en la lista actual (por ejemplo para "
+                           "consultar datos o ejecutar acciones de la intranet). Luego vuelve a intentarlo.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "grupos": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(grupos_disponibles)},
+                        "description": "Grupos necesarios (vacío: todos)"
+                    }
+                }
+            }
+        }
+    }
+
+
+def grupo_de(nombre_herramienta):
+    return _GRUPO_DE.get(nombre_herramienta)
+
+
+def _coincide(palabra, clave):
+    # Las claves cortas ('bi', 'mis') solo como palabra completa
+    return palabra.startswith(clave) if len(clave) >= 4 else palabra == clave
+
+
+def grupos_por_palabras(texto):
+    """Grupos cuyas palabras clave aparecen (como prefijo de palabra) en el texto"""
+    palabras = normalizar_texto(texto).split()
+    return {grupo for grupo, claves in PALABRAS_CLAVE.items()
+            if any(_coincide(p, c) for p in palabras for c in claves)}
+
+
+def grupos_recientes(mensajes, turnos=TURNOS_MEMORIA):
+    """Grupos de las herramientas llamadas en los últimos turnos del historial"""
+    grupos, vistos = set(), 0
+    for mensaje in reversed(mensajes):
+        if mensaje.get('role') != 'assistant' or not mensaje.get('tool_calls'):
+            continue
+        for llamada in mensaje['tool_calls']:
+            grupo = grupo_de(llamada.get('function', {}).get('name'))
+            if grupo:
+                grupos.add(grupo)
+        vistos += 1
+        if vistos == turnos:
+            break
+    return grupos
+
+
+def elegir_grupos(mensaje_usuario, mensajes):
+    """Grupos relevantes para el mensaje actual y el estado de la conversación"""
+    return grupos_por_palabras(mensaje_usuario) | grupos_recientes(mensajes)
+
+
+def seleccionar(herramientas, grupos):
+    """
+    Herramientas de los grupos elegidos más solicitar_herramientas
+
+    Las herramientas que no pertenecen a ningún grupo se envían siempre.
+    Si se eligieron todos los grupos disponibles no se agrega solicitar_herramientas.
+    """
+    disponibles = {grupo_de(h['function']['name']) for h in herramientas} - {None}
+    seleccion = [h for h in herramientas if grupo_de(h['function']['name']) in grupos | {None}]
+    if disponibles <= grupos:
+        return seleccion
+    return seleccion + [herramienta_ampliar(sorted(disponibles))]
+
+
+def ampliar(herramientas, grupos_pedidos=None):
+    """Herramientas tras una ampliación: los grupos pedidos o, sin grupos, todas"""
+    if not grupos_pedidos:
+        return list(herramientas)
+    return seleccionar(herramientas, set(grupos_pedidos))
+
+
+def nombres(herramientas):
+    return {h['function']['name'] for h in herramientas}
+
+
+def estimar_tokens(herramientas):
+    return len(json.dumps(herramientas, ensure_ascii=False, separators=(',', ':'))) // CARACTERES_POR_TOKEN
+
+
+def registrar(grupos_enviados, herramientas_usadas, tokens_enviados, tokens_completos, ampliado):
+    """
+    Registra en el log la precisión del enrutador para una petición
+
+    Args:
+        grupos_enviados: Grupos elegidos por el enrutador
+        herramientas_usadas: Herramientas que el modelo llamó (sin solicitar_herramientas)
+        tokens_enviados: Tokens de esquemas de herramientas enviados en la primera llamada
+        tokens_completos: Tokens que habría costado enviar todas
+        ampliado: Si el modelo tuvo que pedir más herramientas
+    """
+    usados = {grupo_de(h) for h in herramientas_usadas} - {None}
+    aciertos = len(usados & grupos_enviados)
+    with _metricas_lock:
+        _metricas['peticiones'] += 1
+        _metricas['enviados'] += len(grupos_enviados)
+        _metricas['usados'] += len(usados)
+        _metricas['aciertos'] += aciertos
+        _metricas['ampliaciones'] += int(ampliado)
+        acumulado = dict(_metricas)
+
+    precision = aciertos / len(grupos_enviados) if grupos_enviados else None
+    cobertura = aciertos / len(usados) if usados else None
+    logger.info(
+        f"Enrutador: grupos={sorted(grupos_enviados)} usados={sorted(usados)} "
+        f"precision={'-' if precision is None else f'{precision:.2f}'} "
+        f"cobertura={'-' if cobertura is None else f'{cobertura:.2f}'} "
+        f"ampliado={ampliado} tokens_herramientas={tokens_enviados}/{tokens_completos} "
+        f"acumulado={acumulado}"
+    )
+
+
+def metricas():
+    """Precisión, cobertura y tasa de ampliación acumuladas en este proceso"""
+    with _metricas_lock:
+        m = dict(_metricas)
+    return {
+        'peticiones': m['peticiones'],
+        'precision': round(m['aciertos'] / m['enviados'], 3) if m['enviados'] else None,
+        'cobertura': round(m['aciertos'] / m['usados'], 3) if m['usados'] else None,
+        'tasa_ampliacion': round(m['ampliaciones'] / m['peticiones'], 3) if m['peticiones'] else None,
+    }
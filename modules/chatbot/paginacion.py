@@ -0,0 +1,125 @@
+"""
+Resultados paginados y acotados por tokens para las herramientas del chatbot
+
+Las herramientas de consulta filtran y ordenan por relevancia en SQL, y piden
+una fila más que el límite para saber si hay más. Aquí se proyectan solo las
+columnas pedidas y se agregan filas mientras quepan en PRESUPUESTO_TOKENS.
+Si quedan filas, el resultado trae `siguiente_cursor`: el modelo lo envía de
+vuelta, con los mismos filtros, para pedir la página siguiente.
+"""
+import json
+
+PRESUPUESTO_TOKENS = 600
+LIMITE_DEFAULT = 10
+MAX_LIMITE = 50
+# Aproximación conservadora para texto en español serializado como JSON
+CARACTERES_POR_TOKEN = 4
+MAX_CARACTERES_CAMPO = 240
+
+
+def estimar_tokens(valor):
+    """Tokens aproximados de un valor serializado como en el mensaje de la herramienta"""
+    texto = json.dumps(valor, ensure_ascii=False, default=str, separators=(',', ':'))
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+def parametros(campos_permitidos):
+    """Propiedades campos/limite/cursor para el esquema de una herramienta"""
+    return {
+        "campos": {
+            "type": "array",
+            "items": {"type": "string", "enum": list(campos_permitidos)},
+            "description": "Columnas a incluir (opcional; por defecto solo las principales)"
+        },
+        "limite": {
+            "type": "integer",
+            "description": f"Máximo de resultados por página (default {LIMITE_DEFAULT}, máximo {MAX_LIMITE})"
+        },
+        "cursor": {
+            "type": "string",
+            "description": "siguiente_cursor de la respuesta anterior, para ver más resultados con los mismos filtros"
+        },
+    }
+
+
+def leer_cursor(cursor):
+    """Desplazamiento codificado en un cursor ('' o None: primera página)"""
+    if cursor in (None, ''):
+        return 0
+    try:
+        offset = int(cursor)
+    except (TypeError, ValueError):
+        raise ValueError(f'Cursor inválido: {cursor}')
+    if offset < 0:
+        raise ValueError(f'Cursor inválido: {cursor}')
+    return offset
+
+
+def leer_limite(limite, default=LIMITE_DEFAULT):
+    return max(1, min(int(limite or default), MAX_LIMITE))
+
+
+def elegir_campos(pedidos, permitidos, default):
+    """Campos pedidos que existen (en el orden de `permitidos`); `default` si no hay ninguno"""
+    pedidos = set(pedidos or [])
+    campos = [c for c in permitidos if c in pedidos]
+    return campos or list(default)
+
+
+def proyectar(fila, campos):
+    """Solo las columnas pedidas, recortando textos largos"""
+    item = {}
+    for campo in campos:
+        valor = fila.get(campo)
+        if isinstance(valor, str) and len(valor) > MAX_CARACTERES_CAMPO:
+            valor = valor[:MAX_CARACTERES_CAMPO].rstrip() + '…'
+        item[campo] = valor
+    return item
+
+
+def pagina(filas, offset, limite, campos, clave, presupuesto=PRESUPUESTO_TOKENS):
+    """
+    Arma una página a partir de las filas consultadas desde `offset`
+
+    Args:
+        filas: Hasta limite + 1 filas, ya filtradas y ordenadas
+        offset: Desplazamiento con el que se consultaron
+        limite: Máximo de filas a devolver
+        campos: Columnas a incluir
+        clave: Nombre de la lista en el resultado (p. ej. 'empleados')
+        presupuesto: Tokens máximos de la lista (siempre incluye al menos una fila)
+
+    Returns:
+        dict: {clave: [...], 'mostrados', 'siguiente_cursor' (solo si hay más)}
+    """
+    items, usados = [], 0
+    for fila in filas[:limite]:
+        item = proyectar(fila, campos)
+        costo = estimar_tokens(item)
+        if items and usados + costo > presupuesto:
+            break
+        items.append(item)
+        usados += costo
+
+    resultado = {clave: items, 'mostrados': len(items)}
+    if len(filas) > len(items):
+        resultado['siguiente_cursor'] = str(offset + len(items))
+    return resultado
+
+
+def consultar(consulta, args, clave, permitidos, default):
+    """
+    Ejecuta una consulta paginada con los argumentos de la herramienta
+
+    Args:
+        consulta: Función (limit, offset) -> filas
+        args: Argumentos de la herramienta (campos, limite, cursor)
+        clave: Nombre de la lista en el resultado
+        permitidos: Columnas que se pueden pedir
+        default: Columnas si no se piden
+    """
+    offset = leer_cursor(args.get('cursor'))
+    limite = leer_limite(args.get('limite'))
+    campos = elegir_campos(args.get('campos'), permitidos, default)
+    filas = consulta(limit=limite + 1, offset=offset) or []
+    return pagina(filas, offset, limite, campos, clave)
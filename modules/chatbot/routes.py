@@ -4,9 +4,9 @@ Rutas y controladores del chatbot
 import os
 import json
 import logging
-from datetime import datetime, date
 from flask import Blueprint, request, jsonify, session
 from functools import wraps
+from modules.chatbot import compacto, enrutador
 from modules.chatbot.models import ChatbotSession, ChatbotMessage, ChatbotAction
 from modules.chatbot.llm_client import LLMClient, MockLLMClient
 from modules.chatbot.tools import ChatbotTools
@@ -15,14 +15,6 @@ from models import User
 logger = logging.getLogger(__name__)
 
 
-class DateTimeEncoder(json.JSONEncoder):
-    """Encoder personalizado para serializar datetime y date a JSON"""
-    def default(self, obj):
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        return super().default(obj)
-
-
 chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/chatbot')
 
 
@@ -137,6 +129,14 @@ def chat():
             has_tools = 'tool_calls' in msg
             logger.debug(f"Mensaje {i+1}: role={role}, content_length={content_length}, has_tool_calls={has_tools}")
 
+        # Enviar solo los grupos de herramientas relevantes para este mensaje
+        grupos_elegidos = enrutador.elegir_grupos(user_message, messages)
+        grupos = set(grupos_elegidos)
+        request_tools = enrutador.seleccionar(available_tools, grupos)
+        tokens_enviados = enrutador.estimar_tokens(request_tools)
+        herramientas_usadas = set()
+        ampliado = False
+
         # Llamar al LLM
         max_iterations = 5  # Límite de iteraciones para evitar loops infinitos
         iteration = 0
@@ -149,7 +149,7 @@ def chat():
 
             llm_response = llm_client.chat_completion(
                 messages=messages,
-                tools=available_tools,
+                tools=request_tools,
                 tool_choice="auto"
             )
 
@@ -181,22 +181,27 @@ def chat():
                 tool_name = tool_call['function']['name']
                 tool_args = json.loads(tool_call['function']['arguments'])
 
-                # Ejecutar la herramienta
-                result = tools_manager.execute_tool(tool_name, tool_args)
-
-                # Registrar la acción en la tabla de acciones
-                ChatbotAction.create(
-                    session_id=chat_session['id'],
-                    message_id=assistant_message_id,
-                    action_type=tool_name,
-                    action_params=tool_args,
-                    action_result=result.get('data') if result.get('success') else None,
-                    success=result.get('success', False),
-                    error_message=result.get('error')
-                )
-
-                # Preparar resultado de la herramienta
-                tool_result_content = json.dumps(result, ensure_ascii=False, cls=DateTimeEncoder)
+                if tool_name == enrutador.AMPLIAR:
+                    # El modelo pidió herramientas que el enrutador no envió
+                    grupos |= set(tool_args.get('grupos') or enrutador.GRUPOS)
+                    request_tools = enrutador.ampliar(available_tools, grupos)
+                    ampliado = True
+                    result = {'success': True, 'data': {
+                        'mensaje': 'Herramientas habilitadas',
+                        'herramientas': sorted(enrutador.nombres(request_tools) - {enrutador.AMPLIAR})
+                    }}
+                else:
+                    if tool_name not in enrutador.nombres(request_tools):
+                        # Herramienta del rol que no se envió: se ejecuta y se pasa al conjunto completo
+                        logger.info(f"Enrutador: el modelo llamó a {tool_name} fuera de los grupos {sorted(grupos)}")
+                        request_tools = available_tools
+                        ampliado = True
+                    herramientas_usadas.add(tool_name)
+                    # Ejecutar la herramienta
+                    result = tools_manager.execute_tool(tool_name, tool_args)
+
+                # Preparar resultado de la herramienta (tablas, sin nulos ni defaults, ver compacto.py)
+                tool_result_content = compacto.codificar(result, tool_name)
 
                 # Agregar resultado EN MEMORIA
                 tool_results.append({
@@ -206,16 +211,32 @@ def chat():
                 })
 
                 # ✅ GUARDAR mensaje de tipo 'tool' EN BASE DE DATOS
-                ChatbotMessage.create(
+                tool_message_id = ChatbotMessage.create(
                     session_id=chat_session['id'],
                     role='tool',
                     content=tool_result_content,
                     metadata={'tool_call_id': tool_call['id'], 'tool_name': tool_name}
                 )
 
+                # Registrar la acción; si el resultado es grande solo guarda la
+                # referencia al mensaje 'tool' y un resumen
+                ChatbotAction.create(
+                    session_id=chat_session['id'],
+                    message_id=assistant_message_id,
+                    action_type=tool_name,
+                    action_params=tool_args,
+                    action_result=compacto.resumen_accion(tool_result_content, tool_message_id)
+                    if result.get('success') else None,
+                    success=result.get('success', False),
+                    error_message=result.get('error')
+                )
+
             # Agregar resultados de herramientas a los mensajes EN MEMORIA
             messages.extend(tool_results)
 
+        enrutador.registrar(grupos_elegidos, herramientas_usadas, tokens_enviados,
+                            enrutador.estimar_tokens(available_tools), ampliado)
+
         # Si llegamos al límite de iteraciones sin respuesta
         if assistant_response is None:
             assistant_response = "Lo siento, he tenido problemas para procesar tu solicitud. ¿Podrías reformular tu pregunta?"
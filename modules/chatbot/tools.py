@@ -4,7 +4,22 @@ Define las funciones que el LLM puede llamar para ejecutar acciones
 """
 import json
 from datetime import datetime, timedelta, date
-from models import User, Employee, Department, Vacation, Document, Announcement, Ticket, Cliente, Factura, Pago, CobranzaSeguimiento, Cobranza
+from models import User, Employee, Department, Vacation, Document, Announcement, Ticket, Cliente, Factura, Pago, CobranzaSeguimiento, Cobranza, CobranzaWorklist
+from modules.chatbot import paginacion
+
+# Columnas que las herramientas de consulta pueden devolver (y las que devuelven por defecto)
+CAMPOS_EMPLEADOS = ('id', 'nombre', 'apellido', 'email', 'telefono', 'extension', 'cargo',
+                    'departamento_nombre', 'fecha_ingreso')
+CAMPOS_EMPLEADOS_DEFAULT = ('nombre', 'apellido', 'cargo', 'departamento_nombre', 'email')
+CAMPOS_DOCUMENTOS = ('id', 'titulo', 'descripcion', 'categoria', 'tipo_archivo', 'fecha_subida', 'descargas')
+CAMPOS_DOCUMENTOS_DEFAULT = ('id', 'titulo', 'categoria', 'fecha_subida')
+CAMPOS_VACACIONES = ('id', 'empleado_id', 'nombre', 'apellido', 'fecha_inicio', 'fecha_fin',
+                     'dias_solicitados', 'tipo', 'estado', 'motivo', 'fecha_solicitud',
+                     'aprobador_nombre', 'comentarios_aprobador')
+CAMPOS_VACACIONES_DEFAULT = ('id', 'nombre', 'apellido', 'fecha_inicio', 'fecha_fin', 'dias_solicitados', 'estado')
+CAMPOS_TICKETS = ('id', 'titulo', 'descripcion', 'categoria', 'prioridad', 'estado', 'fecha_creacion',
+                  'solicitante_nombre', 'asignado_nombre')
+CAMPOS_TICKETS_DEFAULT = ('id', 'titulo', 'prioridad', 'estado', 'solicitante_nombre', 'asignado_nombre')
 
 
 def convert_datetime_to_str(obj):
@@ -59,6 +74,8 @@ class ChatbotTools:
             self._get_employees_info_tool(),
             self._get_departments_info_tool(),
             self._get_documents_info_tool(),
+            self._buscar_documentos_tool(),
+            self._buscar_conocimiento_tool(),
             self._get_my_vacations_tool(),
             self._get_my_tickets_tool(),
             self._get_announcements_tool(),
@@ -111,6 +128,9 @@ class ChatbotTools:
                 self._get_resumen_cliente_tool(),
                 self._get_antiguedad_saldos_tool(),
                 self._get_dashboard_cobranzas_tool(),
+                self._get_lista_llamadas_tool(),
+                self._get_pronostico_cobranza_tool(),
+                self._get_caracteristicas_cliente_tool(),
             ])
 
         return tools
@@ -131,6 +151,8 @@ class ChatbotTools:
             'get_employees_info': self._execute_get_employees_info,
             'get_departments_info': self._execute_get_departments_info,
             'get_documents_info': self._execute_get_documents_info,
+            'buscar_documentos': self._execute_buscar_documentos,
+            'buscar_conocimiento': self._execute_buscar_conocimiento,
             'get_my_vacations': self._execute_get_my_vacations,
             'get_my_tickets': self._execute_get_my_tickets,
             'get_announcements': self._execute_get_announcements,
@@ -153,6 +175,9 @@ class ChatbotTools:
             'get_resumen_cliente': self._execute_get_resumen_cliente,
             'get_antiguedad_saldos': self._execute_get_antiguedad_saldos,
             'get_dashboard_cobranzas': self._execute_get_dashboard_cobranzas,
+            'get_lista_llamadas': self._execute_get_lista_llamadas,
+            'get_pronostico_cobranza': self._execute_get_pronostico_cobranza,
+            'get_caracteristicas_cliente': self._execute_get_caracteristicas_cliente,
             # PowerBI con Visión
             'list_powerbi_reports': self._execute_list_powerbi_reports,
             'analyze_powerbi_report': self._execute_analyze_powerbi_report,
@@ -177,14 +202,19 @@ class ChatbotTools:
             "type": "function",
             "function": {
                 "name": "get_employees_info",
-                "description": "Obtiene información sobre empleados. Puede buscar por nombre o listar todos.",
+                "description": "Obtiene información sobre empleados, los más relevantes primero. Puede buscar por nombre o cargo y filtrar por departamento. Si la respuesta trae siguiente_cursor, hay más resultados.",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "search_term": {
                             "type": "string",
                             "description": "Término de búsqueda (nombre, cargo, email). Opcional."
-                        }
+                        },
+                        "departamento": {
+                            "type": "string",
+                            "description": "Nombre del departamento. Opcional."
+                        },
+                        **paginacion.parametros(CAMPOS_EMPLEADOS)
                     }
                 }
             }
@@ -205,7 +235,7 @@ class ChatbotTools:
             "type": "function",
             "function": {
                 "name": "get_documents_info",
-                "description": "Consulta documentos corporativos disponibles. Puede filtrar por categoría.",
+                "description": "Lista los documentos corporativos disponibles (título, categoría, fecha), los más recientes primero. Puede filtrar por categoría o por palabras del título. Para el contenido usar buscar_documentos.",
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -213,12 +243,68 @@ class ChatbotTools:
                             "type": "string",
                             "description": "Categoría de documentos",
                             "enum": ["politicas", "procedimientos", "manuales", "formularios", "otros"]
-                        }
+                        },
+                        "busqueda": {
+                            "type": "string",
+                            "description": "Texto a buscar en el título o la descripción. Opcional."
+                        },
+                        **paginacion.parametros(CAMPOS_DOCUMENTOS)
                     }
                 }
             }
         }
 
+    def _buscar_documentos_tool(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": "buscar_documentos",
+                "description": "Busca en el contenido de los documentos corporativos (políticas, procedimientos, manuales) y devuelve solo los pasajes más relevantes. Usar para responder preguntas sobre lo que dicen los documentos, por ejemplo 'política de viáticos'.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "consulta": {
+                            "type": "string",
+                            "description": "Palabras clave a buscar"
+                        },
+                        "categoria": {
+                            "type": "string",
+                            "description": "Categoría de documentos",
+                            "enum": ["politicas", "procedimientos", "manuales", "formularios", "otros"]
+                        },
+                        "limite": {
+                            "type": "integer",
+                            "description": "Número de pasajes a devolver (default: 5, máximo 10)"
+                        }
+                    },
+                    "required": ["consulta"]
+                }
+            }
+        }
+
+    def _buscar_conocimiento_tool(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": "buscar_conocimiento",
+                "description": "Recupera los fragmentos de documentos corporativos y anuncios más relacionados con una pregunta (búsqueda semántica). Usar para responder preguntas sobre políticas, procedimientos o comunicados citando la fuente.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "pregunta": {
+                            "type": "string",
+                            "description": "Pregunta o tema a buscar"
+                        },
+                        "limite": {
+                            "type": "integer",
+                            "description": "Número de fragmentos (default: 3, máximo 6)"
+                        }
+                    },
+                    "required": ["pregunta"]
+                }
+            }
+        }
+
     def _get_my_vacations_tool(self):
         return {
             "type": "function",
@@ -327,7 +413,7 @@ class ChatbotTools:
             "type": "function",
             "function": {
                 "name": "get_all_vacations",
-                "description": "Obtiene todas las solicitudes de vacaciones (solo RRHH/Admin).",
+                "description": "Obtiene las solicitudes de vacaciones, primero las pendientes (solo RRHH/Admin).",
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -335,7 +421,12 @@ class ChatbotTools:
                             "type": "string",
                             "description": "Filtrar por estado",
                             "enum": ["pendiente", "aprobada", "rechazada", "cancelada"]
-                        }
+                        },
+                        "empleado": {
+                            "type": "string",
+                            "description": "Nombre del empleado. Opcional."
+                        },
+                        **paginacion.parametros(CAMPOS_VACACIONES)
                     }
                 }
             }
@@ -392,7 +483,7 @@ class ChatbotTools:
             "type": "function",
             "function": {
                 "name": "get_all_tickets",
-                "description": "Obtiene todos los tickets de soporte (solo Soporte/Admin).",
+                "description": "Obtiene los tickets de soporte, primero los abiertos y más urgentes (solo Soporte/Admin).",
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -400,7 +491,22 @@ class ChatbotTools:
                             "type": "string",
                             "description": "Filtrar por estado",
                             "enum": ["abierto", "en_proceso", "resuelto", "cerrado"]
-                        }
+                        },
+                        "prioridad": {
+                            "type": "string",
+                            "description": "Filtrar por prioridad",
+                            "enum": ["baja", "media", "alta", "urgente"]
+                        },
+                        "categoria": {
+                            "type": "string",
+                            "description": "Filtrar por categoría",
+                            "enum": ["ti", "rrhh", "mantenimiento", "administrativo", "otro"]
+                        },
+                        "busqueda": {
+                            "type": "string",
+                            "description": "Texto a buscar en el título o la descripción. Opcional."
+                        },
+                        **paginacion.parametros(CAMPOS_TICKETS)
                     }
                 }
             }
@@ -517,22 +623,11 @@ class ChatbotTools:
     # ========== IMPLEMENTACIONES DE HERRAMIENTAS ==========
 
     def _execute_get_employees_info(self, args):
-        """Obtiene información de empleados"""
-        search_term = args.get('search_term', '')
-
-        if search_term:
-            employees = Employee.search(search_term)
-        else:
-            employees = Employee.get_all()
-
-        # Manejar el caso donde employees puede ser None
-        if employees is None:
-            employees = []
+        """Obtiene información de empleados (filtrada, ordenada por relevancia y paginada)"""
+        def consulta(limit, offset):
+            return Employee.consultar(args.get('search_term'), args.get('departamento'), limit, offset)
 
-        return {
-            'total': len(employees),
-            'empleados': employees[:20]  # Limitar a 20 resultados
-        }
+        return paginacion.consultar(consulta, args, 'empleados', CAMPOS_EMPLEADOS, CAMPOS_EMPLEADOS_DEFAULT)
 
     def _execute_get_departments_info(self, args):
         """Obtiene información de departamentos"""
@@ -543,23 +638,47 @@ class ChatbotTools:
         return {'departamentos': departments}
 
     def _execute_get_documents_info(self, args):
-        """Consulta documentos"""
-        categoria = args.get('categoria')
+        """Consulta documentos (solo datos del listado; el contenido se consulta con buscar_documentos)"""
+        def consulta(limit, offset):
+            return Document.consultar(args.get('categoria'), args.get('busqueda'), limit, offset)
 
-        if categoria:
-            documents = Document.get_by_category(categoria)
-        else:
-            documents = Document.get_all()
+        return paginacion.consultar(consulta, args, 'documentos', CAMPOS_DOCUMENTOS, CAMPOS_DOCUMENTOS_DEFAULT)
 
-        # Manejar el caso donde documents puede ser None
-        if documents is None:
-            documents = []
+    def _execute_buscar_documentos(self, args):
+        """Pasajes de documentos más relevantes para una consulta"""
+        from modules.documents import indice
+
+        limite = max(1, min(int(args.get('limite') or 5), 10))
+        try:
+            pasajes = indice.buscar_pasajes(args.get('consulta'), args.get('categoria'), limite)
+        except ValueError as e:
+            return {'error': str(e), 'pasajes': []}
 
         return {
-            'total': len(documents),
-            'documentos': documents
+            'total': len(pasajes),
+            'pasajes': [{
+                'documento_id': p['documento_id'],
+                'titulo': p['titulo'],
+                'categoria': p['categoria'],
+                'texto': p['texto'],
+                'relevancia': p['relevancia'],
+            } for p in pasajes]
         }
 
+    def _execute_buscar_conocimiento(self, args):
+        """Fragmentos de documentos y anuncios relevantes para una pregunta (RAG)"""
+        from modules.chatbot import conocimiento
+
+        limite = max(1, min(int(args.get('limite') or conocimiento.LIMITE_DEFAULT), 6))
+        try:
+            fragmentos = conocimiento.buscar(args.get('pregunta'), limit=limite)
+        except ValueError as e:
+            return {'error': str(e), 'fragmentos': []}
+
+        if not fragmentos:
+            return {'mensaje': 'No se encontró información relacionada', 'fragmentos': []}
+        return {'total': len(fragmentos), 'fragmentos': fragmentos}
+
     def _execute_get_my_vacations(self, args):
         """Obtiene vacaciones del usuario actual"""
         # Obtener empleado asociado al usuario
@@ -706,16 +825,10 @@ class ChatbotTools:
         if self.user_role not in ['admin', 'rrhh']:
             raise Exception('No tienes permisos para esta acción')
 
-        vacations = Vacation.get_all()
-        if vacations is None:
-            vacations = []
+        def consulta(limit, offset):
+            return Vacation.consultar(args.get('estado'), args.get('empleado'), limit, offset)
 
-        # Filtrar por estado si se especifica
-        estado = args.get('estado')
-        if estado and vacations:
-            vacations = [v for v in vacations if v['estado'] == estado]
-
-        return {'vacaciones': vacations}
+        return paginacion.consultar(consulta, args, 'vacaciones', CAMPOS_VACACIONES, CAMPOS_VACACIONES_DEFAULT)
 
     def _execute_approve_vacation(self, args):
         """Aprueba una solicitud de vacaciones (RRHH/Admin)"""
@@ -825,16 +938,11 @@ class ChatbotTools:
         if self.user_role not in ['admin', 'soporte']:
             raise Exception('No tienes permisos para ver todos los tickets')
 
-        tickets = Ticket.get_all()
-        if tickets is None:
-            tickets = []
-
-        # Filtrar por estado si se especifica
-        estado = args.get('estado')
-        if estado and tickets:
-            tickets = [t for t in tickets if t['estado'] == estado]
+        def consulta(limit, offset):
+            return Ticket.consultar(args.get('estado'), args.get('prioridad'), args.get('categoria'),
+                                    args.get('busqueda'), limit, offset)
 
-        return {'tickets': tickets}
+        return paginacion.consultar(consulta, args, 'tickets', CAMPOS_TICKETS, CAMPOS_TICKETS_DEFAULT)
 
     def _execute_update_ticket_status(self, args):
         """Actualiza estado de un ticket (Soporte/Admin)"""
@@ -1091,6 +1199,10 @@ class ChatbotTools:
                     'error': 'No se pudo crear el anuncio. Intenta de nuevo o contacta a soporte.'
                 }
 
+            # Indexar el anuncio para buscar_conocimiento, igual que al crearlo desde la web
+            from modules.chatbot import conocimiento
+            conocimiento.programar_sincronizacion()
+
             return {
                 'success': True,
                 'announcement_id': announcement_id,
@@ -1260,6 +1372,70 @@ class ChatbotTools:
             }
         }
 
+    def _get_lista_llamadas_tool(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": "get_lista_llamadas",
+                "description": "Obtiene la lista priorizada de clientes a llamar hoy, ordenada por monto esperado a recuperar por hora de contacto (probabilidad de pago del modelo ML × saldo recuperable). Usar cuando pregunten '¿a quién debo llamar hoy?' o por prioridades de cobranza.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "limite": {
+                            "type": "integer",
+                            "description": "Número de clientes a devolver (por defecto 10, máximo 50)"
+                        },
+                        "prioridad": {
+                            "type": "string",
+                            "enum": ["alta", "media", "baja"],
+                            "description": "Filtra por la prioridad de cobranza asignada por el modelo ML (opcional)"
+                        }
+                    }
+                }
+            }
+        }
+
+    def _get_pronostico_cobranza_tool(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": "get_pronostico_cobranza",
+                "description": "Pronostica la cobranza esperada por semana con bandas de confianza (p05-p95), simulando miles de escenarios sobre las facturas abiertas con las probabilidades de pago del modelo ML. Usar para preguntas como '¿cuánto vamos a cobrar este mes?' o flujo de caja esperado.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "semanas": {
+                            "type": "integer",
+                            "description": "Horizonte del pronóstico en semanas (por defecto 13, máximo 52)"
+                        }
+                    }
+                }
+            }
+        }
+
+    def _get_caracteristicas_cliente_tool(self):
+        return {
+            "type": "function",
+            "function": {
+                "name": "get_caracteristicas_cliente",
+                "description": "Obtiene las variables de comportamiento de pago que usa el modelo ML para un cliente (días promedio de pago, tasa de incumplimiento, promesas incumplidas, días de atraso, contactos recientes, etc.), vigentes hoy o a una fecha pasada. Usar para explicar por qué un cliente tiene cierto riesgo o cómo estaba en una fecha.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "cliente_id": {
+                            "type": "integer",
+                            "description": "ID del cliente"
+                        },
+                        "fecha": {
+                            "type": "string",
+                            "description": "Fecha del snapshot en formato YYYY-MM-DD (opcional, por defecto hoy)"
+                        }
+                    },
+                    "required": ["cliente_id"]
+                }
+            }
+        }
+
     # ========== IMPLEMENTACIONES DE COBRANZAS ==========
 
     def _execute_buscar_cliente(self, args):
@@ -1487,6 +1663,75 @@ class ChatbotTools:
             }
         }
 
+    def _execute_get_lista_llamadas(self, args):
+        """Obtiene los clientes a llamar primero según la lista priorizada"""
+        limite = max(1, min(int(args.get('limite') or 10), 50))
+
+        pagina = CobranzaWorklist.get_pagina(page=1, per_page=limite, prioridad=args.get('prioridad'))
+        if pagina is None:
+            return {'error': 'No se pudo obtener la lista de llamadas'}
+        if not pagina['clientes']:
+            return {'mensaje': 'No hay clientes con saldo por cobrar', 'clientes': []}
+
+        return {
+            'total_en_lista': pagina['total'],
+            'clientes': [{
+                'posicion': c['posicion'],
+                'id': c['cliente_id'],
+                'codigo': c['codigo'],
+                'razon_social': c['razon_social'],
+                'telefono': c['telefono'],
+                'contacto': c['contacto_nombre'],
+                'saldo_total': float(c['saldo_total'] or 0),
+                'saldo_vencido': float(c['saldo_vencido'] or 0),
+                'probabilidad_pago': round(float(c['probabilidad_pago']), 2),
+                'monto_esperado': float(c['monto_esperado'] or 0),
+                'valor_por_hora': float(c['valor_hora'] or 0),
+                'prioridad': c['prioridad_cobranza'],
+                'accion_recomendada': c['accion_recomendada'],
+                'con_modelo_ml': c['ml_resultado_id'] is not None
+            } for c in pagina['clientes']]
+        }
+
+    def _execute_get_pronostico_cobranza(self, args):
+        """Pronóstico Monte Carlo de la cobranza semanal"""
+        from modules.cobranzas import pronostico
+
+        resultado = pronostico.pronosticar(semanas=args.get('semanas') or pronostico.SEMANAS)
+        return {
+            'saldo_abierto': resultado['saldo_abierto'],
+            'cobranza_esperada': resultado['total']['esperado'],
+            'intervalo_90': [resultado['total']['p05'], resultado['total']['p95']],
+            'semanas': [{
+                'semana': s['semana'],
+                'desde': s['desde'],
+                'esperado': s['esperado'],
+                'p05': s['p05'],
+                'p95': s['p95'],
+                'acumulado_esperado': s['acumulado_esperado']
+            } for s in resultado['semanas']],
+            'escenarios': resultado['escenarios'],
+            'facturas': resultado['facturas'],
+            'clientes_sin_modelo_ml': resultado['clientes_sin_modelo'],
+            'ejecucion_ml': resultado['ejecucion_id']
+        }
+
+    def _execute_get_caracteristicas_cliente(self, args):
+        """Snapshot del feature store para un cliente"""
+        from modules.cobranzas import caracteristicas
+
+        fecha = None
+        if args.get('fecha'):
+            try:
+                fecha = datetime.strptime(args['fecha'], '%Y-%m-%d').date()
+            except ValueError:
+                return {'error': 'La fecha debe tener formato YYYY-MM-DD'}
+
+        resultado = caracteristicas.caracteristicas_cliente(args.get('cliente_id'), fecha)
+        if not resultado:
+            return {'mensaje': 'El cliente no tiene características calculadas para esa fecha'}
+        return resultado
+
     # ========== HERRAMIENTAS DE POWERBI CON VISIÓN ==========
 
     def _list_powerbi_reports_tool(self):
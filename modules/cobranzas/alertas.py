@@ -0,0 +1,237 @@
+"""
+Motor incremental de alertas de cobranza (tabla cobranza_alertas)
+
+Cada ejecución evalúa solo lo que cambió desde la anterior:
+- facturas creadas/actualizadas y pagos registrados desde la marca de agua,
+- seguimientos nuevos (id mayor a la marca),
+- facturas y promesas cuya fecha se cruzó desde el último día evaluado
+  (búsqueda por rango sobre fecha_vencimiento / fecha_promesa_pago).
+
+Las alertas se escriben con INSERT ... SELECT y se deduplican contra las
+alertas activas mediante la clave única clave_activa. Las alertas cuya
+condición dejó de cumplirse se desactivan en la misma transacción.
+"""
+import time
+from datetime import timedelta
+
+from database import transaction
+
+DIAS_AVISO_VENCIMIENTO = 3
+ESTADOS_ABIERTOS = "('pendiente', 'parcial', 'vencida')"
+
+
+def _placeholders(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+def _filtro_cambiadas(marca, alias='f'):
+    """Condición para facturas creadas o actualizadas desde la marca (None = todas)"""
+    if marca is None:
+        return "TRUE", ()
+    return f"({alias}.fecha_actualizacion >= %s OR {alias}.fecha_creacion >= %s)", (marca, marca)
+
+
+def _clientes_tocados(cursor, marca_facturas, marca_pagos):
+    """IDs de clientes con facturas o pagos modificados desde las marcas"""
+    cursor.execute("""
+        SELECT cliente_id FROM facturas
+        WHERE fecha_actualizacion >= %s OR fecha_creacion >= %s
+        UNION
+        SELECT cliente_id FROM pagos WHERE fecha_registro >= %s
+    """, (marca_facturas, marca_facturas, marca_pagos))
+    return [fila['cliente_id'] for fila in cursor.fetchall()]
+
+
+def _alertas_vencimiento(cursor, estado, hoy):
+    """Facturas que vencieron (vencida) o están por vencer (vencimiento_proximo)"""
+    cambiadas, params_cambiadas = _filtro_cambiadas(estado['marca_facturas'])
+    ultima = estado['ultima_fecha']
+    limite_aviso = hoy + timedelta(days=DIAS_AVISO_VENCIMIENTO)
+
+    # Cruce de fecha: vencimientos en [ultima_fecha, hoy) ya no estaban
+    # vencidos en la ejecución anterior
+    cruce_vencida = "f.fecha_vencimiento >= %s" if ultima else "TRUE"
+    params_cruce = (ultima,) if ultima else ()
+    cursor.execute(f"""
+        INSERT INTO cobranza_alertas (cliente_id, factura_id, tipo_alerta, mensaje, clave_activa)
+        SELECT f.cliente_id, f.id, 'vencida',
+               CONCAT('Factura ', f.numero_factura, ' vencida desde ', f.fecha_vencimiento,
+                      ' con saldo de $', FORMAT(f.saldo_pendiente, 2)),
+               CONCAT('vencida:', f.cliente_id, ':', f.id, ':0')
+        FROM facturas f
+        WHERE f.estado IN {ESTADOS_ABIERTOS}
+        AND f.saldo_pendiente > 0
+        AND f.fecha_vencimiento < %s
+        AND ({cambiadas} OR {cruce_vencida})
+        ON DUPLICATE KEY UPDATE cobranza_alertas.id = cobranza_alertas.id
+    """, (hoy,) + params_cambiadas + params_cruce)
+
+    # La ventana de aviso anterior terminaba en ultima_fecha + DIAS_AVISO
+    cruce_proximo = "f.fecha_vencimiento > %s" if ultima else "TRUE"
+    params_cruce = (ultima + timedelta(days=DIAS_AVISO_VENCIMIENTO),) if ultima else ()
+    cursor.execute(f"""
+        INSERT INTO cobranza_alertas (cliente_id, factura_id, tipo_alerta, mensaje, clave_activa)
+        SELECT f.cliente_id, f.id, 'vencimiento_proximo',
+               CONCAT('Factura ', f.numero_factura, ' vence el ', f.fecha_vencimiento,
+                      ' con saldo de $', FORMAT(f.saldo_pendiente, 2)),
+               CONCAT('vencimiento_proximo:', f.cliente_id, ':', f.id, ':0')
+        FROM facturas f
+        WHERE f.estado IN {ESTADOS_ABIERTOS}
+        AND f.saldo_pendiente > 0
+        AND f.fecha_vencimiento BETWEEN %s AND %s
+        AND ({cambiadas} OR {cruce_proximo})
+        ON DUPLICATE KEY UPDATE cobranza_alertas.id = cobranza_alertas.id
+    """, (hoy, limite_aviso) + params_cambiadas + params_cruce)
+
+    # Facturas pagadas/canceladas, o avisos de vencimiento cuya factura ya venció
+    cursor.execute(f"""
+        UPDATE cobranza_alertas a
+        JOIN facturas f ON f.id = a.factura_id
+        SET a.activa = FALSE, a.clave_activa = NULL
+        WHERE a.activa = TRUE
+        AND a.tipo_alerta IN ('vencida', 'vencimiento_proximo')
+        AND (f.saldo_pendiente <= 0
+             OR f.estado NOT IN {ESTADOS_ABIERTOS}
+             OR (a.tipo_alerta = 'vencimiento_proximo' AND f.fecha_vencimiento < %s))
+    """, (hoy,))
+
+
+def _alertas_promesas(cursor, estado, hoy):
+    """Promesas de pago vencidas sin pago del cliente entre el contacto y la fecha prometida"""
+    ultima = estado['ultima_fecha']
+    if ultima:
+        nuevas = "(s.id > %s OR s.fecha_promesa_pago >= %s)"
+        params = (estado['marca_seguimientos'], ultima)
+    else:
+        nuevas, params = "TRUE", ()
+
+    cursor.execute(f"""
+        INSERT INTO cobranza_alertas
+            (cliente_id, factura_id, seguimiento_id, tipo_alerta, mensaje, clave_activa)
+        SELECT s.cliente_id, s.factura_id, s.id, 'promesa_incumplida',
+               CONCAT('Promesa de pago del ', s.fecha_promesa_pago, ' por $',
+                      FORMAT(COALESCE(s.monto_prometido, 0), 2), ' no cumplida'),
+               CONCAT('promesa_incumplida:', s.cliente_id, ':', IFNULL(s.factura_id, 0), ':', s.id)
+        FROM cobranza_seguimientos s
+        WHERE s.resultado = 'promesa_pago'
+        AND s.fecha_promesa_pago < %s
+        AND {nuevas}
+        AND NOT EXISTS (
+            SELECT 1 FROM pagos p
+            WHERE p.cliente_id = s.cliente_id
+            AND p.fecha_pago BETWEEN DATE(s.fecha_contacto) AND s.fecha_promesa_pago
+        )
+        ON DUPLICATE KEY UPDATE cobranza_alertas.id = cobranza_alertas.id
+    """, (hoy,) + params)
+
+    # Pagos registrados tarde que sí cumplieron la promesa
+    if estado['marca_pagos'] is not None:
+        cursor.execute("""
+            UPDATE cobranza_alertas a
+            JOIN cobranza_seguimientos s ON s.id = a.seguimiento_id
+            JOIN pagos p ON p.cliente_id = s.cliente_id
+                AND p.fecha_pago BETWEEN DATE(s.fecha_contacto) AND s.fecha_promesa_pago
+            SET a.activa = FALSE, a.clave_activa = NULL
+            WHERE a.activa = TRUE
+            AND a.tipo_alerta = 'promesa_incumplida'
+            AND p.fecha_registro >= %s
+        """, (estado['marca_pagos'],))
+
+
+def _alertas_limite_credito(cursor, clientes):
+    """Clientes cuyo saldo abierto excede su límite de crédito (None = todos)"""
+    if clientes is None:
+        filtro, params = "", ()
+    elif not clientes:
+        return
+    else:
+        filtro = f"AND f.cliente_id IN ({_placeholders(clientes)})"
+        params = tuple(clientes)
+
+    saldos = f"""
+        SELECT f.cliente_id, SUM(f.saldo_pendiente) AS saldo
+        FROM facturas f
+        WHERE f.estado IN {ESTADOS_ABIERTOS} {filtro}
+        GROUP BY f.cliente_id
+    """
+    cursor.execute(f"""
+        INSERT INTO cobranza_alertas (cliente_id, factura_id, tipo_alerta, mensaje, clave_activa)
+        SELECT c.id, NULL, 'limite_credito',
+               CONCAT('Saldo de $', FORMAT(s.saldo, 2), ' excede el límite de crédito de $',
+                      FORMAT(c.limite_credito, 2)),
+               CONCAT('limite_credito:', c.id, ':0:0')
+        FROM clientes c
+        JOIN ({saldos}) s ON s.cliente_id = c.id
+        WHERE c.limite_credito > 0 AND s.saldo > c.limite_credito
+        ON DUPLICATE KEY UPDATE cobranza_alertas.id = cobranza_alertas.id
+    """, params)
+
+    cursor.execute(f"""
+        UPDATE cobranza_alertas a
+        JOIN clientes c ON c.id = a.cliente_id
+        LEFT JOIN ({saldos}) s ON s.cliente_id = a.cliente_id
+        SET a.activa = FALSE, a.clave_activa = NULL
+        WHERE a.activa = TRUE
+        AND a.tipo_alerta = 'limite_credito'
+        {filtro.replace('f.cliente_id', 'a.cliente_id')}
+        AND (c.limite_credito <= 0 OR COALESCE(s.saldo, 0) <= c.limite_credito)
+    """, params + params)
+
+
+def procesar():
+    """
+    Evalúa las reglas sobre los cambios desde la última ejecución
+
+    La fila de cobranza_alertas_estado se lee con FOR UPDATE, así que dos
+    ejecuciones simultáneas se serializan.
+
+    Returns:
+        dict: alertas_nuevas, alertas_activas, clientes_evaluados y segundos
+    """
+    inicio = time.perf_counter()
+
+    with transaction() as cursor:
+        cursor.execute("SELECT * FROM cobranza_alertas_estado WHERE id = 1 FOR UPDATE")
+        estado = cursor.fetchone()
+        if estado is None:
+            raise RuntimeError("Falta la migración add_cobranza_alertas_motor.sql")
+
+        cursor.execute("""
+            SELECT NOW() AS ahora, CURDATE() AS hoy,
+                   (SELECT COALESCE(MAX(id), 0) FROM cobranza_alertas) AS max_alerta,
+                   (SELECT COALESCE(MAX(id), 0) FROM cobranza_seguimientos) AS max_seguimiento
+        """)
+        referencia = cursor.fetchone()
+        hoy = referencia['hoy']
+
+        if estado['marca_facturas'] is None:
+            clientes = None
+        else:
+            clientes = _clientes_tocados(cursor, estado['marca_facturas'], estado['marca_pagos'])
+
+        _alertas_vencimiento(cursor, estado, hoy)
+        _alertas_promesas(cursor, estado, hoy)
+        _alertas_limite_credito(cursor, clientes)
+
+        cursor.execute("""
+            UPDATE cobranza_alertas_estado
+            SET marca_facturas = %s, marca_pagos = %s, marca_seguimientos = %s,
+                ultima_fecha = %s, fecha_ejecucion = NOW()
+            WHERE id = 1
+        """, (referencia['ahora'], referencia['ahora'], referencia['max_seguimiento'], hoy))
+
+        cursor.execute("""
+            SELECT
+                SUM(id > %s) AS alertas_nuevas,
+                COUNT(*) AS alertas_activas
+            FROM cobranza_alertas
+            WHERE activa = TRUE
+        """, (referencia['max_alerta'],))
+        conteo = cursor.fetchone()
+
+    return {
+        'alertas_nuevas': int(conteo['alertas_nuevas'] or 0),
+        'alertas_activas': int(conteo['alertas_activas'] or 0),
+        'clientes_evaluados': 'todos' if clientes is None else len(clientes),
+        'segundos': round(time.perf_counter() - inicio, 2)
+    }
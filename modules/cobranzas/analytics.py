@@ -0,0 +1,340 @@
+"""
+Motor de analítica de cartera para cobranzas
+
+Carga una sola vez las facturas abiertas (más las emitidas en el periodo de
+análisis) y los pagos del periodo en arreglos columnares de NumPy, y calcula
+las métricas de toda la cartera en una pasada vectorizada:
+
+- Saldo total, saldo vencido y antigüedad de saldos
+- Atraso promedio ponderado por saldo
+- DSO (Days Sales Outstanding) sobre el periodo
+- CEI (Collection Effectiveness Index) sobre el periodo
+
+El snapshot se cachea en memoria y se actualiza de forma incremental con las
+filas modificadas desde la última carga (marca de agua por fecha).
+"""
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from database import execute_query
+
+logger = logging.getLogger(__name__)
+
+# Ventana para ventas (DSO) y cobranza (CEI)
+PERIODO_DIAS = 90
+
+# Recarga completa periódica (detecta borrados y refresca segmentos/cobradores)
+SNAPSHOT_TTL_SEGUNDOS = 3600
+
+# Intervalo mínimo entre actualizaciones incrementales
+REFRESH_SEGUNDOS = 60
+
+ESTADOS_ABIERTOS = ('pendiente', 'parcial', 'vencida')
+BUCKETS = ('vigente', 'dias_1_30', 'dias_31_60', 'dias_61_90', 'dias_mas_90')
+_LIMITES_BUCKETS = np.array([0, 30, 60, 90])
+
+AGRUPACIONES = ('cliente', 'segmento', 'cobrador')
+
+_COLUMNAS_FACTURAS = {
+    'id': np.int64, 'cliente_id': np.int64, 'total': np.float64,
+    'saldo': np.float64, 'emision': np.int64, 'vencimiento': np.int64,
+    'abierta': np.bool_
+}
+_COLUMNAS_PAGOS = {
+    'id': np.int64, 'cliente_id': np.int64, 'monto': np.float64, 'fecha': np.int64
+}
+
+
+def _a_dias(fechas):
+    """Convierte una secuencia de date/datetime a días desde epoch (int64)"""
+    return np.array(list(fechas), dtype='datetime64[D]').astype(np.int64)
+
+
+def _vacias(columnas):
+    return {nombre: np.empty(0, dtype=dtype) for nombre, dtype in columnas.items()}
+
+
+def _columnas_facturas(rows):
+    """Convierte filas de facturas (dict) a arreglos columnares"""
+    n = len(rows)
+    return {
+        'id': np.fromiter((r['id'] for r in rows), np.int64, n),
+        'cliente_id': np.fromiter((r['cliente_id'] for r in rows), np.int64, n),
+        'total': np.fromiter((float(r['total'] or 0) for r in rows), np.float64, n),
+        'saldo': np.fromiter((float(r['saldo_pendiente'] or 0) for r in rows), np.float64, n),
+        'emision': _a_dias(r['fecha_emision'] for r in rows),
+        'vencimiento': _a_dias(r['fecha_vencimiento'] for r in rows),
+        'abierta': np.fromiter((r['estado'] in ESTADOS_ABIERTOS for r in rows), np.bool_, n),
+    }
+
+
+def _columnas_pagos(rows):
+    """Convierte filas de pagos (dict) a arreglos columnares"""
+    n = len(rows)
+    return {
+        'id': np.fromiter((r['id'] for r in rows), np.int64, n),
+        'cliente_id': np.fromiter((r['cliente_id'] for r in rows), np.int64, n),
+        'monto': np.fromiter((float(r['monto'] or 0) for r in rows), np.float64, n),
+        'fecha': _a_dias(r['fecha_pago'] for r in rows),
+    }
+
+
+def _fusionar(actual, nuevas, conservar):
+    """Reemplaza en `actual` las filas con el mismo id que `nuevas`"""
+    mantener = ~np.isin(actual['id'], nuevas['id'])
+    return {k: np.concatenate([actual[k][mantener], nuevas[k][conservar]]) for k in actual}
+
+
+def _ratios(sumas, periodo_dias):
+    """Calcula las métricas derivadas a partir de las sumas (por fila)"""
+    cartera = sumas['cartera_total']
+    ventas = sumas['ventas_periodo']
+    cobranza = sumas['cobranza_periodo']
+    denominador_cei = cobranza + sumas['cartera_vencida']
+
+    return {
+        'atraso_promedio_ponderado': np.divide(
+            sumas['_atraso_x_saldo'], cartera,
+            out=np.zeros_like(cartera), where=cartera > 0),
+        'dso': np.divide(
+            cartera * periodo_dias, ventas,
+            out=np.full_like(cartera, np.nan), where=ventas > 0),
+        'cei': np.divide(
+            cobranza * 100, denominador_cei,
+            out=np.full_like(cartera, np.nan), where=denominador_cei > 0),
+    }
+
+
+class PortfolioSnapshot:
+    """Snapshot columnar de la cartera con actualización incremental"""
+
+    def __init__(self, periodo_dias=PERIODO_DIAS):
+        self.periodo_dias = periodo_dias
+        self.facturas = _vacias(_COLUMNAS_FACTURAS)
+        self.pagos = _vacias(_COLUMNAS_PAGOS)
+        # Dimensiones para agrupar: cliente_id ordenado -> etiqueta
+        self.dimensiones = {}
+        self.marca_facturas = None
+        self.marca_pagos = None
+        self.cargado_en = 0.0
+        self.actualizado_en = 0.0
+
+    def _desde(self):
+        return date.today() - timedelta(days=self.periodo_dias)
+
+    def cargar(self):
+        """Carga completa de facturas, pagos y dimensiones"""
+        inicio = time.perf_counter()
+
+        facturas = execute_query("""
+            SELECT id, cliente_id, total, saldo_pendiente, fecha_emision,
+                   fecha_vencimiento, estado,
+                   COALESCE(fecha_actualizacion, fecha_creacion) as modificada
+            FROM facturas
+            WHERE estado != 'cancelada'
+            AND (estado IN ('pendiente', 'parcial', 'vencida') OR fecha_emision >= %s)
+        """, (self._desde(),), fetch=True) or []
+
+        pagos = execute_query("""
+            SELECT id, cliente_id, monto, fecha_pago, fecha_registro
+            FROM pagos
+            WHERE fecha_pago >= %s
+        """, (self._desde(),), fetch=True) or []
+
+        self.facturas = _columnas_facturas(facturas) if facturas else _vacias(_COLUMNAS_FACTURAS)
+        self.pagos = _columnas_pagos(pagos) if pagos else _vacias(_COLUMNAS_PAGOS)
+        self.marca_facturas = max((f['modificada'] for f in facturas if f['modificada']), default=None)
+        self.marca_pagos = max((p['fecha_registro'] for p in pagos if p['fecha_registro']), default=None)
+        self._cargar_dimensiones()
+
+        self.cargado_en = self.actualizado_en = time.monotonic()
+        logger.info(
+            f"Snapshot de cartera cargado: {len(facturas)} facturas, {len(pagos)} pagos "
+            f"en {time.perf_counter() - inicio:.2f}s"
+        )
+
+    def _cargar_dimensiones(self):
+        """Carga segmento (último resultado ML) y cobrador (último seguimiento) por cliente"""
+        segmentos = execute_query("""
+            SELECT c.id as cliente_id, rc.segmento_cliente as etiqueta
+            FROM ml_resultados_cliente rc
+            JOIN (
+                SELECT cliente_codigo, MAX(id) as id
+                FROM ml_resultados_cliente
+                WHERE segmento_cliente IS NOT NULL
+                GROUP BY cliente_codigo
+            ) ult ON ult.id = rc.id
+            JOIN clientes c ON c.codigo = rc.cliente_codigo
+        """, fetch=True) or []
+
+        cobradores = execute_query("""
+            SELECT s.cliente_id, u.nombre_completo as etiqueta
+            FROM cobranza_seguimientos s
+            JOIN (
+                SELECT cliente_id, MAX(id) as id
+                FROM cobranza_seguimientos
+                GROUP BY cliente_id
+            ) ult ON ult.id = s.id
+            JOIN usuarios u ON u.id = s.realizado_por
+        """, fetch=True) or []
+
+        self.dimensiones = {
+            'segmento': self._dimension(segmentos),
+            'cobrador': self._dimension(cobradores),
+        }
+
+    @staticmethod
+    def _dimension(rows):
+        """Convierte filas (cliente_id, etiqueta) a (ids ordenados, códigos, etiquetas)"""
+        ids = np.fromiter((r['cliente_id'] for r in rows), np.int64, len(rows))
+        etiquetas, codigos = np.unique(
+            np.array([r['etiqueta'] or 'sin_asignar' for r in rows], dtype=object).astype(str),
+            return_inverse=True)
+        orden = np.argsort(ids)
+        return ids[orden], codigos[orden], list(etiquetas)
+
+    def actualizar(self):
+        """Actualización incremental con las filas modificadas desde la última marca"""
+        if self.marca_facturas is not None:
+            cambios = execute_query("""
+                SELECT id, cliente_id, total, saldo_pendiente, fecha_emision,
+                       fecha_vencimiento, estado,
+                       COALESCE(fecha_actualizacion, fecha_creacion) as modificada
+                FROM facturas
+                WHERE fecha_actualizacion >= %s OR fecha_creacion >= %s
+            """, (self.marca_facturas, self.marca_facturas), fetch=True) or []
+            if cambios:
+                nuevas = _columnas_facturas(cambios)
+                # Las canceladas o ya pagadas fuera del periodo salen del snapshot
+                vigentes = np.fromiter((f['estado'] != 'cancelada' for f in cambios), np.bool_, len(cambios))
+                desde = _a_dias([self._desde()])[0]
+                conservar = vigentes & (nuevas['abierta'] | (nuevas['emision'] >= desde))
+                self.facturas = _fusionar(self.facturas, nuevas, conservar)
+                self.marca_facturas = max(f['modificada'] for f in cambios if f['modificada'])
+
+        if self.marca_pagos is not None:
+            cambios = execute_query("""
+                SELECT id, cliente_id, monto, fecha_pago, fecha_registro
+                FROM pagos
+                WHERE fecha_registro >= %s
+            """, (self.marca_pagos,), fetch=True) or []
+            if cambios:
+                nuevos = _columnas_pagos(cambios)
+                desde = _a_dias([self._desde()])[0]
+                self.pagos = _fusionar(self.pagos, nuevos, nuevos['fecha'] >= desde)
+                self.marca_pagos = max(p['fecha_registro'] for p in cambios if p['fecha_registro'])
+
+        self.actualizado_en = time.monotonic()
+
+    def calcular(self, agrupar_por='cliente', hoy=None):
+        """
+        Calcula las métricas de toda la cartera en una pasada vectorizada
+
+        Args:
+            agrupar_por: 'cliente', 'segmento', 'cobrador' o None (total de cartera)
+            hoy: Fecha de corte (default: hoy)
+
+        Returns:
+            dict: {'claves': array de claves del grupo, 'metricas': dict de arrays}
+        """
+        if agrupar_por is not None and agrupar_por not in AGRUPACIONES:
+            raise ValueError(f"Agrupación inválida: '{agrupar_por}'. Debe ser una de: {AGRUPACIONES}")
+
+        f = self.facturas
+        p = self.pagos
+        hoy_d = _a_dias([hoy or date.today()])[0]
+        desde = hoy_d - self.periodo_dias
+
+        clientes = np.union1d(f['cliente_id'], p['cliente_id'])
+        f_idx = np.searchsorted(clientes, f['cliente_id'])
+        p_idx = np.searchsorted(clientes, p['cliente_id'])
+        n = len(clientes)
+
+        saldo = np.where(f['abierta'], f['saldo'], 0.0)
+        dias = hoy_d - f['vencimiento']
+        bucket = np.digitize(dias, _LIMITES_BUCKETS, right=True)
+
+        sumas = {
+            'cartera_total': np.bincount(f_idx, weights=saldo, minlength=n),
+            'cartera_vencida': np.bincount(f_idx, weights=np.where(dias > 0, saldo, 0.0), minlength=n),
+            'facturas_abiertas': np.bincount(f_idx, weights=(saldo > 0).astype(np.float64), minlength=n),
+            'ventas_periodo': np.bincount(
+                f_idx, weights=np.where(f['emision'] >= desde, f['total'], 0.0), minlength=n),
+            'cobranza_periodo': np.bincount(
+                p_idx, weights=np.where(p['fecha'] >= desde, p['monto'], 0.0), minlength=n),
+            '_atraso_x_saldo': np.bincount(f_idx, weights=np.maximum(dias, 0) * saldo, minlength=n),
+        }
+        antiguedad = np.bincount(
+            f_idx * len(BUCKETS) + bucket, weights=saldo, minlength=n * len(BUCKETS)
+        ).reshape(n, len(BUCKETS))
+        for i, nombre in enumerate(BUCKETS):
+            sumas[nombre] = antiguedad[:, i]
+
+        if agrupar_por == 'cliente':
+            claves = clientes
+        else:
+            if agrupar_por is None:
+                grupo = np.zeros(n, dtype=np.int64)
+                claves = np.array(['cartera'], dtype=object)
+            else:
+                ids, codigos, etiquetas = self.dimensiones.get(agrupar_por) or self._dimension([])
+                # Los clientes sin etiqueta caen en un grupo extra 'sin_asignar'
+                grupo = np.full(n, len(etiquetas), dtype=np.int64)
+                if len(ids):
+                    pos = np.searchsorted(ids, clientes).clip(max=len(ids) - 1)
+                    encontrado = ids[pos] == clientes
+                    grupo[encontrado] = codigos[pos[encontrado]]
+                claves = np.array(etiquetas + ['sin_asignar'], dtype=object)
+            sumas = {k: np.bincount(grupo, weights=v, minlength=len(claves)) for k, v in sumas.items()}
+
+        metricas = {k: v for k, v in sumas.items() if not k.startswith('_')}
+        metricas.update(_ratios(sumas, self.periodo_dias))
+        return {'claves': claves, 'metricas': metricas}
+
+
+def a_registros(resultado, clave='clave', ordenar_por='cartera_total', limit=None):
+    """Convierte el resultado columnar de `calcular` a lista de dict (JSON)"""
+    metricas = resultado['metricas']
+    orden = np.argsort(-metricas[ordenar_por], kind='stable')
+    if limit:
+        orden = orden[:limit]
+
+    registros = []
+    for i in orden:
+        valor_clave = resultado['claves'][i]
+        registro = {clave: valor_clave.item() if isinstance(valor_clave, np.generic) else valor_clave}
+        for nombre, valores in metricas.items():
+            valor = float(valores[i])
+            registro[nombre] = None if np.isnan(valor) else round(valor, 2)
+        registros.append(registro)
+    return registros
+
+
+# Snapshot compartido por el proceso
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """Obtiene el snapshot cacheado, recargándolo o actualizándolo si corresponde"""
+    global _snapshot
+    with _snapshot_lock:
+        ahora = time.monotonic()
+        if _snapshot is None or ahora - _snapshot.cargado_en > SNAPSHOT_TTL_SEGUNDOS:
+            snapshot = PortfolioSnapshot()
+            snapshot.cargar()
+            _snapshot = snapshot
+        elif ahora - _snapshot.actualizado_en > REFRESH_SEGUNDOS:
+            _snapshot.actualizar()
+        return _snapshot
+
+
+def metricas_cartera(agrupar_por='cliente', limit=None):
+    """Métricas de cartera agrupadas, listas para serializar a JSON"""
+    resultado = get_snapshot().calcular(agrupar_por)
+    clave = 'cliente_id' if agrupar_por == 'cliente' else (agrupar_por or 'grupo')
+    return a_registros(resultado, clave=clave, limit=limit)
@@ -0,0 +1,219 @@
+"""
+Motor de aplicación de pagos a facturas
+
+Los pagos con saldo sin aplicar se asignan en memoria sobre colas de
+facturas abiertas ordenadas por vencimiento (FIFO) o sobre las facturas
+indicadas explícitamente para cada pago. Todas las aplicaciones
+(pago_facturas) y los nuevos saldos/estados de facturas se escriben con
+sentencias por conjunto dentro de una sola transacción, leyendo las filas
+con FOR UPDATE para que dos conciliaciones simultáneas no apliquen el
+mismo saldo.
+"""
+import time
+from collections import deque
+from decimal import Decimal
+
+from database import transaction
+from models import ClienteSaldo
+
+ESTRATEGIAS = ('fifo', 'explicita')
+CERO = Decimal('0.00')
+
+
+def _placeholders(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+def _lista_ids(valores, campo):
+    """Valida una lista JSON de IDs enteros"""
+    if not isinstance(valores, list) or not all(
+            isinstance(v, int) and not isinstance(v, bool) for v in valores):
+        raise ValueError(f"'{campo}' debe ser una lista de IDs enteros")
+    return valores
+
+
+def _validar_asignaciones(asignaciones):
+    """dict pago_id -> [factura_id, ...]; las claves pueden venir como texto (JSON)"""
+    if not isinstance(asignaciones, dict):
+        raise ValueError("'asignaciones' debe ser un objeto pago_id -> [factura_id, ...]")
+    validas = {}
+    for pago_id, facturas in asignaciones.items():
+        if isinstance(pago_id, bool) or not (isinstance(pago_id, int) or str(pago_id).isdigit()):
+            raise ValueError(f"ID de pago inválido en 'asignaciones': {pago_id}")
+        validas[int(pago_id)] = _lista_ids(facturas, f'asignaciones[{pago_id}]')
+    return validas
+
+
+def _pagos_pendientes(cursor, pago_ids):
+    """Pagos con monto aún sin aplicar, en orden de fecha de pago"""
+    filtro, params = "", ()
+    if pago_ids is not None:
+        filtro = f"WHERE p.id IN ({_placeholders(pago_ids)})"
+        params = tuple(pago_ids)
+
+    cursor.execute(f"""
+        SELECT p.id, p.cliente_id,
+               p.monto - COALESCE(SUM(pf.monto_aplicado), 0) AS disponible
+        FROM pagos p
+        LEFT JOIN pago_facturas pf ON pf.pago_id = p.id
+        {filtro}
+        GROUP BY p.id, p.cliente_id, p.fecha_pago, p.monto
+        HAVING disponible > 0
+        ORDER BY p.fecha_pago, p.id
+        FOR UPDATE
+    """, params)
+    return cursor.fetchall()
+
+
+def _facturas_abiertas(cursor, columna, ids):
+    """Facturas con saldo de los clientes (o ids) indicados, bloqueadas para actualizar"""
+    cursor.execute(f"""
+        SELECT id, cliente_id, saldo_pendiente
+        FROM facturas
+        WHERE {columna} IN ({_placeholders(ids)})
+        AND estado IN ('pendiente', 'parcial', 'vencida')
+        AND saldo_pendiente > 0
+        ORDER BY cliente_id, fecha_vencimiento, id
+        FOR UPDATE
+    """, tuple(ids))
+    return cursor.fetchall()
+
+
+def asignar(pagos, colas, saldos, clave='cliente_id'):
+    """
+    Asigna los pagos sobre las colas de facturas (sin tocar la BD)
+
+    Args:
+        pagos: Lista de dict con id, disponible y la clave de su cola
+        colas: dict clave -> deque de factura_id en orden de aplicación
+        saldos: dict factura_id -> saldo pendiente (se actualiza en sitio)
+        clave: Campo del pago que selecciona su cola ('cliente_id' para FIFO,
+               'id' para asignación explícita)
+
+    Returns:
+        tuple: (aplicaciones [(pago_id, factura_id, monto)], monto sin aplicar)
+    """
+    aplicaciones = []
+    sin_aplicar = CERO
+    for pago in pagos:
+        disponible = Decimal(pago['disponible'])
+        cola = colas.get(pago[clave])
+        while disponible > 0 and cola:
+            factura_id = cola[0]
+            monto = min(disponible, saldos[factura_id])
+            if monto > 0:
+                aplicaciones.append((pago['id'], factura_id, monto))
+                saldos[factura_id] -= monto
+                disponible -= monto
+            if saldos[factura_id] <= 0:
+                cola.popleft()
+        sin_aplicar += disponible
+    return aplicaciones, sin_aplicar
+
+
+def _escribir(cursor, aplicaciones, saldos):
+    """Inserta las aplicaciones y actualiza saldos/estados por conjunto"""
+    cursor.executemany("""
+        INSERT INTO pago_facturas (pago_id, factura_id, monto_aplicado)
+        VALUES (%s, %s, %s)
+    """, aplicaciones)
+
+    tocadas = {factura_id for _, factura_id, _ in aplicaciones}
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_saldos_facturas")
+    cursor.execute("""
+        CREATE TEMPORARY TABLE tmp_saldos_facturas (
+            factura_id INT PRIMARY KEY,
+            saldo DECIMAL(12, 2) NOT NULL
+        ) ENGINE=MEMORY
+    """)
+    cursor.executemany("INSERT INTO tmp_saldos_facturas (factura_id, saldo) VALUES (%s, %s)",
+                       [(factura_id, saldos[factura_id]) for factura_id in tocadas])
+    cursor.execute("""
+        UPDATE facturas f
+        JOIN tmp_saldos_facturas t ON t.factura_id = f.id
+        SET f.estado = CASE
+                WHEN t.saldo <= 0 THEN 'pagada'
+                WHEN f.estado = 'vencida' THEN 'vencida'
+                ELSE 'parcial'
+            END,
+            f.saldo_pendiente = t.saldo
+    """)
+    cursor.execute("DROP TEMPORARY TABLE tmp_saldos_facturas")
+    return len(tocadas)
+
+
+def aplicar_pagos(pago_ids=None, estrategia='fifo', asignaciones=None):
+    """
+    Aplica pagos pendientes a facturas en una sola transacción
+
+    Args:
+        pago_ids: IDs de pagos a aplicar (None = todos los pagos con saldo sin aplicar)
+        estrategia: 'fifo' (por fecha de vencimiento) o 'explicita'
+        asignaciones: Para 'explicita', dict pago_id -> [factura_id, ...] en
+                      el orden en que deben cubrirse
+
+    Returns:
+        dict: pagos, aplicaciones, monto_aplicado, facturas_actualizadas,
+              monto_sin_aplicar y segundos
+
+    Raises:
+        ValueError: Si la estrategia, los pagos o las asignaciones no son válidos
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia no soportada: {estrategia}")
+    if estrategia == 'explicita':
+        if not asignaciones:
+            raise ValueError("La estrategia explícita requiere asignaciones")
+        asignaciones = _validar_asignaciones(asignaciones)
+        pago_ids = list(asignaciones)
+    elif pago_ids is not None:
+        if not _lista_ids(pago_ids, 'pago_ids'):
+            raise ValueError("No se indicaron pagos")
+
+    inicio = time.perf_counter()
+    reporte = {'estrategia': estrategia, 'pagos': 0, 'aplicaciones': 0,
+               'monto_aplicado': 0.0, 'facturas_actualizadas': 0, 'monto_sin_aplicar': 0.0}
+    clientes = set()
+
+    with transaction() as cursor:
+        pagos = _pagos_pendientes(cursor, pago_ids)
+        if pagos:
+            if estrategia == 'fifo':
+                clientes = {p['cliente_id'] for p in pagos}
+                facturas = _facturas_abiertas(cursor, 'cliente_id', sorted(clientes))
+                colas = {}
+                for f in facturas:
+                    colas.setdefault(f['cliente_id'], deque()).append(f['id'])
+                clave = 'cliente_id'
+            else:
+                ids = sorted({f for facturas in asignaciones.values() for f in facturas})
+                facturas = _facturas_abiertas(cursor, 'id', ids) if ids else []
+                cliente_de = {f['id']: f['cliente_id'] for f in facturas}
+                colas = {}
+                for p in pagos:
+                    ajenas = [f for f in asignaciones[p['id']]
+                              if f in cliente_de and cliente_de[f] != p['cliente_id']]
+                    if ajenas:
+                        raise ValueError(f"El pago {p['id']} no puede aplicarse a facturas de otro cliente: {ajenas}")
+                    colas[p['id']] = deque(f for f in asignaciones[p['id']] if f in cliente_de)
+                clientes = {p['cliente_id'] for p in pagos}
+                clave = 'id'
+
+            saldos = {f['id']: Decimal(f['saldo_pendiente']) for f in facturas}
+            aplicaciones, sin_aplicar = asignar(pagos, colas, saldos, clave)
+
+            if aplicaciones:
+                reporte['facturas_actualizadas'] = _escribir(cursor, aplicaciones, saldos)
+
+            reporte.update({
+                'pagos': len(pagos),
+                'aplicaciones': len(aplicaciones),
+                'monto_aplicado': float(sum(monto for _, _, monto in aplicaciones)),
+                'monto_sin_aplicar': float(sin_aplicar),
+            })
+
+    if reporte['aplicaciones']:
+        ClienteSaldo.refrescar(sorted(clientes))
+
+    reporte['segundos'] = round(time.perf_counter() - inicio, 2)
+    return reporte
@@ -0,0 +1,448 @@
+"""
+Feature store por cliente para los modelos de cobranza (ml_feature_store)
+
+Guarda, por cliente_codigo y versión de definiciones, el historial de
+valores de cada característica con vigencia [vigente_desde, vigente_hasta):
+un snapshot a cualquier instante es una lectura por rango, sin recalcular.
+
+Cada ejecución de `refrescar` recalcula solo los clientes que cambiaron
+desde la anterior (misma estrategia de marcas de agua que el motor de
+alertas):
+- clientes, facturas y pagos modificados desde la marca,
+- seguimientos nuevos (id mayor a la marca),
+- cruces de fecha desde el último día evaluado: facturas que vencieron,
+  promesas que se cumplieron sin pago, pagos con fecha futura que llegaron
+  y contactos que salieron de la ventana de DIAS_CONTACTOS.
+
+Los agregados se calculan con SQL por conjunto y el armado de la matriz
+es vectorizado. Solo se abre una fila nueva si algún valor cambió.
+antiguedad_cliente y dias_atraso avanzan un día por día transcurrido sin
+cambios en los datos, así que se guardan a su fecha_calculo y se envejecen
+al leer (exacto mientras el refresco corra al menos una vez al día).
+"""
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+from database import execute_batch, execute_query, transaction
+from models import ClienteSaldo
+
+# Cambiar cualquier definición (aquí o en las consultas) exige subir VERSION:
+# la siguiente ejecución recalcula toda la cartera con la versión nueva y las
+# filas de versiones anteriores quedan para reproducir ejecuciones pasadas.
+VERSION = 1
+DIAS_CONTACTOS = 90
+
+DEFINICIONES = {
+    'dias_promedio_pago': ('Días promedio entre emisión y último pago de las facturas liquidadas', 'facturas/pagos'),
+    'facturas_vencidas': ('Facturas con saldo y vencimiento anterior a la fecha', 'facturas/pagos'),
+    'saldo_pendiente': ('Saldo abierto total', 'facturas/pagos'),
+    'limite_credito': ('Límite de crédito del cliente', 'clientes'),
+    'antiguedad_cliente': ('Días desde el alta del cliente', 'clientes'),
+    'tasa_incumplimiento': ('Fracción de facturas exigibles pagadas tarde o aún con saldo', 'facturas/pagos'),
+    'numero_promesas_incumplidas': ('Promesas de pago vencidas sin pago del cliente', 'cobranza_seguimientos/pagos'),
+    'dias_atraso': ('Días de atraso promedio ponderado por saldo vencido', 'facturas/pagos'),
+    'contactos_realizados': (f'Seguimientos de los últimos {DIAS_CONTACTOS} días', 'cobranza_seguimientos'),
+}
+FEATURES = tuple(DEFINICIONES)
+
+# Tolerancia para decidir si un valor cambió
+TOLERANCIA = 1e-6
+
+
+def _placeholders(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+# ==================== CÁLCULO POR CONJUNTO ====================
+
+def _consultas(corte, cliente_ids=None):
+    """Consultas por conjunto con los agregados de cada cliente hasta el día de corte (inclusive)"""
+    if cliente_ids is None:
+        filtro = filtro_f = filtro_s = ""
+        ids = ()
+    else:
+        filtro = f"AND id IN ({_placeholders(cliente_ids)})"
+        filtro_f = f"AND f.cliente_id IN ({_placeholders(cliente_ids)})"
+        filtro_s = f"AND s.cliente_id IN ({_placeholders(cliente_ids)})"
+        ids = tuple(cliente_ids)
+
+    clientes = f"""
+        SELECT id, codigo, limite_credito,
+               GREATEST(DATEDIFF(%s, fecha_creacion), 0) AS antiguedad_cliente
+        FROM clientes
+        WHERE activo = TRUE {filtro}
+        ORDER BY id
+    """
+    # Con corte = hoy el saldo es el de la factura; en cortes pasados se
+    # reconstruye con los pagos aplicados hasta el corte
+    facturas = f"""
+        SELECT x.cliente_id,
+               SUM(x.saldo > 0 AND x.fecha_vencimiento < %s) AS facturas_vencidas,
+               SUM(GREATEST(x.saldo, 0)) AS saldo_pendiente,
+               SUM(CASE WHEN x.saldo > 0 AND x.fecha_vencimiento < %s THEN x.saldo ELSE 0 END) AS saldo_vencido,
+               SUM(CASE WHEN x.saldo > 0 AND x.fecha_vencimiento < %s
+                        THEN x.saldo * DATEDIFF(%s, x.fecha_vencimiento) ELSE 0 END) AS atraso_ponderado,
+               SUM(x.fecha_vencimiento < %s) AS facturas_exigibles,
+               SUM(x.fecha_vencimiento < %s AND (x.saldo > 0 OR x.ultimo_pago > x.fecha_vencimiento)) AS facturas_incumplidas,
+               AVG(CASE WHEN x.saldo <= 0 THEN DATEDIFF(x.ultimo_pago, x.fecha_emision) END) AS dias_promedio_pago
+        FROM (
+            SELECT f.id, f.cliente_id, f.fecha_emision, f.fecha_vencimiento,
+                   CASE WHEN %s >= CURDATE() THEN f.saldo_pendiente
+                        ELSE f.total - COALESCE(SUM(CASE WHEN p.fecha_pago <= %s THEN pf.monto_aplicado END), 0)
+                   END AS saldo,
+                   MAX(CASE WHEN p.fecha_pago <= %s THEN p.fecha_pago END) AS ultimo_pago
+            FROM facturas f
+            LEFT JOIN pago_facturas pf ON pf.factura_id = f.id
+            LEFT JOIN pagos p ON p.id = pf.pago_id
+            WHERE f.estado != 'cancelada' AND f.fecha_emision <= %s {filtro_f}
+            GROUP BY f.id
+        ) x
+        GROUP BY x.cliente_id
+    """
+    seguimientos = f"""
+        SELECT s.cliente_id,
+               SUM(s.fecha_contacto >= %s - INTERVAL {DIAS_CONTACTOS} DAY) AS contactos_realizados,
+               SUM(s.resultado = 'promesa_pago' AND s.fecha_promesa_pago < %s AND NOT EXISTS (
+                   SELECT 1 FROM pagos p
+                   WHERE p.cliente_id = s.cliente_id
+                   AND p.fecha_pago BETWEEN DATE(s.fecha_contacto) AND s.fecha_promesa_pago
+               )) AS numero_promesas_incumplidas
+        FROM cobranza_seguimientos s
+        WHERE s.fecha_contacto < %s + INTERVAL 1 DAY {filtro_s}
+        GROUP BY s.cliente_id
+    """
+    return [
+        (clientes, (corte,) + ids),
+        (facturas, (corte,) * 10 + ids),
+        (seguimientos, (corte,) * 3 + ids),
+    ]
+
+
+def _columna(filas, campo, indice, n, defecto=0.0):
+    """Alinea un campo de filas agrupadas por cliente_id con el arreglo de clientes"""
+    valores = np.full(n, defecto, dtype=np.float64)
+    if filas:
+        pos = indice(np.fromiter((f['cliente_id'] for f in filas), np.int64, len(filas)))
+        ok = pos >= 0
+        datos = np.fromiter((np.nan if f[campo] is None else float(f[campo]) for f in filas),
+                            np.float64, len(filas))
+        valores[pos[ok]] = datos[ok]
+    return valores
+
+
+def cargar_caracteristicas(corte=None, cliente_ids=None):
+    """
+    Calcula la matriz de características desde las tablas de cobranza
+
+    Reconstruye el estado a cualquier fecha pasada (entrenamiento) y es lo
+    que usa `refrescar` para los clientes con cambios. Para leer valores
+    ya calculados usar `snapshot`.
+
+    Args:
+        corte: Fecha de corte (default: hoy). Solo se usan datos hasta ese día.
+        cliente_ids: Lista de IDs a calcular (None = todos los activos)
+
+    Returns:
+        dict: cliente_ids, codigos, X (clientes × FEATURES, dias_promedio_pago
+              puede ser NaN) y saldos
+    """
+    corte = corte or date.today()
+    resultados = execute_batch(_consultas(corte, cliente_ids))
+    if resultados is None:
+        raise RuntimeError("No se pudieron calcular las características de los clientes")
+    clientes, facturas, seguimientos = resultados
+    if not clientes:
+        return {'corte': corte, 'cliente_ids': np.empty(0, np.int64), 'codigos': [],
+                'X': np.empty((0, len(FEATURES))), 'saldos': np.empty(0)}
+
+    n = len(clientes)
+    ids = np.fromiter((c['id'] for c in clientes), np.int64, n)
+
+    def indice(otros):
+        pos = np.minimum(np.searchsorted(ids, otros), n - 1)
+        return np.where(ids[pos] == otros, pos, -1)
+
+    saldo_vencido = _columna(facturas, 'saldo_vencido', indice, n)
+    exigibles = _columna(facturas, 'facturas_exigibles', indice, n)
+    columnas = {
+        'dias_promedio_pago': _columna(facturas, 'dias_promedio_pago', indice, n, np.nan),
+        'facturas_vencidas': _columna(facturas, 'facturas_vencidas', indice, n),
+        'saldo_pendiente': _columna(facturas, 'saldo_pendiente', indice, n),
+        'limite_credito': np.fromiter((float(c['limite_credito'] or 0) for c in clientes), np.float64, n),
+        'antiguedad_cliente': np.fromiter((float(c['antiguedad_cliente'] or 0) for c in clientes), np.float64, n),
+        'tasa_incumplimiento': np.divide(_columna(facturas, 'facturas_incumplidas', indice, n), exigibles,
+                                         out=np.zeros(n), where=exigibles > 0),
+        'numero_promesas_incumplidas': _columna(seguimientos, 'numero_promesas_incumplidas', indice, n),
+        'dias_atraso': np.divide(_columna(facturas, 'atraso_ponderado', indice, n), saldo_vencido,
+                                 out=np.zeros(n), where=saldo_vencido > 0),
+        'contactos_realizados': _columna(seguimientos, 'contactos_realizados', indice, n),
+    }
+    X = np.column_stack([columnas[f] for f in FEATURES])
+    return {
+        'corte': corte,
+        'cliente_ids': ids,
+        'codigos': [c['codigo'] for c in clientes],
+        'X': X,
+        'saldos': columnas['saldo_pendiente'],
+    }
+
+
+def envejecer(X, dias):
+    """
+    Avanza las características que crecen un día por día transcurrido
+    (antiguedad_cliente y dias_atraso)
+
+    Args:
+        X: Matriz clientes × FEATURES calculada a su fecha_calculo
+        dias: Días transcurridos desde fecha_calculo (escalar o uno por cliente)
+
+    Returns:
+        np.ndarray: Copia de X a la fecha de lectura
+    """
+    X = np.array(X, dtype=np.float64)
+    dias = np.broadcast_to(np.asarray(dias, dtype=np.float64), (len(X),))
+    X[:, FEATURES.index('antiguedad_cliente')] += dias
+    # Sin facturas vencidas el atraso sigue en 0
+    con_vencidas = X[:, FEATURES.index('facturas_vencidas')] > 0
+    X[con_vencidas, FEATURES.index('dias_atraso')] += dias[con_vencidas]
+    return X
+
+
+def cambiados(X_nuevo, X_actual):
+    """Máscara de filas con algún valor distinto (NaN == NaN)"""
+    if len(X_nuevo) == 0:
+        return np.zeros(0, dtype=bool)
+    iguales = np.isclose(X_nuevo, X_actual, rtol=0, atol=TOLERANCIA, equal_nan=True)
+    return ~iguales.all(axis=1)
+
+
+# ==================== REFRESCO INCREMENTAL ====================
+
+def _clientes_cambiados(cursor, estado, hoy):
+    """IDs de clientes con datos o cruces de fecha desde la ejecución anterior"""
+    marca, ultima = estado['marca'], estado['ultima_fecha']
+    cursor.execute(f"""
+        SELECT id AS cliente_id FROM clientes WHERE fecha_actualizacion >= %s
+        UNION
+        SELECT cliente_id FROM facturas WHERE fecha_actualizacion >= %s OR fecha_creacion >= %s
+        UNION
+        SELECT cliente_id FROM facturas WHERE fecha_vencimiento >= %s AND fecha_vencimiento < %s
+        UNION
+        SELECT cliente_id FROM pagos WHERE fecha_registro >= %s
+        UNION
+        SELECT cliente_id FROM pagos WHERE fecha_pago > %s AND fecha_pago <= %s
+        UNION
+        SELECT cliente_id FROM cobranza_seguimientos WHERE id > %s
+        UNION
+        SELECT cliente_id FROM cobranza_seguimientos
+        WHERE resultado = 'promesa_pago' AND fecha_promesa_pago >= %s AND fecha_promesa_pago < %s
+        UNION
+        SELECT cliente_id FROM cobranza_seguimientos
+        WHERE fecha_contacto >= %s - INTERVAL {DIAS_CONTACTOS} DAY
+        AND fecha_contacto < %s - INTERVAL {DIAS_CONTACTOS} DAY
+    """, (marca, marca, marca, ultima, hoy, marca, ultima, hoy,
+          estado['marca_seguimientos'], ultima, hoy, ultima, hoy))
+    return [fila['cliente_id'] for fila in cursor.fetchall()]
+
+
+def _vigentes(cursor, codigos):
+    """Filas vigentes de la versión actual (None = todas) como {codigo: (fecha_calculo, valores)}"""
+    columnas = ', '.join(FEATURES)
+    consulta = f"""
+        SELECT cliente_codigo, fecha_calculo, {columnas}
+        FROM ml_feature_store
+        WHERE version = %s AND vigente_hasta IS NULL
+    """
+    if codigos is None:
+        cursor.execute(consulta, (VERSION,))
+    else:
+        cursor.execute(consulta + f" AND cliente_codigo IN ({_placeholders(codigos)})",
+                       (VERSION,) + tuple(codigos))
+    return {f['cliente_codigo']: (f['fecha_calculo'], [np.nan if f[c] is None else float(f[c]) for c in FEATURES])
+            for f in cursor.fetchall()}
+
+
+def _guardar(cursor, datos, ahora, hoy, completa):
+    """Cierra las filas vigentes que cambiaron y abre las nuevas"""
+    codigos = datos['codigos']
+    if not codigos:
+        return 0
+    vigentes = _vigentes(cursor, None if completa else codigos)
+
+    X_actual = np.full(datos['X'].shape, np.nan)
+    dias = np.zeros(len(codigos))
+    existe = np.zeros(len(codigos), dtype=bool)
+    for i, codigo in enumerate(codigos):
+        fila = vigentes.get(codigo)
+        if fila:
+            existe[i] = True
+            dias[i] = (hoy - fila[0]).days
+            X_actual[i] = fila[1]
+    X_actual[existe] = envejecer(X_actual[existe], dias[existe])
+    nuevos = ~existe | cambiados(datos['X'], X_actual)
+
+    indices = np.flatnonzero(nuevos)
+    if not len(indices):
+        return 0
+    cerrar = [codigos[i] for i in indices if existe[i]]
+    for inicio in range(0, len(cerrar), ClienteSaldo.MAX_REFRESCO_PARCIAL):
+        lote = cerrar[inicio:inicio + ClienteSaldo.MAX_REFRESCO_PARCIAL]
+        cursor.execute(f"""
+            UPDATE ml_feature_store SET vigente_hasta = %s
+            WHERE version = %s AND vigente_hasta IS NULL AND cliente_codigo IN ({_placeholders(lote)})
+        """, (ahora, VERSION) + tuple(lote))
+
+    valores = datos['X'][indices].tolist()
+    filas = [(VERSION, codigos[i], ahora, hoy) + tuple(None if v != v else v for v in fila)
+             for i, fila in zip(indices.tolist(), valores)]
+    cursor.executemany(f"""
+        INSERT INTO ml_feature_store (version, cliente_codigo, vigente_desde, fecha_calculo, {', '.join(FEATURES)})
+        VALUES (%s, %s, %s, %s, {_placeholders(FEATURES)})
+    """, filas)
+    return len(filas)
+
+
+def refrescar():
+    """
+    Recalcula el feature store para los clientes con cambios desde la última ejecución
+
+    La primera ejecución (o un cambio de VERSION) calcula toda la cartera.
+    La fila de ml_feature_store_estado se lee con FOR UPDATE, así que dos
+    ejecuciones simultáneas se serializan.
+
+    Returns:
+        dict: version, clientes_evaluados, clientes_recalculados (filas nuevas) y segundos
+    """
+    inicio = time.perf_counter()
+
+    with transaction() as cursor:
+        cursor.execute("SELECT * FROM ml_feature_store_estado WHERE id = 1 FOR UPDATE")
+        estado = cursor.fetchone()
+        if estado is None:
+            raise RuntimeError("Falta la migración add_ml_feature_store.sql")
+
+        cursor.execute("""
+            SELECT NOW(6) AS ahora, CURDATE() AS hoy,
+                   (SELECT COALESCE(MAX(id), 0) FROM cobranza_seguimientos) AS max_seguimiento
+        """)
+        referencia = cursor.fetchone()
+        hoy = referencia['hoy']
+
+        completa = estado['version'] != VERSION or estado['marca'] is None
+        if completa:
+            cliente_ids = None
+            cursor.executemany("""
+                INSERT INTO ml_feature_definiciones (version, nombre, descripcion, fuente)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE descripcion = VALUES(descripcion), fuente = VALUES(fuente)
+            """, [(VERSION, nombre, descripcion, fuente) for nombre, (descripcion, fuente) in DEFINICIONES.items()])
+        else:
+            cliente_ids = _clientes_cambiados(cursor, estado, hoy)
+            if len(cliente_ids) > ClienteSaldo.MAX_REFRESCO_PARCIAL:
+                cliente_ids = None
+
+        nuevos = 0
+        evaluados = 0
+        if cliente_ids is None or cliente_ids:
+            datos = cargar_caracteristicas(hoy, cliente_ids)
+            evaluados = len(datos['codigos'])
+            nuevos = _guardar(cursor, datos, referencia['ahora'], hoy, cliente_ids is None)
+
+        cursor.execute("""
+            UPDATE ml_feature_store_estado
+            SET version = %s, marca = %s, marca_seguimientos = %s,
+                ultima_fecha = %s, fecha_ejecucion = NOW()
+            WHERE id = 1
+        """, (VERSION, referencia['ahora'], referencia['max_seguimiento'], hoy))
+
+    return {
+        'version': VERSION,
+        'clientes_evaluados': evaluados,
+        'clientes_recalculados': nuevos,
+        'completa': cliente_ids is None,
+        'segundos': round(time.perf_counter() - inicio, 2)
+    }
+
+
+# ==================== LECTURA ====================
+
+def snapshot(fecha=None, cliente_ids=None, version=VERSION):
+    """
+    Características de los clientes activos vigentes a un instante
+
+    Args:
+        fecha: datetime del snapshot, o date (= al cierre de ese día). Default: ahora.
+        cliente_ids: Lista de IDs de cliente (None = todos)
+        version: Versión de definiciones a leer
+
+    Returns:
+        dict: fecha, version, cliente_ids, codigos, X (clientes × FEATURES),
+              saldos y vigente_desde por cliente
+    """
+    if fecha is None:
+        fecha = datetime.now()
+    elif not isinstance(fecha, datetime):
+        fecha = datetime.combine(fecha, datetime.max.time())
+
+    filtro, params = "", ()
+    if cliente_ids is not None:
+        if not cliente_ids:
+            cliente_ids = [0]
+        filtro = f"AND c.id IN ({_placeholders(cliente_ids)})"
+        params = tuple(cliente_ids)
+
+    filas = execute_query(f"""
+        SELECT c.id AS cliente_id, fs.cliente_codigo, fs.vigente_desde, fs.fecha_calculo,
+               {', '.join('fs.' + f for f in FEATURES)}
+        FROM ml_feature_store fs
+        JOIN clientes c ON c.codigo = fs.cliente_codigo
+        WHERE fs.version = %s
+        AND fs.vigente_desde <= %s
+        AND (fs.vigente_hasta IS NULL OR fs.vigente_hasta > %s)
+        AND c.activo = TRUE {filtro}
+        ORDER BY c.id
+    """, (version, fecha, fecha) + params, fetch=True)
+    if filas is None:
+        raise RuntimeError("No se pudo leer el feature store")
+
+    n = len(filas)
+    X = np.array([[np.nan if f[c] is None else float(f[c]) for c in FEATURES] for f in filas],
+                 dtype=np.float64).reshape(n, len(FEATURES))
+    dias = np.fromiter(((fecha.date() - f['fecha_calculo']).days for f in filas), np.float64, n)
+    X = envejecer(X, dias)
+    return {
+        'fecha': fecha,
+        'version': version,
+        'cliente_ids': np.fromiter((f['cliente_id'] for f in filas), np.int64, n),
+        'codigos': [f['cliente_codigo'] for f in filas],
+        'X': X,
+        'saldos': X[:, FEATURES.index('saldo_pendiente')],
+        'vigente_desde': [f['vigente_desde'] for f in filas],
+    }
+
+
+def caracteristicas_cliente(cliente_id, fecha=None):
+    """
+    Características de un cliente con sus definiciones (para el chatbot)
+
+    Returns:
+        dict o None si el cliente no tiene valores en el feature store
+    """
+    datos = snapshot(fecha, [cliente_id])
+    if not datos['codigos']:
+        return None
+    valores = datos['X'][0]
+    return {
+        'cliente_codigo': datos['codigos'][0],
+        'version': datos['version'],
+        'fecha': datos['fecha'].isoformat(timespec='seconds'),
+        'vigente_desde': datos['vigente_desde'][0].isoformat(timespec='seconds'),
+        'caracteristicas': {
+            nombre: {
+                'valor': None if np.isnan(valor) else round(float(valor), 4),
+                'descripcion': DEFINICIONES[nombre][0],
+            } for nombre, valor in zip(FEATURES, valores)
+        }
+    }
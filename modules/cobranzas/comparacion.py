@@ -0,0 +1,338 @@
+"""
+Comparación vectorizada de ejecuciones de modelos ML de cobranza
+
+Carga una sola vez los arreglos de scores de las ejecuciones seleccionadas
+(tres consultas en un viaje a la BD) y calcula con NumPy:
+- curvas de ganancia y lift contra lo realmente cobrado,
+- calibración por bins de probabilidad_pago (Brier y error de calibración),
+- deriva de la distribución de scores (PSI) contra la primera ejecución,
+- matrices de acuerdo de clasificación y correlación de rangos entre pares.
+
+El resultado observado de cada cliente es si pagó algo en los HORIZONTE_DIAS
+posteriores a la ejecución. Los resultados de una ejecución completada no
+cambian, pero los pagos observados sí, así que las comparaciones se cachean
+por IDs de ejecución con un TTL.
+"""
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from database import execute_batch, execute_query
+from modules.cobranzas.scoring import auc
+
+logger = logging.getLogger(__name__)
+
+HORIZONTE_DIAS = 90
+MAX_EJECUCIONES = 6
+PUNTOS_CURVA = 20
+BINS_CALIBRACION = 10
+BINS_PSI = 10
+# Evita log(0) en el PSI cuando un bin queda vacío
+EPSILON_PSI = 1e-4
+CLASES = ('bajo_riesgo', 'medio_riesgo', 'alto_riesgo')
+
+CACHE_TTL_SEGUNDOS = 1800
+CACHE_MAX_ENTRADAS = 32
+
+
+def _placeholders(valores):
+    return ', '.join(['%s'] * len(valores))
+
+
+# ==================== MÉTRICAS ====================
+
+def curva_ganancia(score, pago, puntos=PUNTOS_CURVA):
+    """
+    Curva de ganancia acumulada y lift ordenando clientes por score descendente
+
+    Args:
+        score: Score o probabilidad de pago por cliente
+        pago: 1 si el cliente pagó
+        puntos: Número de cortes (20 = cada 5% de la cartera)
+
+    Returns:
+        list: [{fraccion, ganancia, lift}] con ganancia = pagadores capturados / total
+    """
+    score = np.asarray(score, dtype=np.float64)
+    pago = np.asarray(pago, dtype=np.float64)
+    n = len(score)
+    total = pago.sum()
+    if n == 0 or total == 0:
+        return []
+    acumulado = np.cumsum(pago[np.argsort(-score, kind='stable')])
+    fracciones = np.arange(1, puntos + 1) / puntos
+    cortes = np.maximum(np.ceil(fracciones * n).astype(np.int64), 1)
+    ganancia = acumulado[cortes - 1] / total
+    return [{'fraccion': round(float(f), 4), 'ganancia': round(float(g), 4), 'lift': round(float(g / f), 4)}
+            for f, g in zip(fracciones, ganancia)]
+
+
+def calibracion(probabilidad, pago, bins=BINS_CALIBRACION):
+    """
+    Tasa de pago observada por bin de probabilidad predicha
+
+    Returns:
+        dict: bins [{desde, hasta, clientes, probabilidad_media, tasa_observada}],
+              brier y ece (error de calibración esperado)
+    """
+    probabilidad = np.asarray(probabilidad, dtype=np.float64)
+    pago = np.asarray(pago, dtype=np.float64)
+    validos = ~np.isnan(probabilidad)
+    probabilidad, pago = probabilidad[validos], pago[validos]
+    if len(probabilidad) == 0:
+        return {'bins': [], 'brier': None, 'ece': None}
+
+    indice = np.minimum((np.clip(probabilidad, 0, 1) * bins).astype(np.int64), bins - 1)
+    conteo = np.bincount(indice, minlength=bins)
+    suma_prob = np.bincount(indice, weights=probabilidad, minlength=bins)
+    suma_pago = np.bincount(indice, weights=pago, minlength=bins)
+    con_datos = conteo > 0
+    media = np.divide(suma_prob, conteo, out=np.zeros(bins), where=con_datos)
+    tasa = np.divide(suma_pago, conteo, out=np.zeros(bins), where=con_datos)
+    return {
+        'bins': [{
+            'desde': round(i / bins, 4),
+            'hasta': round((i + 1) / bins, 4),
+            'clientes': int(conteo[i]),
+            'probabilidad_media': round(float(media[i]), 4),
+            'tasa_observada': round(float(tasa[i]), 4),
+        } for i in np.flatnonzero(con_datos)],
+        'brier': round(float(np.mean((probabilidad - pago) ** 2)), 4),
+        'ece': round(float(np.sum(conteo * np.abs(media - tasa)) / len(probabilidad)), 4),
+    }
+
+
+def psi(base, actual, bins=BINS_PSI):
+    """
+    Population Stability Index de `actual` contra `base` (bins por cuantiles de base)
+
+    < 0.1 estable, 0.1-0.25 deriva moderada, > 0.25 deriva significativa.
+    """
+    base = np.asarray(base, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    base, actual = base[~np.isnan(base)], actual[~np.isnan(actual)]
+    if len(base) == 0 or len(actual) == 0:
+        return None
+    bordes = np.unique(np.quantile(base, np.linspace(0, 1, bins + 1)[1:-1]))
+    p = np.bincount(np.searchsorted(bordes, base, side='right'), minlength=len(bordes) + 1) / len(base)
+    q = np.bincount(np.searchsorted(bordes, actual, side='right'), minlength=len(bordes) + 1) / len(actual)
+    p, q = np.maximum(p, EPSILON_PSI), np.maximum(q, EPSILON_PSI)
+    return round(float(np.sum((q - p) * np.log(q / p))), 4)
+
+
+def _rangos(x):
+    rangos = np.empty(len(x))
+    rangos[np.argsort(x, kind='stable')] = np.arange(len(x))
+    return rangos
+
+
+def acuerdo(codigos_a, clases_a, score_a, codigos_b, clases_b, score_b):
+    """
+    Acuerdo entre dos ejecuciones sobre los clientes que ambas evaluaron
+
+    Args:
+        codigos_*: Arreglos de cliente_codigo
+        clases_*: Índice de clase (posición en CLASES, -1 = otra)
+        score_*: Scores por cliente
+
+    Returns:
+        dict: clientes_comunes, acuerdo (fracción con la misma clase),
+              matriz (CLASES × CLASES, filas = a) y correlacion_rangos de los scores
+    """
+    _, ia, ib = np.intersect1d(codigos_a, codigos_b, return_indices=True)
+    n = len(ia)
+    if n == 0:
+        return {'clientes_comunes': 0, 'acuerdo': None, 'matriz': None, 'correlacion_rangos': None}
+
+    ca, cb = clases_a[ia], clases_b[ib]
+    conocidas = (ca >= 0) & (cb >= 0)
+    k = len(CLASES)
+    matriz = np.bincount(ca[conocidas] * k + cb[conocidas], minlength=k * k).reshape(k, k)
+
+    correlacion = None
+    sa, sb = score_a[ia], score_b[ib]
+    validos = ~np.isnan(sa) & ~np.isnan(sb)
+    if validos.sum() > 1:
+        ra, rb = _rangos(sa[validos]), _rangos(sb[validos])
+        if ra.std() > 0 and rb.std() > 0:
+            correlacion = round(float(np.corrcoef(ra, rb)[0, 1]), 4)
+
+    return {
+        'clientes_comunes': int(n),
+        'acuerdo': round(float(np.trace(matriz) / conocidas.sum()), 4) if conocidas.any() else None,
+        'matriz': matriz.tolist(),
+        'correlacion_rangos': correlacion,
+    }
+
+
+# ==================== CARGA ====================
+
+def ejecuciones_recientes():
+    """IDs de la última ejecución completada de cada modelo activo"""
+    filas = execute_query("""
+        SELECT MAX(e.id) AS id
+        FROM ml_ejecuciones e
+        JOIN ml_modelos m ON e.modelo_id = m.id
+        WHERE e.estado = 'completado' AND m.activo = 1
+        GROUP BY e.modelo_id
+        ORDER BY id
+    """, fetch=True)
+    return [f['id'] for f in (filas or [])][-MAX_EJECUCIONES:]
+
+
+def _cargar(ejecucion_ids):
+    """Arreglos de score, clase y pago observado por ejecución"""
+    marcas = _placeholders(ejecucion_ids)
+    ids = tuple(ejecucion_ids)
+    resultados = execute_batch([
+        (f"""
+            SELECT e.id, e.fecha_ejecucion, m.nombre AS modelo_nombre, m.algoritmo
+            FROM ml_ejecuciones e
+            JOIN ml_modelos m ON e.modelo_id = m.id
+            WHERE e.id IN ({marcas}) AND e.estado = 'completado'
+        """, ids),
+        (f"""
+            SELECT rc.ejecucion_id, rc.cliente_codigo, rc.score_prediccion,
+                   rc.probabilidad_pago, rc.clasificacion
+            FROM ml_resultados_cliente rc
+            WHERE rc.ejecucion_id IN ({marcas})
+            ORDER BY rc.ejecucion_id, rc.cliente_codigo
+        """, ids),
+        (f"""
+            SELECT rc.ejecucion_id, rc.cliente_codigo
+            FROM ml_resultados_cliente rc
+            JOIN ml_ejecuciones e ON rc.ejecucion_id = e.id
+            JOIN clientes c ON c.codigo = rc.cliente_codigo
+            WHERE rc.ejecucion_id IN ({marcas})
+            AND EXISTS (
+                SELECT 1 FROM pagos p
+                WHERE p.cliente_id = c.id
+                AND p.fecha_pago > DATE(e.fecha_ejecucion)
+                AND p.fecha_pago <= DATE(e.fecha_ejecucion) + INTERVAL {HORIZONTE_DIAS} DAY
+            )
+        """, ids),
+    ])
+    if resultados is None:
+        raise RuntimeError("No se pudieron cargar los resultados de las ejecuciones")
+    ejecuciones, filas, pagaron = resultados
+
+    pagos = {}
+    for f in pagaron:
+        pagos.setdefault(f['ejecucion_id'], set()).add(f['cliente_codigo'])
+
+    indice_clase = {c: i for i, c in enumerate(CLASES)}
+    por_ejecucion = {e['id']: dict(e, filas=[]) for e in ejecuciones}
+    for f in filas:
+        if f['ejecucion_id'] in por_ejecucion:
+            por_ejecucion[f['ejecucion_id']]['filas'].append(f)
+
+    datos = []
+    for ejecucion_id in ejecucion_ids:
+        ejecucion = por_ejecucion.get(ejecucion_id)
+        if ejecucion is None:
+            continue
+        filas_e = ejecucion.pop('filas')
+        n = len(filas_e)
+        pagadores = pagos.get(ejecucion_id, set())
+        probabilidad = np.fromiter((np.nan if f['probabilidad_pago'] is None else f['probabilidad_pago']
+                                    for f in filas_e), np.float64, n)
+        score = np.fromiter((np.nan if f['score_prediccion'] is None else f['score_prediccion']
+                             for f in filas_e), np.float64, n)
+        datos.append(dict(
+            ejecucion,
+            codigos=np.array([f['cliente_codigo'] for f in filas_e]),
+            probabilidad=probabilidad,
+            # Para ordenar se usa la probabilidad de pago y, si falta, el score
+            score=np.where(np.isnan(probabilidad), score, probabilidad),
+            clases=np.fromiter((indice_clase.get(f['clasificacion'], -1) for f in filas_e), np.int64, n),
+            pago=np.fromiter((f['cliente_codigo'] in pagadores for f in filas_e), np.float64, n),
+        ))
+    return datos
+
+
+# ==================== COMPARACIÓN ====================
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def comparar(ejecucion_ids=None):
+    """
+    Compara ejecuciones ML (cacheado por IDs de ejecución)
+
+    Args:
+        ejecucion_ids: IDs a comparar (None = última ejecución de cada modelo activo).
+                       La primera es la base para el PSI.
+
+    Returns:
+        dict: ejecuciones (métricas y curvas de cada una), acuerdo (por par) y segundos
+
+    Raises:
+        ValueError: Si no hay ejecuciones o son demasiadas
+    """
+    if not ejecucion_ids:
+        ejecucion_ids = ejecuciones_recientes()
+    ejecucion_ids = list(dict.fromkeys(int(i) for i in ejecucion_ids))
+    if not ejecucion_ids:
+        raise ValueError("No hay ejecuciones completadas para comparar")
+    if len(ejecucion_ids) > MAX_EJECUCIONES:
+        raise ValueError(f"Se pueden comparar hasta {MAX_EJECUCIONES} ejecuciones")
+
+    clave = tuple(ejecucion_ids)
+    with _cache_lock:
+        cacheado = _cache.get(clave)
+        if cacheado and time.monotonic() - cacheado[0] < CACHE_TTL_SEGUNDOS:
+            return cacheado[1]
+
+    inicio = time.perf_counter()
+    datos = _cargar(ejecucion_ids)
+    if not datos:
+        raise ValueError("Las ejecuciones indicadas no existen o no están completadas")
+
+    hoy = date.today()
+    base = datos[0]
+    ejecuciones = []
+    for d in datos:
+        fecha = d['fecha_ejecucion']
+        fecha = fecha.date() if hasattr(fecha, 'date') else fecha
+        ejecuciones.append({
+            'ejecucion_id': d['id'],
+            'modelo_nombre': d['modelo_nombre'],
+            'algoritmo': d['algoritmo'],
+            'fecha_ejecucion': str(d['fecha_ejecucion']),
+            'clientes': len(d['codigos']),
+            'tasa_pago_observada': round(float(d['pago'].mean()), 4) if len(d['pago']) else None,
+            'horizonte_completo': fecha + timedelta(days=HORIZONTE_DIAS) <= hoy,
+            'auc_observado': auc(d['pago'], d['score']) if len(d['pago']) else None,
+            'ganancia': curva_ganancia(d['score'], d['pago']),
+            'calibracion': calibracion(d['probabilidad'], d['pago']),
+            'distribucion_clases': {c: int(n) for c, n in zip(CLASES, np.bincount(d['clases'][d['clases'] >= 0],
+                                                                                   minlength=len(CLASES)))},
+            'psi_vs_base': psi(base['score'], d['score']) if d is not base else 0.0,
+        })
+
+    pares = []
+    for i in range(len(datos)):
+        for j in range(i + 1, len(datos)):
+            a, b = datos[i], datos[j]
+            pares.append(dict(acuerdo(a['codigos'], a['clases'], a['score'],
+                                      b['codigos'], b['clases'], b['score']),
+                              ejecucion_a=a['id'], ejecucion_b=b['id']))
+
+    comparacion = {
+        'ejecuciones': ejecuciones,
+        'acuerdo': pares,
+        'clases': list(CLASES),
+        'horizonte_dias': HORIZONTE_DIAS,
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+    logger.info(f"Comparación de ejecuciones {ejecucion_ids} en {comparacion['segundos']}s")
+
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX_ENTRADAS:
+            del _cache[min(_cache, key=lambda c: _cache[c][0])]
+        _cache[clave] = (time.monotonic(), comparacion)
+    return comparacion
@@ -0,0 +1,377 @@
+"""
+Exportación en streaming de datos de cobranzas (CSV y XLSX)
+
+Las filas se leen con un cursor sin buffer (database.stream_query) y se
+escriben directamente en la respuesta por bloques, de modo que la memoria
+del worker no depende del tamaño de la exportación.
+
+El XLSX se genera como un zip en streaming con cadenas inline, sin cargar
+la hoja en memoria ni usar archivos temporales.
+
+En el CSV, los textos que empiezan con =, +, - o @ llevan un apóstrofo
+delante para que Excel no los interprete como fórmulas (las cadenas
+inline del XLSX nunca se evalúan).
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from database import stream_query
+
+TAMANO_BLOQUE = 64 * 1024
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+_CARACTERES_INVALIDOS_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Prefijos con los que una hoja de cálculo interpreta una celda como fórmula
+_PREFIJOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+# ==================== DEFINICIÓN DE EXPORTACIONES ====================
+
+def _rango_fechas(columna, filtros, condiciones, params):
+    """Agrega condiciones desde/hasta (YYYY-MM-DD) sobre una columna de fecha"""
+    for clave, operador in (('desde', '>='), ('hasta', '<=')):
+        valor = filtros.get(clave)
+        if valor:
+            try:
+                date.fromisoformat(valor)
+            except ValueError:
+                raise ValueError(f"Fecha inválida en '{clave}', use YYYY-MM-DD")
+            condiciones.append(f"DATE({columna}) {operador} %s")
+            params.append(valor)
+
+
+def _consulta_facturas(filtros):
+    condiciones, params = ["1 = 1"], []
+    if filtros.get('cliente'):
+        condiciones.append("c.codigo = %s")
+        params.append(filtros['cliente'])
+    if filtros.get('estado'):
+        condiciones.append("f.estado = %s")
+        params.append(filtros['estado'])
+    if filtros.get('vencidas'):
+        condiciones.append("f.estado IN ('pendiente', 'parcial', 'vencida') AND f.fecha_vencimiento < CURDATE()")
+    _rango_fechas('f.fecha_emision', filtros, condiciones, params)
+
+    query = f"""
+        SELECT f.numero_factura, c.codigo as cliente_codigo, c.razon_social,
+               f.fecha_emision, f.fecha_vencimiento,
+               GREATEST(DATEDIFF(CURDATE(), f.fecha_vencimiento), 0) as dias_vencido,
+               f.subtotal, f.iva, f.total, f.saldo_pendiente, f.moneda, f.estado
+        FROM facturas f
+        JOIN clientes c ON f.cliente_id = c.id
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY f.fecha_emision DESC, f.id DESC
+    """
+    return query, params
+
+
+def _consulta_antiguedad(filtros):
+    condiciones, params = ["f.estado IN ('pendiente', 'parcial', 'vencida')"], []
+    if filtros.get('cliente'):
+        condiciones.append("c.codigo = %s")
+        params.append(filtros['cliente'])
+
+    query = f"""
+        SELECT
+            c.codigo, c.razon_social,
+            SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) <= 0 THEN f.saldo_pendiente ELSE 0 END) as vigente,
+            SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) BETWEEN 1 AND 30 THEN f.saldo_pendiente ELSE 0 END) as dias_1_30,
+            SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) BETWEEN 31 AND 60 THEN f.saldo_pendiente ELSE 0 END) as dias_31_60,
+            SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) BETWEEN 61 AND 90 THEN f.saldo_pendiente ELSE 0 END) as dias_61_90,
+            SUM(CASE WHEN DATEDIFF(CURDATE(), f.fecha_vencimiento) > 90 THEN f.saldo_pendiente ELSE 0 END) as dias_mas_90,
+            SUM(f.saldo_pendiente) as total_pendiente
+        FROM facturas f
+        JOIN clientes c ON f.cliente_id = c.id
+        WHERE {' AND '.join(condiciones)}
+        GROUP BY c.id, c.codigo, c.razon_social
+        ORDER BY total_pendiente DESC
+    """
+    return query, params
+
+
+def _consulta_pagos(filtros):
+    condiciones, params = ["1 = 1"], []
+    if filtros.get('cliente'):
+        condiciones.append("c.codigo = %s")
+        params.append(filtros['cliente'])
+    if filtros.get('metodo_pago'):
+        condiciones.append("p.metodo_pago = %s")
+        params.append(filtros['metodo_pago'])
+    _rango_fechas('p.fecha_pago', filtros, condiciones, params)
+
+    query = f"""
+        SELECT p.numero_pago, c.codigo as cliente_codigo, c.razon_social,
+               p.fecha_pago, p.monto, p.metodo_pago, p.referencia, p.banco,
+               u.nombre_completo as registrado_por
+        FROM pagos p
+        JOIN clientes c ON p.cliente_id = c.id
+        LEFT JOIN usuarios u ON p.registrado_por = u.id
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY p.fecha_pago DESC, p.id DESC
+    """
+    return query, params
+
+
+def _consulta_seguimientos(filtros):
+    condiciones, params = ["1 = 1"], []
+    if filtros.get('cliente'):
+        condiciones.append("c.codigo = %s")
+        params.append(filtros['cliente'])
+    if filtros.get('resultado'):
+        condiciones.append("s.resultado = %s")
+        params.append(filtros['resultado'])
+    _rango_fechas('s.fecha_contacto', filtros, condiciones, params)
+
+    query = f"""
+        SELECT s.fecha_contacto, c.codigo as cliente_codigo, c.razon_social,
+               f.numero_factura, s.tipo_contacto, s.resultado,
+               s.fecha_promesa_pago, s.monto_prometido, s.proximo_seguimiento,
+               u.nombre_completo as realizado_por, s.notas
+        FROM cobranza_seguimientos s
+        JOIN clientes c ON s.cliente_id = c.id
+        LEFT JOIN facturas f ON s.factura_id = f.id
+        LEFT JOIN usuarios u ON s.realizado_por = u.id
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY s.fecha_contacto DESC, s.id DESC
+    """
+    return query, params
+
+
+# tipo -> (constructor de consulta, [(columna, encabezado)])
+EXPORTACIONES = {
+    'facturas': (_consulta_facturas, [
+        ('numero_factura', 'Factura'), ('cliente_codigo', 'Código Cliente'),
+        ('razon_social', 'Razón Social'), ('fecha_emision', 'Emisión'),
+        ('fecha_vencimiento', 'Vencimiento'), ('dias_vencido', 'Días Vencido'),
+        ('subtotal', 'Subtotal'), ('iva', 'IVA'), ('total', 'Total'),
+        ('saldo_pendiente', 'Saldo Pendiente'), ('moneda', 'Moneda'), ('estado', 'Estado'),
+    ]),
+    'antiguedad': (_consulta_antiguedad, [
+        ('codigo', 'Código Cliente'), ('razon_social', 'Razón Social'),
+        ('vigente', 'Vigente'), ('dias_1_30', '1-30 días'), ('dias_31_60', '31-60 días'),
+        ('dias_61_90', '61-90 días'), ('dias_mas_90', 'Más de 90 días'),
+        ('total_pendiente', 'Total Pendiente'),
+    ]),
+    'pagos': (_consulta_pagos, [
+        ('numero_pago', 'Pago'), ('cliente_codigo', 'Código Cliente'),
+        ('razon_social', 'Razón Social'), ('fecha_pago', 'Fecha'), ('monto', 'Monto'),
+        ('metodo_pago', 'Método'), ('referencia', 'Referencia'), ('banco', 'Banco'),
+        ('registrado_por', 'Registrado por'),
+    ]),
+    'seguimientos': (_consulta_seguimientos, [
+        ('fecha_contacto', 'Fecha Contacto'), ('cliente_codigo', 'Código Cliente'),
+        ('razon_social', 'Razón Social'), ('numero_factura', 'Factura'),
+        ('tipo_contacto', 'Tipo'), ('resultado', 'Resultado'),
+        ('fecha_promesa_pago', 'Fecha Promesa'), ('monto_prometido', 'Monto Prometido'),
+        ('proximo_seguimiento', 'Próximo Seguimiento'), ('realizado_por', 'Realizado por'),
+        ('notas', 'Notas'),
+    ]),
+}
+
+
+def preparar(tipo, filtros):
+    """
+    Valida la exportación y construye su consulta
+
+    Args:
+        tipo: Clave de EXPORTACIONES
+        filtros: dict con los parámetros de la petición
+
+    Returns:
+        tuple: (query, params, columnas)
+
+    Raises:
+        ValueError: Si el tipo o algún filtro no es válido
+    """
+    if tipo not in EXPORTACIONES:
+        raise ValueError(f"Exportación no soportada: {tipo}")
+    constructor, columnas = EXPORTACIONES[tipo]
+    query, params = constructor(filtros)
+    return query, tuple(params), columnas
+
+
+def exportar(tipo, formato, filtros):
+    """
+    Genera el contenido de la exportación por bloques de bytes
+
+    Args:
+        tipo: Clave de EXPORTACIONES
+        formato: 'csv' o 'xlsx'
+        filtros: dict con los parámetros de la petición
+
+    Returns:
+        generator: Bloques de bytes listos para una respuesta en streaming
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    query, params, columnas = preparar(tipo, filtros)
+    filas = stream_query(query, params)
+
+    if formato == 'csv':
+        return generar_csv(filas, columnas)
+    return generar_xlsx(filas, columnas, hoja=tipo.capitalize())
+
+
+# ==================== ESCRITORES ====================
+
+def _texto(valor):
+    """Representación de texto de un valor para CSV/XLSX"""
+    if valor is None:
+        return ''
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+    return str(valor)
+
+
+def _celda_csv(valor):
+    """Texto de una celda CSV; neutraliza los textos que parecen fórmulas"""
+    texto = _texto(valor)
+    if isinstance(valor, str) and texto.startswith(_PREFIJOS_FORMULA):
+        return "'" + texto
+    return texto
+
+
+def generar_csv(filas, columnas):
+    """
+    Escribe las filas como CSV (UTF-8 con BOM para Excel) en bloques
+
+    Args:
+        filas: Iterable de dict
+        columnas: Lista de (columna, encabezado)
+
+    Yields:
+        bytes: Bloques de aproximadamente TAMANO_BLOQUE
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([encabezado for _, encabezado in columnas])
+
+    for fila in filas:
+        writer.writerow([_celda_csv(fila.get(columna)) for columna, _ in columnas])
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _SalidaStreaming:
+    """Archivo de solo escritura (sin seek) que acumula bytes hasta vaciarse"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _celda_xlsx(valor):
+    """Celda de hoja XLSX: números como valores numéricos, el resto como texto inline"""
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = _CARACTERES_INVALIDOS_XML.sub('', _texto(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def generar_xlsx(filas, columnas, hoja='Datos'):
+    """
+    Escribe las filas como un libro XLSX de una hoja, en streaming
+
+    Args:
+        filas: Iterable de dict
+        columnas: Lista de (columna, encabezado)
+        hoja: Nombre de la hoja
+
+    Yields:
+        bytes: Bloques del archivo zip a medida que se comprimen
+    """
+    salida = _SalidaStreaming()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        libro.writestr('_rels/.rels', _XLSX_RELS)
+        libro.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(hoja=escape(hoja[:31])))
+        libro.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        yield salida.vaciar()
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            partes = [
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData><row r="1">',
+                ''.join(_celda_xlsx(encabezado) for _, encabezado in columnas),
+                '</row>'
+            ]
+            tamano = 0
+            for numero, fila in enumerate(filas, start=2):
+                parte = (f'<row r="{numero}">'
+                         + ''.join(_celda_xlsx(fila.get(columna)) for columna, _ in columnas)
+                         + '</row>')
+                partes.append(parte)
+                tamano += len(parte)
+                if tamano >= TAMANO_BLOQUE:
+                    sheet.write(''.join(partes).encode('utf-8'))
+                    partes, tamano = [], 0
+                    if salida.buffer:
+                        yield salida.vaciar()
+
+            partes.append('</sheetData></worksheet>')
+            sheet.write(''.join(partes).encode('utf-8'))
+
+    yield salida.vaciar()
@@ -0,0 +1,267 @@
+"""
+Importación masiva de facturas y pagos desde CSV (extracto del ERP)
+
+El archivo se lee como stream y se procesa por lotes: cada lote se valida,
+se descartan los números ya existentes en la BD (numero_factura/numero_pago)
+con una sola consulta y se inserta con executemany dentro de su propia
+transacción. El resultado es un reporte con throughput y filas rechazadas.
+
+Si la lectura se interrumpe a mitad del archivo (codificación inválida, CSV
+mal formado, error de BD) los lotes anteriores ya quedaron confirmados: se
+devuelve el reporte parcial con el error y la última línea confirmada.
+"""
+import csv
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from database import execute_query, execute_transaction
+from models import ClienteSaldo
+
+TAMANO_LOTE = 5000
+MAX_RECHAZOS_REPORTE = 100
+
+MONEDAS = ('MXN', 'USD')
+ESTADOS_FACTURA = ('pendiente', 'parcial', 'pagada', 'vencida', 'cancelada')
+METODOS_PAGO = ('efectivo', 'transferencia', 'cheque', 'tarjeta', 'otro')
+
+
+# ==================== VALIDACIÓN ====================
+
+def _texto(fila, campo, requerido=False, max_len=None):
+    valor = (fila.get(campo) or '').strip()
+    if requerido and not valor:
+        raise ValueError(f"'{campo}' es obligatorio")
+    if max_len and len(valor) > max_len:
+        raise ValueError(f"'{campo}' excede {max_len} caracteres")
+    return valor or None
+
+
+def _fecha(fila, campo):
+    valor = _texto(fila, campo, requerido=True)
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"'{campo}' no es una fecha YYYY-MM-DD: {valor}")
+
+
+def _monto(fila, campo, requerido=True, defecto=None):
+    valor = _texto(fila, campo, requerido=requerido)
+    if valor is None:
+        return defecto
+    try:
+        monto = Decimal(valor.replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"'{campo}' no es un monto válido: {valor}")
+    if monto < 0:
+        raise ValueError(f"'{campo}' no puede ser negativo")
+    return monto.quantize(Decimal('0.01'))
+
+
+def _cliente(fila, clientes):
+    codigo = _texto(fila, 'cliente_codigo', requerido=True)
+    if codigo not in clientes:
+        raise ValueError(f"Cliente no existe: {codigo}")
+    return clientes[codigo]
+
+
+def _validar_factura(fila, clientes, usuario_id):
+    """Convierte una fila del CSV en los valores a insertar en facturas"""
+    numero = _texto(fila, 'numero_factura', requerido=True, max_len=50)
+    cliente_id = _cliente(fila, clientes)
+    emision = _fecha(fila, 'fecha_emision')
+    vencimiento = _fecha(fila, 'fecha_vencimiento')
+    if vencimiento < emision:
+        raise ValueError("fecha_vencimiento anterior a fecha_emision")
+
+    total = _monto(fila, 'total')
+    iva = _monto(fila, 'iva', requerido=False, defecto=Decimal('0.00'))
+    subtotal = _monto(fila, 'subtotal', requerido=False, defecto=total - iva)
+    saldo = _monto(fila, 'saldo_pendiente', requerido=False, defecto=total)
+    if saldo > total:
+        raise ValueError("saldo_pendiente mayor que total")
+
+    moneda = (_texto(fila, 'moneda') or 'MXN').upper()
+    if moneda not in MONEDAS:
+        raise ValueError(f"Moneda no soportada: {moneda}")
+
+    estado = (_texto(fila, 'estado') or '').lower()
+    if not estado:
+        estado = 'pagada' if saldo == 0 else 'parcial' if saldo < total else 'pendiente'
+    elif estado not in ESTADOS_FACTURA:
+        raise ValueError(f"Estado no válido: {estado}")
+
+    return (numero, cliente_id, emision, vencimiento, subtotal, iva, total, saldo,
+            moneda, estado, _texto(fila, 'notas'), usuario_id)
+
+
+def _validar_pago(fila, clientes, usuario_id):
+    """Convierte una fila del CSV en los valores a insertar en pagos"""
+    numero = _texto(fila, 'numero_pago', requerido=True, max_len=50)
+    cliente_id = _cliente(fila, clientes)
+    fecha_pago = _fecha(fila, 'fecha_pago')
+    monto = _monto(fila, 'monto')
+    if monto == 0:
+        raise ValueError("'monto' debe ser mayor que cero")
+
+    metodo = (_texto(fila, 'metodo_pago') or 'transferencia').lower()
+    if metodo not in METODOS_PAGO:
+        raise ValueError(f"Método de pago no válido: {metodo}")
+
+    return (numero, cliente_id, fecha_pago, monto, metodo,
+            _texto(fila, 'referencia', max_len=100), _texto(fila, 'banco', max_len=100),
+            _texto(fila, 'notas'), usuario_id)
+
+
+# tipo -> especificación de la importación
+IMPORTACIONES = {
+    'facturas': {
+        'tabla': 'facturas',
+        'clave': 'numero_factura',
+        'requeridas': ('numero_factura', 'cliente_codigo', 'fecha_emision',
+                       'fecha_vencimiento', 'total'),
+        'validar': _validar_factura,
+        'insert': """
+            INSERT INTO facturas
+                (numero_factura, cliente_id, fecha_emision, fecha_vencimiento, subtotal, iva,
+                 total, saldo_pendiente, moneda, estado, notas, creado_por)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+    },
+    'pagos': {
+        'tabla': 'pagos',
+        'clave': 'numero_pago',
+        'requeridas': ('numero_pago', 'cliente_codigo', 'fecha_pago', 'monto'),
+        'validar': _validar_pago,
+        'insert': """
+            INSERT INTO pagos
+                (numero_pago, cliente_id, fecha_pago, monto, metodo_pago, referencia,
+                 banco, notas, registrado_por)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+    },
+}
+
+
+# ==================== IMPORTACIÓN ====================
+
+def _mapa_clientes():
+    """codigo -> id de todos los clientes (se carga una sola vez por importación)"""
+    filas = execute_query("SELECT id, codigo FROM clientes", fetch=True)
+    if filas is None:
+        raise RuntimeError("No se pudo leer la tabla de clientes")
+    return {f['codigo']: f['id'] for f in filas}
+
+
+def _existentes(spec, numeros):
+    """Números del lote que ya existen en la BD"""
+    placeholders = ', '.join(['%s'] * len(numeros))
+    query = f"SELECT {spec['clave']} AS numero FROM {spec['tabla']} WHERE {spec['clave']} IN ({placeholders})"
+    filas = execute_query(query, tuple(numeros), fetch=True)
+    if filas is None:
+        raise RuntimeError(f"No se pudo verificar duplicados en {spec['tabla']}")
+    return {f['numero'] for f in filas}
+
+
+def _rechazar(reporte, linea, motivo):
+    reporte['rechazadas'] += 1
+    if len(reporte['rechazos']) < MAX_RECHAZOS_REPORTE:
+        reporte['rechazos'].append({'linea': linea, 'motivo': motivo})
+
+
+def _escribir_lote(spec, lote, reporte, clientes_afectados):
+    """Descarta duplicados contra la BD e inserta el lote en una transacción"""
+    existentes = _existentes(spec, [valores[0] for _, valores in lote])
+    nuevos = []
+    for linea, valores in lote:
+        if valores[0] in existentes:
+            reporte['duplicadas'] += 1
+        else:
+            nuevos.append(valores)
+
+    if not nuevos:
+        return
+    if execute_transaction([(spec['insert'], nuevos)]):
+        reporte['insertadas'] += len(nuevos)
+        reporte['ultima_linea_confirmada'] = lote[-1][0]
+        clientes_afectados.update(valores[1] for valores in nuevos)
+    else:
+        for linea, valores in lote:
+            if valores[0] not in existentes:
+                _rechazar(reporte, linea, 'Error al escribir el lote en la BD')
+
+
+def importar(tipo, archivo, usuario_id=None, tamano_lote=TAMANO_LOTE):
+    """
+    Importa un CSV de facturas o pagos
+
+    Args:
+        tipo: 'facturas' o 'pagos'
+        archivo: Stream de texto del CSV (con encabezados)
+        usuario_id: Usuario que registra la importación
+        tamano_lote: Filas por lote/transacción
+
+    Returns:
+        dict: Reporte con procesadas, insertadas, duplicadas, rechazadas,
+              rechazos (primeros MAX_RECHAZOS_REPORTE), ultima_linea_confirmada,
+              segundos y filas_por_segundo. Si la importación se interrumpió,
+              además error (motivo); las filas del lote en curso no se insertan
+
+    Raises:
+        ValueError: Si el tipo no existe o faltan columnas obligatorias
+        UnicodeDecodeError: Si el encabezado no está en UTF-8
+    """
+    if tipo not in IMPORTACIONES:
+        raise ValueError(f"Importación no soportada: {tipo}")
+    spec = IMPORTACIONES[tipo]
+
+    reader = csv.DictReader(archivo)
+    faltantes = [c for c in spec['requeridas'] if c not in (reader.fieldnames or [])]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+
+    inicio = time.perf_counter()
+    clientes = _mapa_clientes()
+    reporte = {'tipo': tipo, 'procesadas': 0, 'insertadas': 0, 'duplicadas': 0,
+               'rechazadas': 0, 'rechazos': [], 'ultima_linea_confirmada': None}
+    clientes_afectados = set()
+    lote, numeros_lote = [], set()
+
+    try:
+        for linea, fila in enumerate(reader, start=2):
+            reporte['procesadas'] += 1
+            try:
+                valores = spec['validar'](fila, clientes, usuario_id)
+            except ValueError as e:
+                _rechazar(reporte, linea, str(e))
+                continue
+
+            # Los duplicados entre lotes ya están en la BD cuando se valida el
+            # siguiente lote, así que basta con deduplicar dentro del lote
+            if valores[0] in numeros_lote:
+                reporte['duplicadas'] += 1
+                continue
+            numeros_lote.add(valores[0])
+            lote.append((linea, valores))
+
+            if len(lote) >= tamano_lote:
+                _escribir_lote(spec, lote, reporte, clientes_afectados)
+                lote, numeros_lote = [], set()
+
+        if lote:
+            _escribir_lote(spec, lote, reporte, clientes_afectados)
+    except UnicodeDecodeError:
+        reporte['error'] = 'El archivo debe estar codificado en UTF-8'
+    except csv.Error as e:
+        reporte['error'] = f'CSV mal formado: {e}'
+    except RuntimeError as e:
+        reporte['error'] = str(e)
+
+    if tipo == 'facturas' and clientes_afectados:
+        ClienteSaldo.refrescar(sorted(clientes_afectados))
+
+    segundos = time.perf_counter() - inicio
+    reporte['segundos'] = round(segundos, 2)
+    reporte['filas_por_segundo'] = round(reporte['procesadas'] / segundos) if segundos else None
+    reporte['clientes_afectados'] = len(clientes_afectados)
+    return reporte
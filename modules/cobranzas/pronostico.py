@@ -0,0 +1,319 @@
+"""
+Pronóstico de cobranza semanal por simulación Monte Carlo
+
+Convierte la probabilidad de pago y los días de pago predichos por el modelo
+ML (ml_resultados_cliente) en el flujo de cobranza esperado por semana, con
+bandas de confianza, sobre todas las facturas abiertas.
+
+Modelo de cada escenario:
+- El cliente paga su saldo cobrable con probabilidad probabilidad_pago.
+- El pago ocurre a los T días: T = dias_pago_predicho × (1 + E) / 2 con
+  E ~ Exp(1) (media dias_pago_predicho, nunca antes de la mitad).
+- Una factura que aún no vence no se cobra antes de su semana de vencimiento.
+
+El evento de pago se sortea por cliente (las predicciones ML son por cliente,
+así que sus facturas se mueven juntas) y las facturas entran como capas de
+saldo por semana de vencimiento. Así cada bloque de escenarios es una pasada
+vectorizada sobre el arreglo clientes × escenarios.
+
+Los resultados se cachean por ejecución ML: una ejecución nueva produce un
+pronóstico nuevo y la semilla del generador es el ID de la ejecución, por lo
+que el pronóstico es reproducible.
+"""
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from database import execute_query
+from models import CobranzaWorklist
+
+logger = logging.getLogger(__name__)
+
+SEMANAS = 13
+ESCENARIOS = 10000
+MAX_SEMANAS = 52
+MAX_ESCENARIOS = 50000
+
+# Clientes sin resultado ML en la ejecución
+PROBABILIDAD_SIN_MODELO = CobranzaWorklist.PROBABILIDAD_SIN_MODELO
+DIAS_PAGO_SIN_MODELO = 30
+
+# Tamaño de cada bloque de escenarios (celdas clientes × escenarios en memoria)
+CELDAS_POR_BLOQUE = 4_000_000
+
+# Los saldos cambian durante el día aunque la ejecución ML sea la misma
+CACHE_TTL_SEGUNDOS = 3600
+
+PERCENTILES = (5, 50, 95)
+ESTADOS_ABIERTOS = ('pendiente', 'parcial', 'vencida')
+
+
+def simular(clientes, saldos, semanas_vencimiento, probabilidad, dias_pago,
+            semanas=SEMANAS, escenarios=ESCENARIOS, seed=None):
+    """
+    Simula la cobranza semanal de la cartera
+
+    Args:
+        clientes: Índice (0..m-1) del cliente de cada factura
+        saldos: Saldo pendiente de cada factura
+        semanas_vencimiento: Semana desde hoy en que vence cada factura (0 = ya vencida)
+        probabilidad: Probabilidad de pago por cliente (m)
+        dias_pago: Días de pago predichos por cliente (m)
+        semanas: Horizonte en semanas
+        escenarios: Número de escenarios
+        seed: Semilla del generador
+
+    Returns:
+        np.ndarray: Matriz escenarios × semanas con el monto cobrado
+    """
+    m = len(probabilidad)
+    cobros = np.zeros((escenarios, semanas))
+    if m == 0 or len(saldos) == 0:
+        return cobros
+
+    # Saldo que se vuelve cobrable en cada semana; la columna `semanas` junta
+    # lo que vence después del horizonte
+    capas = np.bincount(
+        np.asarray(clientes, dtype=np.int64) * (semanas + 1) + np.clip(semanas_vencimiento, 0, semanas),
+        weights=saldos, minlength=m * (semanas + 1)
+    ).reshape(m, semanas + 1)
+    # Si el cliente paga en la semana w cobra todo lo vencido hasta w; la
+    # columna `semanas` (no paga dentro del horizonte) vale cero
+    acumulado = np.cumsum(capas, axis=1)
+    acumulado[:, semanas] = 0
+    acumulado = acumulado.ravel()
+    fila = (np.arange(m, dtype=np.int32) * (semanas + 1))[:, None]
+    # ... y después, cada semana k, lo que vence en k
+    futuras = []
+    for semana in range(1, semanas):
+        idx = np.flatnonzero(capas[:, semana] > 0)
+        if len(idx):
+            futuras.append((semana, idx, capas[idx, semana]))
+
+    p = np.asarray(probabilidad, dtype=np.float32)[:, None]
+    # T en semanas = base × (1 + E) = base × (1 + ln p) - base × ln u, con u < p
+    base = (np.maximum(np.asarray(dias_pago, dtype=np.float32), 1) / 14)[:, None]
+    with np.errstate(divide='ignore'):
+        constante = base * (1 + np.log(p))
+
+    rng = np.random.default_rng(seed)
+    bloque = max(1, min(escenarios, CELDAS_POR_BLOQUE // m))
+    for inicio in range(0, escenarios, bloque):
+        k = min(bloque, escenarios - inicio)
+        u = rng.random((m, k), dtype=np.float32)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.log(u)
+            t *= base
+            np.subtract(constante, t, out=t)
+            np.minimum(t, semanas, out=t)
+        np.copyto(t, semanas, where=u >= p)
+        semana_pago = t.astype(np.int32)
+
+        pesos = acumulado[fila + semana_pago]
+        # índice semana × k + escenario: una sola pasada de bincount
+        semana_pago *= k
+        semana_pago += np.arange(k, dtype=np.int32)
+        bloque_cobros = np.bincount(
+            semana_pago.ravel(), weights=pesos.ravel(), minlength=(semanas + 1) * k
+        ).reshape(semanas + 1, k)[:semanas].T
+
+        for semana, idx, montos in futuras:
+            bloque_cobros[:, semana] += montos @ (semana_pago[idx] < semana * k)
+
+        cobros[inicio:inicio + k] = bloque_cobros
+
+    return cobros
+
+
+def resumir(cobros, hoy=None):
+    """
+    Resume la matriz de escenarios en el flujo esperado y sus bandas
+
+    Args:
+        cobros: Matriz escenarios × semanas de `simular`
+        hoy: Fecha de inicio de la primera semana
+
+    Returns:
+        dict: semanas (esperado y percentiles semanales y acumulados) y total
+    """
+    hoy = hoy or date.today()
+    acumulado = np.cumsum(cobros, axis=1)
+    semanal_p = np.percentile(cobros, PERCENTILES, axis=0)
+    acumulado_p = np.percentile(acumulado, PERCENTILES, axis=0)
+    esperado = cobros.mean(axis=0)
+    esperado_acumulado = acumulado.mean(axis=0)
+
+    semanas = []
+    for i in range(cobros.shape[1]):
+        desde = hoy + timedelta(weeks=i)
+        semana = {
+            'semana': i + 1,
+            'desde': desde.isoformat(),
+            'hasta': (desde + timedelta(days=6)).isoformat(),
+            'esperado': round(float(esperado[i]), 2),
+            'acumulado_esperado': round(float(esperado_acumulado[i]), 2),
+        }
+        for j, percentil in enumerate(PERCENTILES):
+            semana[f'p{percentil:02d}'] = round(float(semanal_p[j, i]), 2)
+            semana[f'acumulado_p{percentil:02d}'] = round(float(acumulado_p[j, i]), 2)
+        semanas.append(semana)
+
+    total = semanas[-1] if semanas else {}
+    return {
+        'semanas': semanas,
+        'total': {
+            'esperado': total.get('acumulado_esperado', 0.0),
+            **{f'p{p:02d}': total.get(f'acumulado_p{p:02d}', 0.0) for p in PERCENTILES}
+        }
+    }
+
+
+def ultima_ejecucion():
+    """ID de la última ejecución completada con probabilidades de pago (o None)"""
+    filas = execute_query("""
+        SELECT MAX(e.id) AS id
+        FROM ml_ejecuciones e
+        JOIN ml_modelos m ON m.id = e.modelo_id
+        WHERE e.estado = 'completado' AND m.activo = 1
+        AND EXISTS (
+            SELECT 1 FROM ml_resultados_cliente rc
+            WHERE rc.ejecucion_id = e.id AND rc.probabilidad_pago IS NOT NULL
+        )
+    """, fetch=True)
+    return filas[0]['id'] if filas else None
+
+
+def _cargar(ejecucion_id, hoy):
+    """
+    Carga facturas abiertas y parámetros ML como arreglos por cliente
+
+    Returns:
+        tuple: (clientes, saldos, semanas_vencimiento, probabilidad, dias_pago,
+                número de clientes sin resultado ML)
+    """
+    placeholders = ', '.join(['%s'] * len(ESTADOS_ABIERTOS))
+    facturas = execute_query(f"""
+        SELECT cliente_id, saldo_pendiente, fecha_vencimiento
+        FROM facturas
+        WHERE estado IN ({placeholders}) AND saldo_pendiente > 0
+    """, ESTADOS_ABIERTOS, fetch=True)
+    if facturas is None:
+        raise RuntimeError("No se pudieron leer las facturas abiertas")
+
+    resultados = []
+    if ejecucion_id is not None:
+        resultados = execute_query("""
+            SELECT c.id AS cliente_id, rc.probabilidad_pago, rc.dias_pago_predicho
+            FROM ml_resultados_cliente rc
+            JOIN clientes c ON c.codigo = rc.cliente_codigo
+            WHERE rc.ejecucion_id = %s AND rc.probabilidad_pago IS NOT NULL
+        """, (ejecucion_id,), fetch=True) or []
+
+    n = len(facturas)
+    cliente_ids = np.fromiter((f['cliente_id'] for f in facturas), np.int64, n)
+    saldos = np.fromiter((float(f['saldo_pendiente']) for f in facturas), np.float64, n)
+    vencimiento = np.array([f['fecha_vencimiento'] for f in facturas], dtype='datetime64[D]')
+    dias = (vencimiento - np.datetime64(hoy, 'D')).astype(np.int64)
+    semanas_vencimiento = np.maximum(dias, 0) // 7
+
+    ids, clientes = np.unique(cliente_ids, return_inverse=True)
+    probabilidad = np.full(len(ids), PROBABILIDAD_SIN_MODELO)
+    dias_pago = np.full(len(ids), float(DIAS_PAGO_SIN_MODELO))
+    sin_modelo = len(ids)
+    if resultados:
+        ml_ids = np.fromiter((r['cliente_id'] for r in resultados), np.int64, len(resultados))
+        pos = np.searchsorted(ids, ml_ids)
+        con_saldo = (pos < len(ids)) & (ids[np.minimum(pos, len(ids) - 1)] == ml_ids)
+        prob = np.fromiter((r['probabilidad_pago'] for r in resultados), np.float64, len(resultados))
+        dias_ml = np.fromiter((r['dias_pago_predicho'] if r['dias_pago_predicho'] is not None
+                               else DIAS_PAGO_SIN_MODELO for r in resultados), np.float64, len(resultados))
+        probabilidad[pos[con_saldo]] = np.clip(prob[con_saldo], 0, 1)
+        dias_pago[pos[con_saldo]] = dias_ml[con_saldo]
+        sin_modelo -= len(np.unique(pos[con_saldo]))
+
+    return clientes, saldos, semanas_vencimiento, probabilidad, dias_pago, sin_modelo
+
+
+# (ejecucion_id, semanas, escenarios) -> (momento, pronóstico)
+_cache = {}
+# (ejecucion_id, semanas, escenarios) -> Event del cálculo en curso
+_en_curso = {}
+_cache_lock = threading.Lock()
+
+
+def _calcular(ejecucion_id, semanas, escenarios):
+    inicio = time.perf_counter()
+    hoy = date.today()
+    clientes, saldos, semanas_vencimiento, probabilidad, dias_pago, sin_modelo = _cargar(ejecucion_id, hoy)
+    cobros = simular(clientes, saldos, semanas_vencimiento, probabilidad, dias_pago,
+                     semanas=semanas, escenarios=escenarios, seed=ejecucion_id or 0)
+
+    pronostico = resumir(cobros, hoy)
+    pronostico.update({
+        'ejecucion_id': ejecucion_id,
+        'escenarios': escenarios,
+        'saldo_abierto': round(float(saldos.sum()), 2),
+        'facturas': int(len(saldos)),
+        'clientes': int(len(probabilidad)),
+        'clientes_sin_modelo': int(sin_modelo),
+        'generado': hoy.isoformat(),
+        'segundos': round(time.perf_counter() - inicio, 2),
+    })
+    logger.info(f"Pronóstico de cobranza: {len(saldos)} facturas × {escenarios} escenarios "
+                f"en {pronostico['segundos']}s (ejecución {ejecucion_id})")
+    return pronostico
+
+
+def pronosticar(ejecucion_id=None, semanas=SEMANAS, escenarios=ESCENARIOS):
+    """
+    Pronóstico de cobranza semanal con bandas de confianza (cacheado por ejecución)
+
+    El lock del cache solo protege la consulta y el guardado: la carga y la
+    simulación corren fuera de él, así que un pronóstico lento no bloquea a
+    los demás. Las peticiones simultáneas con la misma clave esperan el
+    cálculo en curso en lugar de repetirlo.
+
+    Args:
+        ejecucion_id: Ejecución ML de la que se toman las probabilidades
+                      (None = la última completada)
+        semanas: Horizonte en semanas (máximo MAX_SEMANAS)
+        escenarios: Escenarios a simular (máximo MAX_ESCENARIOS)
+
+    Returns:
+        dict: ejecucion_id, semanas, total, saldo_abierto, facturas, clientes,
+              clientes_sin_modelo, escenarios, generado y segundos
+    """
+    semanas = max(1, min(int(semanas), MAX_SEMANAS))
+    escenarios = max(100, min(int(escenarios), MAX_ESCENARIOS))
+    if ejecucion_id is None:
+        ejecucion_id = ultima_ejecucion()
+
+    clave = (ejecucion_id, semanas, escenarios)
+    while True:
+        with _cache_lock:
+            cacheado = _cache.get(clave)
+            if cacheado and time.monotonic() - cacheado[0] < CACHE_TTL_SEGUNDOS:
+                return cacheado[1]
+            evento = _en_curso.get(clave)
+            if evento is None:
+                evento = _en_curso[clave] = threading.Event()
+                break
+        # Otro hilo calcula el mismo pronóstico; si falla, se reintenta aquí
+        evento.wait()
+
+    try:
+        pronostico = _calcular(ejecucion_id, semanas, escenarios)
+        with _cache_lock:
+            # Solo se conserva el pronóstico de la ejecución vigente
+            for otra in [c for c in _cache if c[0] != ejecucion_id]:
+                del _cache[otra]
+            _cache[clave] = (time.monotonic(), pronostico)
+        return pronostico
+    finally:
+        with _cache_lock:
+            del _en_curso[clave]
+        evento.set()
@@ -0,0 +1,141 @@
+"""
+Resultados ML de varios clientes en una sola respuesta
+
+La pestaña de resultados ML pedía /api/ml-results/cliente/<codigo> cliente por
+cliente y cada petición volvía a parsear factores_principales/datos_entrada.
+Aquí se responde un lote de clientes en formato columnar (una lista por
+columna en vez de un objeto por fila) y con un ETag calculado a partir de los
+resultado_id vigentes:
+
+- Un resultado de ml_resultados_cliente no cambia una vez escrito, así que
+  sus columnas JSON ya parseadas se cachean por resultado_id.
+- El ETag cambia cuando una ejecución nueva reemplaza el último resultado
+  de algún cliente/modelo en ml_latest_result o cuando cambian los clientes
+  pedidos o su orden (con ?worklist=1 la URL es la misma aunque la lista
+  de llamadas se reordene); si el navegador ya tiene esa versión se
+  responde 304 sin leer las columnas pesadas.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from models import CobranzaWorklist, MLResultadoCliente
+
+logger = logging.getLogger(__name__)
+
+MAX_CLIENTES = 200
+CACHE_MAX_RESULTADOS = 20000
+
+COLUMNAS = ('cliente_codigo', 'modelo_nombre', 'algoritmo', 'ejecucion_id', 'fecha_ejecucion',
+            'score_prediccion', 'clasificacion', 'probabilidad_pago', 'dias_pago_predicho',
+            'monto_recuperable_predicho', 'confianza_prediccion', 'segmento_cliente',
+            'accion_recomendada', 'prioridad_cobranza',
+            'factores_principales', 'datos_entrada', 'explicacion')
+
+# resultado_id -> {factores_principales, datos_entrada, explicacion} (LRU)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _parsear(valor):
+    """Parsea una columna JSON; si no es JSON válido se devuelve tal cual"""
+    if not valor:
+        return valor
+    try:
+        return json.loads(valor)
+    except (TypeError, ValueError):
+        return valor
+
+
+def calcular_etag(codigos, filas):
+    """
+    ETag de un lote: los clientes pedidos en orden (definen clientes y
+    sin_resultados de la respuesta) y el resultado_id vigente de cada par
+    cliente/modelo
+    """
+    huella = hashlib.sha1()
+    huella.update((','.join(codigos) + '#').encode())
+    for fila in sorted((f['cliente_codigo'], f['modelo_id'], f['resultado_id']) for f in filas):
+        huella.update(('%s|%s|%s;' % fila).encode())
+    return huella.hexdigest()
+
+
+def columnar(filas, columnas=COLUMNAS):
+    """Convierte una lista de dicts en {columna: [valores]}"""
+    return {c: [f.get(c) for f in filas] for c in columnas}
+
+
+def _detalles(resultado_ids):
+    """Columnas JSON parseadas por resultado_id, leyendo de la BD solo las que faltan"""
+    with _cache_lock:
+        detalles = {i: _cache[i] for i in resultado_ids if i in _cache}
+        for i in detalles:
+            _cache.move_to_end(i)
+
+    faltantes = [i for i in resultado_ids if i not in detalles]
+    if faltantes:
+        filas = MLResultadoCliente.get_detalle_resultados(faltantes)
+        if filas is None:
+            raise RuntimeError('Error al consultar los resultados ML')
+        nuevos = {f['id']: {
+            'factores_principales': _parsear(f['factores_principales']),
+            'datos_entrada': _parsear(f['datos_entrada']),
+            'explicacion': f['explicacion'],
+        } for f in filas}
+        detalles.update(nuevos)
+        with _cache_lock:
+            _cache.update(nuevos)
+            while len(_cache) > CACHE_MAX_RESULTADOS:
+                _cache.popitem(last=False)
+    return detalles
+
+
+def codigos_worklist(prioridad=None, limit=50):
+    """Códigos de los primeros clientes de la lista de llamadas"""
+    pagina = CobranzaWorklist.get_pagina(page=1, per_page=limit, prioridad=prioridad)
+    if pagina is None:
+        raise RuntimeError('Error al consultar la lista de llamadas')
+    return [c['codigo'] for c in pagina['clientes']]
+
+
+def resultados_clientes(codigos, etag_cliente=None):
+    """
+    Último resultado ML por modelo de un lote de clientes, en formato columnar
+
+    Args:
+        codigos: Códigos de cliente (máximo MAX_CLIENTES, duplicados se ignoran)
+        etag_cliente: Función que recibe el ETag y devuelve True si el cliente
+                      ya tiene esa versión (entonces no se arma el cuerpo)
+
+    Returns:
+        tuple: (etag, respuesta) con respuesta None si etag_cliente lo aceptó;
+               respuesta = {clientes, sin_resultados, total, columnas: {col: [...]}}
+    """
+    codigos = list(dict.fromkeys(c for c in codigos if c))
+    if not codigos:
+        raise ValueError('Debe indicar al menos un cliente')
+    if len(codigos) > MAX_CLIENTES:
+        raise ValueError(f'Máximo {MAX_CLIENTES} clientes por consulta')
+
+    filas = MLResultadoCliente.get_ultimos_clientes(codigos)
+    if filas is None:
+        raise RuntimeError('Error al consultar los resultados ML')
+
+    etag = calcular_etag(codigos, filas)
+    if etag_cliente and etag_cliente(etag):
+        return etag, None
+
+    detalles = _detalles([f['resultado_id'] for f in filas])
+    for fila in filas:
+        fila.update(detalles.get(fila['resultado_id'], {}))
+        fila['fecha_ejecucion'] = str(fila['fecha_ejecucion'])
+
+    con_resultados = {f['cliente_codigo'] for f in filas}
+    return etag, {
+        'clientes': [c for c in codigos if c in con_resultados],
+        'sin_resultados': [c for c in codigos if c not in con_resultados],
+        'total': len(filas),
+        'columnas': columnar(filas),
+    }
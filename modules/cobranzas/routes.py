@@ -1,12 +1,18 @@
 """
 Rutas para el módulo de Cobranzas
 """
-from flask import render_template, jsonify, request, session
+from flask import render_template, jsonify, request, session, flash, Response, stream_with_context
+from mysql.connector import Error
 from modules.cobranzas import cobranzas_bp
 from modules.auth.routes import login_required
-from models import (Cliente, Factura, Pago, CobranzaSeguimiento, Cobranza,
+from models import (Cliente, ClienteBusqueda, Pago, Cobranza,
+                    CobranzaAlerta, CobranzaWorklist, CarteraSnapshot,
                     MLModelo, MLEjecucion, MLResultadoCliente, MLKDDProceso,
                     MLMetricasModelo, MLComparacion)
+from modules.cobranzas import (analytics, asignacion, comparacion, exportacion, importacion,
+                               pronostico, resultados as resultados_ml)
+from datetime import date, timedelta
+import io
 import json
 
 
@@ -22,12 +28,12 @@ def index():
     # Obtener métricas del dashboard
     dashboard = Cobranza.get_dashboard_cobranzas()
 
-    # Obtener lista de clientes
-    clientes = Cliente.get_all()  # Obtiene todos los clientes
-
+    # La grilla de clientes se carga paginada desde /api/clientes/grid y el
+    # selector de la pestaña ML autocompleta desde /api/clientes/buscar
     return render_template('cobranzas/index.html',
                          dashboard=dashboard,
-                         clientes=clientes)
+                         alertas=CobranzaAlerta.get_activas(solo_no_leidas=True, limit=10),
+                         alertas_resumen=CobranzaAlerta.get_resumen())
 
 
 @cobranzas_bp.route('/cliente/<codigo>')
@@ -44,22 +50,23 @@ def detalle_cliente(codigo):
         return render_template('error.html',
                              error='Cliente no encontrado'), 404
 
-    cliente_id = cliente['id']
-
-    # Obtener resumen completo de cobranza
-    resumen = Cobranza.get_resumen_cliente_completo(cliente_id)
-
-    # Obtener facturas del cliente
-    facturas = Factura.get_by_cliente(cliente_id)
+    # Resumen completo en un solo batch: incluye todas las facturas y los
+    # últimos 20 seguimientos que muestra la página
+    resumen = Cobranza.get_resumen_cliente_completo(cliente['id'], limite_seguimientos=20)
+    if not resumen:
+        return render_template('error.html',
+                             error='Cliente no encontrado'), 404
 
-    # Obtener seguimientos
-    seguimientos = CobranzaSeguimiento.get_by_cliente(cliente_id)
+    facturas = resumen['facturas']
+    seguimientos = resumen['ultimos_seguimientos']
+    alertas = CobranzaAlerta.get_activas(cliente_id=cliente['id'], limit=20)
 
     return render_template('cobranzas/detalle_cliente.html',
                          cliente=cliente,
                          resumen=resumen,
                          facturas=facturas,
-                         seguimientos=seguimientos)
+                         seguimientos=seguimientos,
+                         alertas=alertas)
 
 
 @cobranzas_bp.route('/ml-results')
@@ -73,15 +80,11 @@ def ml_results():
     # Obtener modelos activos
     modelos = MLModelo.get_all_activos()
 
-    # Obtener clientes con resultados ML
-    clientes = MLResultadoCliente.get_clientes_con_resultados()
-
-    # Obtener últimas ejecuciones
+    # Obtener últimas ejecuciones (el cliente se elige con /api/clientes/buscar)
     ultimas_ejecuciones = MLEjecucion.get_ultimas_ejecuciones(limit=10)
 
     return render_template('cobranzas/ml_results.html',
                          modelos=modelos,
-                         clientes=clientes,
                          ultimas_ejecuciones=ultimas_ejecuciones)
 
 
@@ -92,7 +95,7 @@ def api_ml_results_cliente(codigo):
     if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
         return jsonify({'error': 'Sin permisos'}), 403
 
-    # Obtener resultados del cliente
+    # Último resultado del cliente en cada modelo
     resultados = MLResultadoCliente.get_by_cliente(codigo)
 
     if not resultados:
@@ -121,6 +124,37 @@ def api_ml_results_cliente(codigo):
     return jsonify(resultados_json)
 
 
+@cobranzas_bp.route('/api/ml-results/clientes')
+@login_required
+def api_ml_results_clientes():
+    """API: Últimos resultados ML de varios clientes (columnar, con ETag)
+
+    ?codigos=C001,C002,... o ?worklist=1&prioridad=alta&limit=50 para tomar
+    los primeros clientes de la lista de llamadas.
+    """
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    try:
+        if request.args.get('worklist'):
+            limit = max(1, min(request.args.get('limit', 50, type=int), resultados_ml.MAX_CLIENTES))
+            codigos = resultados_ml.codigos_worklist(request.args.get('prioridad'), limit)
+        else:
+            codigos = request.args.get('codigos', '').split(',')
+        etag, datos = resultados_ml.resultados_clientes(
+            [c.strip() for c in codigos], etag_cliente=request.if_none_match.contains)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+    response = Response(status=304) if datos is None else jsonify(datos)
+    response.set_etag(etag)
+    # El navegador guarda la respuesta pero revalida siempre con If-None-Match
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @cobranzas_bp.route('/api/ml-results/ejecucion/<int:ejecucion_id>')
 @login_required
 def api_ml_ejecucion_detalle(ejecucion_id):
@@ -163,8 +197,8 @@ def api_ml_comparar_modelos():
     if not cliente_codigo:
         return jsonify({'error': 'Cliente no especificado'}), 400
 
-    # Obtener todos los resultados del cliente
-    resultados = MLResultadoCliente.get_by_cliente(cliente_codigo)
+    # Obtener el historial reciente del cliente
+    resultados = MLResultadoCliente.get_historial_cliente(cliente_codigo)
 
     if not resultados:
         return jsonify({'error': 'No hay resultados para comparar'}), 404
@@ -218,18 +252,329 @@ def api_ml_kdd_proceso(ejecucion_id):
     return jsonify(proceso_json)
 
 
+@cobranzas_bp.route('/api/ml-results/pronostico')
+@login_required
+def api_ml_pronostico():
+    """API: Pronóstico semanal de cobranza (Monte Carlo sobre las probabilidades ML)"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    escenarios = request.args.get('escenarios', pronostico.ESCENARIOS, type=int)
+    if session.get('rol') != 'admin':
+        # Solo admin puede pedir simulaciones más grandes que la estándar
+        escenarios = min(escenarios, pronostico.ESCENARIOS)
+
+    try:
+        resultado = pronostico.pronosticar(
+            ejecucion_id=request.args.get('ejecucion_id', type=int),
+            semanas=request.args.get('semanas', pronostico.SEMANAS, type=int),
+            escenarios=escenarios
+        )
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(resultado)
+
+
+@cobranzas_bp.route('/api/ml-results/comparar-ejecuciones')
+@login_required
+def api_ml_comparar_ejecuciones():
+    """API: Ganancia/lift, calibración, PSI y acuerdo entre ejecuciones ML"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    ids = request.args.get('ids', '')
+    try:
+        ejecucion_ids = [int(i) for i in ids.split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'error': 'IDs de ejecución inválidos'}), 400
+
+    try:
+        resultado = comparacion.comparar(ejecucion_ids or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(resultado)
+
+
 @cobranzas_bp.route('/api/clientes/buscar')
 @login_required
 def api_buscar_clientes():
-    """API: Busca clientes por nombre o código"""
+    """API: Autocompletado de clientes por prefijo de nombre, código o RFC"""
     if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
         return jsonify({'error': 'Sin permisos'}), 403
 
     query = request.args.get('q', '')
-    clientes = Cliente.search(query) if query else Cliente.get_all()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    clientes = ClienteBusqueda.buscar(query, limit=limit)
 
     return jsonify([{
         'codigo': c['codigo'],
         'razon_social': c['razon_social'],
         'rfc': c['rfc']
-    } for c in clientes] if clientes else [])
+    } for c in clientes])
+
+
+@cobranzas_bp.route('/api/clientes/grid')
+@login_required
+def api_clientes_grid():
+    """API: Grilla paginada de clientes con saldos precalculados"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', 25, type=int), 100))
+
+    grid = ClienteBusqueda.grid(
+        texto=request.args.get('q', ''),
+        ordenar_por=request.args.get('sort', 'razon_social'),
+        direccion=request.args.get('dir', 'asc'),
+        page=page,
+        per_page=per_page
+    )
+    if grid is None:
+        return jsonify({'error': 'Error al consultar clientes'}), 500
+
+    return jsonify(grid)
+
+
+@cobranzas_bp.route('/api/worklist')
+@login_required
+def api_worklist():
+    """API: Lista de llamadas ordenada por recuperación esperada por hora de contacto"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', 25, type=int), 100))
+
+    pagina = CobranzaWorklist.get_pagina(
+        page=page,
+        per_page=per_page,
+        prioridad=request.args.get('prioridad')
+    )
+    if pagina is None:
+        return jsonify({'error': 'Error al consultar la lista de llamadas'}), 500
+
+    return jsonify(pagina)
+
+
+@cobranzas_bp.route('/api/analytics/cartera')
+@login_required
+def api_analytics_cartera():
+    """API: Métricas de cartera (saldo, antigüedad, atraso ponderado, DSO, CEI) agrupadas"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    agrupar_por = request.args.get('agrupar_por', 'cliente')
+    if agrupar_por == 'total':
+        agrupar_por = None
+    limit = request.args.get('limit', 100, type=int)
+
+    try:
+        registros = analytics.metricas_cartera(agrupar_por, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'agrupar_por': agrupar_por or 'total',
+        'periodo_dias': analytics.PERIODO_DIAS,
+        'resultados': registros
+    })
+
+
+def _parametros_snapshots():
+    """Lee desde/hasta/cliente/granularidad de la query string (por defecto, último año)"""
+    hoy = date.today()
+    try:
+        hasta = date.fromisoformat(request.args.get('hasta', hoy.isoformat()))
+        desde = date.fromisoformat(request.args.get('desde', (hasta - timedelta(days=365)).isoformat()))
+    except ValueError:
+        raise ValueError('Formato de fecha inválido, use YYYY-MM-DD')
+
+    cliente_id = None
+    codigo = request.args.get('cliente')
+    if codigo:
+        cliente = Cliente.get_by_codigo(codigo)
+        if not cliente:
+            raise LookupError('Cliente no encontrado')
+        cliente_id = cliente['id']
+
+    return desde, hasta, cliente_id, request.args.get('granularidad', 'dia')
+
+
+@cobranzas_bp.route('/api/snapshots')
+@login_required
+def api_snapshots():
+    """API: Snapshots diarios de cartera en un rango de fechas"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    try:
+        desde, hasta, cliente_id, granularidad = _parametros_snapshots()
+        filas = CarteraSnapshot.get_serie(desde, hasta, cliente_id, granularidad)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    resultado = []
+    for fila in filas:
+        registro = {'fecha': fila['fecha'].isoformat()}
+        registro.update({columna: float(fila[columna]) for columna in CarteraSnapshot.COLUMNAS})
+        if 'clientes_con_saldo' in fila:
+            registro['clientes_con_saldo'] = fila['clientes_con_saldo']
+        resultado.append(registro)
+
+    return jsonify(resultado)
+
+
+@cobranzas_bp.route('/api/snapshots/grafico')
+@login_required
+def api_snapshots_grafico():
+    """API: Serie de tendencia de cartera lista para graficar (formato columnar)"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    try:
+        desde, hasta, cliente_id, granularidad = _parametros_snapshots()
+        filas = CarteraSnapshot.get_serie(desde, hasta, cliente_id, granularidad)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'granularidad': granularidad,
+        'fechas': [f['fecha'].isoformat() for f in filas],
+        'series': {columna: [float(f[columna]) for f in filas]
+                   for columna in CarteraSnapshot.COLUMNAS}
+    })
+
+
+@cobranzas_bp.route('/exportar/<tipo>')
+@login_required
+def exportar(tipo):
+    """Exporta facturas, antigüedad, pagos o seguimientos en CSV/XLSX (streaming)"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    formato = request.args.get('formato', 'csv')
+    try:
+        contenido = exportacion.exportar(tipo, formato, request.args.to_dict())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        # La consulta se ejecuta antes de enviar los encabezados: un error de
+        # base de datos se informa aquí en lugar de truncar el archivo
+        return jsonify({'error': f'Error al generar la exportación: {str(e)}'}), 500
+
+    nombre = f"{tipo}_{date.today().isoformat()}.{formato}"
+    return Response(
+        stream_with_context(contenido),
+        mimetype=exportacion.FORMATOS[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename="{nombre}"',
+            # Evita que nginx acumule la respuesta antes de enviarla
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@cobranzas_bp.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar():
+    """Importación masiva de facturas o pagos desde CSV (solo admin)"""
+    if session.get('rol') != 'admin':
+        return render_template('error.html',
+                             error='Solo administradores pueden importar datos'), 403
+
+    reporte = None
+    if request.method == 'POST':
+        tipo = request.form.get('tipo')
+        archivo = request.files.get('archivo')
+
+        if not archivo or archivo.filename == '':
+            flash('Por favor selecciona un archivo CSV', 'danger')
+        elif not archivo.filename.lower().endswith('.csv'):
+            flash('El archivo debe ser CSV', 'danger')
+        else:
+            # Se lee el upload como stream de texto, sin cargarlo completo en memoria
+            texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+            try:
+                reporte = importacion.importar(tipo, texto, usuario_id=session.get('user_id'))
+            except UnicodeDecodeError:
+                # Subclase de ValueError: va primero
+                flash('El archivo debe estar codificado en UTF-8', 'danger')
+            except (ValueError, RuntimeError) as e:
+                flash(str(e), 'danger')
+            else:
+                if reporte.get('error'):
+                    flash(f"Importación interrumpida: {reporte['error']}. "
+                          f"Se confirmaron {reporte['insertadas']} filas hasta la línea "
+                          f"{reporte['ultima_linea_confirmada'] or '-'}", 'warning')
+
+    return render_template('cobranzas/importar.html',
+                         tipos=sorted(importacion.IMPORTACIONES),
+                         reporte=reporte)
+
+
+@cobranzas_bp.route('/api/pagos/aplicar', methods=['POST'])
+@login_required
+def api_aplicar_pagos():
+    """API: Aplica pagos pendientes a facturas (FIFO por vencimiento o explícita)"""
+    if session.get('rol') != 'admin':
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    data = request.get_json() or {}
+    try:
+        reporte = asignacion.aplicar_pagos(
+            pago_ids=data.get('pago_ids'),
+            estrategia=data.get('estrategia', 'fifo'),
+            asignaciones=data.get('asignaciones')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Error:
+        # Error de BD o pool agotado dentro de la transacción (ya se hizo rollback)
+        return jsonify({'error': 'Error al aplicar los pagos'}), 500
+
+    return jsonify(reporte)
+
+
+@cobranzas_bp.route('/api/alertas')
+@login_required
+def api_alertas():
+    """API: Alertas de cobranza activas"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    cliente_id = None
+    codigo = request.args.get('cliente')
+    if codigo:
+        cliente = Cliente.get_by_codigo(codigo)
+        if not cliente:
+            return jsonify({'error': 'Cliente no encontrado'}), 404
+        cliente_id = cliente['id']
+
+    alertas = CobranzaAlerta.get_activas(
+        cliente_id=cliente_id,
+        tipo_alerta=request.args.get('tipo'),
+        solo_no_leidas=request.args.get('no_leidas') == '1',
+        limit=max(1, min(request.args.get('limit', 50, type=int), 200))
+    )
+    return jsonify(alertas)
+
+
+@cobranzas_bp.route('/api/alertas/<int:alerta_id>/leida', methods=['POST'])
+@login_required
+def api_marcar_alerta_leida(alerta_id):
+    """API: Marca una alerta como leída"""
+    if session.get('rol') not in ['admin', 'rrhh', 'soporte']:
+        return jsonify({'error': 'Sin permisos'}), 403
+
+    if CobranzaAlerta.marcar_leida(alerta_id) is None:
+        return jsonify({'error': 'No se pudo actualizar la alerta'}), 500
+    return jsonify({'success': True})
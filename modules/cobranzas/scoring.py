@@ -0,0 +1,579 @@
+"""
+Servicio de scoring ML por lotes para cobranzas
+
+Ejecuta el proceso KDD completo sobre toda la cartera y registra cada etapa
+en ml_kdd_proceso:
+
+1. selection: refresco incremental del feature store
+   (modules/cobranzas/caracteristicas.py) y snapshot vigente
+2. preprocessing: matriz de características e imputación de faltantes
+3. transformation: escalamiento con los parámetros guardados en el modelo
+4. data_mining: scoring vectorizado por lotes (pool de procesos si la
+   cartera es grande)
+5. interpretation: clasificación, factores principales y métricas
+
+Los resultados, métricas y etapas se escriben con inserciones masivas en una
+sola transacción junto con el cierre de la ejecución; mientras tanto la
+ejecución queda 'en_proceso' y las pantallas siguen mostrando la anterior.
+
+El modelo es un artefacto .npz (regresión logística para la probabilidad de
+pago y regresión lineal para los días de pago) registrado en
+ml_modelos.artefacto. Se entrena con `entrenar` sobre la propia historia de
+la cartera: características reconstruidas a una fecha de corte y etiquetas
+con lo cobrado en los HORIZONTE_DIAS siguientes.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from config import Config
+from database import execute_query, execute_transaction, transaction
+from models import MLModelo, MLEjecucion, MLResultadoCliente, CobranzaWorklist
+from modules.cobranzas import caracteristicas
+from modules.cobranzas.caracteristicas import FEATURES
+
+logger = logging.getLogger(__name__)
+
+MODELO_DEFAULT = 'Scoring de Cobranza'
+
+# Montos con cola larga: se transforman con log1p antes de escalar
+MONETARIAS = ('saldo_pendiente', 'limite_credito')
+
+HORIZONTE_DIAS = 90
+
+TAMANO_LOTE = 20000
+# Por debajo de este número de clientes el pool cuesta más de lo que ahorra
+MIN_CLIENTES_POOL = 100000
+LOTE_INSERT = 5000
+
+# probabilidad_pago -> clasificación
+UMBRAL_RIESGO_ALTO = 0.5
+UMBRAL_RIESGO_BAJO = 0.75
+CLASIFICACIONES = {
+    'alto_riesgo': ('alta', 'Llamada de supervisor y propuesta de plan de pagos'),
+    'medio_riesgo': ('media', 'Llamada de seguimiento y confirmación de fecha de pago'),
+    'bajo_riesgo': ('baja', 'Recordatorio por email antes del vencimiento'),
+}
+
+ETAPAS = {
+    'selection': 'Refresco incremental y snapshot del feature store',
+    'preprocessing': 'Matriz de características e imputación de faltantes',
+    'transformation': 'log1p de montos y estandarización con parámetros del modelo',
+    'data_mining': 'Scoring por lotes con el modelo registrado',
+    'interpretation': 'Clasificación de riesgo, factores principales y métricas',
+}
+
+
+# ==================== ETIQUETAS ====================
+
+def cargar_etiquetas(cliente_ids, saldos, corte, horizonte=HORIZONTE_DIAS):
+    """
+    Etiquetas de entrenamiento: lo cobrado a cada cliente en el horizonte tras el corte
+
+    Returns:
+        tuple: (pago: 1 si cobró al menos la mitad de su saldo al corte,
+                dias: días hasta el primer pago, NaN si no pagó)
+    """
+    filas = execute_query("""
+        SELECT cliente_id, SUM(monto) AS cobrado, DATEDIFF(MIN(fecha_pago), %s) AS dias
+        FROM pagos
+        WHERE fecha_pago > %s AND fecha_pago <= %s
+        GROUP BY cliente_id
+    """, (corte, corte, corte + timedelta(days=horizonte)), fetch=True)
+    if filas is None:
+        raise RuntimeError("No se pudieron leer los pagos posteriores al corte")
+
+    cobrado = np.zeros(len(cliente_ids))
+    dias = np.full(len(cliente_ids), np.nan)
+    if filas and len(cliente_ids):
+        fila_ids = np.fromiter((f['cliente_id'] for f in filas), np.int64, len(filas))
+        pos = np.minimum(np.searchsorted(cliente_ids, fila_ids), len(cliente_ids) - 1)
+        ok = cliente_ids[pos] == fila_ids
+        cobrado[pos[ok]] = np.fromiter((float(f['cobrado']) for f in filas), np.float64, len(filas))[ok]
+        dias[pos[ok]] = np.fromiter((float(f['dias']) for f in filas), np.float64, len(filas))[ok]
+
+    return (cobrado >= 0.5 * saldos).astype(np.float64), dias
+
+
+# ==================== MODELO ====================
+
+def _sigmoide(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+def auc(y, score):
+    """Área bajo la curva ROC (estadístico de Mann-Whitney con rangos promedio)"""
+    y = np.asarray(y, dtype=bool)
+    positivos, negativos = y.sum(), (~y).sum()
+    if positivos == 0 or negativos == 0:
+        return None
+    orden = np.argsort(score, kind='mergesort')
+    rangos = np.empty(len(score))
+    rangos[orden] = np.arange(1, len(score) + 1)
+    # Empates: rango promedio
+    valores, inverso, conteo = np.unique(score, return_inverse=True, return_counts=True)
+    if len(valores) < len(score):
+        suma = np.bincount(inverso, weights=rangos)
+        rangos = (suma / conteo)[inverso]
+    return float((rangos[y].sum() - positivos * (positivos + 1) / 2) / (positivos * negativos))
+
+
+class ModeloScoring:
+    """Regresión logística (probabilidad de pago) + lineal (días de pago) sobre FEATURES"""
+
+    def __init__(self, media, escala, coef_pago, coef_dias, imputacion, metricas=None, features=FEATURES):
+        self.features = tuple(features)
+        self.media = np.asarray(media, dtype=np.float64)
+        self.escala = np.asarray(escala, dtype=np.float64)
+        self.coef_pago = np.asarray(coef_pago, dtype=np.float64)
+        self.coef_dias = np.asarray(coef_dias, dtype=np.float64)
+        self.imputacion = np.asarray(imputacion, dtype=np.float64)
+        self.metricas = metricas or {}
+
+    # ---- preprocesamiento ----
+
+    def imputar(self, X):
+        """Reemplaza NaN por la mediana de entrenamiento de cada columna"""
+        X = np.array(X, dtype=np.float64)
+        faltantes = np.isnan(X)
+        if faltantes.any():
+            X[faltantes] = np.broadcast_to(self.imputacion, X.shape)[faltantes]
+        return X
+
+    def transformar(self, X):
+        """log1p de montos y estandarización"""
+        Z = np.array(X, dtype=np.float64)
+        for nombre in MONETARIAS:
+            j = self.features.index(nombre)
+            Z[:, j] = np.log1p(np.maximum(Z[:, j], 0))
+        Z -= self.media
+        Z /= self.escala
+        return Z
+
+    def predecir(self, Z):
+        """
+        Scoring vectorizado sobre la matriz transformada
+
+        Returns:
+            tuple: (probabilidad de pago, días de pago, contribuciones por feature)
+        """
+        contribuciones = Z * self.coef_pago[1:]
+        probabilidad = _sigmoide(self.coef_pago[0] + contribuciones.sum(axis=1))
+        dias = np.clip(self.coef_dias[0] + Z @ self.coef_dias[1:], 1, 365)
+        return probabilidad, dias, contribuciones
+
+    # ---- entrenamiento ----
+
+    @classmethod
+    def entrenar(cls, X, y_pago, y_dias, l2=1.0, iteraciones=25, validacion=0.2, seed=0):
+        """
+        Ajusta el modelo (Newton/IRLS con regularización L2 y ridge para días)
+
+        Args:
+            X: Matriz clientes × FEATURES (puede tener NaN)
+            y_pago: 1 si el cliente pagó en el horizonte
+            y_dias: Días hasta el pago (NaN si no pagó)
+            validacion: Fracción reservada para métricas
+
+        Returns:
+            ModeloScoring con sus métricas de validación
+        """
+        y_pago = np.asarray(y_pago, dtype=np.float64)
+        if len(y_pago) < 50 or y_pago.min() == y_pago.max():
+            raise ValueError("Se requieren al menos 50 clientes y ambas clases para entrenar")
+
+        rng = np.random.default_rng(seed)
+        prueba = rng.random(len(y_pago)) < validacion
+        entrena = ~prueba
+
+        X = np.asarray(X, dtype=np.float64)
+        imputacion = np.nanmedian(X[entrena], axis=0)
+        imputacion = np.where(np.isnan(imputacion), 0.0, imputacion)
+        modelo = cls(np.zeros(X.shape[1]), np.ones(X.shape[1]), np.zeros(X.shape[1] + 1),
+                     np.zeros(X.shape[1] + 1), imputacion)
+        Xt = modelo.transformar(modelo.imputar(X))
+        modelo.media = Xt[entrena].mean(axis=0)
+        modelo.escala = np.where(Xt[entrena].std(axis=0) > 0, Xt[entrena].std(axis=0), 1.0)
+        Z = (Xt - modelo.media) / modelo.escala
+        Z1 = np.column_stack([np.ones(len(Z)), Z])
+        penalizacion = l2 * np.eye(Z1.shape[1])
+        penalizacion[0, 0] = 0
+
+        w = np.zeros(Z1.shape[1])
+        A, y = Z1[entrena], y_pago[entrena]
+        for _ in range(iteraciones):
+            p = _sigmoide(A @ w)
+            gradiente = A.T @ (p - y) + penalizacion @ w
+            hessiana = (A * (p * (1 - p))[:, None]).T @ A + penalizacion
+            paso = np.linalg.solve(hessiana, gradiente)
+            w -= paso
+            if np.abs(paso).max() < 1e-6:
+                break
+        modelo.coef_pago = w
+
+        pagaron = entrena & ~np.isnan(y_dias)
+        if pagaron.sum() > Z1.shape[1]:
+            B = Z1[pagaron]
+            modelo.coef_dias = np.linalg.solve(B.T @ B + penalizacion, B.T @ y_dias[pagaron])
+        else:
+            modelo.coef_dias = np.zeros(Z1.shape[1])
+            modelo.coef_dias[0] = HORIZONTE_DIAS / 2
+
+        modelo.metricas = modelo._evaluar(Z[prueba], y_pago[prueba], y_dias[prueba])
+        modelo.metricas.update({'clientes_entrenamiento': int(entrena.sum()),
+                                'clientes_validacion': int(prueba.sum())})
+        return modelo
+
+    def _evaluar(self, Z, y_pago, y_dias):
+        """Métricas de validación (clasificación para pago, regresión para días)"""
+        if len(Z) == 0:
+            return {}
+        probabilidad, dias, _ = self.predecir(Z)
+        prediccion = probabilidad >= UMBRAL_RIESGO_ALTO
+        real = y_pago >= 0.5
+        vp = float(np.sum(prediccion & real))
+        fp = float(np.sum(prediccion & ~real))
+        fn = float(np.sum(~prediccion & real))
+        vn = float(np.sum(~prediccion & ~real))
+        precision = vp / (vp + fp) if vp + fp else 0.0
+        recall = vp / (vp + fn) if vp + fn else 0.0
+        metricas = {
+            'accuracy': (vp + vn) / len(real),
+            'precision_score': precision,
+            'recall': recall,
+            'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'auc_roc': auc(real, probabilidad),
+            'matriz_confusion': [[vn, fp], [fn, vp]],
+        }
+        pagaron = ~np.isnan(y_dias)
+        if pagaron.sum() > 1:
+            error = dias[pagaron] - y_dias[pagaron]
+            varianza = np.var(y_dias[pagaron])
+            metricas.update({
+                'mae': float(np.mean(np.abs(error))),
+                'mse': float(np.mean(error ** 2)),
+                'rmse': float(np.sqrt(np.mean(error ** 2))),
+                'r2_score': float(1 - np.mean(error ** 2) / varianza) if varianza > 0 else None,
+            })
+        return metricas
+
+    # ---- serialización ----
+
+    def guardar(self, ruta):
+        """Guarda el modelo como .npz (sin pickle)"""
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta, 'wb') as archivo:
+            np.savez(archivo, features=np.array(self.features), media=self.media, escala=self.escala,
+                     coef_pago=self.coef_pago, coef_dias=self.coef_dias, imputacion=self.imputacion,
+                     metricas=np.array(json.dumps(self.metricas)))
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Carga un modelo guardado con `guardar`"""
+        with np.load(ruta, allow_pickle=False) as datos:
+            features = tuple(str(f) for f in datos['features'])
+            if set(features) - set(FEATURES):
+                raise ValueError(f"El modelo usa características desconocidas: {set(features) - set(FEATURES)}")
+            return cls(datos['media'], datos['escala'], datos['coef_pago'], datos['coef_dias'],
+                       datos['imputacion'], json.loads(str(datos['metricas'])), features)
+
+    def importancias(self):
+        """Peso relativo de cada feature (|coeficiente| normalizado)"""
+        pesos = np.abs(self.coef_pago[1:])
+        total = pesos.sum() or 1.0
+        return {f: round(float(p / total), 4) for f, p in zip(self.features, pesos)}
+
+
+# ==================== SCORING ====================
+
+def clasificar(probabilidad):
+    """Clasificación de riesgo por umbrales de probabilidad de pago"""
+    return np.where(probabilidad < UMBRAL_RIESGO_ALTO, 'alto_riesgo',
+                    np.where(probabilidad < UMBRAL_RIESGO_BAJO, 'medio_riesgo', 'bajo_riesgo'))
+
+
+def _formato(nombre, valor):
+    if nombre in MONETARIAS:
+        return f"${valor:,.2f}"
+    if nombre == 'tasa_incumplimiento':
+        return f"{valor * 100:.0f}%"
+    if nombre.startswith('dias') or nombre == 'antiguedad_cliente':
+        return f"{valor:.0f} días"
+    return f"{valor:g}"
+
+
+def _puntuar_lote(args):
+    """
+    Puntúa un lote de clientes y arma las filas de ml_resultados_cliente
+
+    Función de módulo para poder ejecutarse en el pool de procesos.
+    """
+    modelo, ejecucion_id, codigos, X, Z, saldos = args
+    probabilidad, dias, contribuciones = modelo.predecir(Z)
+    n = len(codigos)
+    filas_idx = np.arange(n)[:, None]
+
+    # Todo lo numérico se redondea vectorizado y se pasa a tipos nativos una vez
+    principales = np.argsort(-np.abs(contribuciones), axis=1)[:, :3]
+    pesos = np.abs(contribuciones)
+    totales = pesos.sum(axis=1, keepdims=True)
+    importancia = np.round(np.divide(pesos[filas_idx, principales], totales,
+                                     out=np.zeros(principales.shape), where=totales > 0), 2).tolist()
+    favorable = (contribuciones[filas_idx, principales] > 0).tolist()
+    valores = X[filas_idx, principales].tolist()
+    principales = principales.tolist()
+    clasificacion = clasificar(probabilidad).tolist()
+    dias = np.rint(dias).astype(np.int64).tolist()
+    recuperable = np.round(probabilidad * saldos, 2).tolist()
+    confianza = np.round(np.abs(2 * probabilidad - 1), 4).tolist()
+    porcentaje = np.rint(probabilidad * 100).astype(np.int64).tolist()
+    probabilidad = np.round(probabilidad, 4).tolist()
+    entradas = np.round(X, 4).tolist()
+    features = modelo.features
+
+    filas = []
+    for i, codigo in enumerate(codigos):
+        prioridad, accion = CLASIFICACIONES[clasificacion[i]]
+        factores = [{
+            'nombre': features[j],
+            'valor': _formato(features[j], valores[i][k]),
+            'importancia': importancia[i][k],
+            'efecto': 'favorable' if favorable[i][k] else 'desfavorable',
+        } for k, j in enumerate(principales[i])]
+        filas.append((
+            ejecucion_id, codigo,
+            probabilidad[i], clasificacion[i],
+            probabilidad[i], dias[i], recuperable[i],
+            json.dumps(factores, ensure_ascii=False),
+            confianza[i], accion, prioridad,
+            json.dumps(dict(zip(features, entradas[i]))),
+            f"Probabilidad de pago del {porcentaje[i]}% en los próximos {HORIZONTE_DIAS} días, "
+            f"con pago estimado en {dias[i]} días. Factor principal: "
+            f"{factores[0]['nombre']} ({factores[0]['valor']})."
+        ))
+    return filas
+
+
+class _Etapas:
+    """Cronometra las etapas KDD de una ejecución"""
+
+    def __init__(self):
+        self.registros = []
+
+    def medir(self, etapa, funcion, detalles=None):
+        inicio_fecha = datetime.now()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        metricas = detalles(resultado) if detalles else {}
+        self.registros.append((etapa, inicio_fecha, datetime.now(), round(duracion, 4),
+                               ETAPAS[etapa], json.dumps(metricas)))
+        logger.info(f"Etapa {etapa}: {duracion:.2f}s")
+        return resultado
+
+
+def _escribir(ejecucion_id, filas, metricas, etapas, duracion, corte):
+    """Resultados, métricas, etapas KDD, últimos por cliente y cierre de la ejecución en una transacción"""
+    with transaction() as cursor:
+        for i in range(0, len(filas), LOTE_INSERT):
+            cursor.executemany("""
+                INSERT INTO ml_resultados_cliente
+                    (ejecucion_id, cliente_codigo, score_prediccion, clasificacion,
+                     probabilidad_pago, dias_pago_predicho, monto_recuperable_predicho,
+                     factores_principales, confianza_prediccion, accion_recomendada,
+                     prioridad_cobranza, datos_entrada, explicacion)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, filas[i:i + LOTE_INSERT])
+
+        cursor.execute("""
+            INSERT INTO ml_metricas_modelo
+                (ejecucion_id, accuracy, precision_score, recall, f1_score, auc_roc,
+                 mae, mse, rmse, r2_score, tasa_recuperacion_predicha, matriz_confusion, metricas_custom)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (ejecucion_id, metricas.get('accuracy'), metricas.get('precision_score'),
+              metricas.get('recall'), metricas.get('f1_score'), metricas.get('auc_roc'),
+              metricas.get('mae'), metricas.get('mse'), metricas.get('rmse'), metricas.get('r2_score'),
+              metricas.get('tasa_recuperacion_predicha'),
+              json.dumps(metricas['matriz_confusion']) if metricas.get('matriz_confusion') else None,
+              json.dumps(metricas.get('custom', {}))))
+
+        cursor.executemany("""
+            INSERT INTO ml_kdd_proceso
+                (ejecucion_id, etapa, fecha_inicio, fecha_fin, duracion_segundos,
+                 descripcion, metricas_etapa, estado)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'completado')
+        """, [(ejecucion_id,) + registro for registro in etapas])
+
+        cursor.execute(*MLResultadoCliente.sql_actualizar_ultimos(ejecucion_id))
+
+        cursor.execute("""
+            UPDATE ml_ejecuciones
+            SET estado = 'completado', num_registros_procesados = %s, duracion_segundos = %s,
+                fecha_datos_hasta = %s
+            WHERE id = %s
+        """, (len(filas), round(duracion, 2), corte, ejecucion_id))
+
+
+def puntuar(modelo_nombre=MODELO_DEFAULT, procesos=None, tamano_lote=TAMANO_LOTE, usuario=None):
+    """
+    Puntúa toda la cartera con el modelo registrado y guarda una ejecución nueva
+
+    Args:
+        modelo_nombre: Nombre en ml_modelos (debe tener artefacto)
+        procesos: Procesos del pool (None = núcleos disponibles; 1 = sin pool)
+        tamano_lote: Clientes por lote de scoring
+        usuario: Usuario ejecutor que queda en ml_ejecuciones
+
+    Returns:
+        dict: ejecucion_id, clientes, segundos y distribución de clasificaciones
+
+    Raises:
+        ValueError: Si el modelo no existe o no tiene artefacto
+    """
+    registro = MLModelo.get_by_nombre(modelo_nombre)
+    if not registro or not registro.get('artefacto'):
+        raise ValueError(f"El modelo '{modelo_nombre}' no existe o no tiene artefacto entrenado")
+    modelo = ModeloScoring.cargar(registro['artefacto'])
+
+    inicio = time.perf_counter()
+    corte = date.today()
+    procesos = procesos or os.cpu_count() or 1
+    ejecucion_id = MLEjecucion.create(
+        registro['id'], fecha_datos_hasta=corte, estado='en_proceso',
+        parametros=json.dumps({'artefacto': registro['artefacto'], 'version': registro['version'],
+                               'version_caracteristicas': caracteristicas.VERSION,
+                               'tamano_lote': tamano_lote, 'procesos': procesos}),
+        usuario_ejecutor=usuario or 'puntuar_clientes.py'
+    )
+    if not ejecucion_id:
+        raise RuntimeError("No se pudo registrar la ejecución")
+
+    etapas = _Etapas()
+    try:
+        def seleccionar():
+            refresco = caracteristicas.refrescar()
+            datos = caracteristicas.snapshot()
+            datos['refresco'] = refresco
+            return datos
+
+        datos = etapas.medir('selection', seleccionar, lambda d: {
+            'clientes': len(d['codigos']),
+            'clientes_recalculados': d['refresco']['clientes_recalculados'],
+            'version_caracteristicas': d['version'],
+        })
+        columnas = [FEATURES.index(f) for f in modelo.features]
+        X = etapas.medir('preprocessing', lambda: modelo.imputar(datos['X'][:, columnas]),
+                         lambda _: {'faltantes_imputados': int(np.isnan(datos['X'][:, columnas]).sum())})
+        Z = etapas.medir('transformation', lambda: modelo.transformar(X),
+                         lambda Z: {'fuera_de_rango': int((np.abs(Z) > 5).any(axis=1).sum())})
+
+        lotes = [(modelo, ejecucion_id, datos['codigos'][i:i + tamano_lote], X[i:i + tamano_lote],
+                  Z[i:i + tamano_lote], datos['saldos'][i:i + tamano_lote])
+                 for i in range(0, len(X), tamano_lote)]
+
+        def scoring():
+            if procesos > 1 and len(X) >= MIN_CLIENTES_POOL:
+                with ProcessPoolExecutor(max_workers=procesos) as pool:
+                    return [fila for filas in pool.map(_puntuar_lote, lotes) for fila in filas]
+            return [fila for lote in lotes for fila in _puntuar_lote(lote)]
+
+        filas = etapas.medir('data_mining', scoring,
+                             lambda f: {'lotes': len(lotes), 'procesos': procesos if len(lotes) > 1 else 1})
+
+        def interpretar():
+            probabilidad = np.fromiter((f[4] for f in filas), np.float64, len(filas))
+            recuperable = np.fromiter((f[6] for f in filas), np.float64, len(filas))
+            saldo_total = float(datos['saldos'].sum())
+            clases, conteos = np.unique([f[3] for f in filas], return_counts=True)
+            metricas = dict(modelo.metricas)
+            metricas['tasa_recuperacion_predicha'] = round(float(recuperable.sum()) / saldo_total, 4) if saldo_total else None
+            metricas['custom'] = {
+                'clasificaciones': {str(c): int(n) for c, n in zip(clases, conteos)},
+                'probabilidad_promedio': round(float(probabilidad.mean()), 4) if len(filas) else None,
+                'saldo_total': round(saldo_total, 2),
+                'version_modelo': registro['version'],
+                'clientes_entrenamiento': modelo.metricas.get('clientes_entrenamiento'),
+                'monto_recuperable_total': round(float(recuperable.sum()), 2),
+            }
+            return metricas
+
+        metricas = etapas.medir('interpretation', interpretar, lambda m: m['custom'])
+        _escribir(ejecucion_id, filas, metricas, etapas.registros, time.perf_counter() - inicio, corte)
+    except Exception as e:
+        execute_query("UPDATE ml_ejecuciones SET estado = 'error', notas = %s WHERE id = %s",
+                      (str(e)[:1000], ejecucion_id))
+        raise
+
+    CobranzaWorklist.refrescar_ejecucion(ejecucion_id)
+
+    return {
+        'ejecucion_id': ejecucion_id,
+        'clientes': len(filas),
+        'clasificaciones': metricas['custom']['clasificaciones'],
+        'tasa_recuperacion_predicha': metricas['tasa_recuperacion_predicha'],
+        'etapas': {r[0]: r[3] for r in etapas.registros},
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+
+
+# ==================== ENTRENAMIENTO ====================
+
+def entrenar(modelo_nombre=MODELO_DEFAULT, horizonte=HORIZONTE_DIAS):
+    """
+    Entrena con la historia de la cartera y registra el artefacto en ml_modelos
+
+    Las características se calculan al corte hoy - horizonte y la etiqueta es
+    si el cliente pagó al menos la mitad de su saldo en el horizonte.
+
+    Returns:
+        dict: modelo_id, artefacto, version y métricas de validación
+    """
+    corte = date.today() - timedelta(days=horizonte)
+    datos = caracteristicas.cargar_caracteristicas(corte)
+    con_saldo = datos['saldos'] > 0
+    y_pago, y_dias = cargar_etiquetas(datos['cliente_ids'], datos['saldos'], corte, horizonte)
+    modelo = ModeloScoring.entrenar(datos['X'][con_saldo], y_pago[con_saldo], y_dias[con_saldo])
+
+    version = datetime.now().strftime('%Y.%m.%d.%H%M')
+    ruta = os.path.join(Config.ML_MODELS_FOLDER, f"scoring_cobranza_{version.replace('.', '')}.npz")
+    modelo.guardar(ruta)
+
+    variables = json.dumps(list(modelo.features))
+    registro = MLModelo.get_by_nombre(modelo_nombre)
+    if registro:
+        modelo_id = registro['id']
+    else:
+        modelo_id = MLModelo.create(
+            modelo_nombre,
+            'Regresión logística sobre el historial de facturas, pagos y seguimientos de cada cliente',
+            'clasificacion', 'Regresión Logística', version,
+            f'Estimar la probabilidad de cobrar al menos la mitad del saldo en {horizonte} días '
+            'y los días hasta el pago', variables)
+        if not modelo_id:
+            raise RuntimeError("No se pudo registrar el modelo")
+
+    importancias = modelo.importancias()
+    ok = execute_transaction([
+        ("""
+            UPDATE ml_modelos
+            SET artefacto = %s, version = %s, variables_entrada = %s, activo = 1
+            WHERE id = %s
+        """, (ruta, version, variables, modelo_id)),
+        ("DELETE FROM ml_features WHERE modelo_id = %s", (modelo_id,)),
+        ("""
+            INSERT INTO ml_features (modelo_id, nombre_feature, tipo_dato, fuente_dato, importancia)
+            VALUES (%s, %s, 'numerico', %s, %s)
+        """, [(modelo_id, f, 'cobranza_seguimientos' if f in ('numero_promesas_incumplidas', 'contactos_realizados')
+               else 'clientes' if f in ('limite_credito', 'antiguedad_cliente') else 'facturas/pagos',
+               importancias[f]) for f in modelo.features]),
+    ])
+    if not ok:
+        raise RuntimeError("No se pudo registrar el artefacto del modelo")
+
+    return {'modelo_id': modelo_id, 'artefacto': ruta, 'version': version,
+            'corte': corte.isoformat(), 'metricas': modelo.metricas}
@@ -0,0 +1,202 @@
+"""
+Backends del almacén de documentos: disco local o S3 compatible (AWS, MinIO)
+
+storage.py decide las claves (ab/cd/<sha256> y sus derivados) y el backend
+solo guarda y entrega bytes bajo una clave. Con DOCUMENTS_STORAGE='s3' todos
+los nodos web comparten el bucket: un documento subido en un nodo se descarga
+desde cualquier otro sin montar una carpeta compartida.
+
+Interfaz común:
+    existe(clave), subir(ruta_local, clave, mover), abrir(clave),
+    copia_local(clave), borrar(clave), uri(clave), ruta_local(clave),
+    url_descarga(clave, nombre, mimetype)
+"""
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from config import Config
+
+# Partes de la subida multipart a S3 (el mínimo de S3 es 5 MB)
+TAMANO_PARTE = 8 * 1024 * 1024
+SUBIDAS_CONCURRENTES = 4
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+class BackendLocal:
+    """Blobs en una carpeta del disco (un solo nodo, o carpeta montada en todos)"""
+
+    nombre = 'local'
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def ruta_local(self, clave):
+        return os.path.join(self.raiz, *clave.split('/'))
+
+    def uri(self, clave):
+        return self.ruta_local(clave)
+
+    def existe(self, clave):
+        return os.path.exists(self.ruta_local(clave))
+
+    def subir(self, ruta_local, clave, mover=False):
+        destino = self.ruta_local(clave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if mover:
+            # El temporal está en la misma carpeta raíz: el rename es atómico
+            os.replace(ruta_local, destino)
+            return
+        tmp = f'{destino}.{os.getpid()}.tmp'
+        try:
+            shutil.copyfile(ruta_local, tmp)
+            os.replace(tmp, destino)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def abrir(self, clave):
+        return open(self.ruta_local(clave), 'rb')
+
+    @contextmanager
+    def copia_local(self, clave):
+        yield self.ruta_local(clave)
+
+    def borrar(self, clave):
+        try:
+            os.remove(self.ruta_local(clave))
+        except FileNotFoundError:
+            pass
+
+    def url_descarga(self, clave, nombre, mimetype=None):
+        # Se entrega con send_file o con el proxy (DOCUMENTS_ACCEL)
+        return None
+
+
+class BackendS3:
+    """
+    Blobs en un bucket S3 o compatible
+
+    Args:
+        cliente: Cliente de boto3 (o uno con la misma interfaz, p. ej. en tests)
+        bucket: Nombre del bucket
+        prefijo: Prefijo de las claves dentro del bucket
+        expira: Segundos de validez de las URLs firmadas (0: sin URLs firmadas)
+        transferencia: boto3.s3.transfer.TransferConfig para la subida multipart
+    """
+
+    nombre = 's3'
+
+    def __init__(self, cliente, bucket, prefijo='', expira=300, transferencia=None):
+        self.cliente = cliente
+        self.bucket = bucket
+        self.prefijo = prefijo.strip('/') + '/' if prefijo.strip('/') else ''
+        self.expira = expira
+        self.transferencia = transferencia
+
+    def _clave(self, clave):
+        return self.prefijo + clave
+
+    def ruta_local(self, clave):
+        return None
+
+    def uri(self, clave):
+        return f's3://{self.bucket}/{self._clave(clave)}'
+
+    def existe(self, clave):
+        try:
+            self.cliente.head_object(Bucket=self.bucket, Key=self._clave(clave))
+            return True
+        except self.cliente.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def subir(self, ruta_local, clave, mover=False):
+        # upload_file parte los archivos grandes en una subida multipart con
+        # varias partes en paralelo, leyendo del disco sin cargarlos en memoria
+        extra = {}
+        if self.transferencia is not None:
+            extra['Config'] = self.transferencia
+        self.cliente.upload_file(ruta_local, self.bucket, self._clave(clave), **extra)
+        if mover:
+            os.remove(ruta_local)
+
+    def abrir(self, clave):
+        return self.cliente.get_object(Bucket=self.bucket, Key=self._clave(clave))['Body']
+
+    @contextmanager
+    def copia_local(self, clave):
+        descriptor, ruta = tempfile.mkstemp(prefix='blob-')
+        os.close(descriptor)
+        try:
+            self.cliente.download_file(self.bucket, self._clave(clave), ruta)
+            yield ruta
+        finally:
+            os.remove(ruta)
+
+    def borrar(self, clave):
+        self.cliente.delete_object(Bucket=self.bucket, Key=self._clave(clave))
+
+    def url_descarga(self, clave, nombre, mimetype=None):
+        """URL firmada de descarga directa desde el bucket (None si están desactivadas)"""
+        if not self.expira:
+            return None
+        params = {'Bucket': self.bucket, 'Key': self._clave(clave)}
+        if nombre:
+            params['ResponseContentDisposition'] = f'attachment; filename="{nombre}"'
+        if mimetype:
+            params['ResponseContentType'] = mimetype
+        return self.cliente.generate_presigned_url('get_object', Params=params, ExpiresIn=self.expira)
+
+
+def crear_backend(tipo=None):
+    """
+    Crea un backend según la configuración
+
+    Args:
+        tipo: 'local' o 's3' (default: DOCUMENTS_STORAGE)
+    """
+    tipo = (tipo or Config.DOCUMENTS_STORAGE).lower()
+    if tipo == 'local':
+        return BackendLocal(Config.DOCUMENTS_FOLDER)
+    if tipo != 's3':
+        raise ValueError(f"DOCUMENTS_STORAGE desconocido: {tipo}")
+    if not Config.S3_BUCKET:
+        raise ValueError('S3_BUCKET no está configurado')
+
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+
+    cliente = boto3.client(
+        's3',
+        endpoint_url=Config.S3_ENDPOINT_URL or None,
+        region_name=Config.S3_REGION,
+        # Sin credenciales explícitas usa la cadena de boto3 (variables AWS_*, rol IAM)
+        aws_access_key_id=Config.S3_ACCESS_KEY_ID or None,
+        aws_secret_access_key=Config.S3_SECRET_ACCESS_KEY or None,
+        # MinIO y la mayoría de servicios compatibles requieren path-style
+        config=BotoConfig(signature_version='s3v4',
+                          s3={'addressing_style': 'path' if Config.S3_ENDPOINT_URL else 'auto'}),
+    )
+    transferencia = TransferConfig(multipart_threshold=TAMANO_PARTE, multipart_chunksize=TAMANO_PARTE,
+                                   max_concurrency=SUBIDAS_CONCURRENTES)
+    return BackendS3(cliente, Config.S3_BUCKET, Config.S3_PREFIX,
+                     expira=Config.S3_PRESIGNED_SEGUNDOS, transferencia=transferencia)
+
+
+def backend():
+    """Backend configurado (el cliente S3 se crea una vez por proceso)"""
+    global _s3
+    if Config.DOCUMENTS_STORAGE != 's3':
+        return BackendLocal(Config.DOCUMENTS_FOLDER)
+    with _s3_lock:
+        # Los clientes de boto3 no sobreviven a un fork (workers, pool de miniaturas)
+        if _s3 is None or _s3[0] != os.getpid():
+            _s3 = (os.getpid(), crear_backend('s3'))
+        return _s3[1]
@@ -0,0 +1,298 @@
+"""
+Índice de texto completo sobre el contenido de los documentos
+
+Al subir un documento, un hilo en segundo plano extrae su texto (PDF, DOCX,
+XLSX, TXT), lo parte en pasajes y los guarda en documento_pasajes, que tiene
+un índice FULLTEXT de MySQL. La búsqueda ordena pasajes por relevancia de
+MATCH ... AGAINST y devuelve el mejor pasaje de cada documento con un
+fragmento alrededor de los términos buscados.
+
+El título y la descripción se indexan como pasaje 0, así que un documento se
+encuentra aunque no se pueda extraer texto de su archivo.
+"""
+import logging
+import re
+import threading
+import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+from database import execute_query, execute_transaction
+from models import normalizar_texto
+from modules.documents import storage
+
+logger = logging.getLogger(__name__)
+
+TAMANO_PASAJE = 1200
+MAX_CARACTERES = 2_000_000
+ANCHO_FRAGMENTO = 240
+MAX_RESULTADOS = 50
+LOTE_INDEXACION = 20
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_S = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+# Un solo hilo: la extracción no compite con las peticiones por CPU
+_indexador = ThreadPoolExecutor(max_workers=1, thread_name_prefix='indice-documentos')
+_indexando = threading.Lock()
+
+
+# ==================== EXTRACCIÓN ====================
+
+def _texto_txt(ruta):
+    with open(ruta, 'rb') as f:
+        crudo = f.read(MAX_CARACTERES * 4)
+    try:
+        return crudo.decode('utf-8')
+    except UnicodeDecodeError:
+        return crudo.decode('latin-1')
+
+
+def _texto_docx(ruta):
+    with zipfile.ZipFile(ruta) as docx:
+        raiz = ElementTree.fromstring(docx.read('word/document.xml'))
+    return '\n'.join(''.join(t.text or '' for t in p.iter(f'{_W}t')) for p in raiz.iter(f'{_W}p'))
+
+
+def _texto_xlsx(ruta):
+    lineas = []
+    with zipfile.ZipFile(ruta) as xlsx:
+        compartidas = []
+        if 'xl/sharedStrings.xml' in xlsx.namelist():
+            raiz = ElementTree.fromstring(xlsx.read('xl/sharedStrings.xml'))
+            compartidas = [''.join(t.text or '' for t in si.iter(f'{_S}t')) for si in raiz.iter(f'{_S}si')]
+        hojas = sorted(n for n in xlsx.namelist() if re.match(r'xl/worksheets/sheet\d+\.xml$', n))
+        for hoja in hojas:
+            raiz = ElementTree.fromstring(xlsx.read(hoja))
+            for fila in raiz.iter(f'{_S}row'):
+                celdas = []
+                for celda in fila.iter(f'{_S}c'):
+                    valor = celda.find(f'{_S}v')
+                    if celda.get('t') == 's' and valor is not None:
+                        celdas.append(compartidas[int(valor.text)])
+                    elif celda.get('t') == 'inlineStr':
+                        celdas.append(''.join(t.text or '' for t in celda.iter(f'{_S}t')))
+                    elif valor is not None and valor.text:
+                        celdas.append(valor.text)
+                if celdas:
+                    lineas.append(' | '.join(celdas))
+    return '\n'.join(lineas)
+
+
+def _texto_pdf(ruta):
+    from pypdf import PdfReader
+
+    return '\n'.join(pagina.extract_text() or '' for pagina in PdfReader(ruta).pages)
+
+
+EXTRACTORES = {
+    'txt': _texto_txt,
+    'docx': _texto_docx,
+    'xlsx': _texto_xlsx,
+    'pdf': _texto_pdf,
+}
+
+
+def extraer_texto(ruta, tipo_archivo):
+    """
+    Texto plano de un archivo según su tipo
+
+    Returns:
+        str: Texto extraído ('' si el tipo no tiene extractor, p. ej. imágenes)
+    """
+    extractor = EXTRACTORES.get((tipo_archivo or '').lower())
+    if extractor is None:
+        return ''
+    return extractor(ruta)[:MAX_CARACTERES]
+
+
+def pasajes(texto, tamano=TAMANO_PASAJE):
+    """
+    Parte un texto en pasajes de hasta `tamano` caracteres por párrafos
+
+    Los párrafos más largos que un pasaje se cortan por oraciones y, si hace
+    falta, por tamaño.
+    """
+    bloques = []
+    for parrafo in re.split(r'\n\s*\n|\r?\n', texto):
+        parrafo = re.sub(r'\s+', ' ', parrafo).strip()
+        if len(parrafo) <= tamano:
+            bloques.append(parrafo)
+            continue
+        for oracion in re.split(r'(?<=[.!?;])\s+', parrafo):
+            bloques.extend(oracion[i:i + tamano] for i in range(0, len(oracion), tamano))
+
+    resultado, actual = [], ''
+    for bloque in filter(None, bloques):
+        if actual and len(actual) + 1 + len(bloque) > tamano:
+            resultado.append(actual)
+            actual = bloque
+        else:
+            actual = f'{actual} {bloque}' if actual else bloque
+    if actual:
+        resultado.append(actual)
+    return resultado
+
+
+def _plegar(texto):
+    """Minúsculas sin acentos conservando la posición de cada carácter"""
+    return ''.join(unicodedata.normalize('NFKD', c)[0].lower()[:1] for c in texto)
+
+
+def fragmento(texto, consulta, ancho=ANCHO_FRAGMENTO):
+    """Recorte de `texto` centrado en la primera aparición de algún término de la consulta"""
+    if len(texto) <= ancho:
+        return texto
+    terminos = [t for t in normalizar_texto(consulta).split() if len(t) > 2]
+    plegado = _plegar(texto)
+    posiciones = [plegado.find(t) for t in terminos]
+    posiciones = [p for p in posiciones if p >= 0]
+    centro = min(posiciones) if posiciones else 0
+    inicio = max(0, min(centro - ancho // 3, len(texto) - ancho))
+    recorte = texto[inicio:inicio + ancho].strip()
+    return ('…' if inicio > 0 else '') + recorte + ('…' if inicio + ancho < len(texto) else '')
+
+
+# ==================== INDEXACIÓN ====================
+
+def _indexar_documento(doc):
+    """Extrae y guarda los pasajes de un documento; devuelve (estado, pasajes)"""
+    encabezado = ' '.join(filter(None, [doc['titulo'], doc.get('descripcion')]))
+    try:
+        with storage.copia_local(doc) as ruta:
+            texto = extraer_texto(ruta, doc['tipo_archivo'])
+        estado, error = ('indexado' if texto.strip() else 'sin_texto'), None
+    except Exception as e:
+        logger.warning(f"No se pudo extraer texto del documento {doc['id']}: {e}")
+        texto, estado, error = '', 'error', str(e)[:255]
+
+    filas = [(doc['id'], orden, p) for orden, p in enumerate([encabezado] + pasajes(texto))]
+    ok = execute_transaction([
+        ("DELETE FROM documento_pasajes WHERE documento_id = %s", (doc['id'],)),
+        ("INSERT INTO documento_pasajes (documento_id, orden, texto) VALUES (%s, %s, %s)", filas),
+        ("""
+            INSERT INTO documento_indice (documento_id, estado, pasajes, caracteres, error)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE estado = VALUES(estado), pasajes = VALUES(pasajes),
+                caracteres = VALUES(caracteres), error = VALUES(error), fecha_indexado = NOW()
+        """, (doc['id'], estado, len(filas), len(texto), error)),
+    ])
+    if not ok:
+        raise RuntimeError(f"Error al guardar el índice del documento {doc['id']}")
+    return estado, len(filas)
+
+
+def indexar_pendientes(reindexar=False):
+    """
+    Indexa los documentos activos que aún no están en el índice
+
+    Args:
+        reindexar: Vuelve a indexar todos los documentos activos
+
+    Returns:
+        dict: documentos, indexado, sin_texto, error (conteo por estado) y pasajes
+    """
+    reporte = {'documentos': 0, 'indexado': 0, 'sin_texto': 0, 'error': 0, 'pasajes': 0}
+    # Evita que dos subidas seguidas lancen dos pasadas sobre los mismos documentos
+    with _indexando:
+        ultimo_id = 0
+        while True:
+            filtro = "" if reindexar else "AND i.documento_id IS NULL"
+            documentos = execute_query(f"""
+                SELECT d.id, d.titulo, d.descripcion, d.ruta_archivo, d.tipo_archivo, d.sha256
+                FROM documentos d
+                LEFT JOIN documento_indice i ON i.documento_id = d.id
+                WHERE d.activo = TRUE AND d.id > %s {filtro}
+                ORDER BY d.id
+                LIMIT %s
+            """, (ultimo_id, LOTE_INDEXACION), fetch=True)
+            if documentos is None:
+                raise RuntimeError('Error al consultar los documentos por indexar')
+            if not documentos:
+                return reporte
+
+            for doc in documentos:
+                estado, total = _indexar_documento(doc)
+                reporte['documentos'] += 1
+                reporte[estado] += 1
+                reporte['pasajes'] += total
+            ultimo_id = documentos[-1]['id']
+
+
+def _indexar_en_segundo_plano():
+    try:
+        reporte = indexar_pendientes()
+        if reporte['documentos']:
+            logger.info(f"Índice de documentos: {reporte}")
+    except Exception as e:
+        logger.error(f"Error al indexar documentos: {e}")
+
+
+def en_segundo_plano(tarea):
+    """Encola una tarea en el hilo del índice (las tareas corren en orden de llegada)"""
+    _indexador.submit(tarea)
+
+
+def programar_indexacion():
+    """Encola la indexación de documentos nuevos sin bloquear la petición"""
+    en_segundo_plano(_indexar_en_segundo_plano)
+
+
+# ==================== BÚSQUEDA ====================
+
+def buscar_pasajes(consulta, categoria=None, limit=10):
+    """
+    Pasajes más relevantes para una consulta (FULLTEXT, modo lenguaje natural)
+
+    Returns:
+        list: [{documento_id, titulo, categoria, nombre_archivo, orden, texto, relevancia}]
+    """
+    consulta = (consulta or '').strip()
+    if not consulta:
+        raise ValueError('La consulta está vacía')
+    limit = max(1, min(int(limit), MAX_RESULTADOS * 5))
+
+    filtro, params = "", [consulta, consulta]
+    if categoria:
+        filtro = "AND d.categoria = %s"
+        params.append(categoria)
+    filas = execute_query(f"""
+        SELECT p.documento_id, p.orden, p.texto, d.titulo, d.categoria, d.nombre_archivo,
+               MATCH(p.texto) AGAINST (%s IN NATURAL LANGUAGE MODE) AS relevancia
+        FROM documento_pasajes p
+        JOIN documentos d ON d.id = p.documento_id AND d.activo = TRUE
+        WHERE MATCH(p.texto) AGAINST (%s IN NATURAL LANGUAGE MODE) {filtro}
+        ORDER BY relevancia DESC, p.documento_id, p.orden
+        LIMIT %s
+    """, tuple(params + [limit]), fetch=True)
+    if filas is None:
+        raise RuntimeError('Error al buscar en los documentos')
+    for fila in filas:
+        fila['relevancia'] = round(float(fila['relevancia']), 4)
+    return filas
+
+
+def buscar(consulta, categoria=None, limit=10):
+    """
+    Documentos que coinciden con la consulta, con el fragmento de su mejor pasaje
+
+    Returns:
+        list: [{documento_id, titulo, categoria, nombre_archivo, relevancia, fragmento}]
+    """
+    limit = max(1, min(int(limit), MAX_RESULTADOS))
+    resultados = {}
+    for p in buscar_pasajes(consulta, categoria, limit * 5):
+        if p['documento_id'] in resultados:
+            continue
+        resultados[p['documento_id']] = {
+            'documento_id': p['documento_id'],
+            'titulo': p['titulo'],
+            'categoria': p['categoria'],
+            'nombre_archivo': p['nombre_archivo'],
+            'relevancia': p['relevancia'],
+            'fragmento': fragmento(p['texto'], consulta),
+        }
+        if len(resultados) == limit:
+            break
+    return list(resultados.values())
@@ -0,0 +1,205 @@
+"""
+Miniaturas y vistas previas de documentos, generadas en segundo plano
+
+Junto a cada blob del almacén (modules/documents/storage.py), en el mismo
+backend, se guarda:
+- <clave>.miniatura.png: primera página de PDFs (con pdftoppm de poppler) o
+  la imagen reducida, de MAX_ANCHO × MAX_ALTO como máximo.
+- <clave>.vista.txt: el inicio del texto de TXT, DOCX y XLSX (y de PDFs si
+  pdftoppm no está instalado).
+
+El renderizado corre en un pool de procesos acotado (MINIATURAS_PROCESOS) y
+nunca hay más de MAX_PENDIENTES trabajos en cola: si el pool está saturado la
+subida no espera, y el documento queda para generar_miniaturas.py. Como el
+nombre es el hash del contenido, la vista previa se comparte entre documentos
+idénticos y el hash sirve de ETag.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+from modules.documents import storage
+
+logger = logging.getLogger(__name__)
+
+MAX_ANCHO = 320
+MAX_ALTO = 448
+MAX_CARACTERES_VISTA = 1500
+MAX_PENDIENTES = 32
+TIMEOUT_PDF_SEGUNDOS = 30
+
+TIPOS_IMAGEN = ('png', 'jpg', 'jpeg')
+TIPOS_TEXTO = ('txt', 'docx', 'xlsx')
+
+_pool = None
+_pool_lock = threading.Lock()
+_cupos = threading.BoundedSemaphore(MAX_PENDIENTES)
+
+
+def claves(sha256):
+    """(miniatura .png, vista de texto .txt) de un blob"""
+    return tuple(storage.clave_derivado(sha256, sufijo) for sufijo in storage.SUFIJOS_DERIVADOS)
+
+
+def soportado(tipo_archivo):
+    return (tipo_archivo or '').lower() in TIPOS_IMAGEN + TIPOS_TEXTO + ('pdf',)
+
+
+def _escribir(clave, escribir):
+    """Escribe a un temporal y lo sube completo al backend para no servir archivos a medias"""
+    descriptor, tmp = tempfile.mkstemp(dir=storage.carpeta_temporal())
+    os.close(descriptor)
+    try:
+        escribir(tmp)
+        storage.backend().subir(tmp, clave, mover=True)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _miniatura_imagen(origen, destino):
+    from PIL import Image
+
+    with Image.open(origen) as imagen:
+        # En JPEG decodifica directamente a una escala menor
+        imagen.draft('RGB', (MAX_ANCHO * 2, MAX_ALTO * 2))
+        imagen.thumbnail((MAX_ANCHO, MAX_ALTO))
+        if imagen.mode not in ('RGB', 'RGBA', 'L'):
+            imagen = imagen.convert('RGBA')
+        _escribir(destino, lambda tmp: imagen.save(tmp, format='PNG', optimize=True))
+
+
+def _miniatura_pdf(origen, destino):
+    """Primera página con pdftoppm; False si no está instalado"""
+    pdftoppm = shutil.which('pdftoppm')
+    if not pdftoppm:
+        return False
+
+    def renderizar(tmp):
+        # pdftoppm agrega la extensión .png al prefijo de salida
+        subprocess.run(
+            [pdftoppm, '-png', '-f', '1', '-l', '1', '-singlefile',
+             '-scale-to-x', str(MAX_ANCHO), '-scale-to-y', '-1', origen, tmp],
+            check=True, timeout=TIMEOUT_PDF_SEGUNDOS, capture_output=True
+        )
+        os.replace(tmp + '.png', tmp)
+
+    _escribir(destino, renderizar)
+    return True
+
+
+def _vista_texto(origen, tipo, destino):
+    from modules.documents.indice import extraer_texto
+
+    texto = extraer_texto(origen, tipo)[:MAX_CARACTERES_VISTA * 2]
+    texto = '\n'.join(linea.rstrip() for linea in texto.splitlines() if linea.strip())
+
+    def escribir(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(texto[:MAX_CARACTERES_VISTA])
+
+    _escribir(destino, escribir)
+
+
+def generar(sha256, tipo_archivo):
+    """
+    Genera la vista previa de un blob (se ejecuta en el pool de procesos)
+
+    Returns:
+        str: 'miniatura', 'texto' o None si el tipo no tiene vista previa
+    """
+    tipo = (tipo_archivo or '').lower()
+    if not soportado(tipo):
+        return None
+    miniatura, vista = claves(sha256)
+    with storage.copia_local({'sha256': sha256}) as origen:
+        if tipo in TIPOS_IMAGEN:
+            _miniatura_imagen(origen, miniatura)
+            return 'miniatura'
+        if tipo == 'pdf' and _miniatura_pdf(origen, miniatura):
+            return 'miniatura'
+        _vista_texto(origen, tipo, vista)
+        return 'texto'
+
+
+def existente(doc):
+    """(clave, mimetype) de la vista previa ya generada de un documento, o None"""
+    if not doc.get('sha256') or not soportado(doc.get('tipo_archivo')):
+        return None
+    almacen = storage.backend()
+    miniatura, vista = claves(doc['sha256'])
+    if almacen.existe(miniatura):
+        return miniatura, 'image/png'
+    if almacen.existe(vista):
+        return vista, 'text/plain; charset=utf-8'
+    return None
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, Config.MINIATURAS_PROCESOS))
+        return _pool
+
+
+def _terminado(futuro, doc_id):
+    _cupos.release()
+    error = futuro.exception()
+    if error is not None:
+        logger.warning(f"No se pudo generar la vista previa del documento {doc_id}: {error}")
+
+
+def programar(doc):
+    """
+    Encola la vista previa de un documento sin bloquear la petición
+
+    Returns:
+        bool: False si no aplica o el pool está saturado (queda para el backfill)
+    """
+    if not doc.get('sha256') or not soportado(doc.get('tipo_archivo')) or existente(doc):
+        return False
+    if not _cupos.acquire(blocking=False):
+        return False
+    try:
+        futuro = _obtener_pool().submit(generar, doc['sha256'], doc['tipo_archivo'])
+    except Exception:
+        _cupos.release()
+        raise
+    futuro.add_done_callback(lambda f: _terminado(f, doc.get('id')))
+    return True
+
+
+def generar_pendientes(documentos, procesos=None):
+    """
+    Genera las vistas previas que faltan de una lista de documentos
+
+    Returns:
+        dict: documentos, generados (por tipo), omitidos y errores
+    """
+    reporte = {'documentos': len(documentos), 'miniatura': 0, 'texto': 0, 'omitidos': 0, 'errores': 0}
+    trabajos = {}
+    vistos = set()
+    with ProcessPoolExecutor(max_workers=max(1, procesos or Config.MINIATURAS_PROCESOS)) as pool:
+        for doc in documentos:
+            sha256 = doc.get('sha256')
+            if not sha256 or sha256 in vistos or not soportado(doc.get('tipo_archivo')) or existente(doc):
+                reporte['omitidos'] += 1
+                continue
+            vistos.add(sha256)
+            trabajos[pool.submit(generar, sha256, doc['tipo_archivo'])] = doc['id']
+
+        for futuro, doc_id in trabajos.items():
+            try:
+                tipo = futuro.result()
+                if tipo:
+                    reporte[tipo] += 1
+            except Exception as e:
+                logger.warning(f"Vista previa del documento {doc_id}: {e}")
+                reporte['errores'] += 1
+    return reporte
@@ -1,8 +1,9 @@
 import logging
-import uuid
-from flask import render_template, request, redirect, url_for, flash, session, send_file, abort
-from modules.documents import documents_bp
+import mimetypes
+from flask import render_template, request, redirect, url_for, flash, session, send_file, abort, Response
+from modules.documents import documents_bp, indice, miniaturas, storage
 from modules.auth.routes import login_required
+from modules.chatbot import conocimiento
 from models import Document
 from werkzeug.utils import secure_filename
 import os
@@ -44,6 +45,16 @@ def validate_file_mime(file, extension):
 def index():
     """Lista de documentos"""
     categoria = request.args.get('categoria')
+    consulta = request.args.get('q', '').strip()
+
+    resultados = None
+    if consulta:
+        try:
+            resultados = indice.buscar(consulta, categoria=categoria, limit=20)
+        except RuntimeError as e:
+            logger.error(f"Búsqueda de documentos '{consulta}': {e}")
+            flash('No se pudo realizar la búsqueda', 'danger')
+            resultados = []
 
     if categoria:
         documents = Document.get_by_category(categoria)
@@ -52,7 +63,9 @@ def index():
 
     return render_template('documents/index.html',
                          documents=documents,
-                         selected_category=categoria)
+                         selected_category=categoria,
+                         consulta=consulta,
+                         resultados=resultados)
 
 @documents_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
@@ -89,53 +102,137 @@ def upload():
             flash('El tipo de archivo no coincide con su extensión', 'danger')
             return render_template('documents/upload.html')
 
-        # Crear directorio de uploads si no existe
-        upload_folder = Config.UPLOAD_FOLDER
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
-
-        # Generar nombre único para evitar colisiones y path traversal
-        unique_filename = f"{uuid.uuid4().hex}_{original_filename}"
-        filepath = os.path.join(upload_folder, unique_filename)
-        file.save(filepath)
-
-        # Obtener información del archivo
-        file_size = os.path.getsize(filepath)
+        # Guardar por contenido: subidas idénticas comparten el mismo archivo
+        blob = storage.guardar(file.stream)
 
         # Guardar en base de datos
-        Document.create(
+        creado = Document.create(
             titulo=titulo,
             descripcion=descripcion,
             categoria=categoria,
             nombre_archivo=original_filename,
-            ruta_archivo=filepath,
-            tamanio=file_size,
+            ruta_archivo=blob['ruta'],
+            tamanio=blob['tamanio'],
             tipo_archivo=file_ext,
-            subido_por=session['user_id']
+            subido_por=session['user_id'],
+            sha256=blob['sha256']
         )
+        if not creado:
+            storage.descartar(blob)
+            flash('No se pudo registrar el documento', 'danger')
+            return render_template('documents/upload.html')
+
+        # Extraer el texto para la búsqueda (y luego vectorizarlo para el
+        # chatbot) sin hacer esperar al usuario
+        indice.programar_indexacion()
+        conocimiento.programar_sincronizacion()
+        miniaturas.programar({'sha256': blob['sha256'], 'tipo_archivo': file_ext})
 
         flash('Documento subido exitosamente', 'success')
         return redirect(url_for('documents.index'))
 
     return render_template('documents/upload.html')
 
+def es_descarga_nueva():
+    """Un cliente que reanuda (Range desde un byte > 0) no cuenta como otra descarga"""
+    rango = request.range
+    return rango is None or not rango.ranges or rango.ranges[0][0] == 0
+
+
+def respuesta_proxy(doc, filepath):
+    """Respuesta vacía que delega el envío del archivo a nginx o Apache"""
+    nombre = doc.get('nombre_archivo', 'documento')
+    response = Response(mimetype=mimetypes.guess_type(nombre)[0] or 'application/octet-stream')
+    if Config.DOCUMENTS_ACCEL == 'nginx':
+        relativa = os.path.relpath(filepath, Config.DOCUMENTS_FOLDER).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = Config.DOCUMENTS_ACCEL_PREFIX.rstrip('/') + '/' + relativa
+    else:
+        response.headers['X-Sendfile'] = os.path.abspath(filepath)
+    response.headers.set('Content-Disposition', 'attachment', filename=nombre)
+    response.set_etag(doc['sha256'])
+    return response
+
+
+def descarga_remota(doc, almacen):
+    """Descarga desde un backend remoto: URL firmada del bucket o el archivo a través de la app"""
+    nombre = doc.get('nombre_archivo', 'documento')
+    clave = storage.clave(doc['sha256'])
+    url = almacen.url_descarga(clave, nombre, mimetypes.guess_type(nombre)[0])
+    if url:
+        # El bucket atiende los Range y la transferencia sin ocupar un worker
+        return redirect(url)
+    return send_file(almacen.abrir(clave), as_attachment=True, download_name=nombre,
+                     etag=doc['sha256'], conditional=True)
+
+
 @documents_bp.route('/download/<int:doc_id>')
 @login_required
 def download(doc_id):
-    """Descargar documento"""
+    """Descargar documento (ETag por SHA-256, Range y entrega opcional por el proxy o el bucket)"""
     doc = Document.get_by_id(doc_id)
     if not doc:
         flash('Documento no encontrado', 'danger')
         return redirect(url_for('documents.index'))
 
-    filepath = doc.get('ruta_archivo') or doc.get('ruta')
-    if not filepath or not os.path.exists(filepath):
+    # El contenido de un hash no cambia: no hace falta consultar el backend
+    etag = doc.get('sha256')
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    if not storage.disponible(doc):
         flash('El archivo no está disponible en el servidor', 'danger')
         return redirect(url_for('documents.index'))
 
-    Document.increment_downloads(doc_id)
+    if es_descarga_nueva():
+        Document.increment_downloads(doc_id)
+
+    filepath = doc.get('ruta_archivo')
+    if etag:
+        almacen = storage.backend()
+        filepath = almacen.ruta_local(storage.clave(etag))
+        if filepath is None:
+            return descarga_remota(doc, almacen)
+        # Solo los blobs del almacén (con sha256) viven bajo la location del proxy
+        if Config.DOCUMENTS_ACCEL in ('nginx', 'apache'):
+            return respuesta_proxy(doc, filepath)
+
+    # conditional=True responde 304/206 según If-None-Match y Range
     return send_file(
         filepath,
         as_attachment=True,
-        download_name=doc.get('nombre_archivo', 'documento')
+        download_name=doc.get('nombre_archivo', 'documento'),
+        etag=etag or True,
+        conditional=True
     )
+
+
+@documents_bp.route('/preview/<int:doc_id>')
+@login_required
+def preview(doc_id):
+    """Miniatura (PNG) o inicio del texto de un documento, cacheable por su hash"""
+    doc = Document.get_by_id(doc_id)
+    if not doc:
+        abort(404)
+
+    etag = f"{doc['sha256']}-vista" if doc.get('sha256') else None
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    vista = miniaturas.existente(doc)
+    if vista is None:
+        # Aún no generada (o pool saturado al subir): se encola y el cliente reintenta después
+        miniaturas.programar(doc)
+        abort(404)
+
+    clave, mimetype = vista
+    almacen = storage.backend()
+    response = send_file(almacen.ruta_local(clave) or almacen.abrir(clave), mimetype=mimetype,
+                         etag=etag, conditional=True, max_age=86400)
+    # Contenido con login: solo la caché del navegador, no proxies compartidos
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
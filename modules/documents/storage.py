@@ -0,0 +1,238 @@
+"""
+Almacenamiento de documentos direccionado por contenido
+
+Cada archivo se guarda una sola vez bajo su SHA-256, con la clave:
+
+    ab/cd/abcd1234...
+
+en el backend configurado (modules/documents/backends.py): la carpeta
+DOCUMENTS_FOLDER o un bucket S3 compartido por todos los nodos. La subida se
+copia por bloques a un temporal local mientras se calcula el hash; después se
+sube con su clave definitiva o, si ese contenido ya existía, se descarta el
+temporal. La tabla documento_blobs cuenta cuántos documentos apuntan a cada
+blob, y el hash guardado en documentos.sha256 sirve como ETag de las descargas.
+
+guardar() toma la referencia en documento_blobs antes de decidir si el blob
+ya existe, y liberar() borra los archivos con esa fila bloqueada: una subida
+del mismo contenido nunca descarta su temporal confiando en un blob que se
+está borrando.
+
+Los derivados de un blob (miniatura y vista previa) usan su clave más un
+sufijo y se borran junto con él.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+from config import Config
+from models import Document, DocumentBlob
+from modules.documents.backends import backend
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 64 * 1024
+SUFIJOS_DERIVADOS = ('miniatura.png', 'vista.txt')
+
+
+def clave(sha256):
+    """Clave del blob de un hash (dos niveles de carpetas para no saturar un directorio)"""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def clave_derivado(sha256, sufijo):
+    return f'{clave(sha256)}.{sufijo}'
+
+
+def ruta_blob(sha256):
+    """Ubicación del blob en el backend (ruta local o s3://bucket/clave)"""
+    return backend().uri(clave(sha256))
+
+
+def carpeta_temporal():
+    """Carpeta local de temporales (con el backend local, en el mismo disco que los blobs)"""
+    carpeta = os.path.join(Config.DOCUMENTS_FOLDER, 'tmp')
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def guardar(stream):
+    """
+    Guarda el contenido de un stream en el almacén y devuelve su blob
+
+    Args:
+        stream: Objeto con read(n) (p. ej. FileStorage.stream)
+
+    La referencia queda tomada: el llamador registra el documento o llama a
+    descartar(blob).
+
+    Returns:
+        dict: sha256, tamanio, ruta y nuevo (False si el contenido ya existía)
+
+    Raises:
+        RuntimeError: Si no se pudo registrar la referencia al blob
+    """
+    huella = hashlib.sha256()
+    tamanio = 0
+    descriptor, ruta_tmp = tempfile.mkstemp(dir=carpeta_temporal())
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            while True:
+                bloque = stream.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                huella.update(bloque)
+                destino.write(bloque)
+                tamanio += len(bloque)
+
+        sha256 = huella.hexdigest()
+        almacen = backend()
+        if not DocumentBlob.referenciar(sha256, tamanio, almacen.uri(clave(sha256))):
+            raise RuntimeError('No se pudo registrar el archivo en el almacén')
+    except BaseException:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+
+    try:
+        # Con la referencia tomada nadie borra el blob; si falta (contenido
+        # nuevo o liberado justo antes) se sube. Dos subidas simultáneas del
+        # mismo contenido escriben bytes idénticos
+        nuevo = not almacen.existe(clave(sha256))
+        if nuevo:
+            almacen.subir(ruta_tmp, clave(sha256), mover=True)
+        else:
+            os.remove(ruta_tmp)
+    except BaseException:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        liberar(sha256)
+        raise
+
+    return {'sha256': sha256, 'tamanio': tamanio, 'ruta': almacen.uri(clave(sha256)), 'nuevo': nuevo}
+
+
+def descartar(blob):
+    """Devuelve la referencia de un blob guardado cuyo documento no se pudo registrar"""
+    liberar(blob['sha256'])
+
+
+def liberar(sha256):
+    """Quita una referencia al blob y lo borra (con sus derivados) si ya nadie lo usa"""
+    def borrar():
+        almacen = backend()
+        for c in [clave(sha256)] + [clave_derivado(sha256, s) for s in SUFIJOS_DERIVADOS]:
+            try:
+                almacen.borrar(c)
+            except Exception as e:
+                logger.error(f"No se pudo borrar el blob {c}: {e}")
+
+    return DocumentBlob.liberar(sha256, borrar=borrar)
+
+
+def disponible(doc):
+    """Si el archivo de un documento existe (en el backend o, sin sha256, en su ruta)"""
+    if doc.get('sha256'):
+        return backend().existe(clave(doc['sha256']))
+    return os.path.isfile(doc.get('ruta_archivo') or '')
+
+
+@contextmanager
+def copia_local(doc):
+    """Ruta local del archivo de un documento (descargado a un temporal si es remoto)"""
+    if doc.get('sha256'):
+        with backend().copia_local(clave(doc['sha256'])) as ruta:
+            yield ruta
+    else:
+        yield doc['ruta_archivo']
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"No se pudo borrar el archivo {ruta}: {e}")
+
+
+def migrar_existentes():
+    """
+    Mueve al almacén los archivos de documentos subidos antes de usarlo
+
+    Cada archivo se guarda por su hash, el documento pasa a apuntar al blob y
+    el archivo original se borra. Los documentos cuyo archivo no existe se
+    reportan y quedan sin cambios.
+
+    Returns:
+        dict: documentos, migrados, duplicados, faltantes y bytes_liberados
+    """
+    documentos = Document.get_sin_blob()
+    if documentos is None:
+        raise RuntimeError('Error al consultar los documentos')
+
+    reporte = {'documentos': len(documentos), 'migrados': 0, 'duplicados': 0,
+               'faltantes': [], 'bytes_liberados': 0}
+    for doc in documentos:
+        origen = doc['ruta_archivo']
+        if not origen or not os.path.isfile(origen):
+            reporte['faltantes'].append(doc['id'])
+            continue
+
+        with open(origen, 'rb') as archivo:
+            blob = guardar(archivo)
+        if not Document.asignar_blob(doc['id'], blob['sha256'], blob['ruta'], blob['tamanio']):
+            descartar(blob)
+            raise RuntimeError(f"No se pudo actualizar el documento {doc['id']}")
+
+        if os.path.abspath(origen) != os.path.abspath(blob['ruta']):
+            _borrar(origen)
+        reporte['migrados'] += 1
+        if not blob['nuevo']:
+            reporte['duplicados'] += 1
+            reporte['bytes_liberados'] += blob['tamanio']
+    return reporte
+
+
+def migrar_backend(origen, destino):
+    """
+    Copia todos los blobs (y sus derivados) de un backend a otro
+
+    Solo copia lo que falta en el destino, así que se puede repetir o
+    reanudar. Después de copiar cada blob actualiza su ubicación en
+    documento_blobs y documentos; el origen queda intacto hasta que se
+    verifique el destino y se cambie DOCUMENTS_STORAGE.
+
+    Returns:
+        dict: blobs, copiados, existentes, derivados, faltantes y bytes
+    """
+    blobs = DocumentBlob.get_all()
+    if blobs is None:
+        raise RuntimeError('Error al consultar los blobs')
+
+    reporte = {'blobs': len(blobs), 'copiados': 0, 'existentes': 0, 'derivados': 0,
+               'faltantes': [], 'bytes': 0}
+    for blob in blobs:
+        sha256 = blob['sha256']
+        if destino.existe(clave(sha256)):
+            reporte['existentes'] += 1
+        elif origen.existe(clave(sha256)):
+            with origen.copia_local(clave(sha256)) as ruta:
+                destino.subir(ruta, clave(sha256))
+            reporte['copiados'] += 1
+            reporte['bytes'] += blob['tamanio']
+        else:
+            reporte['faltantes'].append(sha256)
+            continue
+
+        for c in [clave_derivado(sha256, s) for s in SUFIJOS_DERIVADOS]:
+            if origen.existe(c) and not destino.existe(c):
+                with origen.copia_local(c) as ruta:
+                    destino.subir(ruta, c)
+                reporte['derivados'] += 1
+
+        if blob['ruta'] != destino.uri(clave(sha256)):
+            if not DocumentBlob.actualizar_ruta(sha256, destino.uri(clave(sha256))):
+                raise RuntimeError(f"No se pudo actualizar la ubicación del blob {sha256}")
+    return reporte
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Procesa las alertas de cobranza de forma incremental
+
+Requiere la migración sql/migrations/add_cobranza_alertas_motor.sql. La
+primera ejecución evalúa toda la cartera; las siguientes solo los cambios
+desde la anterior. Programar con cron, por ejemplo cada 10 minutos:
+
+    */10 * * * * cd /ruta/intranet && python procesar_alertas.py
+"""
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from mysql.connector import Error
+
+from modules.cobranzas.alertas import procesar
+
+
+def main():
+    print("=" * 60)
+    print("PROCESAMIENTO DE ALERTAS DE COBRANZA")
+    print("=" * 60)
+
+    try:
+        reporte = procesar()
+    except (RuntimeError, Error) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"Clientes evaluados: {reporte['clientes_evaluados']}")
+    print(f"Alertas nuevas:     {reporte['alertas_nuevas']}")
+    print(f"Alertas activas:    {reporte['alertas_activas']}")
+    print(f"Tiempo:             {reporte['segundos']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Scoring ML nocturno de la cartera de cobranza
+
+Calcula las características de todos los clientes, los puntúa con el modelo
+registrado en ml_modelos y guarda una ejecución nueva (resultados, métricas y
+etapas KDD). Requiere la migración sql/migrations/add_ml_scoring.sql.
+
+Pensado para cron, por ejemplo todos los días a las 02:00:
+    0 2 * * * cd /ruta/intranet && python puntuar_clientes.py
+
+Uso:
+    python puntuar_clientes.py                  # puntúa con el modelo vigente
+    python puntuar_clientes.py --entrenar       # reentrena y luego puntúa
+    python puntuar_clientes.py --procesos 4 --lote 50000
+"""
+import argparse
+import sys
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from modules.cobranzas.scoring import entrenar, puntuar, MODELO_DEFAULT, TAMANO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scoring ML por lotes de clientes de cobranza')
+    parser.add_argument('--modelo', default=MODELO_DEFAULT, help='Nombre del modelo en ml_modelos')
+    parser.add_argument('--entrenar', action='store_true',
+                        help='Reentrena el modelo con la historia de la cartera antes de puntuar')
+    parser.add_argument('--solo-entrenar', action='store_true', help='Reentrena sin puntuar')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Procesos para el scoring (default: núcleos disponibles)')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Clientes por lote')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SCORING ML DE CLIENTES")
+    print("=" * 60)
+
+    try:
+        if args.entrenar or args.solo_entrenar:
+            inicio = time.perf_counter()
+            entrenado = entrenar(args.modelo)
+            metricas = entrenado['metricas']
+            print(f"✓ Modelo '{args.modelo}' v{entrenado['version']} entrenado en "
+                  f"{time.perf_counter() - inicio:.2f}s (corte {entrenado['corte']})")
+            print(f"  Artefacto: {entrenado['artefacto']}")
+            print(f"  AUC: {metricas.get('auc_roc')}, accuracy: {metricas.get('accuracy', 0):.3f}, "
+                  f"MAE días: {metricas.get('mae')}")
+            if args.solo_entrenar:
+                return 0
+
+        resultado = puntuar(args.modelo, procesos=args.procesos, tamano_lote=args.lote)
+    except (ValueError, RuntimeError) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"✓ Ejecución {resultado['ejecucion_id']}: {resultado['clientes']} clientes "
+          f"en {resultado['segundos']:.2f}s")
+    for etapa, segundos in resultado['etapas'].items():
+        print(f"  {etapa:<16} {segundos:8.2f}s")
+    for clasificacion, total in resultado['clasificaciones'].items():
+        print(f"  {clasificacion:<16} {total:8d}")
+    if resultado['tasa_recuperacion_predicha'] is not None:
+        print(f"  Recuperación predicha: {resultado['tasa_recuperacion_predicha'] * 100:.1f}% del saldo")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
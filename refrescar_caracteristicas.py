@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Refresca el feature store de clientes de cobranza de forma incremental
+
+Requiere la migración sql/migrations/add_ml_feature_store.sql. La primera
+ejecución (o un cambio de versión de las definiciones) calcula toda la
+cartera; las siguientes solo los clientes con cambios. Debe correr al menos
+una vez al día, por ejemplo:
+
+    30 1 * * * cd /ruta/intranet && python refrescar_caracteristicas.py
+
+puntuar_clientes.py también lo refresca antes de cada scoring.
+"""
+import sys
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from mysql.connector import Error
+
+from modules.cobranzas.caracteristicas import refrescar
+
+
+def main():
+    print("=" * 60)
+    print("REFRESCO DEL FEATURE STORE DE CLIENTES")
+    print("=" * 60)
+
+    try:
+        reporte = refrescar()
+    except (RuntimeError, Error) as e:
+        print(f"✗ {e}")
+        return 1
+
+    print(f"Versión de definiciones: {reporte['version']}")
+    print(f"Recálculo:               {'completo' if reporte['completa'] else 'incremental'}")
+    print(f"Clientes evaluados:      {reporte['clientes_evaluados']}")
+    print(f"Filas nuevas:            {reporte['clientes_recalculados']}")
+    print(f"Tiempo:                  {reporte['segundos']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
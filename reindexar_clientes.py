@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Reconstruye el índice de búsqueda y los saldos precalculados de clientes
+
+Requiere las migraciones sql/migrations/add_clientes_busqueda_saldos.sql y
+add_cobranza_worklist.sql (la lista de llamadas se recalcula con los saldos).
+Los saldos vencidos dependen de la fecha, así que conviene programar este
+script una vez al día (cron) además de los refrescos puntuales.
+
+Uso:
+    python reindexar_clientes.py              # índice de búsqueda + saldos
+    python reindexar_clientes.py --solo-saldos
+"""
+import argparse
+import sys
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from models import ClienteBusqueda, ClienteSaldo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reindexa clientes de cobranzas')
+    parser.add_argument('--solo-saldos', action='store_true',
+                        help='Solo recalcula cliente_saldos')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("REINDEXACIÓN DE CLIENTES")
+    print("=" * 60)
+
+    ok = True
+
+    if not args.solo_saldos:
+        inicio = time.perf_counter()
+        tokens = ClienteBusqueda.indexar()
+        if tokens is None:
+            print("✗ Error al reconstruir el índice de búsqueda")
+            ok = False
+        else:
+            print(f"✓ Índice de búsqueda: {tokens} tokens en {time.perf_counter() - inicio:.2f}s")
+
+    inicio = time.perf_counter()
+    if ClienteSaldo.refrescar() is None:
+        print("✗ Error al recalcular saldos")
+        ok = False
+    else:
+        print(f"✓ Saldos y lista de llamadas recalculados en {time.perf_counter() - inicio:.2f}s")
+
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -78,6 +78,7 @@ CREATE TABLE IF NOT EXISTS documentos (
     ruta_archivo VARCHAR(500) NOT NULL,
     tamanio INT,
     tipo_archivo VARCHAR(50),
+    sha256 CHAR(64) NULL,
     subido_por INT NOT NULL,
     fecha_subida TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     fecha_actualizacion TIMESTAMP NULL,
@@ -85,7 +86,51 @@ CREATE TABLE IF NOT EXISTS documentos (
     activo BOOLEAN DEFAULT TRUE,
     FOREIGN KEY (subido_por) REFERENCES usuarios(id) ON DELETE CASCADE,
     INDEX idx_categoria (categoria),
-    INDEX idx_fecha (fecha_subida)
+    INDEX idx_fecha (fecha_subida),
+    INDEX idx_sha256 (sha256)
+);
+
+-- Blobs de documentos por SHA-256 con conteo de referencias
+CREATE TABLE IF NOT EXISTS documento_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    tamanio BIGINT NOT NULL,
+    ruta VARCHAR(500) NOT NULL,
+    referencias INT NOT NULL DEFAULT 0,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índice de texto completo del contenido de documentos (pasajes)
+CREATE TABLE IF NOT EXISTS documento_indice (
+    documento_id INT PRIMARY KEY,
+    estado ENUM('indexado', 'sin_texto', 'error') NOT NULL,
+    pasajes INT NOT NULL DEFAULT 0,
+    caracteres INT NOT NULL DEFAULT 0,
+    error VARCHAR(255) NULL,
+    fecha_indexado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (documento_id) REFERENCES documentos(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS documento_pasajes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    documento_id INT NOT NULL,
+    orden INT NOT NULL,
+    texto TEXT NOT NULL,
+    FOREIGN KEY (documento_id) REFERENCES documentos(id) ON DELETE CASCADE,
+    INDEX idx_documento (documento_id, orden),
+    FULLTEXT INDEX ft_texto (texto)
+);
+
+-- Fragmentos del índice vectorial del chatbot (fila = fila en vectores.f32 de la instancia indice)
+CREATE TABLE IF NOT EXISTS conocimiento_fragmentos (
+    indice CHAR(32) NOT NULL,
+    fila INT NOT NULL,
+    fuente ENUM('documento', 'anuncio') NOT NULL,
+    fuente_id INT NOT NULL,
+    orden INT NOT NULL,
+    texto TEXT NOT NULL,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (indice, fila),
+    INDEX idx_fuente (indice, fuente, fuente_id)
 );
 
 -- Tabla de anuncios/noticias
@@ -11,6 +11,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from database import execute_query
+from models import ClienteBusqueda, ClienteSaldo
+from modules.cobranzas.alertas import procesar as procesar_alertas
+from modules.cobranzas.asignacion import aplicar_pagos
 
 
 def clean_cobranzas_tables():
@@ -31,6 +34,12 @@ def clean_cobranzas_tables():
         execute_query(query)
         print(f"  ✓ Tabla {table} limpiada")
 
+    # Reiniciar marcas de agua del motor de alertas para reevaluar todo
+    execute_query("""
+        UPDATE cobranza_alertas_estado
+        SET marca_facturas = NULL, marca_pagos = NULL, marca_seguimientos = 0, ultima_fecha = NULL
+    """)
+
     print()
 
 
@@ -129,6 +138,7 @@ def seed_pagos(clientes, facturas):
         return []
 
     pago_ids = []
+    asignaciones = {}
     metodos = ['efectivo', 'transferencia', 'cheque', 'tarjeta']
 
     # Agrupar facturas por cliente
@@ -183,24 +193,15 @@ def seed_pagos(clientes, facturas):
                 # Aplicar el pago a 1-3 facturas del cliente
                 facturas_cliente = facturas_por_cliente[cliente_id]
                 facturas_a_aplicar = random.sample(facturas_cliente, min(random.randint(1, 3), len(facturas_cliente)))
-
-                monto_restante = monto
-                for factura in facturas_a_aplicar:
-                    if monto_restante <= 0:
-                        break
-
-                    monto_aplicado = min(monto_restante, factura['saldo_pendiente'])
-
-                    query_aplicacion = """
-                        INSERT INTO pago_facturas (pago_id, factura_id, monto_aplicado)
-                        VALUES (%s, %s, %s)
-                    """
-                    execute_query(query_aplicacion, (lastrowid, factura['id'], monto_aplicado))
-
-                    monto_restante -= monto_aplicado
+                asignaciones[lastrowid] = [f['id'] for f in facturas_a_aplicar]
 
         print(f"  ✓ Creados {num_pagos} pagos para cliente {cliente['razon_social']}")
 
+    # Aplicar todos los pagos en una sola transacción
+    if asignaciones:
+        reporte = aplicar_pagos(estrategia='explicita', asignaciones=asignaciones)
+        print(f"  ✓ {reporte['aplicaciones']} aplicaciones de pago en {reporte['segundos']}s")
+
     print(f"\n  Total de pagos creados: {len(pago_ids)}")
     return pago_ids
 
@@ -290,39 +291,15 @@ def seed_seguimientos(clientes, facturas):
 
 
 def seed_alertas(clientes, facturas):
-    """Crea alertas de cobranza de ejemplo"""
+    """Genera las alertas de cobranza con el motor de alertas"""
     print("\nCreando alertas de cobranza...")
 
     if not clientes or not facturas:
         print("  ⚠ No hay clientes o facturas. Omitiendo alertas.")
         return
 
-    tipos_alerta = ['vencimiento_proximo', 'vencida', 'promesa_incumplida', 'limite_credito']
-
-    # Filtrar facturas vencidas y por vencer
-    facturas_vencidas = [f for f in facturas if f['estado'] == 'vencida']
-
-    count = 0
-
-    # Crear alertas para facturas vencidas
-    for factura in random.sample(facturas_vencidas, min(10, len(facturas_vencidas))):
-        query = """
-            INSERT INTO cobranza_alertas
-            (cliente_id, factura_id, tipo_alerta, mensaje, leida, activa)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-
-        execute_query(query, (
-            factura['cliente_id'],
-            factura['id'],
-            'vencida',
-            f"Factura {factura['numero']} está vencida con saldo de ${factura['saldo_pendiente']:,.2f}",
-            random.choice([True, False]),
-            True
-        ))
-        count += 1
-
-    print(f"  ✓ Total de alertas creadas: {count}")
+    reporte = procesar_alertas()
+    print(f"  ✓ Total de alertas creadas: {reporte['alertas_nuevas']}")
 
 
 def main():
@@ -362,6 +339,10 @@ def main():
         # 5. Crear alertas
         seed_alertas(clientes, facturas)
 
+        # 6. Índice de búsqueda y saldos de la grilla de clientes
+        ClienteBusqueda.indexar()
+        ClienteSaldo.refrescar()
+
         print("\n" + "=" * 60)
         print("✅ SEED COMPLETADO EXITOSAMENTE")
         print("=" * 60)
@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from database import execute_query
+from models import CobranzaWorklist, MLResultadoCliente
 
 def clean_ml_tables():
     """Limpia todas las tablas ML antes de insertar datos nuevos"""
@@ -19,6 +20,7 @@ def clean_ml_tables():
 
     # Orden de eliminación respetando foreign keys
     tables = [
+        'ml_latest_result',
         'ml_resultados_cliente',
         'ml_metricas_modelo',
         'ml_kdd_proceso',
@@ -419,6 +421,12 @@ def main():
         # 5. Crear resultados por cliente
         seed_ml_results_cliente(ejecucion_ids)
 
+        # 6. Último resultado por cliente y lista de llamadas
+        if MLResultadoCliente.reconstruir_ultimos():
+            print("  ✓ Últimos resultados por cliente actualizados")
+        if CobranzaWorklist.refrescar():
+            print("  ✓ Lista de llamadas actualizada")
+
         print("\n" + "=" * 60)
         print("✅ SEED COMPLETADO EXITOSAMENTE")
         print("=" * 60)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Registra el snapshot diario de cartera (total y por cliente)
+
+Requiere la migración sql/migrations/add_cartera_snapshots.sql. Programar una
+vez al día, por ejemplo con cron:
+
+    55 23 * * * cd /ruta/intranet && python snapshot_cartera.py
+"""
+import sys
+import time
+
+# ✅ CARGAR .env ANTES DE IMPORTAR database
+from dotenv import load_dotenv
+load_dotenv()
+
+from models import CarteraSnapshot
+
+
+def main():
+    print("=" * 60)
+    print("SNAPSHOT DIARIO DE CARTERA")
+    print("=" * 60)
+
+    inicio = time.perf_counter()
+    if not CarteraSnapshot.generar():
+        print("✗ Error al registrar el snapshot")
+        return 1
+
+    print(f"✓ Snapshot registrado en {time.perf_counter() - inicio:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
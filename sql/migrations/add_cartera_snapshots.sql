@@ -0,0 +1,38 @@
+-- Migración: Snapshots diarios de cartera
+-- Fecha: 2026-10-19
+-- Descripción: Serie de tiempo con una fila por día (total) y una fila por día
+-- y cliente con saldo. Las gráficas de tendencia leen estas tablas en lugar de
+-- re-agregar facturas históricas.
+-- Poblar con: python snapshot_cartera.py (una vez al día)
+
+CREATE TABLE IF NOT EXISTS cartera_snapshots_cliente (
+    fecha DATE NOT NULL,
+    cliente_id INT NOT NULL,
+    cartera_total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    cartera_vencida DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    vigente DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_1_30 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_31_60 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_61_90 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_mas_90 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    facturas_pendientes INT NOT NULL DEFAULT 0,
+    facturas_vencidas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, cliente_id),
+    INDEX idx_cliente_fecha (cliente_id, fecha),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS cartera_snapshots_diarios (
+    fecha DATE PRIMARY KEY,
+    cartera_total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    cartera_vencida DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    vigente DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_1_30 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_31_60 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_61_90 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    dias_mas_90 DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    facturas_pendientes INT NOT NULL DEFAULT 0,
+    facturas_vencidas INT NOT NULL DEFAULT 0,
+    clientes_con_saldo INT NOT NULL DEFAULT 0,
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,27 @@
+-- Migración: Índice de búsqueda y saldos precalculados de clientes
+-- Fecha: 2026-10-19
+-- Descripción: cliente_busqueda_tokens guarda los términos normalizados (sin
+-- acentos, minúsculas) de código, razón social y RFC para búsqueda por prefijo
+-- con índice. cliente_saldos guarda el saldo de cada cliente para que la grilla
+-- de /cobranzas/ no agregue facturas en cada petición.
+-- Poblar con: python reindexar_clientes.py
+
+CREATE TABLE IF NOT EXISTS cliente_busqueda_tokens (
+    token VARCHAR(100) NOT NULL,
+    cliente_id INT NOT NULL,
+    PRIMARY KEY (token, cliente_id),
+    INDEX idx_cliente (cliente_id),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+
+CREATE TABLE IF NOT EXISTS cliente_saldos (
+    cliente_id INT PRIMARY KEY,
+    saldo_total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    saldo_vencido DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    facturas_pendientes INT NOT NULL DEFAULT 0,
+    facturas_vencidas INT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_saldo_total (saldo_total),
+    INDEX idx_saldo_vencido (saldo_vencido),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,32 @@
+-- Migración: Motor incremental de alertas de cobranza
+-- Fecha: 2026-10-19
+-- Descripción: Agrega a cobranza_alertas la referencia al seguimiento y una
+-- clave única solo para alertas activas (el motor la pone en NULL al
+-- desactivar la alerta) para deduplicar con INSERT ... ON DUPLICATE KEY.
+-- No es columna generada porque MySQL no permite columnas generadas sobre
+-- columnas con FOREIGN KEY ... ON DELETE SET NULL/CASCADE.
+-- cobranza_alertas_estado guarda las marcas de agua del motor.
+-- Procesar con: python procesar_alertas.py (cron cada pocos minutos)
+
+ALTER TABLE cobranza_alertas
+    ADD COLUMN seguimiento_id INT NULL AFTER factura_id,
+    ADD COLUMN clave_activa VARCHAR(120) NULL,
+    ADD UNIQUE INDEX uk_alerta_activa (clave_activa),
+    ADD INDEX idx_activa_fecha (activa, leida, fecha_creacion),
+    ADD INDEX idx_cliente_activa (cliente_id, activa, fecha_creacion),
+    ADD CONSTRAINT fk_alerta_seguimiento FOREIGN KEY (seguimiento_id)
+        REFERENCES cobranza_seguimientos(id) ON DELETE CASCADE;
+
+-- Promesas cuya fecha se cruza desde la última ejecución (búsqueda por rango)
+CREATE INDEX idx_promesa ON cobranza_seguimientos(resultado, fecha_promesa_pago);
+
+CREATE TABLE IF NOT EXISTS cobranza_alertas_estado (
+    id TINYINT PRIMARY KEY DEFAULT 1,
+    marca_facturas TIMESTAMP NULL,
+    marca_pagos TIMESTAMP NULL,
+    marca_seguimientos INT NOT NULL DEFAULT 0,
+    ultima_fecha DATE NULL,
+    fecha_ejecucion TIMESTAMP NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO cobranza_alertas_estado (id) VALUES (1);
@@ -0,0 +1,31 @@
+-- Migración: Lista de llamadas priorizada para cobradores
+-- Fecha: 2026-10-19
+-- Descripción: cobranza_worklist guarda, por cliente con saldo abierto, el
+-- monto esperado a recuperar (probabilidad de pago del último resultado ML ×
+-- monto recuperable) y el valor por hora de contacto. El índice sobre
+-- valor_hora mantiene el ranking ordenado: la página N de la lista es un
+-- recorrido del índice, sin ordenar en cada petición.
+-- Se refresca por cliente junto con cliente_saldos (facturas y pagos) y por
+-- ejecución cuando se cargan resultados ML.
+-- Poblar con: python reindexar_clientes.py
+
+CREATE TABLE IF NOT EXISTS cobranza_worklist (
+    cliente_id INT PRIMARY KEY,
+    saldo_total DECIMAL(15, 2) NOT NULL,
+    saldo_vencido DECIMAL(15, 2) NOT NULL,
+    probabilidad_pago DOUBLE NOT NULL,
+    monto_recuperable DECIMAL(15, 2) NOT NULL,
+    monto_esperado DECIMAL(15, 2) NOT NULL,
+    horas_contacto DOUBLE NOT NULL,
+    valor_hora DECIMAL(15, 2) NOT NULL,
+    prioridad_cobranza VARCHAR(20) NULL,
+    accion_recomendada VARCHAR(100) NULL,
+    ml_resultado_id INT NULL,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_valor_hora (valor_hora, cliente_id),
+    INDEX idx_prioridad_valor (prioridad_cobranza, valor_hora, cliente_id),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Último resultado ML por cliente (MAX(id) agrupado por cliente_codigo)
+CREATE INDEX idx_ml_resultados_cliente_id ON ml_resultados_cliente(cliente_codigo, id);
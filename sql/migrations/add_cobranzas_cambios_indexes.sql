@@ -0,0 +1,8 @@
+-- Migración: Índices para detectar cambios recientes en cobranzas
+-- Fecha: 2026-10-19
+-- Descripción: Permite leer solo las facturas y pagos modificados desde una
+-- marca de agua (actualización incremental del snapshot de analítica)
+
+CREATE INDEX IF NOT EXISTS idx_facturas_actualizacion ON facturas(fecha_actualizacion);
+CREATE INDEX IF NOT EXISTS idx_facturas_creacion ON facturas(fecha_creacion);
+CREATE INDEX IF NOT EXISTS idx_pagos_registro ON pagos(fecha_registro);
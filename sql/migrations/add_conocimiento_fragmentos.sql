@@ -0,0 +1,25 @@
+-- Migración: Índice vectorial de conocimiento para el chatbot
+-- Fecha: 2026-10-19
+-- Descripción: Cada fila de conocimiento_fragmentos corresponde a una fila de
+-- la matriz de vectores RAG_INDEX_FOLDER/vectores.f32
+-- (modules/chatbot/conocimiento.py). La matriz está en el disco de cada nodo,
+-- así que las filas llevan el ID de instancia del índice (indice, guardado en
+-- meta.json) y cada nodo solo lee y borra las suyas. fuente_id es
+-- documento_pasajes.id para documentos y anuncios.id para anuncios; el índice
+-- (indice, fuente, fuente_id) sirve para encontrar lo que falta indexar.
+-- Las filas de un nodo retirado se pueden borrar con
+-- DELETE FROM conocimiento_fragmentos WHERE indice = '<instancia>'.
+-- Requiere: sql/migrations/add_documentos_fulltext.sql
+-- Poblar con: python indexar_conocimiento.py
+
+CREATE TABLE IF NOT EXISTS conocimiento_fragmentos (
+    indice CHAR(32) NOT NULL,
+    fila INT NOT NULL,
+    fuente ENUM('documento', 'anuncio') NOT NULL,
+    fuente_id INT NOT NULL,
+    orden INT NOT NULL,
+    texto TEXT NOT NULL,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (indice, fila),
+    INDEX idx_fuente (indice, fuente, fuente_id)
+);
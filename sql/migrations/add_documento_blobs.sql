@@ -0,0 +1,19 @@
+-- Migración: Almacén de documentos direccionado por contenido
+-- Fecha: 2026-10-19
+-- Descripción: Los archivos de documentos se guardan una sola vez bajo su
+-- SHA-256 en DOCUMENTS_FOLDER (modules/documents/storage.py).
+-- documentos.sha256 apunta al blob y documento_blobs cuenta cuántos
+-- documentos lo usan, para borrar el archivo cuando deja de referenciarse.
+-- Poblar con: python migrar_documentos_blobs.py (mueve los archivos existentes)
+
+ALTER TABLE documentos
+    ADD COLUMN sha256 CHAR(64) NULL AFTER tipo_archivo,
+    ADD INDEX idx_sha256 (sha256);
+
+CREATE TABLE IF NOT EXISTS documento_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    tamanio BIGINT NOT NULL,
+    ruta VARCHAR(500) NOT NULL,
+    referencias INT NOT NULL DEFAULT 0,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
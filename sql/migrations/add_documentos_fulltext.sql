@@ -0,0 +1,27 @@
+-- Migración: Búsqueda de texto completo en el contenido de los documentos
+-- Fecha: 2026-10-19
+-- Descripción: modules/documents/indice.py extrae el texto de cada documento
+-- (PDF, DOCX, XLSX, TXT) en segundo plano y lo guarda en pasajes con un índice
+-- FULLTEXT. documento_indice marca qué documentos ya se procesaron; el
+-- pasaje 0 de cada documento es su título y descripción.
+-- Poblar con: python indexar_documentos.py
+
+CREATE TABLE IF NOT EXISTS documento_indice (
+    documento_id INT PRIMARY KEY,
+    estado ENUM('indexado', 'sin_texto', 'error') NOT NULL,
+    pasajes INT NOT NULL DEFAULT 0,
+    caracteres INT NOT NULL DEFAULT 0,
+    error VARCHAR(255) NULL,
+    fecha_indexado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (documento_id) REFERENCES documentos(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS documento_pasajes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    documento_id INT NOT NULL,
+    orden INT NOT NULL,
+    texto TEXT NOT NULL,
+    FOREIGN KEY (documento_id) REFERENCES documentos(id) ON DELETE CASCADE,
+    INDEX idx_documento (documento_id, orden),
+    FULLTEXT INDEX ft_texto (texto)
+);
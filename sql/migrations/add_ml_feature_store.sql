@@ -0,0 +1,54 @@
+-- Migración: Feature store por cliente para los modelos de cobranza
+-- Fecha: 2026-10-19
+-- Descripción: ml_feature_store guarda el historial de características de
+-- cada cliente por versión de definiciones, con vigencia
+-- [vigente_desde, vigente_hasta): el snapshot a un instante es un rango
+-- sobre la llave primaria y el snapshot actual usa idx_vigentes.
+-- ml_feature_definiciones registra qué significa cada característica en
+-- cada versión. ml_feature_store_estado guarda las marcas de agua del
+-- refresco incremental; clientes.fecha_actualizacion permite detectar
+-- cambios de límite de crédito y altas.
+-- Poblar con: python refrescar_caracteristicas.py (cron diario o más frecuente)
+
+ALTER TABLE clientes
+    ADD COLUMN fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD INDEX idx_clientes_actualizacion (fecha_actualizacion);
+
+CREATE TABLE IF NOT EXISTS ml_feature_definiciones (
+    version INT NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    descripcion TEXT,
+    fuente VARCHAR(100),
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (version, nombre)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS ml_feature_store (
+    version INT NOT NULL,
+    cliente_codigo VARCHAR(20) NOT NULL,
+    vigente_desde DATETIME(6) NOT NULL,
+    vigente_hasta DATETIME(6) NULL,
+    fecha_calculo DATE NOT NULL,
+    dias_promedio_pago DOUBLE NULL,
+    facturas_vencidas DOUBLE NOT NULL DEFAULT 0,
+    saldo_pendiente DOUBLE NOT NULL DEFAULT 0,
+    limite_credito DOUBLE NOT NULL DEFAULT 0,
+    antiguedad_cliente DOUBLE NOT NULL DEFAULT 0,
+    tasa_incumplimiento DOUBLE NOT NULL DEFAULT 0,
+    numero_promesas_incumplidas DOUBLE NOT NULL DEFAULT 0,
+    dias_atraso DOUBLE NOT NULL DEFAULT 0,
+    contactos_realizados DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (version, cliente_codigo, vigente_desde),
+    INDEX idx_vigentes (version, vigente_hasta, cliente_codigo)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS ml_feature_store_estado (
+    id TINYINT PRIMARY KEY DEFAULT 1,
+    version INT NULL,
+    marca DATETIME(6) NULL,
+    marca_seguimientos INT NOT NULL DEFAULT 0,
+    ultima_fecha DATE NULL,
+    fecha_ejecucion TIMESTAMP NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO ml_feature_store_estado (id) VALUES (1);
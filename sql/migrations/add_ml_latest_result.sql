@@ -0,0 +1,64 @@
+-- Migración: Último resultado ML por cliente y modelo
+-- Fecha: 2026-10-19
+-- Descripción: ml_latest_result mantiene una fila por (cliente_codigo,
+-- modelo_id) con el resultado de la ejecución más reciente. Se actualiza en
+-- la misma transacción que cierra cada ejecución
+-- (MLResultadoCliente.sql_actualizar_ultimos), así que las páginas y APIs
+-- de resultados ML leen una fila por modelo en vez de recorrer todo el
+-- historial de ejecuciones.
+-- Poblar con: el INSERT de abajo (o MLResultadoCliente.reconstruir_ultimos())
+
+CREATE TABLE IF NOT EXISTS ml_latest_result (
+    cliente_codigo VARCHAR(20) NOT NULL,
+    modelo_id INT NOT NULL,
+    ejecucion_id INT NOT NULL,
+    resultado_id INT NOT NULL,
+    fecha_ejecucion TIMESTAMP NOT NULL,
+    score_prediccion DOUBLE,
+    clasificacion VARCHAR(50),
+    probabilidad_pago DOUBLE,
+    dias_pago_predicho INT,
+    monto_recuperable_predicho DOUBLE,
+    factores_principales TEXT,
+    confianza_prediccion DOUBLE,
+    segmento_cliente VARCHAR(50),
+    cluster_id INT,
+    accion_recomendada VARCHAR(100),
+    prioridad_cobranza VARCHAR(20),
+    datos_entrada TEXT,
+    explicacion TEXT,
+    PRIMARY KEY (cliente_codigo, modelo_id),
+    INDEX idx_modelo_clasificacion (modelo_id, clasificacion),
+    INDEX idx_modelo_prioridad (modelo_id, prioridad_cobranza),
+    INDEX idx_ejecucion (ejecucion_id),
+    FOREIGN KEY (modelo_id) REFERENCES ml_modelos(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO ml_latest_result
+    (cliente_codigo, modelo_id, ejecucion_id, resultado_id, fecha_ejecucion,
+     score_prediccion, clasificacion, probabilidad_pago, dias_pago_predicho,
+     monto_recuperable_predicho, factores_principales, confianza_prediccion,
+     segmento_cliente, cluster_id, accion_recomendada, prioridad_cobranza,
+     datos_entrada, explicacion)
+SELECT rc.cliente_codigo, e.modelo_id, e.id, rc.id, e.fecha_ejecucion,
+       rc.score_prediccion, rc.clasificacion, rc.probabilidad_pago, rc.dias_pago_predicho,
+       rc.monto_recuperable_predicho, rc.factores_principales, rc.confianza_prediccion,
+       rc.segmento_cliente, rc.cluster_id, rc.accion_recomendada, rc.prioridad_cobranza,
+       rc.datos_entrada, rc.explicacion
+FROM ml_resultados_cliente rc
+JOIN ml_ejecuciones e ON rc.ejecucion_id = e.id
+JOIN (
+    SELECT rc2.cliente_codigo, e2.modelo_id, MAX(rc2.id) AS resultado_id
+    FROM ml_resultados_cliente rc2
+    JOIN ml_ejecuciones e2 ON rc2.ejecucion_id = e2.id
+    JOIN (
+        SELECT rc3.cliente_codigo, e3.modelo_id, MAX(e3.fecha_ejecucion) AS fecha_ejecucion
+        FROM ml_resultados_cliente rc3
+        JOIN ml_ejecuciones e3 ON rc3.ejecucion_id = e3.id
+        WHERE e3.estado = 'completado'
+        GROUP BY rc3.cliente_codigo, e3.modelo_id
+    ) ult ON ult.cliente_codigo = rc2.cliente_codigo AND ult.modelo_id = e2.modelo_id
+        AND ult.fecha_ejecucion = e2.fecha_ejecucion
+    WHERE e2.estado = 'completado'
+    GROUP BY rc2.cliente_codigo, e2.modelo_id
+) sel ON sel.resultado_id = rc.id;
@@ -0,0 +1,13 @@
+-- Migración: Artefactos de modelos para el scoring ML por lotes
+-- Fecha: 2026-10-19
+-- Descripción: ml_modelos.artefacto guarda la ruta del modelo entrenado
+-- (.npz en ML_MODELS_FOLDER) que usa modules/cobranzas/scoring.py. Cada
+-- corrida nocturna crea una ejecución 'en_proceso' y la cierra en una sola
+-- transacción con sus resultados, métricas y etapas KDD; el índice sobre
+-- (estado, modelo_id) sirve para encontrar la última ejecución completada.
+-- Poblar con: python puntuar_clientes.py --entrenar
+
+ALTER TABLE ml_modelos
+    ADD COLUMN artefacto VARCHAR(255) NULL AFTER variables_entrada;
+
+CREATE INDEX idx_ml_ejecuciones_estado ON ml_ejecuciones(estado, modelo_id, id);
@@ -0,0 +1,55 @@
+"""
+Tests para la asignación en memoria del motor de aplicación de pagos
+"""
+import os
+import sys
+import unittest
+from collections import deque
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas.asignacion import aplicar_pagos, asignar
+
+
+class TestAsignacionPagos(unittest.TestCase):
+
+    def test_fifo_cubre_por_vencimiento_y_comparte_cola(self):
+        saldos = {10: Decimal('100'), 11: Decimal('50'), 12: Decimal('80')}
+        colas = {1: deque([10, 11, 12])}
+        pagos = [{'id': 1, 'cliente_id': 1, 'disponible': Decimal('120')},
+                 {'id': 2, 'cliente_id': 1, 'disponible': Decimal('200')}]
+
+        aplicaciones, sin_aplicar = asignar(pagos, colas, saldos)
+
+        self.assertEqual(aplicaciones, [
+            (1, 10, Decimal('100')), (1, 11, Decimal('20')),
+            (2, 11, Decimal('30')), (2, 12, Decimal('80')),
+        ])
+        self.assertEqual(sin_aplicar, Decimal('90'))
+        self.assertTrue(all(s == 0 for s in saldos.values()))
+
+    def test_explicita_respeta_facturas_indicadas(self):
+        saldos = {10: Decimal('100'), 11: Decimal('50')}
+        colas = {7: deque([11])}
+        pagos = [{'id': 7, 'cliente_id': 1, 'disponible': Decimal('30')}]
+
+        aplicaciones, sin_aplicar = asignar(pagos, colas, saldos, clave='id')
+
+        self.assertEqual(aplicaciones, [(7, 11, Decimal('30'))])
+        self.assertEqual(saldos, {10: Decimal('100'), 11: Decimal('20')})
+        self.assertEqual(sin_aplicar, 0)
+
+
+    def test_rechaza_tipos_invalidos_sin_tocar_la_bd(self):
+        for argumentos in ({'pago_ids': '12'}, {'pago_ids': 5}, {'pago_ids': [1, '2']},
+                           {'pago_ids': [True]}, {'pago_ids': []},
+                           {'estrategia': 'explicita', 'asignaciones': [1]},
+                           {'estrategia': 'explicita', 'asignaciones': {'x': [1]}},
+                           {'estrategia': 'explicita', 'asignaciones': {'1': 3}}):
+            with self.assertRaises(ValueError):
+                aplicar_pagos(**argumentos)
+
+
+if __name__ == '__main__':
+    unittest.main()
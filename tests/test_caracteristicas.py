@@ -0,0 +1,46 @@
+"""
+Tests para el post-procesamiento del feature store de clientes
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas.caracteristicas import FEATURES, cambiados, envejecer
+
+
+def fila(**valores):
+    x = np.zeros(len(FEATURES))
+    for nombre, valor in valores.items():
+        x[FEATURES.index(nombre)] = valor
+    return x
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def test_envejecer_solo_atraso_con_vencidas(self):
+        X = np.vstack([
+            fila(antiguedad_cliente=100, facturas_vencidas=2, dias_atraso=10),
+            fila(antiguedad_cliente=5, facturas_vencidas=0, dias_atraso=0),
+        ])
+        Y = envejecer(X, [3, 7])
+        self.assertEqual(Y[0, FEATURES.index('antiguedad_cliente')], 103)
+        self.assertEqual(Y[0, FEATURES.index('dias_atraso')], 13)
+        self.assertEqual(Y[1, FEATURES.index('antiguedad_cliente')], 12)
+        self.assertEqual(Y[1, FEATURES.index('dias_atraso')], 0)
+        # No modifica la matriz original
+        self.assertEqual(X[0, FEATURES.index('dias_atraso')], 10)
+
+    def test_cambiados_trata_nan_como_igual(self):
+        a = np.vstack([fila(dias_promedio_pago=np.nan, saldo_pendiente=100),
+                       fila(saldo_pendiente=100)])
+        b = np.vstack([fila(dias_promedio_pago=np.nan, saldo_pendiente=100),
+                       fila(saldo_pendiente=100.5)])
+        self.assertEqual(list(cambiados(a, b)), [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests para la codificación compacta de resultados de herramientas del chatbot
+"""
+import json
+import os
+import sys
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.chatbot import compacto
+
+
+def tickets(total):
+    return [{
+        'id': i,
+        'titulo': f'Falla en impresora piso {i}',
+        'descripcion': None,
+        'categoria': 'ti',
+        'prioridad': 'alta' if i % 3 else 'urgente',
+        'estado': 'abierto',
+        'fecha_creacion': f'2026-10-{10 + i % 9:02d}T09:{i % 60:02d}:31.482913',
+        'solicitante_nombre': f'Usuario {i}',
+        'asignado_nombre': None,
+    } for i in range(total)]
+
+
+class TestCompacto(unittest.TestCase):
+
+    def test_lista_de_registros_como_tabla(self):
+        datos = compacto.compactar({'tickets': tickets(3), 'mostrados': 3})
+        tabla = datos['tickets']
+
+        self.assertEqual(tabla['comun'], {'categoria': 'ti', 'estado': 'abierto'})
+        self.assertNotIn('descripcion', tabla['columnas'])
+        self.assertNotIn('asignado_nombre', tabla['columnas'])
+        self.assertEqual(len(tabla['filas']), 3)
+        fila = dict(zip(tabla['columnas'], tabla['filas'][1]))
+        self.assertEqual(fila['fecha_creacion'], '2026-10-11 09:01')
+
+    def test_numeros_fechas_y_esquema(self):
+        datos = compacto.compactar({
+            'pasajes': [{'relevancia': 0.123456, 'monto': Decimal('1500.00'), 'tipo': 'vacaciones',
+                         'fecha': datetime(2026, 10, 19), 'inicio': '2026-10-19T00:00:00'}],
+        }, 'buscar_documentos')
+        self.assertEqual(datos['pasajes'][0], {'relevancia': 0.123, 'monto': 1500, 'tipo': 'vacaciones',
+                                               'fecha': '2026-10-19', 'inicio': '2026-10-19'})
+
+        vacaciones = compacto.compactar({'vacaciones': [{'id': 1, 'tipo': 'vacaciones', 'empleado_id': 7}]},
+                                        'get_my_vacations')
+        self.assertEqual(vacaciones, {'vacaciones': [{'id': 1, 'tipo': 'vacaciones'}]})
+
+    def test_conserva_valores_por_defecto(self):
+        llamadas = compacto.compactar({'clientes': [
+            {'codigo': 'C1', 'con_modelo_ml': True},
+            {'codigo': 'C2', 'con_modelo_ml': False},
+            {'codigo': 'C3', 'con_modelo_ml': True},
+        ]}, 'get_lista_llamadas')['clientes']
+        self.assertEqual(llamadas['columnas'], ['codigo', 'con_modelo_ml'])
+        self.assertEqual([f[1] for f in llamadas['filas']], [True, False, True])
+
+        anuncios = compacto.compactar({'anuncios': [
+            {'titulo': 'A', 'tipo': 'general', 'prioridad': 'media'},
+            {'titulo': 'B', 'tipo': 'general', 'prioridad': 'alta'},
+        ]}, 'get_announcements')['anuncios']
+        self.assertEqual(anuncios['comun'], {'tipo': 'general'})
+        self.assertEqual([f[-1] for f in anuncios['filas']], ['media', 'alta'])
+
+    def test_reduce_mas_de_la_mitad(self):
+        resultado = {'success': True, 'data': {'tickets': tickets(20), 'mostrados': 20}}
+        anterior = json.dumps(resultado, ensure_ascii=False)
+        compacto_ = compacto.codificar(resultado, 'get_all_tickets')
+
+        self.assertLess(len(compacto_), len(anterior) * 0.5)
+        self.assertEqual(json.loads(compacto.codificar({'success': False, 'error': 'Sin permisos'})),
+                         {'error': 'Sin permisos'})
+
+    def test_accion_grande_guarda_referencia_y_resumen(self):
+        chico = compacto.codificar({'success': True, 'data': {'mensaje': 'ok'}})
+        self.assertEqual(compacto.resumen_accion(chico, 10), {'mensaje': 'ok'})
+
+        grande = compacto.codificar({'success': True, 'data': {'tickets': tickets(50), 'mostrados': 50}})
+        registro = compacto.resumen_accion(grande, 10)
+        self.assertEqual(registro['mensaje_id'], 10)
+        self.assertEqual(registro['resumen'], {'tickets': 50, 'mostrados': 50})
+        self.assertLess(len(json.dumps(registro)), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
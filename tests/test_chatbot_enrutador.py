@@ -0,0 +1,68 @@
+"""
+Tests para el enrutador de herramientas del chatbot
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.chatbot import enrutador
+
+
+def herramienta(nombre):
+    return {"type": "function", "function": {"name": nombre, "description": "x" * 400, "parameters": {}}}
+
+
+TODAS = [herramienta(n) for nombres in enrutador.GRUPOS.values() for n in nombres]
+
+
+class TestEnrutador(unittest.TestCase):
+
+    def test_palabras_clave_por_grupo(self):
+        self.assertEqual(enrutador.grupos_por_palabras('¿Cuánto nos debe el cliente ACME?'), {'cobranzas'})
+        self.assertEqual(enrutador.grupos_por_palabras('Muéstrame el reporte de Power BI de ventas'), {'powerbi'})
+        self.assertIn('consultas', enrutador.grupos_por_palabras('¿Qué dice la política de viáticos?'))
+        self.assertEqual(enrutador.grupos_por_palabras('Hola, buenos días. ¿Bien?'), set())
+
+    def test_saludo_envia_solo_la_herramienta_de_ampliacion(self):
+        seleccion = enrutador.seleccionar(TODAS, enrutador.elegir_grupos('hola', []))
+
+        self.assertEqual(enrutador.nombres(seleccion), {enrutador.AMPLIAR})
+        self.assertLess(enrutador.estimar_tokens(seleccion), enrutador.estimar_tokens(TODAS) / 10)
+
+    def test_seguimiento_conserva_grupos_recientes(self):
+        historial = [
+            {'role': 'user', 'content': 'tickets urgentes'},
+            {'role': 'assistant', 'content': '', 'tool_calls': [
+                {'id': '1', 'function': {'name': 'get_all_tickets', 'arguments': '{}'}}]},
+            {'role': 'tool', 'content': '{}'},
+        ]
+        grupos = enrutador.elegir_grupos('¿y el siguiente?', historial)
+        seleccion = enrutador.nombres(enrutador.seleccionar(TODAS, grupos))
+
+        self.assertEqual(grupos, {'soporte'})
+        self.assertIn('assign_ticket', seleccion)
+        self.assertNotIn('get_deuda_cliente', seleccion)
+
+    def test_ampliar_y_rol_sin_grupos(self):
+        self.assertEqual(len(enrutador.ampliar(TODAS)), len(TODAS))
+        # Si el rol solo tiene los grupos elegidos no hace falta ofrecer ampliación
+        propias = [h for h in TODAS if enrutador.grupo_de(h['function']['name']) == 'personal']
+        self.assertEqual(enrutador.seleccionar(propias, {'personal'}), propias)
+        # Herramientas nuevas sin grupo se envían siempre
+        nueva = herramienta('herramienta_nueva')
+        self.assertIn('herramienta_nueva', enrutador.nombres(enrutador.seleccionar(TODAS + [nueva], set())))
+
+    def test_metricas_de_precision(self):
+        antes = enrutador.metricas()['peticiones']
+        with self.assertLogs('modules.chatbot.enrutador', level='INFO') as log:
+            enrutador.registrar({'cobranzas', 'consultas'}, {'get_deuda_cliente'}, 500, 5000, False)
+
+        self.assertIn('precision=0.50', log.output[0])
+        self.assertIn('cobertura=1.00', log.output[0])
+        self.assertEqual(enrutador.metricas()['peticiones'], antes + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
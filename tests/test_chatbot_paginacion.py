@@ -0,0 +1,71 @@
+"""
+Tests para la paginación por cursor y presupuesto de tokens de las herramientas del chatbot
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.chatbot import paginacion
+
+CAMPOS = ('id', 'nombre', 'cargo', 'notas')
+
+
+def filas(total):
+    return [{'id': i, 'nombre': f'Empleado {i}', 'cargo': 'Analista', 'notas': 'x' * 1000}
+            for i in range(total)]
+
+
+class TestPaginacion(unittest.TestCase):
+
+    def test_proyecta_campos_pedidos(self):
+        args = {'campos': ['cargo', 'desconocido', 'id'], 'limite': 3}
+        resultado = paginacion.consultar(lambda limit, offset: filas(10)[offset:offset + limit],
+                                         args, 'empleados', CAMPOS, ('nombre',))
+
+        self.assertEqual(resultado['empleados'][0], {'id': 0, 'cargo': 'Analista'})
+        self.assertEqual(resultado['mostrados'], 3)
+        self.assertEqual(resultado['siguiente_cursor'], '3')
+
+    def test_cursor_recorre_todas_las_filas(self):
+        datos = filas(25)
+        pedidas = []
+
+        def consulta(limit, offset):
+            pedidas.append((limit, offset))
+            return datos[offset:offset + limit]
+
+        vistos, args = [], {'campos': ['id'], 'limite': 10}
+        while True:
+            resultado = paginacion.consultar(consulta, args, 'empleados', CAMPOS, ('id',))
+            vistos += [e['id'] for e in resultado['empleados']]
+            if 'siguiente_cursor' not in resultado:
+                break
+            args['cursor'] = resultado['siguiente_cursor']
+
+        self.assertEqual(vistos, list(range(25)))
+        # Una fila extra por página para saber si hay más
+        self.assertEqual(pedidas, [(11, 0), (11, 10), (11, 20)])
+
+    def test_presupuesto_de_tokens_corta_la_pagina(self):
+        campos = ['id', 'notas']
+        resultado = paginacion.pagina(filas(20), 0, 20, campos, 'empleados', presupuesto=200)
+
+        self.assertLess(resultado['mostrados'], 20)
+        self.assertGreaterEqual(resultado['mostrados'], 1)
+        self.assertLessEqual(paginacion.estimar_tokens(resultado['empleados']), 200 + 10)
+        self.assertEqual(resultado['siguiente_cursor'], str(resultado['mostrados']))
+        # Los textos largos se recortan
+        self.assertLessEqual(len(resultado['empleados'][0]['notas']), paginacion.MAX_CARACTERES_CAMPO + 1)
+
+    def test_cursor_invalido(self):
+        for cursor in ('abc', '-5'):
+            with self.assertRaises(ValueError):
+                paginacion.leer_cursor(cursor)
+        self.assertEqual(paginacion.leer_cursor(None), 0)
+        self.assertEqual(paginacion.leer_limite(500), paginacion.MAX_LIMITE)
+
+
+if __name__ == '__main__':
+    unittest.main()
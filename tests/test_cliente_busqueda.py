@@ -0,0 +1,37 @@
+"""
+Tests para la normalización y tokenización de la búsqueda de clientes
+"""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import normalizar_texto, ClienteBusqueda
+
+
+class TestClienteBusqueda(unittest.TestCase):
+
+    def test_normalizar_quita_acentos_y_signos(self):
+        self.assertEqual(normalizar_texto('Comercializadora Peñón, S.A. de C.V.'),
+                         'comercializadora penon s a de c v')
+        self.assertEqual(normalizar_texto(None), '')
+
+    def test_tokens_incluyen_codigo_compacto(self):
+        tokens = ClienteBusqueda.tokens_cliente({
+            'codigo': 'CLI-001',
+            'razon_social': 'Distribuidora Álamo',
+            'rfc': 'DAL-850101-AB1'
+        })
+        self.assertIn('cli001', tokens)
+        self.assertIn('alamo', tokens)
+        self.assertIn('dal850101ab1', tokens)
+
+    def test_terminos_consulta_limitados(self):
+        terminos = ClienteBusqueda.terminos_consulta('uno dos tres cuatro cinco')
+        self.assertEqual(len(terminos), ClienteBusqueda.MAX_TERMINOS)
+        self.assertEqual(ClienteBusqueda.terminos_consulta('  '), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Tests para las métricas de comparación de ejecuciones ML
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas.comparacion import acuerdo, calibracion, curva_ganancia, psi
+
+
+class TestComparacionEjecuciones(unittest.TestCase):
+
+    def test_curva_ganancia_modelo_perfecto(self):
+        score = np.array([0.9, 0.8, 0.2, 0.1])
+        pago = np.array([1, 1, 0, 0])
+        curva = curva_ganancia(score, pago, puntos=4)
+        self.assertEqual([p['ganancia'] for p in curva], [0.5, 1.0, 1.0, 1.0])
+        self.assertEqual(curva[0]['lift'], 2.0)
+        self.assertEqual(curva_ganancia(score, np.zeros(4)), [])
+
+    def test_calibracion_brier_y_ece(self):
+        prob = np.array([0.05, 0.05, 0.95, 0.95, np.nan])
+        pago = np.array([0, 0, 1, 1, 1])
+        resultado = calibracion(prob, pago)
+        self.assertEqual([b['clientes'] for b in resultado['bins']], [2, 2])
+        self.assertAlmostEqual(resultado['brier'], 0.0025, places=4)
+        self.assertAlmostEqual(resultado['ece'], 0.05, places=4)
+
+    def test_psi_estable_y_con_deriva(self):
+        rng = np.random.default_rng(0)
+        base = rng.random(5000)
+        self.assertLess(psi(base, rng.random(5000)), 0.02)
+        self.assertGreater(psi(base, rng.random(5000) ** 4), 0.25)
+        self.assertIsNone(psi([], base))
+
+    def test_acuerdo_sobre_clientes_comunes(self):
+        resultado = acuerdo(
+            np.array(['A', 'B', 'C']), np.array([0, 1, 2]), np.array([0.9, 0.5, 0.1]),
+            np.array(['B', 'C', 'D']), np.array([1, 1, 0]), np.array([0.6, 0.2, 0.8]),
+        )
+        self.assertEqual(resultado['clientes_comunes'], 2)
+        self.assertEqual(resultado['acuerdo'], 0.5)
+        self.assertEqual(resultado['matriz'][2][1], 1)
+        self.assertEqual(resultado['correlacion_rangos'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
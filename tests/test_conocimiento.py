@@ -0,0 +1,128 @@
+"""
+Tests para los embeddings locales y el índice vectorial del chatbot
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.chatbot import conocimiento
+from modules.chatbot.conocimiento import EmbeddingsLocales, IndiceVectorial
+
+
+class TablaCompartida:
+    """conocimiento_fragmentos en memoria, compartida por varios nodos"""
+
+    PASAJES = [{'id': i, 'orden': 0, 'texto': f'Pasaje {i} sobre viáticos', 'titulo': 'Política'}
+               for i in range(1, 6)]
+
+    def __init__(self):
+        self.filas = {}
+
+    def execute_query(self, query, params=None, fetch=False):
+        if 'MAX(fila)' in query:
+            filas = [fila for indice, fila in self.filas if indice == params[0]]
+            return [{'ultima_fila': max(filas, default=None)}]
+        if 'FROM documento_pasajes' in query:
+            indice, desde, limite = params
+            indexados = {f['fuente_id'] for (i, _), f in self.filas.items()
+                         if i == indice and f['fuente'] == 'documento'}
+            return [p for p in self.PASAJES if p['id'] > desde and p['id'] not in indexados][:limite]
+        return []
+
+    def execute_transaction(self, operaciones):
+        for query, params in operaciones:
+            if query.strip().startswith('DELETE'):
+                self.filas = {k: v for k, v in self.filas.items() if k[0] != params[0]}
+                continue
+            for indice, fila, fuente, fuente_id, orden, texto in params:
+                if (indice, fila) in self.filas:
+                    return False
+                self.filas[(indice, fila)] = {'fuente': fuente, 'fuente_id': fuente_id}
+        return True
+
+
+class TestConocimiento(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.carpeta.cleanup()
+
+    def test_embeddings_locales_priorizan_el_tema(self):
+        embeddings = EmbeddingsLocales()
+        pasajes = embeddings.embeber([
+            'Política de viáticos: el tope diario de hospedaje es de 1500 pesos.',
+            'Las vacaciones se solicitan con quince días de anticipación.',
+        ])
+        consulta = embeddings.embeber(['politica de viatico'])[0]
+        similitudes = pasajes @ consulta
+        self.assertGreater(similitudes[0], similitudes[1])
+        self.assertAlmostEqual(float(np.linalg.norm(pasajes[0])), 1.0, places=5)
+
+    def test_busqueda_exacta_e_ivf(self):
+        rng = np.random.default_rng(1)
+        vectores = conocimiento._normalizar(rng.normal(size=(600, 16)).astype(np.float32))
+        indice = IndiceVectorial(self.carpeta.name)
+        indice.reiniciar('prueba', 16)
+        self.assertEqual(indice.agregar(vectores[:400]), 0)
+        self.assertEqual(indice.agregar(vectores[400:]), 400)
+
+        filas, similitudes = indice.buscar(vectores[450], 3)
+        self.assertEqual(filas[0], 450)
+        self.assertAlmostEqual(float(similitudes[0]), 1.0, places=5)
+
+        with patch.object(conocimiento, 'MIN_FILAS_IVF', 100):
+            self.assertTrue(indice.requiere_entrenamiento())
+            indice.entrenar()
+            self.assertFalse(indice.requiere_entrenamiento())
+            indice.agregar(vectores[:10])
+            self.assertEqual(len(indice.asignaciones()), 610)
+            filas, _ = indice.buscar(vectores[123], 1)
+        self.assertEqual(filas[0], 123)
+
+
+    def test_nodos_con_indices_propios_sobre_la_tabla_compartida(self):
+        tabla = TablaCompartida()
+        nodos = [tempfile.TemporaryDirectory() for _ in range(2)]
+        self.addCleanup(lambda: [n.cleanup() for n in nodos])
+
+        def sincronizar(nodo, **kwargs):
+            with patch.object(conocimiento.Config, 'RAG_INDEX_FOLDER', nodo.name), \
+                    patch.object(conocimiento.Config, 'RAG_EMBEDDINGS', 'local'), \
+                    patch.object(conocimiento, 'execute_query', side_effect=tabla.execute_query), \
+                    patch.object(conocimiento, 'execute_transaction', side_effect=tabla.execute_transaction):
+                return conocimiento.sincronizar(**kwargs)
+
+        self.assertEqual(sincronizar(nodos[0])['nuevos'], 5)
+        # Un segundo nodo indexa todo en su propia instancia, sin chocar con el primero
+        self.assertEqual(sincronizar(nodos[1])['nuevos'], 5)
+        self.assertEqual(sincronizar(nodos[0])['nuevos'], 0)
+        self.assertEqual(len(tabla.filas), 10)
+
+        # Un nodo que pierde su carpeta se reconstruye sin borrar las filas del otro
+        otra = IndiceVectorial(nodos[1].name).instancia
+        os.remove(os.path.join(nodos[0].name, 'vectores.f32'))
+        self.assertEqual(sincronizar(nodos[0])['nuevos'], 5)
+        self.assertEqual(sum(1 for indice, _ in tabla.filas if indice == otra), 5)
+        self.assertEqual(len(tabla.filas), 10)
+
+        # Un pasaje con ID menor que se confirma después de sincronizar también se indexa
+        tabla.PASAJES = tabla.PASAJES[1:]
+        sincronizar(nodos[0], reconstruir=True)
+        tabla.PASAJES = TablaCompartida.PASAJES
+        self.assertEqual(sincronizar(nodos[0])['nuevos'], 1)
+
+        sincronizar(nodos[1], reconstruir=True)
+        self.assertNotIn(otra, {indice for indice, _ in tabla.filas})
+        self.assertEqual(len(tabla.filas), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
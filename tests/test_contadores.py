@@ -0,0 +1,41 @@
+"""
+Tests para los contadores con escritura diferida
+"""
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contadores
+from contadores import ContadorDiferido
+
+
+class TestContadorDiferido(unittest.TestCase):
+
+    def setUp(self):
+        self.contador = ContadorDiferido('anuncios', 'vistas', intervalo=3600)
+
+    def test_agrega_por_id_en_un_solo_update(self):
+        for registro_id in (7, 7, 3, 7):
+            self.contador.incrementar(registro_id)
+
+        with patch.object(contadores, 'execute_transaction', return_value=True) as escribir:
+            self.assertEqual(self.contador.vaciar(), 2)
+
+        (query, params), = escribir.call_args[0][0]
+        self.assertIn('CASE id WHEN %s THEN %s WHEN %s THEN %s END', query)
+        self.assertEqual(params, (7, 3, 3, 1, 7, 3))
+        self.assertEqual(self.contador.pendientes(), {})
+
+    def test_reintenta_si_falla_la_escritura(self):
+        self.contador.incrementar(5, 2)
+        with patch.object(contadores, 'execute_transaction', return_value=False):
+            self.assertEqual(self.contador.vaciar(), 0)
+        self.contador.incrementar(5)
+        self.assertEqual(self.contador.pendientes(), {5: 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Tests para los backends del almacén de documentos (local y S3 compatible)
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from modules.documents import storage
+from modules.documents.backends import BackendLocal, BackendS3
+
+
+class ClientError(Exception):
+    def __init__(self, codigo):
+        super().__init__(codigo)
+        self.response = {'Error': {'Code': codigo}}
+
+
+class ClienteS3Memoria:
+    """Sustituto en memoria de un servidor S3 (estilo MinIO) con la interfaz de boto3"""
+
+    class exceptions:
+        ClientError = ClientError
+
+    def __init__(self):
+        self.objetos = {}
+        self.subidas = 0
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objetos:
+            raise ClientError('404')
+        return {'ContentLength': len(self.objetos[(Bucket, Key)])}
+
+    def upload_file(self, Filename, Bucket, Key, Config=None):
+        with open(Filename, 'rb') as f:
+            self.objetos[(Bucket, Key)] = f.read()
+        self.subidas += 1
+
+    def download_file(self, Bucket, Key, Filename):
+        if (Bucket, Key) not in self.objetos:
+            raise ClientError('404')
+        with open(Filename, 'wb') as f:
+            f.write(self.objetos[(Bucket, Key)])
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objetos[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objetos.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operacion, Params, ExpiresIn):
+        return f"https://minio.local/{Params['Bucket']}/{Params['Key']}?expira={ExpiresIn}"
+
+
+class TestBackendsAlmacen(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.patcher = patch.object(Config, 'DOCUMENTS_FOLDER', self.carpeta)
+        self.patcher.start()
+        self.cliente = ClienteS3Memoria()
+        self.s3 = BackendS3(self.cliente, 'intranet', prefijo='documentos', expira=60)
+        self.referenciar = patch.object(storage.DocumentBlob, 'referenciar', return_value=True)
+        self.referenciar.start()
+
+    def tearDown(self):
+        self.referenciar.stop()
+        self.patcher.stop()
+        shutil.rmtree(self.carpeta)
+
+    def test_guardar_en_s3_sube_una_vez_por_contenido(self):
+        with patch.object(storage, 'backend', return_value=self.s3):
+            primero = storage.guardar(io.BytesIO(b'reglamento interno'))
+            segundo = storage.guardar(io.BytesIO(b'reglamento interno'))
+
+        clave = 'documentos/' + storage.clave(primero['sha256'])
+        self.assertEqual(self.cliente.objetos[('intranet', clave)], b'reglamento interno')
+        self.assertEqual(self.cliente.subidas, 1)
+        self.assertFalse(segundo['nuevo'])
+        self.assertEqual(primero['ruta'], f's3://intranet/{clave}')
+        self.assertEqual(os.listdir(storage.carpeta_temporal()), [])
+
+    def test_liberar_borra_blob_y_derivados(self):
+        with patch.object(storage, 'backend', return_value=self.s3):
+            blob = storage.guardar(io.BytesIO(b'manual'))
+            for sufijo in storage.SUFIJOS_DERIVADOS:
+                with open(os.path.join(self.carpeta, 'derivado'), 'wb') as f:
+                    f.write(b'x')
+                self.s3.subir(os.path.join(self.carpeta, 'derivado'),
+                              storage.clave_derivado(blob['sha256'], sufijo))
+            with patch.object(storage.DocumentBlob, 'liberar',
+                              side_effect=lambda sha256, borrar: borrar() or True):
+                storage.liberar(blob['sha256'])
+
+        self.assertEqual(self.cliente.objetos, {})
+
+    def test_url_firmada_y_copia_local(self):
+        with patch.object(storage, 'backend', return_value=self.s3):
+            blob = storage.guardar(io.BytesIO(b'contenido remoto'))
+            with storage.copia_local({'sha256': blob['sha256']}) as ruta:
+                with open(ruta, 'rb') as f:
+                    self.assertEqual(f.read(), b'contenido remoto')
+        self.assertFalse(os.path.exists(ruta))
+
+        url = self.s3.url_descarga(storage.clave(blob['sha256']), 'manual.pdf')
+        self.assertIn('expira=60', url)
+        self.assertIsNone(BackendS3(self.cliente, 'intranet', expira=0).url_descarga('a/b/c', 'x.pdf'))
+
+    def test_migrar_de_local_a_s3(self):
+        local = BackendLocal(self.carpeta)
+        with patch.object(storage, 'backend', return_value=local):
+            blob = storage.guardar(io.BytesIO(b'politica de viajes'))
+        miniatura = storage.clave_derivado(blob['sha256'], 'miniatura.png')
+        with open(local.ruta_local(miniatura), 'wb') as f:
+            f.write(b'png')
+
+        blobs = [{'sha256': blob['sha256'], 'tamanio': blob['tamanio'], 'ruta': blob['ruta']},
+                 {'sha256': 'f' * 64, 'tamanio': 1, 'ruta': 'perdido'}]
+        with patch.object(storage.DocumentBlob, 'get_all', return_value=blobs), \
+                patch.object(storage.DocumentBlob, 'actualizar_ruta', return_value=True) as actualizar:
+            reporte = storage.migrar_backend(local, self.s3)
+            repetido = storage.migrar_backend(local, self.s3)
+
+        self.assertEqual((reporte['copiados'], reporte['derivados']), (1, 1))
+        self.assertEqual(reporte['faltantes'], ['f' * 64])
+        self.assertEqual((repetido['copiados'], repetido['existentes']), (0, 1))
+        self.assertTrue(self.s3.existe(miniatura))
+        actualizar.assert_called_with(blob['sha256'], self.s3.uri(storage.clave(blob['sha256'])))
+        # El origen queda intacto
+        self.assertTrue(local.existe(storage.clave(blob['sha256'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
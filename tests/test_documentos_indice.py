@@ -0,0 +1,66 @@
+"""
+Tests para la extracción de texto y los fragmentos del índice de documentos
+"""
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.documents.indice import extraer_texto, fragmento, pasajes
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+S = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+
+class TestIndiceDocumentos(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.carpeta.cleanup()
+
+    def crear_zip(self, nombre, archivos):
+        ruta = os.path.join(self.carpeta.name, nombre)
+        with zipfile.ZipFile(ruta, 'w') as z:
+            for interno, contenido in archivos.items():
+                z.writestr(interno, contenido)
+        return ruta
+
+    def test_extrae_docx_y_xlsx(self):
+        docx = self.crear_zip('a.docx', {'word/document.xml': (
+            f'<w:document xmlns:w="{W}"><w:body>'
+            '<w:p><w:r><w:t>Política de </w:t></w:r><w:r><w:t>viáticos</w:t></w:r></w:p>'
+            '<w:p><w:r><w:t>Tope diario</w:t></w:r></w:p></w:body></w:document>')})
+        self.assertEqual(extraer_texto(docx, 'docx'), 'Política de viáticos\nTope diario')
+
+        xlsx = self.crear_zip('b.xlsx', {
+            'xl/sharedStrings.xml': f'<sst xmlns="{S}"><si><t>Concepto</t></si><si><t>Hotel</t></si></sst>',
+            'xl/worksheets/sheet1.xml': (
+                f'<worksheet xmlns="{S}"><sheetData>'
+                '<row><c t="s"><v>0</v></c></row>'
+                '<row><c t="s"><v>1</v></c><c><v>1500</v></c></row>'
+                '</sheetData></worksheet>'),
+        })
+        self.assertEqual(extraer_texto(xlsx, 'xlsx'), 'Concepto\nHotel | 1500')
+        self.assertEqual(extraer_texto(xlsx, 'png'), '')
+
+    def test_pasajes_respetan_tamano(self):
+        texto = 'Primer párrafo.\n\n' + 'Una oración larga de relleno. ' * 50
+        resultado = pasajes(texto, tamano=200)
+        self.assertTrue(resultado[0].startswith('Primer párrafo.'))
+        self.assertTrue(all(len(p) <= 200 for p in resultado))
+        self.assertEqual(''.join(resultado).count('relleno'), 50)
+
+    def test_fragmento_centrado_sin_acentos(self):
+        texto = 'x' * 500 + ' La POLÍTICA DE VIÁTICOS aplica a viajes. ' + 'y' * 500
+        recorte = fragmento(texto, 'politica viaticos', ancho=120)
+        self.assertIn('POLÍTICA DE VIÁTICOS', recorte)
+        self.assertTrue(recorte.startswith('…') and recorte.endswith('…'))
+
+
+if __name__ == '__main__':
+    unittest.main()
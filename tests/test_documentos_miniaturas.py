@@ -0,0 +1,74 @@
+"""
+Tests para las miniaturas y vistas previas de documentos
+"""
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from modules.documents import miniaturas, storage
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class TestMiniaturas(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(Config, 'DOCUMENTS_FOLDER', self.carpeta.name)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.carpeta.cleanup()
+
+    def _doc(self, contenido, tipo):
+        with patch.object(storage.DocumentBlob, 'referenciar', return_value=True):
+            blob = storage.guardar(io.BytesIO(contenido))
+        return {'id': 1, 'sha256': blob['sha256'], 'ruta_archivo': blob['ruta'], 'tipo_archivo': tipo}
+
+    def test_vista_previa_de_texto(self):
+        doc = self._doc(('línea con contenido\n\n   \n' * 200).encode('utf-8'), 'txt')
+
+        self.assertEqual(miniaturas.generar(doc['sha256'], 'txt'), 'texto')
+        clave, mimetype = miniaturas.existente(doc)
+        ruta = storage.backend().ruta_local(clave)
+        self.assertTrue(mimetype.startswith('text/plain'))
+        with open(ruta, encoding='utf-8') as f:
+            vista = f.read()
+        self.assertLessEqual(len(vista), miniaturas.MAX_CARACTERES_VISTA)
+        self.assertNotIn('\n\n', vista)
+
+    @unittest.skipIf(Image is None, 'Pillow no está instalado')
+    def test_miniatura_de_imagen_respeta_el_maximo(self):
+        salida = io.BytesIO()
+        Image.new('RGB', (2000, 1000), 'navy').save(salida, format='PNG')
+        doc = self._doc(salida.getvalue(), 'png')
+
+        self.assertEqual(miniaturas.generar(doc['sha256'], 'PNG'), 'miniatura')
+        clave, mimetype = miniaturas.existente(doc)
+        ruta = storage.backend().ruta_local(clave)
+        self.assertEqual(mimetype, 'image/png')
+        with Image.open(ruta) as miniatura:
+            self.assertLessEqual(miniatura.width, miniaturas.MAX_ANCHO)
+            self.assertLessEqual(miniatura.height, miniaturas.MAX_ALTO)
+
+    def test_tipo_sin_vista_previa(self):
+        doc = self._doc(b'PK\x03\x04', 'zip')
+
+        self.assertFalse(miniaturas.soportado('zip'))
+        self.assertIsNone(miniaturas.generar(doc['sha256'], 'zip'))
+        self.assertIsNone(miniaturas.existente(doc))
+        self.assertFalse(miniaturas.programar(doc))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests para el almacén de documentos direccionado por contenido
+"""
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from modules.documents import storage
+
+
+class ReferenciasMemoria:
+    """documento_blobs en memoria: referenciar() y liberar() de DocumentBlob"""
+
+    def __init__(self):
+        self.referencias = {}
+
+    def referenciar(self, sha256, tamanio, ruta):
+        self.referencias[sha256] = self.referencias.get(sha256, 0) + 1
+        return True
+
+    def liberar(self, sha256, borrar=None):
+        if sha256 not in self.referencias:
+            return False
+        self.referencias[sha256] -= 1
+        if self.referencias[sha256] > 0:
+            return False
+        if borrar:
+            borrar()
+        del self.referencias[sha256]
+        return True
+
+
+class TestAlmacenDocumentos(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.tabla = ReferenciasMemoria()
+        self.patchers = [
+            patch.object(Config, 'DOCUMENTS_FOLDER', self.carpeta.name),
+            patch.object(storage.DocumentBlob, 'referenciar', side_effect=self.tabla.referenciar),
+            patch.object(storage.DocumentBlob, 'liberar', side_effect=self.tabla.liberar),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.carpeta.cleanup()
+
+    def test_guardar_calcula_hash_por_bloques(self):
+        contenido = os.urandom(storage.TAMANO_BLOQUE * 2 + 123)
+        blob = storage.guardar(io.BytesIO(contenido))
+
+        self.assertEqual(blob['sha256'], hashlib.sha256(contenido).hexdigest())
+        self.assertEqual(blob['tamanio'], len(contenido))
+        self.assertTrue(blob['nuevo'])
+        self.assertEqual(blob['ruta'], storage.ruta_blob(blob['sha256']))
+        with open(blob['ruta'], 'rb') as f:
+            self.assertEqual(f.read(), contenido)
+
+    def test_contenido_repetido_comparte_blob(self):
+        primero = storage.guardar(io.BytesIO(b'politica de viajes'))
+        segundo = storage.guardar(io.BytesIO(b'politica de viajes'))
+
+        self.assertFalse(segundo['nuevo'])
+        self.assertEqual(primero['ruta'], segundo['ruta'])
+        self.assertEqual(os.listdir(os.path.join(self.carpeta.name, 'tmp')), [])
+
+
+    def test_referencia_se_toma_al_guardar_y_el_blob_se_borra_al_final(self):
+        primero = storage.guardar(io.BytesIO(b'manual de induccion'))
+        segundo = storage.guardar(io.BytesIO(b'manual de induccion'))
+        self.assertEqual(self.tabla.referencias[primero['sha256']], 2)
+
+        storage.descartar(segundo)
+        self.assertTrue(os.path.exists(primero['ruta']))
+        storage.liberar(primero['sha256'])
+        self.assertFalse(os.path.exists(primero['ruta']))
+        self.assertEqual(self.tabla.referencias, {})
+
+    def test_vuelve_a_subir_si_el_blob_desaparecio(self):
+        blob = storage.guardar(io.BytesIO(b'reglamento'))
+        # Otro proceso liberó la última referencia y borró el archivo
+        os.remove(blob['ruta'])
+
+        otra = storage.guardar(io.BytesIO(b'reglamento'))
+        self.assertTrue(otra['nuevo'])
+        self.assertTrue(os.path.exists(otra['ruta']))
+
+
+if __name__ == '__main__':
+    unittest.main()
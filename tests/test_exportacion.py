@@ -0,0 +1,57 @@
+"""
+Tests para los escritores en streaming de la exportación de cobranzas
+"""
+import io
+import os
+import sys
+import unittest
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.dom import minidom
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas.exportacion import generar_csv, generar_xlsx
+
+COLUMNAS = [('numero', 'Número'), ('cliente', 'Cliente'), ('fecha', 'Fecha'), ('monto', 'Monto')]
+
+
+def filas(n):
+    for i in range(n):
+        yield {'numero': f'F-{i}', 'cliente': 'Peñón & <Hijos>\x01',
+               'fecha': date(2026, 1, 15), 'monto': Decimal('1500.50')}
+
+
+class TestExportacion(unittest.TestCase):
+
+    def test_csv_con_encabezado_y_bom(self):
+        contenido = b''.join(generar_csv(filas(2), COLUMNAS)).decode('utf-8')
+        lineas = contenido.lstrip('\ufeff').splitlines()
+        self.assertTrue(contenido.startswith('\ufeff'))
+        self.assertEqual(lineas[0], 'Número,Cliente,Fecha,Monto')
+        self.assertEqual(len(lineas), 3)
+        self.assertIn('2026-01-15,1500.50', lineas[1])
+
+    def test_csv_neutraliza_formulas(self):
+        fila = {'numero': '=HYPERLINK("http://x")', 'cliente': '@SUM(A1)',
+                'fecha': '-2+3', 'monto': Decimal('-150.00')}
+        contenido = b''.join(generar_csv([fila], COLUMNAS)).decode('utf-8')
+        linea = contenido.splitlines()[1]
+        self.assertTrue(linea.startswith('"\'=HYPERLINK('))
+        self.assertIn(",'@SUM(A1),'-2+3,", linea)
+        # Los números negativos se exportan tal cual
+        self.assertTrue(linea.endswith(',-150.00'))
+
+    def test_xlsx_valido_y_por_bloques(self):
+        bloques = list(generar_xlsx(filas(20000), COLUMNAS, hoja='Facturas'))
+        self.assertGreater(len(bloques), 2)
+
+        libro = zipfile.ZipFile(io.BytesIO(b''.join(bloques)))
+        hoja = minidom.parseString(libro.read('xl/worksheets/sheet1.xml'))
+        self.assertEqual(len(hoja.getElementsByTagName('row')), 20001)
+        self.assertIn('xl/workbook.xml', libro.namelist())
+
+
+if __name__ == '__main__':
+    unittest.main()
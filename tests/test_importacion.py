@@ -0,0 +1,77 @@
+"""
+Tests para la validación de filas de la importación masiva de cobranzas
+"""
+import io
+import os
+import sys
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas import importacion
+from modules.cobranzas.importacion import _validar_factura, _validar_pago
+
+CLIENTES = {'CLI001': 1}
+
+
+class TestValidacionImportacion(unittest.TestCase):
+
+    def test_factura_completa_valores_por_defecto(self):
+        valores = _validar_factura({
+            'numero_factura': 'F-001', 'cliente_codigo': 'CLI001',
+            'fecha_emision': '2026-01-01', 'fecha_vencimiento': '2026-01-31',
+            'total': '1,160.00', 'iva': '160'
+        }, CLIENTES, usuario_id=7)
+
+        self.assertEqual(valores[:4], ('F-001', 1, date(2026, 1, 1), date(2026, 1, 31)))
+        self.assertEqual(valores[4], Decimal('1000.00'))   # subtotal = total - iva
+        self.assertEqual(valores[7], Decimal('1160.00'))   # saldo = total
+        self.assertEqual(valores[8:10], ('MXN', 'pendiente'))
+        self.assertEqual(valores[-1], 7)
+
+    def test_factura_rechazos(self):
+        base = {'numero_factura': 'F-002', 'cliente_codigo': 'CLI001',
+                'fecha_emision': '2026-02-01', 'fecha_vencimiento': '2026-03-01', 'total': '100'}
+        for cambios in ({'cliente_codigo': 'NOPE'},
+                        {'fecha_vencimiento': '2026-01-01'},
+                        {'total': 'abc'},
+                        {'saldo_pendiente': '150'},
+                        {'moneda': 'EUR'}):
+            with self.assertRaises(ValueError):
+                _validar_factura({**base, **cambios}, CLIENTES, None)
+
+    def test_pago(self):
+        valores = _validar_pago({'numero_pago': 'P-1', 'cliente_codigo': 'CLI001',
+                                 'fecha_pago': '2026-02-10', 'monto': '500'}, CLIENTES, None)
+        self.assertEqual(valores[3:5], (Decimal('500.00'), 'transferencia'))
+
+        with self.assertRaises(ValueError):
+            _validar_pago({'numero_pago': 'P-2', 'cliente_codigo': 'CLI001',
+                           'fecha_pago': '2026-02-10', 'monto': '0'}, CLIENTES, None)
+
+
+    def test_error_de_codificacion_devuelve_reporte_parcial(self):
+        # Más filas que el bloque que decodifica TextIOWrapper, para que el
+        # byte inválido aparezca a mitad de la lectura y no en el encabezado
+        contenido = ('numero_pago,cliente_codigo,fecha_pago,monto\n'
+                     + ''.join(f'P-{i},CLI001,2026-02-10,100\n' for i in range(1000))).encode('utf-8')
+        archivo = io.TextIOWrapper(io.BytesIO(contenido + b'P-X,CLI001,2026-02-10,\xff\n'),
+                                   encoding='utf-8', newline='')
+
+        def consulta(query, params=None, fetch=False):
+            return [{'id': 1, 'codigo': 'CLI001'}] if 'FROM clientes' in query else []
+
+        with patch.object(importacion, 'execute_query', side_effect=consulta), \
+                patch.object(importacion, 'execute_transaction', return_value=True):
+            reporte = importacion.importar('pagos', archivo, tamano_lote=100)
+
+        self.assertEqual(reporte['error'], 'El archivo debe estar codificado en UTF-8')
+        self.assertGreater(reporte['insertadas'], 0)
+        self.assertEqual(reporte['insertadas'] % 100, 0)
+        self.assertEqual(reporte['ultima_linea_confirmada'], reporte['insertadas'] + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests para la simulación Monte Carlo del pronóstico de cobranza
+"""
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas import pronostico
+from modules.cobranzas.pronostico import simular, resumir
+
+
+class TestPronosticoCobranza(unittest.TestCase):
+
+    def test_pago_seguro_cobra_en_semana_de_vencimiento(self):
+        # Cliente 0: una factura vencida y otra que vence en la semana 2
+        # Cliente 1: nunca paga
+        cobros = simular(
+            clientes=np.array([0, 0, 1]),
+            saldos=np.array([100.0, 50.0, 70.0]),
+            semanas_vencimiento=np.array([0, 2, 0]),
+            probabilidad=np.array([1.0, 0.0]),
+            dias_pago=np.array([1.0, 1.0]),
+            semanas=4, escenarios=200, seed=1
+        )
+        self.assertEqual(cobros.shape, (200, 4))
+        np.testing.assert_allclose(cobros, np.tile([100.0, 0.0, 50.0, 0.0], (200, 1)))
+
+    def test_esperado_converge_a_probabilidad_por_saldo(self):
+        cobros = simular(
+            clientes=np.arange(50),
+            saldos=np.full(50, 1000.0),
+            semanas_vencimiento=np.zeros(50, dtype=np.int64),
+            probabilidad=np.full(50, 0.4),
+            dias_pago=np.full(50, 1.0),
+            semanas=2, escenarios=5000, seed=7
+        )
+        self.assertAlmostEqual(cobros.sum(axis=1).mean() / 50000.0, 0.4, delta=0.01)
+
+    def test_resumen_bandas_ordenadas(self):
+        rng = np.random.default_rng(3)
+        resumen = resumir(rng.uniform(0, 100, (1000, 3)))
+        self.assertEqual(len(resumen['semanas']), 3)
+        for semana in resumen['semanas']:
+            self.assertLessEqual(semana['p05'], semana['p50'])
+            self.assertLessEqual(semana['p50'], semana['p95'])
+        self.assertEqual(resumen['total']['esperado'], resumen['semanas'][-1]['acumulado_esperado'])
+
+
+    def test_calculo_fuera_del_lock_y_sin_duplicar(self):
+        liberar = threading.Event()
+        llamadas = []
+
+        def calcular(ejecucion_id, semanas, escenarios):
+            llamadas.append(semanas)
+            if semanas == 13:
+                liberar.wait(5)
+            return {'semanas': semanas}
+
+        resultados = []
+        with patch.object(pronostico, '_calcular', side_effect=calcular), \
+                patch.dict(pronostico._cache, clear=True):
+            hilos = [threading.Thread(target=lambda: resultados.append(
+                pronostico.pronosticar(ejecucion_id=1, semanas=13))) for _ in range(3)]
+            for hilo in hilos:
+                hilo.start()
+            # Mientras el primer cálculo sigue en curso, otra clave no espera
+            self.assertEqual(pronostico.pronosticar(ejecucion_id=1, semanas=4), {'semanas': 4})
+            liberar.set()
+            for hilo in hilos:
+                hilo.join(5)
+
+        self.assertEqual(sorted(llamadas), [4, 13])
+        self.assertEqual(resultados, [{'semanas': 13}] * 3)
+        self.assertEqual(pronostico._en_curso, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+Tests para la respuesta columnar de resultados ML por lote de clientes
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas.resultados import calcular_etag, columnar
+
+
+class TestResultadosLote(unittest.TestCase):
+
+    def test_etag_cambia_solo_con_resultado_vigente(self):
+        filas = [
+            {'cliente_codigo': 'C001', 'modelo_id': 1, 'resultado_id': 10, 'score_prediccion': 0.4},
+            {'cliente_codigo': 'C002', 'modelo_id': 1, 'resultado_id': 11, 'score_prediccion': 0.7},
+        ]
+        codigos = ['C001', 'C002', 'C003']
+        etag = calcular_etag(codigos, filas)
+        self.assertEqual(etag, calcular_etag(codigos, list(reversed(filas))))
+
+        filas[1] = dict(filas[1], resultado_id=25)
+        self.assertNotEqual(etag, calcular_etag(codigos, filas))
+
+    def test_etag_cambia_con_los_clientes_pedidos(self):
+        filas = [{'cliente_codigo': 'C001', 'modelo_id': 1, 'resultado_id': 10}]
+        etag = calcular_etag(['C001', 'C002'], filas)
+        # La lista de llamadas se reordena o agrega un cliente sin resultados
+        self.assertNotEqual(etag, calcular_etag(['C002', 'C001'], filas))
+        self.assertNotEqual(etag, calcular_etag(['C001', 'C002', 'C009'], filas))
+
+    def test_columnar(self):
+        filas = [{'a': 1, 'b': 'x'}, {'a': 2}]
+        self.assertEqual(columnar(filas, ('a', 'b')), {'a': [1, 2], 'b': ['x', None]})
+
+
+if __name__ == '__main__':
+    unittest.main()
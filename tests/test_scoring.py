@@ -0,0 +1,83 @@
+"""
+Tests para el modelo del scoring ML por lotes de cobranza
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.cobranzas.scoring import FEATURES, ModeloScoring, auc, clasificar, _puntuar_lote
+
+
+def cartera_sintetica(n=2000, seed=0):
+    """Clientes cuyo pago depende de la tasa de incumplimiento y los días de atraso"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(5, 90, n),            # dias_promedio_pago
+        rng.integers(0, 6, n),            # facturas_vencidas
+        rng.uniform(1000, 500000, n),     # saldo_pendiente
+        rng.uniform(10000, 1000000, n),   # limite_credito
+        rng.uniform(0, 3000, n),          # antiguedad_cliente
+        rng.uniform(0, 1, n),             # tasa_incumplimiento
+        rng.integers(0, 4, n),            # numero_promesas_incumplidas
+        rng.uniform(0, 120, n),           # dias_atraso
+        rng.integers(0, 10, n),           # contactos_realizados
+    ]).astype(float)
+    logit = 2.0 - 4.0 * X[:, 5] - 0.02 * X[:, 7]
+    y_pago = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(float)
+    y_dias = np.where(y_pago == 1, 10 + 0.5 * X[:, 0] + rng.normal(0, 3, n), np.nan)
+    X[rng.random(n) < 0.1, 0] = np.nan
+    return X, y_pago, y_dias
+
+
+class TestScoringCobranza(unittest.TestCase):
+
+    def test_auc_con_empates(self):
+        self.assertEqual(auc([0, 0, 1, 1], [0.1, 0.2, 0.8, 0.9]), 1.0)
+        self.assertEqual(auc([0, 1], [0.5, 0.5]), 0.5)
+        self.assertIsNone(auc([1, 1], [0.2, 0.3]))
+
+    def test_entrenamiento_aprende_relacion(self):
+        X, y_pago, y_dias = cartera_sintetica()
+        modelo = ModeloScoring.entrenar(X, y_pago, y_dias)
+        self.assertGreater(modelo.metricas['auc_roc'], 0.75)
+        self.assertLess(modelo.metricas['mae'], 6)
+        importancias = modelo.importancias()
+        self.assertEqual(max(importancias, key=importancias.get), 'tasa_incumplimiento')
+
+    def test_artefacto_ida_y_vuelta(self):
+        X, y_pago, y_dias = cartera_sintetica(500)
+        modelo = ModeloScoring.entrenar(X, y_pago, y_dias)
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, 'modelo.npz')
+            modelo.guardar(ruta)
+            cargado = ModeloScoring.cargar(ruta)
+        Z = modelo.transformar(modelo.imputar(X))
+        np.testing.assert_allclose(cargado.predecir(cargado.transformar(cargado.imputar(X)))[0],
+                                   modelo.predecir(Z)[0])
+        self.assertEqual(cargado.features, FEATURES)
+        self.assertEqual(cargado.metricas['auc_roc'], modelo.metricas['auc_roc'])
+
+    def test_filas_de_resultados(self):
+        X, y_pago, y_dias = cartera_sintetica(300)
+        modelo = ModeloScoring.entrenar(X, y_pago, y_dias)
+        X = modelo.imputar(X[:3])
+        saldos = np.array([1000.0, 0.0, 5000.0])
+        filas = _puntuar_lote((modelo, 7, ['C1', 'C2', 'C3'], X, modelo.transformar(X), saldos))
+        self.assertEqual([f[:2] for f in filas], [(7, 'C1'), (7, 'C2'), (7, 'C3')])
+        for fila, saldo in zip(filas, saldos):
+            self.assertAlmostEqual(fila[6], fila[4] * saldo, delta=saldo * 1e-4 + 0.01)
+            self.assertEqual(fila[3], str(clasificar(np.array([fila[4]]))[0]))
+            self.assertTrue(1 <= fila[5] <= 365)
+
+    def test_clasificacion_por_umbrales(self):
+        self.assertEqual(list(clasificar(np.array([0.2, 0.5, 0.74, 0.75, 0.99]))),
+                         ['alto_riesgo', 'medio_riesgo', 'medio_riesgo', 'bajo_riesgo', 'bajo_riesgo'])
+
+
+if __name__ == '__main__':
+    unittest.main()